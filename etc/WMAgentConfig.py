@@ -181,6 +181,7 @@ config.JobAccountant.logLevel = globalLogLevel
 config.JobAccountant.workerThreads = 1
 config.JobAccountant.pollInterval = 60
 config.JobAccountant.specDir = config.General.workDir + "/JobAccountant/SpecCache"
+config.JobAccountant.reportLoaderProcesses = 0
 
 config.component_("JobCreator")
 config.JobCreator.namespace = "WMComponent.JobCreator.JobCreator"
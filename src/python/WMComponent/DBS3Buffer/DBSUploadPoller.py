@@ -38,6 +38,7 @@ from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Services.UUID                  import makeUUID
 from WMCore.WMException                    import WMException
 from WMCore.Algorithms.MiscAlgos           import sortListByKey
+from WMCore.DataStructs.MathStructs.ContinuousSummaryHistogram import ContinuousSummaryHistogram
 
 from WMComponent.DBS3Buffer.DBSBufferUtil  import DBSBufferUtil
 from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock
@@ -111,10 +112,12 @@ def uploadWorker(workInput, results, dbsUrl):
         block = work.get('block', None)
 
         # Do stuff with DBS
+        startTime = time.time()
         try:
             logging.debug("About to call insert block with block: %s", block)
             dbsApi.insertBulkBlock(blockDump = block)
-            results.put({'name': name, 'success': "uploaded"})
+            results.put({'name': name, 'success': "uploaded",
+                         'latency': time.time() - startTime})
         except Exception as ex:
             exString = str(ex)
             if 'Block %s already exists' % name in exString:
@@ -123,24 +126,92 @@ def uploadWorker(workInput, results, dbsUrl):
                 logging.error("Had duplicate entry for block %s. Ignoring for now.", name)
                 logging.debug("Exception: %s", exString)
                 logging.debug("Traceback: %s", str(traceback.format_exc()))
-                results.put({'name': name, 'success': "uploaded"})
+                results.put({'name': name, 'success': "uploaded",
+                             'latency': time.time() - startTime})
             elif 'Proxy Error' in exString:
                 # This is probably a successfully inserton that went bad.
                 # Put it on the check list
                 msg = "Got a proxy error for block (%s)." % name
                 logging.error(msg)
                 logging.error(str(traceback.format_exc()))
-                results.put({'name': name, 'success': "check"})
+                results.put({'name': name, 'success': "check",
+                             'latency': time.time() - startTime})
             else:
                 msg =  "Error trying to process block %s through DBS.\n" % name
                 msg += exString
                 logging.error(msg)
                 logging.error(str(traceback.format_exc()))
                 logging.debug("block: %s \n", block)
-                results.put({'name': name, 'success': "error", 'error': msg})
+                results.put({'name': name, 'success': "error", 'error': msg,
+                             'latency': time.time() - startTime})
 
     return
 
+class RetryScheduler(object):
+    """
+    _RetryScheduler_
+
+    Keep track of the blocks waiting for a retry.  The first retry is done
+    on the next cycle, then the delay starts at baseDelay and is doubled
+    every time the block is scheduled again, up to maxDelay.
+    """
+
+    def __init__(self, baseDelay, maxDelay):
+        self.baseDelay = baseDelay
+        self.maxDelay  = maxDelay
+        # block name: (number of attempts, time of the next attempt)
+        self.entries   = {}
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, name, now = None):
+        """
+        _schedule_
+
+        Schedule the next attempt for a block, return the delay.
+        """
+        now = now or time.time()
+        attempts = self.entries.get(name, (0, None))[0] + 1
+        delay = 0
+        if attempts > 1:
+            delay = min(self.baseDelay * 2 ** (attempts - 2), self.maxDelay)
+        self.entries[name] = (attempts, now + delay)
+        return delay
+
+    def isWaiting(self, name, now = None):
+        """
+        _isWaiting_
+
+        Check whether a block is scheduled for a later attempt.
+        """
+        if name not in self.entries:
+            return False
+        return self.entries[name][1] > (now or time.time())
+
+    def due(self, now = None):
+        """
+        _due_
+
+        Return the blocks whose attempt is due, oldest first.
+        """
+        now = now or time.time()
+        dueEntries = [(retryTime, name) for name, (_, retryTime) in self.entries.items()
+                      if retryTime <= now]
+        return [name for _, name in sorted(dueEntries)]
+
+    def remove(self, name):
+        """
+        _remove_
+
+        Forget about a block.
+        """
+        self.entries.pop(name, None)
+        return
+
 class DBSUploadException(WMException):
     """
     Holds the exception info for
@@ -175,12 +246,14 @@ class DBSUploadPoller(BaseWorkerThread):
                                      dbinterface = myThread.dbi)
 
         self.pool   = []
-        self.blocksToCheck = []
         self.workInput  = None
         self.workResult = None
         self.nProc  = getattr(self.config.DBS3Upload, 'nProcesses', 4)
         self.wait   = getattr(self.config.DBS3Upload, 'dbsWaitTime', 2)
         self.nTries = getattr(self.config.DBS3Upload, 'dbsNTries', 300)
+        self.maxInFlight = getattr(self.config.DBS3Upload, 'dbsMaxInFlight', 2 * self.nProc)
+        retryDelay    = getattr(self.config.DBS3Upload, 'dbsRetryDelay', 60)
+        maxRetryDelay = getattr(self.config.DBS3Upload, 'dbsMaxRetryDelay', 3600)
         self.physicsGroup   = getattr(self.config.DBS3Upload, "physicsGroup", "NoGroup")
         self.datasetType    = getattr(self.config.DBS3Upload, "datasetType", "PRODUCTION")
         self.primaryDatasetType = getattr(self.config.DBS3Upload, "primaryDatasetType", "mc")
@@ -189,6 +262,18 @@ class DBSUploadPoller(BaseWorkerThread):
 
         # List of blocks currently in processing
         self.queuedBlocks = []
+        self.queueTimes   = {}
+        self.blockResults = []
+
+        # Blocks to check in DBS after a proxy error and blocks to upload
+        # again after an error, both retried with an exponential backoff
+        self.blocksToCheck = RetryScheduler(retryDelay, maxRetryDelay)
+        self.blocksToRetry = RetryScheduler(retryDelay, maxRetryDelay)
+
+        # Latency histograms of the blocks uploaded in the current cycle:
+        # the DBS call and the whole time in the upload pipeline
+        self.latencyHistograms = {}
+        self.latencySummary    = {}
 
         # Set up the pool of worker processes
         self.setupPool()
@@ -520,6 +605,8 @@ class DBSUploadPoller(BaseWorkerThread):
         following:
          Queued - Block is already being acted on by another process.  We just
           ignore it.
+         Waiting - Block is waiting to be checked in DBS or to be uploaded
+          again after an error.  We ignore it until it is due.
          Pending, not in DBSBuffer - Block that has been closed and needs to
            be injected into DBS and also written to DBSBuffer.  We'll do both.
          Pending, in DBSBuffer - Block has been closed and written to
@@ -543,6 +630,10 @@ class DBSUploadPoller(BaseWorkerThread):
                 # Block is already being dealt with by another process.  We'll
                 # ignore it here.
                 continue
+            if block.getName() in self.blocksToCheck or \
+                    self.blocksToRetry.isWaiting(block.getName()):
+                # Block is waiting for a retry
+                continue
             if block.status == 'Pending':
                 # All pending blocks need to be injected into DBS.
                 createInDBS.append(block)
@@ -560,6 +651,11 @@ class DBSUploadPoller(BaseWorkerThread):
         # Build the pool if it was closed
         if len(self.pool) == 0:
             self.setupPool()
+        if not self.latencyHistograms:
+            for key in ['latency', 'queueLatency']:
+                self.latencyHistograms[key] = ContinuousSummaryHistogram(title = "DBS block %s" % key,
+                                                                         xLabel = "Seconds",
+                                                                         yLabel = "Blocks")
 
         # First handle new and updated blocks
         if len(createInDBSBuffer) > 0 or len(updateInDBSBuffer) > 0:
@@ -613,7 +709,9 @@ class DBSUploadPoller(BaseWorkerThread):
             else:
                 myThread.transaction.commit()
 
-        # Finally upload blocks to DBS.
+        # Finally upload blocks to DBS.  The blocks are encoded while the
+        # previous ones are being uploaded, with at most maxInFlight blocks
+        # handed to the upload processes at any time.
         for block in createInDBS:
             if len(block.files) < 1:
                 # What are we doing?
@@ -631,8 +729,10 @@ class DBSUploadPoller(BaseWorkerThread):
             block.setPhysicsGroup(group = self.physicsGroup)
             
             encodedBlock = block.convertToDBSBlock()
+            self.waitForUploadSlot()
             logging.info("About to insert block %s", block.getName())
             self.workInput.put({'name': block.getName(), 'block': encodedBlock})
+            self.queueTimes[block.getName()] = time.time()
             self.blockCount += 1
             if self.produceCopy:
                 import json
@@ -644,6 +744,63 @@ class DBSUploadPoller(BaseWorkerThread):
         # And all work is in and we're done for now
         return
 
+    def collectResult(self):
+        """
+        _collectResult_
+
+        Get the result of one upload out of the result queue, waiting at most
+        dbsWaitTime for it.  Return False if there was none.
+        """
+        try:
+            blockresult = self.workResult.get(timeout = self.wait)
+        except Queue.Empty:
+            return False
+
+        self.blockResults.append(blockresult)
+        self.blockCount -= 1
+        queueTime = self.queueTimes.pop(blockresult['name'], None)
+        if queueTime is not None:
+            blockresult['queueLatency'] = time.time() - queueTime
+        for key, histogram in self.latencyHistograms.items():
+            if key in blockresult:
+                histogram.addPoint(blockresult[key])
+        logging.debug("Got a block to close")
+        return True
+
+    def waitForUploadSlot(self):
+        """
+        _waitForUploadSlot_
+
+        Wait until there are less than maxInFlight blocks being uploaded.
+        """
+        emptyCount = 0
+        while self.blockCount >= self.maxInFlight:
+            if self.collectResult():
+                continue
+            emptyCount += 1
+            if emptyCount > self.nTries:
+                msg = "Exceeded max number of waits while waiting for a DBS upload to finish"
+                raise DBSUploadException(msg)
+        return
+
+    def summarizeLatency(self):
+        """
+        _summarizeLatency_
+
+        Log the upload latency histograms of the cycle and start new ones.
+        """
+        histograms = self.latencyHistograms
+        self.latencyHistograms = {}
+        if not histograms or histograms['latency'].nPoints == 0:
+            return
+        self.latencySummary = {}
+        for key, histogram in histograms.items():
+            self.latencySummary[key] = histogram.toJSON()
+            logging.info("Uploaded %d blocks, %s average %.2f s, std dev %.2f s, histogram %s",
+                         histogram.nPoints, histogram.title, self.latencySummary[key]['average'],
+                         self.latencySummary[key]['stdDev'], self.latencySummary[key]['data'])
+        return
+
     def retrieveBlocks(self):
         """
         _retrieveBlocks_
@@ -659,7 +816,6 @@ class DBSUploadPoller(BaseWorkerThread):
         updateBlocksDAO = self.daoFactory(classname = "UpdateBlocks")
         updateFilesDAO = self.daoFactory(classname = "UpdateFiles")
 
-        blocksToClose = []
         emptyCount    = 0
         while self.blockCount > 0:
             if emptyCount > self.nTries:
@@ -679,35 +835,37 @@ class DBSUploadPoller(BaseWorkerThread):
                 else:
                     self.timeoutWaiver = 0
                     return
-            try:
-                # Get stuff out of the queue with a ridiculously
-                # short wait time
-                blockresult = self.workResult.get(timeout = self.wait)
-                blocksToClose.append(blockresult)
-                self.blockCount -= 1
-                logging.debug("Got a block to close")
-            except Queue.Empty:
+            # Get stuff out of the queue with a ridiculously
+            # short wait time
+            if not self.collectResult():
                 # This means the queue has no current results
                 time.sleep(2)
                 emptyCount += 1
                 continue
 
+        blocksToClose = self.blockResults
+        self.blockResults = []
+        self.summarizeLatency()
+
         loadedBlocks = []
         for result in blocksToClose:
             # Remove from list of work being processed
-            self.queuedBlocks.remove(result.get('name'))
+            name = result.get('name')
+            self.queuedBlocks.remove(name)
             if result["success"] == "uploaded":
-                block = self.blockCache.get(result.get('name'))
+                block = self.blockCache.get(name)
                 block.status = 'InDBS'
                 loadedBlocks.append(block)
+                self.blocksToRetry.remove(name)
             elif result["success"] == "check":
-                block = result["name"]
-                self.blocksToCheck.append(block)
+                delay = self.blocksToCheck.schedule(name)
+                logging.info("Block %s will be checked in DBS in %d seconds", name, delay)
             else:
-                logging.error("Error found in multiprocess during process of block %s", result.get('name'))
+                logging.error("Error found in multiprocess during process of block %s", name)
                 logging.error(result['error'])
-                # Continue to the next block
                 # Block will remain in pending status until it is transferred
+                delay = self.blocksToRetry.schedule(name)
+                logging.info("Block %s will be uploaded again in %d seconds", name, delay)
 
         if len(loadedBlocks) > 0:
             try:
@@ -761,7 +919,8 @@ class DBSUploadPoller(BaseWorkerThread):
         _checkBlocks_
 
         Check with DBS3 if the blocks marked as check are
-        uploaded or not.
+        uploaded or not.  Blocks that are not in DBS are uploaded again,
+        blocks that can't be checked are checked again later.
         """
         myThread = threading.currentThread()
 
@@ -771,23 +930,27 @@ class DBSUploadPoller(BaseWorkerThread):
         blocksUploaded = []
 
         # See if there is anything to check
-        for block in self.blocksToCheck:
+        for block in self.blocksToCheck.due():
             logging.debug("Checking block existence: %s", block)
             # Check in DBS if the block was really inserted
             try:
                 result = self.dbsApi.listBlocks(block_name = block)
-                for blockResult in result:
-                    if blockResult['block_name'] == block:
-                        loadedBlock = self.blockCache.get(block)
-                        loadedBlock.status = 'InDBS'
-                        blocksUploaded.append(loadedBlock)
-                        break
             except Exception as ex:
                 exString = str(ex)
                 msg =  "Error trying to check block %s through DBS.\n" % block
                 msg += exString
                 logging.error(msg)
                 logging.error(str(traceback.format_exc()))
+                self.blocksToCheck.schedule(block)
+                continue
+
+            self.blocksToCheck.remove(block)
+            for blockResult in result:
+                if blockResult['block_name'] == block:
+                    loadedBlock = self.blockCache.get(block)
+                    loadedBlock.status = 'InDBS'
+                    blocksUploaded.append(loadedBlock)
+                    break
 
         # Update the status of those blocks that were truly inserted
         if len(blocksUploaded) > 0:
@@ -816,9 +979,7 @@ class DBSUploadPoller(BaseWorkerThread):
             # Clean things up
             name = block.getName()
             del self.blockCache[name]
-
-        # Clean the check list
-        self.blocksToCheck = []
+            self.blocksToRetry.remove(name)
 
         # We're done
         return
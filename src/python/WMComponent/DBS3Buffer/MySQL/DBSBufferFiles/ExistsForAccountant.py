@@ -16,7 +16,8 @@ class ExistsForAccountant(DBFormatter):
     This is highly specialized.  You shouldn't confuse it with
     a normal Exists DAO
 
-
+    Takes a list of lfns and returns the ones that exist, in a single
+    select.
     """
     sql = "SELECT lfn FROM dbsbuffer_file WHERE lfn = :lfn"
 
@@ -26,6 +27,11 @@ class ExistsForAccountant(DBFormatter):
         return self.dbi.buildbinds(self.dbi.makelist(lfn), "lfn")
 
     def execute(self, lfn=None, conn = None, transaction = False):
-        result = self.dbi.processData(self.sql, self.getBinds(lfn),
-                         conn = conn, transaction = transaction)
+        binds = self.getBinds(lfn)
+        if len(binds) == 0:
+            return []
+
+        result = self.dbi.processData(self.sql, binds,
+                         conn = conn, transaction = transaction,
+                         inKey = "lfn")
         return self.format(result)
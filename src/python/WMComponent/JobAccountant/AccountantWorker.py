@@ -16,6 +16,8 @@ import threading
 import logging
 import gc
 import collections
+import multiprocessing
+import time
 
 from WMCore.FwkJobReport.Report  import Report
 from WMCore.DAOFactory           import DAOFactory
@@ -25,6 +27,7 @@ from WMCore.WMException          import WMException
 from WMCore.DataStructs.Run import Run
 from WMCore.WMBS.File       import File
 from WMCore.WMBS.Job        import Job
+from WMCore.WMBS.ParentageResolver import ParentageResolver
 
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMComponent.DBS3Buffer.DBSBufferFile import DBSBufferFile
@@ -35,6 +38,100 @@ from WMCore.Lexicon import sanitizeURL
 from WMCore.ACDC.DataCollectionService  import DataCollectionService
 
 
+# Phases of the handling of a slice of jobs, prefetch and commit are the
+# database bound ones
+ACCOUNTANT_PHASES = ["prefetch", "loadReports", "handleJobs", "commit"]
+
+
+def createMissingFWKJR(parameters, errorCode = 999,
+                       errorDescription = 'Failure of unknown type'):
+    """
+    _createMissingFWJR_
+
+    Create a missing FWJR if the report can't be found by the code in the
+    path location.
+    """
+    report = Report()
+    report.addError("cmsRun1", 84, errorCode, errorDescription)
+    report.data.cmsRun1.status = "Failed"
+    return report
+
+
+def loadJobReport(parameters):
+    """
+    _loadJobReport_
+
+    Given a framework job report on disk, load it and return a
+    FwkJobReport instance.  If there is any problem loading or parsing the
+    framework job report return a report with the error.
+    """
+    # The jobReportPath may be prefixed with "file://" which needs to be
+    # removed so it doesn't confuse the FwkJobReport() parser.
+    jobReportPath = parameters.get("fwjr_path", None)
+    if not jobReportPath:
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99999, "FWJR path is empty")
+
+    jobReportPath = jobReportPath.replace("file://","")
+    if not os.path.exists(jobReportPath):
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
+
+    if os.path.getsize(jobReportPath) == 0:
+        logging.error("Empty FwkJobReport: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
+
+    jobReport = Report()
+
+    try:
+        jobReport.load(jobReportPath)
+    except Exception as ex:
+        msg =  "Error loading jobReport %s\n" % jobReportPath
+        msg += str(ex)
+        logging.error(msg)
+        logging.debug("Failing job: %s\n" % parameters)
+        return createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
+
+    if len(jobReport.listSteps()) == 0:
+        logging.error("FwkJobReport with no steps: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
+
+    return jobReport
+
+
+def digestJobReport(jobReport):
+    """
+    _digestJobReport_
+
+    Pull out of a report what the accountant needs to handle the job: the
+    success status, the steps, the output files with their runs and lumis,
+    the logArch1 files used for failed jobs and the skipped files.  The
+    files keep their references to the report sections.
+    """
+    digest = {"success": jobReport.taskSuccessful(),
+              "steps": jobReport.listSteps(),
+              "logArchFiles": jobReport.getAllFilesFromStep(step = 'logArch1'),
+              "files": [],
+              "skippedFiles": []}
+    if digest["success"]:
+        digest["files"] = jobReport.getAllFiles()
+        digest["skippedFiles"] = jobReport.getAllSkippedFiles()
+    return digest
+
+
+def loadAndDigestJobReport(parameters):
+    """
+    _loadAndDigestJobReport_
+
+    Load and digest the report of a job, run by the report loader processes.
+    The report and its digest are returned together so that the files in the
+    digest still point to the report once they are sent back.
+    """
+    jobReport = loadJobReport(parameters)
+    jobReport.setJobID(parameters["id"])
+    return jobReport, digestJobReport(jobReport)
+
+
 class AccountantWorkerException(WMException):
     """
     _AccountantWorkerException_
@@ -77,6 +174,8 @@ class AccountantWorker(WMConnectionBase):
         self.getJobInfoByID          = self.daofactory(classname = "Jobs.LoadFromID")
         self.getFullJobInfo          = self.daofactory(classname = "Jobs.LoadForErrorHandler")
         self.getJobTaskNameAction    = self.daofactory(classname = "Jobs.GetFWJRTaskName")
+        self.getOutputIDAction       = self.daofactory(classname = "Jobs.LoadOutputID")
+        self.getMasksAction          = self.daofactory(classname = "Masks.Load")
         self.pnn_to_psn              = self.daofactory(classname = "Locations.GetPNNtoPSNMapping").execute()
         
         self.dbsStatusAction       = self.dbsDaoFactory(classname = "DBSBufferFiles.SetStatus")
@@ -130,6 +229,15 @@ class AccountantWorker(WMConnectionBase):
         self.dbsLocations      = set()
         self.workflowIDs       = collections.deque(maxlen = 1000)
         self.workflowPaths     = collections.deque(maxlen = 1000)
+        self.phaseTimings      = dict.fromkeys(ACCOUNTANT_PHASES, 0.0)
+        self.reportsPerSecond  = 0.0
+
+        # Load and digest the job reports in a pool of processes, the
+        # database work stays in this thread
+        self.reportLoaderProcesses = getattr(config.JobAccountant, 'reportLoaderProcesses', 0)
+        self.reportLoaderPool = None
+        if self.reportLoaderProcesses > 0:
+            self.reportLoaderPool = multiprocessing.Pool(processes = self.reportLoaderProcesses)
 
         self.phedex = PhEDEx()
         self.locLists = self.phedex.getNodeMap()
@@ -161,42 +269,36 @@ class AccountantWorker(WMConnectionBase):
         """
         _loadJobReport_
 
-        Given a framework job report on disk, load it and return a
-        FwkJobReport instance.  If there is any problem loading or parsing the
-        framework job report return None.
+        Load the framework job report of a job, see loadJobReport().
         """
-        # The jobReportPath may be prefixed with "file://" which needs to be
-        # removed so it doesn't confuse the FwkJobReport() parser.
-        jobReportPath = parameters.get("fwjr_path", None)
-        if not jobReportPath:
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, "FWJR path is empty")
+        return loadJobReport(parameters)
 
-        jobReportPath = jobReportPath.replace("file://","")
-        if not os.path.exists(jobReportPath):
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
-
-        if os.path.getsize(jobReportPath) == 0:
-            logging.error("Empty FwkJobReport: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
+    def loadJobReports(self, parameters):
+        """
+        _loadJobReports_
 
-        jobReport = Report()
+        Load and digest the framework job reports of a list of jobs, in the
+        report loader processes if there are any.  Return a list of
+        (report, digest) tuples.
+        """
+        jobs = [{"id": x["id"], "fwjr_path": x["fwjr_path"]} for x in parameters]
+        if self.reportLoaderPool is None or len(jobs) < 2:
+            return [loadAndDigestJobReport(x) for x in jobs]
 
-        try:
-            jobReport.load(jobReportPath)
-        except Exception as ex:
-            msg =  "Error loading jobReport %s\n" % jobReportPath
-            msg += str(ex)
-            logging.error(msg)
-            logging.debug("Failing job: %s\n" % parameters)
-            return self.createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
+        chunkSize = max(1, len(jobs) // (4 * self.reportLoaderProcesses))
+        return self.reportLoaderPool.map(loadAndDigestJobReport, jobs, chunkSize)
 
-        if len(jobReport.listSteps()) == 0:
-            logging.error("FwkJobReport with no steps: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
+    def close(self):
+        """
+        _close_
 
-        return jobReport
+        Stop the report loader processes.
+        """
+        if self.reportLoaderPool is not None:
+            self.reportLoaderPool.close()
+            self.reportLoaderPool.join()
+            self.reportLoaderPool = None
+        return
 
     def isTaskExistInFWJR(self, jobReport, jobStatus):
         """
@@ -231,16 +333,29 @@ class AccountantWorker(WMConnectionBase):
         """
         returnList = []
         self.reset()
+        phaseTimings = dict.fromkeys(ACCOUNTANT_PHASES, 0.0)
+
+        startTime = time.time()
+        jobInfo = self.prefetchJobInfo([job["id"] for job in parameters])
+        phaseTimings["prefetch"] = time.time() - startTime
 
-        for job in parameters:
+        startTime = time.time()
+        jobReports = self.loadJobReports(parameters)
+        phaseTimings["loadReports"] = time.time() - startTime
+        if phaseTimings["loadReports"] > 0:
+            self.reportsPerSecond = len(jobReports) / phaseTimings["loadReports"]
+            logging.info("Loaded %d job reports at %.1f reports/s", len(jobReports),
+                         self.reportsPerSecond)
+
+        for job, (fwkJobReport, reportDigest) in zip(parameters, jobReports):
             logging.info("Handling %s" % job["fwjr_path"])
 
-            # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job)
-            fwkJobReport.setJobID(job['id'])
-            
+            startTime = time.time()
             jobSuccess = self.handleJob(jobID = job["id"],
-                                        fwkJobReport = fwkJobReport)
+                                        fwkJobReport = fwkJobReport,
+                                        jobInfo = jobInfo.get(job["id"]),
+                                        reportDigest = reportDigest)
+            phaseTimings["handleJobs"] += time.time() - startTime
 
             if self.returnJobReport:
                 returnList.append({'id': job["id"], 'jobSuccess': jobSuccess,
@@ -250,6 +365,7 @@ class AccountantWorker(WMConnectionBase):
 
             self.count += 1
 
+        startTime = time.time()
         self.beginTransaction()
 
         # Now things done at the end of the job
@@ -309,9 +425,56 @@ class AccountantWorker(WMConnectionBase):
             self.handleSkippedFiles()
 
         self.commitTransaction(existingTransaction = False)
+        phaseTimings["commit"] = time.time() - startTime
 
+        self.phaseTimings = phaseTimings
+        logging.info("Handled %d jobs, time spent by phase: %s", len(parameters),
+                     ", ".join(["%s %.2f s" % (x, phaseTimings[x]) for x in ACCOUNTANT_PHASES]))
         return returnList
 
+    def prefetchJobInfo(self, jobIDs):
+        """
+        _prefetchJobInfo_
+
+        Load what handleJob needs from WMBS for a list of jobs with one bulk
+        query per DAO: the output maps, the job types, the jobs with their
+        masks and the output fileset IDs.  Return a dictionary keyed by job ID.
+        """
+        jobInfo = {}
+        if len(jobIDs) == 0:
+            return jobInfo
+
+        outputMaps = self.getOutputMapAction.execute(jobID = jobIDs,
+                                                     conn = self.getDBConn(),
+                                                     transaction = self.existingTransaction())
+        jobTypes = self.getJobTypeAction.execute(jobID = jobIDs,
+                                                 conn = self.getDBConn(),
+                                                 transaction = self.existingTransaction())
+        jobTypes = dict([(x["id"], x["type"]) for x in jobTypes])
+        jobRows = self.getJobInfoByID.execute([{"jobid": x} for x in jobIDs],
+                                              conn = self.getDBConn(),
+                                              transaction = self.existingTransaction())
+        if isinstance(jobRows, dict):
+            jobRows = [jobRows]
+        jobRows = dict([(x["id"], x) for x in jobRows])
+        masks = self.getMasksAction.execute(jobid = jobIDs,
+                                            conn = self.getDBConn(),
+                                            transaction = self.existingTransaction())
+        outputIDs = self.getOutputIDAction.execute(jobID = jobIDs,
+                                                   conn = self.getDBConn(),
+                                                   transaction = self.existingTransaction())
+
+        for jobID in jobIDs:
+            wmbsJob = Job(id = jobID)
+            wmbsJob.update(jobRows.get(jobID, {}))
+            wmbsJob["mask"].loadEntries(masks.get(jobID, []))
+            jobInfo[jobID] = {"outputMap": outputMaps.get(jobID, {}),
+                              "jobType": jobTypes.get(jobID),
+                              "job": wmbsJob,
+                              "outputID": outputIDs.get(jobID)}
+
+        return jobInfo
+
     def outputFilesetsForJob(self, outputMap, merged, moduleLabel):
         """
         _outputFilesetsForJob_
@@ -385,37 +548,20 @@ class AccountantWorker(WMConnectionBase):
         _findDBSParents_
 
         Find the parent of the file in DBS
-        This is meant to be called recursively
-        """
-        parentsInfo = self.getParentInfoAction.execute([lfn],
-                                                       conn = self.getDBConn(),
-                                                       transaction = self.existingTransaction())
-        newParents = set()
-        for parentInfo in parentsInfo:
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
-
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
+        """
+        return self.findDBSParentsBulk([lfn])[lfn]
 
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findDBSParents(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+    def findDBSParentsBulk(self, lfns):
+        """
+        _findDBSParentsBulk_
 
-        return newParents
+        Find the parents in DBS for a list of files, walking up the
+        unmerged ancestors one generation at a time.  Returns a dictionary
+        keyed by lfn.
+        """
+        parentageResolver = ParentageResolver(self.getParentInfoAction)
+        return parentageResolver.findParents(lfns, conn = self.getDBConn(),
+                                             transaction = self.existingTransaction())
 
     def addFileToWMBS(self, jobType, fwjrFile, jobMask, task, jobID = None):
         """
@@ -452,26 +598,29 @@ class AccountantWorker(WMConnectionBase):
                 file.location = self.phedex.getBestNodeName(file.location, self.locLists)
 
 
-    def handleJob(self, jobID, fwkJobReport):
+    def handleJob(self, jobID, fwkJobReport, jobInfo = None, reportDigest = None):
         """
         _handleJob_
 
         Figure out if a job was successful or not, handle it appropriately
-        (parse FWJR, update WMBS) and return the success status as a boolean
+        (parse FWJR, update WMBS) and return the success status as a boolean.
+        The WMBS information about the job and the report digest are loaded
+        unless they were already loaded by prefetchJobInfo and
+        digestJobReport.
 
         """
-        jobSuccess = fwkJobReport.taskSuccessful()
+        if jobInfo is None:
+            jobInfo = self.prefetchJobInfo([jobID])[jobID]
+        if reportDigest is None:
+            reportDigest = digestJobReport(fwkJobReport)
 
-        outputMap = self.getOutputMapAction.execute(jobID = jobID,
-                                                    conn = self.getDBConn(),
-                                                    transaction = self.existingTransaction())
+        jobSuccess = reportDigest["success"]
 
-        jobType = self.getJobTypeAction.execute(jobID = jobID,
-                                                conn = self.getDBConn(),
-                                                transaction = self.existingTransaction())
+        outputMap = jobInfo["outputMap"]
+        jobType = jobInfo["jobType"]
 
         if jobSuccess:
-            fileList = fwkJobReport.getAllFiles()
+            fileList = reportDigest["files"]
 
             # consistency check comparing outputMap to fileList
             # they should match except for some limited special cases
@@ -492,7 +641,7 @@ class AccountantWorker(WMConnectionBase):
                 failJob = True
                 if jobType in [ "Processing", "Production" ]:
                     cmsRunSteps = 0
-                    for step in fwkJobReport.listSteps():
+                    for step in reportDigest["steps"]:
                         if step.startswith("cmsRun"):
                             cmsRunSteps += 1
                     if cmsRunSteps > 1:
@@ -503,11 +652,11 @@ class AccountantWorker(WMConnectionBase):
                     logging.error("Job %d , list of expected outputModules does not match job report, failing job", jobID)
                     logging.debug("Job %d , expected outputModules %s", jobID, sorted(outputMap.keys()))
                     logging.debug("Job %d , fwjr outputModules %s", jobID, sorted(outputModules))
-                    fileList = fwkJobReport.getAllFilesFromStep(step = 'logArch1')
+                    fileList = reportDigest["logArchFiles"]
                 else:
                     logging.debug("Job %d , list of expected outputModules does not match job report, accepted for multi-step CMSSW job", jobID)
         else:
-            fileList = fwkJobReport.getAllFilesFromStep(step = 'logArch1')
+            fileList = reportDigest["logArchFiles"]
 
         if jobSuccess:
             logging.info("Job %d , handle successful job", jobID)
@@ -536,10 +685,8 @@ class AccountantWorker(WMConnectionBase):
         # now handle the job (unless the special LogCollect check failed)
         if not skipLogCollect:
 
-            wmbsJob = Job(id = jobID)
-            wmbsJob.load()
-            outputID = wmbsJob.loadOutputID()
-            wmbsJob.getMask()
+            wmbsJob = jobInfo["job"]
+            outputID = jobInfo["outputID"]
 
             wmbsJob["fwjr"] = fwkJobReport
 
@@ -576,7 +723,7 @@ class AccountantWorker(WMConnectionBase):
             # Check if the job had any skipped files, put them in ACDC containers
             # We assume full file processing (no job masks)
             if jobSuccess:
-                skippedFiles = fwkJobReport.getAllSkippedFiles()
+                skippedFiles = reportDigest["skippedFiles"]
                 if skippedFiles and jobType not in ['LogCollect', 'Cleanup']:
                     self.jobsWithSkippedFiles[jobID] = skippedFiles
 
@@ -631,13 +778,9 @@ class AccountantWorker(WMConnectionBase):
         """
         _createMissingFWJR_
 
-        Create a missing FWJR if the report can't be found by the code in the
-        path location.
+        Create a missing FWJR, see createMissingFWKJR().
         """
-        report = Report()
-        report.addError("cmsRun1", 84, errorCode, errorDescription)
-        report.data.cmsRun1.status = "Failed"
-        return report
+        return createMissingFWKJR(parameters, errorCode, errorDescription)
 
     def createFilesInDBSBuffer(self):
         """
@@ -906,9 +1049,9 @@ class AccountantWorker(WMConnectionBase):
         """
         outputLFNs = [f['lfn'] for f in self.mergedOutputFiles]
         bindList         = []
+        parentsByLFN = self.findDBSParentsBulk(outputLFNs)
         for lfn in outputLFNs:
-            newParents = self.findDBSParents(lfn = lfn)
-            for parentLFN in newParents:
+            for parentLFN in parentsByLFN[lfn]:
                 bindList.append({'child': lfn, 'parent': parentLFN})
 
         # Now all the parents should exist
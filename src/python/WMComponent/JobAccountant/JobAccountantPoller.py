@@ -8,11 +8,12 @@ Poll WMBS for complete jobs and process their framework job reports.
 import time
 import threading
 import logging
+import collections
 
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Agent.Harness import Harness
 from WMCore.DAOFactory import DAOFactory
-from WMComponent.JobAccountant.AccountantWorker import AccountantWorker
+from WMComponent.JobAccountant.AccountantWorker import AccountantWorker, ACCOUNTANT_PHASES
 from WMCore.WMException import WMException
 
 class JobAccountantPollerException(WMException):
@@ -52,6 +53,15 @@ class JobAccountantPoller(BaseWorkerThread):
         self.getJobsAction = daoFactory(classname = "Jobs.GetFWJRByState")
         return
 
+    def terminate(self, parameters = None):
+        """
+        _terminate_
+
+        Stop the report loader processes of the worker.
+        """
+        self.accountantWorker.close()
+        return
+
     def algorithm(self, parameters = None):
         """
         _algorithm_
@@ -66,11 +76,15 @@ class JobAccountantPoller(BaseWorkerThread):
             logging.debug("No work to do; exiting")
             return
 
+        nJobs = len(completeJobs)
+        cycleTimings = collections.defaultdict(float)
         while len(completeJobs) > 0:
             try:
                 jobsSlice = completeJobs[:self.accountantWorkSize]
                 completeJobs = completeJobs[self.accountantWorkSize:]
                 self.accountantWorker(jobsSlice)
+                for phase, phaseTime in self.accountantWorker.phaseTimings.items():
+                    cycleTimings[phase] += phaseTime
                 logging.info("Remaining completed jobs to process: %d" % len(completeJobs))
             except WMException:
                 myThread = threading.currentThread()
@@ -87,4 +101,25 @@ class JobAccountantPoller(BaseWorkerThread):
                 self.sendAlert(6, msg = msg)
                 raise JobAccountantPollerException(msg)
 
+        self.logPhaseTimings(nJobs, cycleTimings)
+        return
+
+    def logPhaseTimings(self, nJobs, cycleTimings):
+        """
+        _logPhaseTimings_
+
+        Log the time spent in each phase of the cycle and the share of the
+        database bound phases.
+        """
+        totalTime = sum(cycleTimings.values())
+        if totalTime <= 0:
+            return
+        dbTime = cycleTimings["prefetch"] + cycleTimings["commit"]
+        logging.info("Accounted %d jobs in %.2f s (%s), database share %.0f%%",
+                     nJobs, totalTime,
+                     ", ".join(["%s %.2f s" % (x, cycleTimings[x]) for x in ACCOUNTANT_PHASES]),
+                     100.0 * dbTime / totalTime)
+        if cycleTimings["loadReports"] > 0:
+            logging.info("Loaded job reports at %.1f reports/s",
+                         nJobs / cycleTimings["loadReports"])
         return
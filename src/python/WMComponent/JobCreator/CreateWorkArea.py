@@ -19,8 +19,9 @@ import traceback
 
 from subprocess import Popen, PIPE
 from WMCore.DAOFactory        import DAOFactory
-from WMCore.WMSpec.WMWorkload               import WMWorkload, WMWorkloadHelper
+from WMCore.WMSpec.WMSpecCache              import getSpecCache
 from WMCore.WMException import WMException
+from WMCore.WMBS.JobCacheIndex import INDEX_NAME
 from Utils.IteratorTools import grouper
 
 
@@ -89,8 +90,7 @@ def getMasterName(startDir, wmWorkload = None, workflow = None):
         logging.error(msg)
         raise CreateWorkAreaException(msg)
     else:
-        wmWorkload = WMWorkloadHelper(WMWorkload("workload"))
-        wmWorkload.load(workflow.spec)
+        wmWorkload = getSpecCache().getWorkload(workflow.spec)
 
         workload = wmWorkload.name()
 
@@ -322,7 +322,7 @@ class CreateWorkArea:
             return 0
         if os.path.isdir(jobCollDir):
             #This should never happen
-            return len(os.listdir(jobCollDir))
+            return len([x for x in os.listdir(jobCollDir) if x != INDEX_NAME])
         elif os.path.isfile(jobCollDir):
             #Well, you're screwed.  Some other file is in the way: IN A DIRECTORY YOU JUST CREATED.
             #Time to freak the hell out
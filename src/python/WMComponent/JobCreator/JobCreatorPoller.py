@@ -8,8 +8,10 @@ __all__ = []
 import os
 import os.path
 import logging
+import time
 import traceback
 import threading
+from collections import defaultdict
 try:
     import cPickle as pickle
 except ImportError:
@@ -24,8 +26,9 @@ from WMCore.JobStateMachine.ChangeState     import ChangeState
 from WMComponent.JobCreator.CreateWorkArea  import CreateWorkArea
 from WMCore.JobSplitting.SplitterFactory    import SplitterFactory
 from WMCore.WMBS.Subscription               import Subscription
+from WMCore.WMBS.JobCacheIndex              import INDEX_NAME, jobCacheRecord, appendJobCacheRecords
 from WMCore.WMBS.Workflow                   import Workflow
-from WMCore.WMSpec.WMWorkload               import WMWorkload, WMWorkloadHelper
+from WMCore.WMSpec.WMSpecCache              import getSpecCache
 from WMCore.FwkJobReport.Report             import Report
 
 
@@ -33,7 +36,8 @@ def retrieveWMSpec(workflow = None, wmWorkloadURL = None):
     """
     _retrieveWMSpec_
 
-    Given a subscription, this function loads the WMSpec associated with that workload
+    Given a subscription, this function loads the WMSpec associated with that workload.
+    The workload comes from the process spec cache and must not be modified, see WMSpecCache.
     """
     if not wmWorkloadURL and workflow:
         wmWorkloadURL = workflow.spec
@@ -42,10 +46,7 @@ def retrieveWMSpec(workflow = None, wmWorkloadURL = None):
         logging.error("WMWorkloadURL %s is empty" % (wmWorkloadURL))
         return None
 
-    wmWorkload = WMWorkloadHelper(WMWorkload("workload"))
-    wmWorkload.load(wmWorkloadURL)
-
-    return wmWorkload
+    return getSpecCache().getWorkload(wmWorkloadURL)
 
 
 def retrieveJobSplitParams(wmWorkload, task):
@@ -126,7 +127,8 @@ def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job to a pickle file.  Returns
+    the job record for the job cache index.
     """
     if wmTask:
             # If we managed to load the task,
@@ -155,8 +157,7 @@ def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
     pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
     output.close()
 
-
-    return
+    return jobCacheRecord(job)
 
 
 def creatorProcess(work, jobCacheDir):
@@ -209,23 +210,29 @@ def creatorProcess(work, jobCacheDir):
                                    wmWorkload = wmWorkload,
                                    cache = False)
 
+        # job collection directory -> records for its job cache index
+        indexRecords = defaultdict(list)
         for job in wmbsJobGroup.jobs:
             jobNumber += 1
-            saveJob(job = job, workflow = workflow,
-                    wmTask = wmTaskName,
-                    jobNumber = jobNumber,
-                    sandbox = sandbox,
-                    owner = owner,
-                    ownerDN = ownerDN,
-                    ownerGroup = ownerGroup,
-                    ownerRole = ownerRole,
-                    scramArch = scramArch,
-                    swVersion = swVersion,
-                    agentNumber = agentNumber,
-                    numberOfCores = numberOfCores,
-                    inputDataset = inputDataset,
-                    inputDatasetLocations = inputDatasetLocations,
-                    allowOpportunistic = allowOpportunistic)
+            record = saveJob(job = job, workflow = workflow,
+                             wmTask = wmTaskName,
+                             jobNumber = jobNumber,
+                             sandbox = sandbox,
+                             owner = owner,
+                             ownerDN = ownerDN,
+                             ownerGroup = ownerGroup,
+                             ownerRole = ownerRole,
+                             scramArch = scramArch,
+                             swVersion = swVersion,
+                             agentNumber = agentNumber,
+                             numberOfCores = numberOfCores,
+                             inputDataset = inputDataset,
+                             inputDatasetLocations = inputDatasetLocations,
+                             allowOpportunistic = allowOpportunistic)
+            indexRecords[os.path.dirname(job['cache_dir'])].append((job['id'], record))
+
+        for collectionDir, records in indexRecords.iteritems():
+            appendJobCacheRecords(os.path.join(collectionDir, INDEX_NAME), records)
 
     except Exception as ex:
         # Register as failure; move on
@@ -466,6 +473,7 @@ class JobCreatorPoller(BaseWorkerThread):
 
         #First, get list of Subscriptions
         subscriptions    = self.subscriptionList.execute()
+        specLoadTime     = 0.0
 
         # Okay, now we have a list of subscriptions
         for subscriptionID in subscriptions:
@@ -485,7 +493,9 @@ class JobCreatorPoller(BaseWorkerThread):
             workflow         = Workflow(id = wmbsSubscription["workflow"].id)
             workflow.load()
             wmbsSubscription['workflow'] = workflow
+            startTime        = time.time()
             wmWorkload       = retrieveWMSpec(workflow = workflow)
+            specLoadTime    += time.time() - startTime
 
             if not workflow.task or not wmWorkload:
                 # Then we have a problem
@@ -511,7 +521,7 @@ class JobCreatorPoller(BaseWorkerThread):
             # Get generators
             # If you fail to load the generators, pass on the job
             try:
-                if hasattr(wmTask.data, 'generators'):
+                if wmTask.listGenerators():
                     manager    = GeneratorManager(wmTask)
                     seederList = manager.getGeneratorList()
                 else:
@@ -580,7 +590,7 @@ class JobCreatorPoller(BaseWorkerThread):
                 # Assemble a dict of all the info
                 processDict = {'workflow': workflow,
                                'wmWorkload': wmWorkload, 'wmTaskName': wmTask.getPathName(),
-                               'jobNumber': jobNumber, 'sandbox': wmTask.data.input.sandbox,
+                               'jobNumber': jobNumber, 'sandbox': wmTask.getSandbox(),
                                'owner': wmWorkload.getOwner().get('name', None),
                                'ownerDN': wmWorkload.getOwner().get('dn', None),
                                'ownerGroup': wmWorkload.getOwner().get('vogroup', ''),
@@ -588,12 +598,7 @@ class JobCreatorPoller(BaseWorkerThread):
                                'numberOfCores': 1,
                                'inputDataset': wmTask.getInputDatasetPath()}
                 try:
-                    maxCores = 1
-                    stepNames = wmTask.listAllStepNames()
-                    for stepName in stepNames:
-                        sh = wmTask.getStep(stepName)
-                        maxCores = max(maxCores, sh.getNumberOfCores())
-                    processDict.update({'numberOfCores' : maxCores})
+                    processDict.update({'numberOfCores' : wmTask.getNumberOfCores()})
                 except AttributeError:
                     logging.info("Failed to read multicore settings from task %s" % wmTask.getPathName())
 
@@ -659,6 +664,7 @@ class JobCreatorPoller(BaseWorkerThread):
             # Close the jobFactory
             wmbsJobFactory.close()
 
+        logging.info("Loaded the specs of %i subscriptions in %.3f secs", len(subscriptions), specLoadTime)
         return
 
 
@@ -8,11 +8,12 @@ _JobSubmitterPoller_t_
 Submit jobs for execution.
 """
 
+import heapq
 import logging
 import threading
+import time
 import os.path
 from collections import defaultdict, Counter
-from operator import itemgetter
 try:
     import cPickle as pickle
 except ImportError:
@@ -28,6 +29,7 @@ from WMCore.DataStructs.JobPackage            import JobPackage
 from WMCore.FwkJobReport.Report               import Report
 from WMCore.WMException                       import WMException
 from WMCore.BossAir.BossAirAPI                import BossAirAPI
+from WMCore.WMBS.JobCacheIndex                import INDEX_NAME, jobCacheRecord, readJobCacheIndex
 from WMCore.Services.ReqMgr.ReqMgr import ReqMgr
 
 
@@ -73,6 +75,10 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.cachedJobIDs = set()
         self.cachedJobs = {}
         self.jobDataCache = {}
+        # site name -> ids of the cached jobs that could potentially run there
+        self.siteJobIndex = defaultdict(set)
+        # (possible sites, task type) -> heap of (-priority, timestamp, job id)
+        self.jobHeaps = {}
         self.jobsToPackage = {}
         self.sandboxPackage = {}
         self.locationDict = {}
@@ -213,13 +219,35 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         return
 
+    def packageJob(self, jobInfo):
+        """
+        _packageJob_
+
+        Unpickle a cached job and add it to a job package, returns the batch
+        directory of the package.
+        """
+        pickledJobPath = os.path.join(jobInfo["cache_dir"], "job.pkl")
+        try:
+            jobHandle = open(pickledJobPath, "r")
+            loadedJob = pickle.load(jobHandle)
+            jobHandle.close()
+        except Exception as ex:
+            msg = "Error while loading pickled job object %s\n" % pickledJobPath
+            msg += str(ex)
+            logging.error(msg)
+            raise JobSubmitterPollerException(msg)
+
+        loadedJob['retry_count'] = jobInfo['retry_count']
+        return self.addJobsToPackage(loadedJob)
+
     def refreshCache(self):
         """
         _refreshCache_
 
         Query WMBS for all jobs in the 'created' state.  For all jobs returned
         from the query, check if they already exist in the cache.  If they
-        don't, unpickle them and combine their site white and black list with
+        don't, read them from the job cache index (or unpickle them for jobs
+        without index) and combine their site white and black list with
         the list of locations they can run at.  Add them to the cache.
 
         Each entry in the cache is a tuple with five items:
@@ -236,7 +264,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         if self.cacheRefreshSize == -1 or len(self.cachedJobIDs) < self.cacheRefreshSize or \
            self.refreshPollingCount >= self.skipRefreshCount:
-            newJobs = self.listJobsAction.execute()
+            newJobs = self.listJobsAction.execute(lazy=True)
             self.refreshPollingCount = 0
             
             if self.useReqMgrForCompletionCheck:
@@ -256,6 +284,11 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         logging.info("Determining possible sites for new jobs...")
         jobCount = 0
+        # job cache index records by job collection directory, the rows
+        # don't come ordered by directory so each index is only read once
+        indexRecordsByDir = {}
+        filesOpened = 0
+        startTime = time.time()
         for newJob in newJobs:
             # whether newJob belongs to aborted or force-complete workflow, and skip it if it is.
             if (newJob['request_name'] in abortedAndForceCompleteRequests) and \
@@ -271,24 +304,37 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobCount % 5000 == 0:
                 logging.info("Processed %d/%d new jobs.", jobCount, len(newJobs))
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
+            # the job cache index saves unpickling the whole job, the job
+            # only gets unpickled and packaged once it is submitted
+            jobDir = os.path.dirname(newJob["cache_dir"])
+            if jobDir not in indexRecordsByDir:
+                indexRecordsByDir[jobDir] = readJobCacheIndex(os.path.join(jobDir, INDEX_NAME))
+                filesOpened += 1
+            loadedJob = indexRecordsByDir[jobDir].pop(jobID, None)
+            pickledJob = None
 
+            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
             if not os.path.isfile(pickledJobPath):
                 # Then we have a problem - there's no file
                 logging.error("Could not find pickled jobObject %s", pickledJobPath)
                 badJobs[71103].append(newJob)
                 continue
-            try:
-                jobHandle = open(pickledJobPath, "r")
-                loadedJob = pickle.load(jobHandle)
-                jobHandle.close()
-            except Exception as ex:
-                msg = "Error while loading pickled job object %s\n" % pickledJobPath
-                msg += str(ex)
-                logging.error(msg)
-                raise JobSubmitterPollerException(msg)
 
-            loadedJob['retry_count'] = newJob['retry_count']
+            if loadedJob is None:
+                # jobs created without index, load the pickled job
+                try:
+                    jobHandle = open(pickledJobPath, "r")
+                    pickledJob = pickle.load(jobHandle)
+                    jobHandle.close()
+                    filesOpened += 1
+                except Exception as ex:
+                    msg = "Error while loading pickled job object %s\n" % pickledJobPath
+                    msg += str(ex)
+                    logging.error(msg)
+                    raise JobSubmitterPollerException(msg)
+
+                pickledJob['retry_count'] = newJob['retry_count']
+                loadedJob = jobCacheRecord(pickledJob)
 
             # figure out possible locations for job
             possibleLocations = loadedJob["possiblePSN"]
@@ -298,8 +344,7 @@ class JobSubmitterPoller(BaseWorkerThread):
             potentialLocations = set()
             potentialLocations.update(possibleLocations)
 
-            # now check for sites in drain and adjust the possible locations
-            # also check if there is at least one site left to run the job
+            # check if there is at least one site to run the job
             if len(possibleLocations) == 0:
                 newJob['name'] = loadedJob['name']
                 newJob['fileLocations'] = loadedJob.get('fileLocations', [])
@@ -307,34 +352,25 @@ class JobSubmitterPoller(BaseWorkerThread):
                 newJob['siteBlacklist'] = loadedJob.get('siteBlacklist', [])
                 badJobs[71101].append(newJob)
                 continue
-            else:
-                nonAbortSites = [x for x in possibleLocations if x not in self.abortSites]
-                if nonAbortSites: # if there is at least a non aborted/down site then run there, otherwise fail the job
-                    possibleLocations = nonAbortSites
-                else:
-                    newJob['name'] = loadedJob['name']
-                    newJob['possibleLocations'] = possibleLocations
-                    badJobs[71102].append(newJob)
-                    continue
 
-            # try to remove draining sites if possible, this is needed to stop
-            # jobs that could run anywhere blocking draining sites
-            # if the job type is Merge, LogCollect or Cleanup this is skipped
-            if newJob['type'] not in ('LogCollect', 'Merge', 'Cleanup', 'Harvesting'):
-                nonDrainingSites = [x for x in possibleLocations if x not in self.drainSites]
-                if nonDrainingSites: # if >1 viable non-draining site remove draining ones
-                    possibleLocations = nonDrainingSites
-                else:
-                    newJob['name'] = loadedJob['name']
-                    newJob['possibleLocations'] = possibleLocations
-                    badJobs[71104].append(newJob)
-                    continue
+            # now check for sites in drain or abort and adjust the possible locations
+            possibleLocations, errorCode = self._filterPossibleLocations(possibleLocations, newJob['type'])
+            if errorCode:
+                newJob['name'] = loadedJob['name']
+                newJob['possibleLocations'] = possibleLocations
+                badJobs[errorCode].append(newJob)
+                continue
 
             # locations clear of abort and draining sites
             newJob['possibleLocations'] = possibleLocations
 
-            batchDir = self.addJobsToPackage(loadedJob)
+            # jobs read from the index are packaged when they are submitted
+            batchDir = None
+            if pickledJob is not None:
+                batchDir = self.addJobsToPackage(pickledJob)
             self.cachedJobIDs.add(jobID)
+            for siteName in potentialLocations:
+                self.siteJobIndex[siteName].add(jobID)
 
             # calculate the final job priority such that we can order cached jobs by prio
             jobPrio = self.taskTypePrioMap.get(newJob['type'], 0) + newJob['wf_priority']
@@ -343,14 +379,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             # now add basic information keyed by the jobid
             self.cachedJobs[jobPrio][jobID] = newJob
-
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
+            self._pushJobToHeap(jobPrio, newJob)
 
             # Create a job dictionary object and put it in the cache (needs to be in sync with RunJob)
             jobInfo = {'id': jobID,
@@ -363,7 +392,7 @@ class JobSubmitterPoller(BaseWorkerThread):
                        'retry_count': newJob["retry_count"],
                        'taskPriority': None,                                # update from the thresholds
                        'custom': {'location': None},                        # update later
-                       'packageDir': batchDir,
+                       'packageDir': batchDir,                              # None until packaged
                        'sandbox': loadedJob["sandbox"],                     # remove before submit
                        'userdn': loadedJob.get("ownerDN", None),
                        'usergroup': loadedJob.get("ownerGroup", ''),
@@ -377,13 +406,18 @@ class JobSubmitterPoller(BaseWorkerThread):
                        'estimatedJobTime': loadedJob.get("estimatedJobTime", None),
                        'estimatedDiskUsage': loadedJob.get("estimatedDiskUsage", None),
                        'estimatedMemoryUsage': loadedJob.get("estimatedMemoryUsage", None),
-                       'numberOfCores': loadedJob.get("numberOfCores", 1),  # may update it later
+                       'numberOfCores': loadedJob.get("numberOfCores", 1),  # overridden by the job baggage
                        'inputDataset': loadedJob.get('inputDataset', None),
                        'inputDatasetLocations': loadedJob.get('inputDatasetLocations', None),
                        'allowOpportunistic': loadedJob.get('allowOpportunistic', False)}
 
             self.jobDataCache[jobID] = jobInfo
 
+        if filesOpened:
+            elapsed = time.time() - startTime
+            logging.info("Cached %d new jobs opening %d files in %.1f secs (%.1f files/s).",
+                         jobCount, filesOpened, elapsed, filesOpened / max(elapsed, 0.001))
+
         # Register failures in submission
         for errorCode in badJobs:
             if badJobs[errorCode]:
@@ -398,9 +432,121 @@ class JobSubmitterPoller(BaseWorkerThread):
         jobIDsToPurge = self.cachedJobIDs - dbJobs
         self._purgeJobsFromCache(jobIDsToPurge)
 
+        # purged jobs are only lazily removed from the heaps, compact them
+        # if they are mostly made of stale entries
+        heapEntries = sum([len(x) for x in self.jobHeaps.values()])
+        if heapEntries > 2 * len(self.cachedJobIDs) + 1000:
+            self._rebuildJobHeaps()
+
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
+
+    def _pushJobToHeap(self, jobPrio, cachedJob):
+        """
+        _pushJobToHeap_
+
+        Add a cached job to the heap of the jobs that have the same possible
+        sites and task type, ordered by priority and then age.
+        """
+        heapKey = (frozenset(cachedJob['possibleLocations']), cachedJob['type'])
+        jobHeap = self.jobHeaps.setdefault(heapKey, [])
+        heapq.heappush(jobHeap, (-jobPrio, cachedJob['timestamp'], cachedJob['id']))
+        return
+
+    def _rebuildJobHeaps(self):
+        """
+        _rebuildJobHeaps_
+
+        Rebuild the job heaps from the cached jobs, dropping stale entries.
+        """
+        self.jobHeaps = {}
+        for jobPrio in self.cachedJobs:
+            for cachedJob in self.cachedJobs[jobPrio].itervalues():
+                heapKey = (frozenset(cachedJob['possibleLocations']), cachedJob['type'])
+                self.jobHeaps.setdefault(heapKey, []).append((-jobPrio, cachedJob['timestamp'],
+                                                              cachedJob['id']))
+        for jobHeap in self.jobHeaps.values():
+            heapq.heapify(jobHeap)
+        return
+
+    def _isStaleHeapEntry(self, heapKey, entry):
+        """
+        _isStaleHeapEntry_
+
+        Heap entries become stale when their job leaves the cache or when the
+        possible sites of the job change, in which case it got pushed again
+        to another heap.
+        """
+        negPrio, dummyTimestamp, jobID = entry
+        if jobID not in self.cachedJobs.get(-negPrio, {}):
+            return True
+        return self.jobDataCache[jobID]['possibleSites'] != heapKey[0]
  
+    def _filterPossibleLocations(self, possibleLocations, jobType):
+        """
+        _filterPossibleLocations_
+
+        Remove the aborted/down sites from the locations a job can run at and,
+        unless it's a Merge, LogCollect, Cleanup or Harvesting job, the draining
+        ones too.  Returns a tuple with the list of remaining locations and the
+        error code to fail the job with (None if it can still run somewhere).
+        """
+        nonAbortSites = [x for x in possibleLocations if x not in self.abortSites]
+        if nonAbortSites: # if there is at least a non aborted/down site then run there, otherwise fail the job
+            possibleLocations = nonAbortSites
+        else:
+            return possibleLocations, 71102
+
+        # try to remove draining sites if possible, this is needed to stop
+        # jobs that could run anywhere blocking draining sites
+        if jobType not in ('LogCollect', 'Merge', 'Cleanup', 'Harvesting'):
+            nonDrainingSites = [x for x in possibleLocations if x not in self.drainSites]
+            if nonDrainingSites: # if >1 viable non-draining site remove draining ones
+                possibleLocations = nonDrainingSites
+            else:
+                return possibleLocations, 71104
+
+        return possibleLocations, None
+
+    def updateCachedLocations(self, changedSites):
+        """
+        _updateCachedLocations_
+
+        Re-derive the possible locations of the cached jobs that could
+        potentially run at any of the sites whose state changed.  Jobs that
+        are left without a site are dropped from the cache, the next cache
+        refresh will load and fail them.
+        """
+        affectedJobIDs = set()
+        for siteName in changedSites:
+            affectedJobIDs.update(self.siteJobIndex.get(siteName, ()))
+        if not affectedJobIDs:
+            return
+
+        logging.info("Updating the possible locations of %d cached jobs.", len(affectedJobIDs))
+        jobIDsToPurge = set()
+        for jobPrio in self.cachedJobs:
+            jobsForPrio = self.cachedJobs[jobPrio]
+            for jobID in affectedJobIDs.intersection(jobsForPrio):
+                cachedJob = jobsForPrio[jobID]
+                jobInfo = self.jobDataCache[jobID]
+                possibleLocations, errorCode = self._filterPossibleLocations(jobInfo['potentialSites'],
+                                                                             cachedJob['type'])
+                if errorCode:
+                    jobIDsToPurge.add(jobID)
+                    continue
+                cachedJob['possibleLocations'] = possibleLocations
+                if jobInfo['possibleSites'] != frozenset(possibleLocations):
+                    jobInfo['possibleSites'] = frozenset(possibleLocations)
+                    self._pushJobToHeap(jobPrio, cachedJob)
+
+        if jobIDsToPurge:
+            logging.info("%d cached jobs have no site left to run at.", len(jobIDsToPurge))
+            self._purgeJobsFromCache(jobIDsToPurge)
+            # make sure they are loaded (and failed) by the next cache refresh
+            self.refreshPollingCount = self.skipRefreshCount
+        return
+
     def removeAbortedForceCompletedWorkflowFromCache(self):
         abortedAndForceCompleteRequests = self.abortedAndForceCompleteWorkflowCache.getData()
         jobIDsToPurge = set() 
@@ -419,13 +565,29 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.cachedJobIDs -= jobIDsToPurge
 
         for jobid in jobIDsToPurge:
-            self.jobDataCache.pop(jobid, None)
+            jobInfo = self.jobDataCache.pop(jobid, None)
+            if jobInfo:
+                self._removeFromSiteIndex(jobid, jobInfo['potentialSites'])
             for jobPrio in self.cachedJobs:
                 if self.cachedJobs[jobPrio].pop(jobid, None):
                     # then the jobid was found, go to the next one
                     break
         return  
         
+    def _removeFromSiteIndex(self, jobID, potentialSites):
+        """
+        _removeFromSiteIndex_
+
+        Remove a job from the site -> cached jobs index.
+        """
+        for siteName in potentialSites:
+            jobIDs = self.siteJobIndex.get(siteName)
+            if jobIDs is not None:
+                jobIDs.discard(jobID)
+                if not jobIDs:
+                    del self.siteJobIndex[siteName]
+        return
+
     def _handleSubmitFailedJobs(self, badJobs, exitCode):
         """
         __handleSubmitFailedJobs_
@@ -498,21 +660,61 @@ class JobSubmitterPoller(BaseWorkerThread):
                 for task, value in rcThresholds[siteName]['thresholds'].items():
                     self.taskTypePrioMap[task] = value.get('priority', 0) * self.maxTaskPriority
 
-        # When the list of drain/abort sites change between iteration then a location
-        # refresh is needed, for now it forces a full cache refresh
-        if newDrainSites != self.drainSites or  newAbortSites != self.abortSites:
-            logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
-            self.cachedJobIDs = set()
-            self.cachedJobs = {}
-            self.jobDataCache = {}
+        # When the list of drain/abort sites change between iteration then the
+        # locations of the cached jobs that could run at those sites are updated
+        changedSites = (newDrainSites ^ self.drainSites) | (newAbortSites ^ self.abortSites)
 
         self.currentRcThresholds = rcThresholds
         self.abortSites = newAbortSites
         self.drainSites = newDrainSites
 
+        if changedSites:
+            logging.info("Draining or Aborted sites have changed: %s", sorted(changedSites))
+            self.updateCachedLocations(changedSites)
+
         return
 
         
+    def _siteSaturation(self, siteName, jobType):
+        """
+        _siteSaturation_
+
+        Check the submit thresholds of a site and task type.  Returns None if
+        another job can be submitted there or the reason why it can't.
+        """
+        if siteName not in self.currentRcThresholds:
+            logging.warn("Have a job for %s which is not in the resource control", siteName)
+            return "NotInResourceControl"
+
+        try:
+            siteThresholds = self.currentRcThresholds[siteName]
+            totalPendingSlots = siteThresholds["total_pending_slots"]
+            totalPendingJobs = siteThresholds["total_pending_jobs"]
+            totalRunningSlots = siteThresholds["total_running_slots"]
+            totalRunningJobs = siteThresholds["total_running_jobs"]
+
+            taskThresholds = siteThresholds['thresholds'][jobType]
+            taskPendingSlots = taskThresholds["pending_slots"]
+            taskPendingJobs = taskThresholds["task_pending_jobs"]
+            taskRunningSlots = taskThresholds["max_slots"]
+            taskRunningJobs = taskThresholds["task_running_jobs"]
+        except KeyError as ex:
+            msg = "Invalid key for site %s and job type %s\n" % (siteName, jobType)
+            msg += str(ex)
+            logging.error(msg)
+            return "InvalidThresholds"
+
+        # check if site has free pending slots AND free pending task slots
+        if totalPendingJobs >= totalPendingSlots or taskPendingJobs >= taskPendingSlots:
+            return "NoPendingSlot"
+        # check if site overall thresholds have free slots
+        if totalPendingJobs + totalRunningJobs >= totalPendingSlots + totalRunningSlots:
+            return "NoRunningSlot"
+        # finally, check whether task has free overall slots
+        if taskPendingJobs + taskRunningJobs >= taskPendingSlots + taskRunningSlots:
+            return "NoTaskSlot"
+        return None
+
     def assignJobLocations(self):
         """
         _assignJobLocations_
@@ -526,105 +728,115 @@ class JobSubmitterPoller(BaseWorkerThread):
           - Path to sanbox
           - Path to cache directory
           - SE name of the site to run at
+
+        Jobs are taken from the highest to the lowest priority and the elder
+        first, through the heads of the heaps of jobs sharing the same possible
+        sites and task type.  Once all the sites of a heap are saturated the
+        whole heap is skipped for the rest of the cycle, so the cost depends
+        on the number of jobs submitted rather than on the number of cached
+        jobs.
         """
         jobsToSubmit = {}
-        jobsToUncache = []
+        # jobs whose pickled job can't be loaded to package them
+        badJobs = []
         jobsCount = 0
-        exitLoop = False
         jobSubmitLogBySites = defaultdict(Counter)
         jobSubmitLogByPriority = defaultdict(Counter)
+        # (site name, task type) -> reason why no more jobs can go there
+        saturation = {}
 
-        # iterate over jobs from the highest to the lowest prio
-        for jobPrio in sorted(self.cachedJobs, reverse=True):
-
-            # then we're completely done and have our basket full of jobs to submit
-            if exitLoop:
-                break
-
-            # start eating through the elder jobs first
-            for job in sorted(self.cachedJobs[jobPrio].values(), key=itemgetter('timestamp')):
-                jobid = job['id']
-                jobType = job['type']
-                possibleSites = job['possibleLocations']
-                jobSubmitLogByPriority[jobPrio]['Total'] += 1
-                # now look for sites with free pending slots
-                for siteName in possibleSites:
-                    if siteName not in self.currentRcThresholds:
-                        logging.warn("Have a job for %s which is not in the resource control", siteName)
-                        continue
-                    
-                    try:
-                        totalPendingSlots = self.currentRcThresholds[siteName]["total_pending_slots"]
-                        totalPendingJobs = self.currentRcThresholds[siteName]["total_pending_jobs"]
-                        totalRunningSlots = self.currentRcThresholds[siteName]["total_running_slots"]
-                        totalRunningJobs = self.currentRcThresholds[siteName]["total_running_jobs"]
-
-                        taskPendingSlots = self.currentRcThresholds[siteName]['thresholds'][jobType]["pending_slots"]
-                        taskPendingJobs = self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"]
-                        taskRunningSlots = self.currentRcThresholds[siteName]['thresholds'][jobType]["max_slots"]
-                        taskRunningJobs = self.currentRcThresholds[siteName]['thresholds'][jobType]["task_running_jobs"]
-                        taskPriority = self.currentRcThresholds[siteName]['thresholds'][jobType]["priority"]
-                    except KeyError as ex:
-                        msg = "Invalid key for site %s and job type %s\n" % (siteName, jobType)
-                        msg += str(ex)
-                        logging.error(msg)
-                        continue
-
-                    # check if site has free pending slots AND free pending task slots
-                    if totalPendingJobs >= totalPendingSlots or taskPendingJobs >= taskPendingSlots:
-                        jobSubmitLogBySites[siteName]["NoPendingSlot"] += 1
-                        logging.debug("Found a job for %s which has no free pending slots", siteName)
-                        continue
-                    # check if site overall thresholds have free slots
-                    if totalPendingJobs + totalRunningJobs >= totalPendingSlots + totalRunningSlots:
-                        jobSubmitLogBySites[siteName]["NoRunningSlot"] += 1
-                        logging.debug("Found a job for %s which has no free overall slots", siteName)
-                        continue
-                    # finally, check whether task has free overall slots
-                    if taskPendingJobs + taskRunningJobs >= taskPendingSlots + taskRunningSlots:
-                        jobSubmitLogBySites[siteName]["NoTaskSlot"] += 1
-                        logging.debug("Found a job for %s which has no free task slots", siteName)
-                        continue
-
-                    # otherwise, update the site/task thresholds and the component job counter
-                    self.currentRcThresholds[siteName]["total_pending_jobs"] += 1
-                    self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
-                    jobsCount += 1
-
-                    # load (and remove) the job dictionary object from jobDataCache
-                    cachedJob = self.jobDataCache.pop(jobid)
-                    jobsToUncache.append((jobPrio, jobid))
-
-                    # Sort jobs by jobPackage
-                    package = cachedJob['packageDir']
-                    if package not in jobsToSubmit.keys():
-                        jobsToSubmit[package] = []
-
-                    # Add the sandbox to a global list
-                    self.sandboxPackage[package] = cachedJob.pop('sandbox')
-
-                    # Now update the job dictionary object
-                    cachedJob['custom'] = {'location': siteName}
-                    cachedJob['taskPriority'] = taskPriority
-
-                    # Get this job in place to be submitted by the plugin
-                    jobsToSubmit[package].append(cachedJob)
-                    
-                    jobSubmitLogBySites[siteName]["submitted"] += 1
-                    jobSubmitLogByPriority[jobPrio]['submitted'] += 1
-                    # found a site to submit this job, so go to the next job
-                    break
+        for jobPrio in self.cachedJobs:
+            jobSubmitLogByPriority[jobPrio]['Total'] = len(self.cachedJobs[jobPrio])
+
+        # heap of the heads of the non empty job heaps
+        headsHeap = [(jobHeap[0], heapKey) for heapKey, jobHeap in self.jobHeaps.iteritems() if jobHeap]
+        heapq.heapify(headsHeap)
+
+        while headsHeap and jobsCount < self.maxJobsPerPoll:
+            headEntry, heapKey = heapq.heappop(headsHeap)
+            jobHeap = self.jobHeaps[heapKey]
+
+            # drop the stale entries on top of the heap
+            while jobHeap and self._isStaleHeapEntry(heapKey, jobHeap[0]):
+                heapq.heappop(jobHeap)
+            if not jobHeap:
+                del self.jobHeaps[heapKey]
+                continue
+            if jobHeap[0] != headEntry:
+                heapq.heappush(headsHeap, (jobHeap[0], heapKey))
+                continue
 
-                # set the flag and get out of the job iteration
-                if jobsCount >= self.maxJobsPerPoll:
-                    exitLoop = True
+            possibleSites, jobType = heapKey
+            for siteName in possibleSites:
+                if (siteName, jobType) not in saturation:
+                    reason = self._siteSaturation(siteName, jobType)
+                    if reason:
+                        saturation[(siteName, jobType)] = reason
+                        jobSubmitLogBySites[siteName][reason] += 1
+            if all([(siteName, jobType) in saturation for siteName in possibleSites]):
+                # nothing else from this heap can be submitted in this cycle
+                continue
+
+            negPrio, dummyTimestamp, jobid = heapq.heappop(jobHeap)
+            jobPrio = -negPrio
+            job = self.cachedJobs[jobPrio][jobid]
+
+            # the first of the job's sites with free slots gets the job
+            for siteName in job['possibleLocations']:
+                if (siteName, jobType) not in saturation:
                     break
 
-        # jobs that are going to be submitted must be removed from all caches
-        for prio, jobid in jobsToUncache:
-            self.cachedJobs[prio].pop(jobid)
-            self.cachedJobIDs.remove(jobid)
-            
+            # load (and remove) the job dictionary object from all the caches
+            cachedJob = self.jobDataCache.pop(jobid)
+            self.cachedJobs[jobPrio].pop(jobid)
+            self.cachedJobIDs.discard(jobid)
+            self._removeFromSiteIndex(jobid, cachedJob['potentialSites'])
+
+            # jobs read from the job cache index are packaged now
+            if cachedJob['packageDir'] is None:
+                try:
+                    cachedJob['packageDir'] = self.packageJob(cachedJob)
+                except JobSubmitterPollerException:
+                    badJobs.append(job)
+                    if jobHeap:
+                        heapq.heappush(headsHeap, (jobHeap[0], heapKey))
+                    continue
+
+            # update the site/task thresholds and the component job counter
+            siteThresholds = self.currentRcThresholds[siteName]
+            siteThresholds["total_pending_jobs"] += 1
+            siteThresholds['thresholds'][jobType]["task_pending_jobs"] += 1
+            taskPriority = siteThresholds['thresholds'][jobType]["priority"]
+            jobsCount += 1
+
+            # Sort jobs by jobPackage
+            package = cachedJob['packageDir']
+            if package not in jobsToSubmit:
+                jobsToSubmit[package] = []
+
+            # Add the sandbox to a global list
+            self.sandboxPackage[package] = cachedJob.pop('sandbox')
+
+            # Now update the job dictionary object
+            cachedJob['custom'] = {'location': siteName}
+            cachedJob['taskPriority'] = taskPriority
+
+            # Get this job in place to be submitted by the plugin
+            jobsToSubmit[package].append(cachedJob)
+
+            jobSubmitLogBySites[siteName]["submitted"] += 1
+            jobSubmitLogByPriority[jobPrio]['submitted'] += 1
+
+            if jobHeap:
+                heapq.heappush(headsHeap, (jobHeap[0], heapKey))
+
+        # write out the packages of the jobs to submit
+        self.flushJobPackages()
+
+        if badJobs:
+            logging.error("%d jobs failed to load their pickled job, failing them.", len(badJobs))
+            self._handleSubmitFailedJobs(badJobs, 71103)
+
         logging.info("Site submission report: %s", dict(jobSubmitLogBySites))
         logging.info("Priority submission report: %s", dict(jobSubmitLogByPriority))
         logging.info("Have %s packages to submit.", len(jobsToSubmit))
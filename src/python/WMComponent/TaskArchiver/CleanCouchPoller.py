@@ -14,6 +14,7 @@ import traceback
 import time
 
 from httplib import HTTPException
+from multiprocessing.pool import ThreadPool
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Services.WMStats.WMStatsWriter import WMStatsWriter
 from WMCore.Services.RequestDB.RequestDBReader import RequestDBReader
@@ -22,10 +23,10 @@ from WMCore.Services.RequestDB.RequestDBWriter import RequestDBWriter
 from WMCore.Services.FWJRDB.FWJRDBAPI import FWJRDBAPI
 from WMCore.Services.UserFileCache.UserFileCache import UserFileCache
 from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError
+from WMCore.Database.CouchBulkPurge import CouchBulkPurge
 from WMCore.Lexicon import sanitizeURL
 from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.MathStructs.DiscreteSummaryHistogram import DiscreteSummaryHistogram
-from WMCore.Algorithms import MathAlgos
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.Workflow import Workflow
@@ -35,6 +36,7 @@ from WMCore.WMException import WMException
 from WMComponent.JobCreator.CreateWorkArea import getMasterName
 from WMComponent.JobCreator.JobCreatorPoller import retrieveWMSpec
 from WMComponent.TaskArchiver.DataCache import DataCache
+from WMComponent.TaskArchiver.PerformanceSummary import summarizeStepPerformance
 
 
 class FileEncoder(json.JSONEncoder):
@@ -191,6 +193,14 @@ class CleanCouchPoller(BaseWorkerThread):
         self.dashBoardUrl = getattr(config.TaskArchiver, "dashBoardUrl", None)
         self.DataKeepDays = getattr(config.TaskArchiver, "DataKeepDays", 0.125)  # 3 hours
 
+        # Paginated deletion of the workflow docs from the local couch dbs
+        self.purgePageSize = getattr(config.TaskArchiver, "purgePageSize", 5000)
+        self.purgeMaxInFlight = getattr(config.TaskArchiver, "purgeMaxInFlight", 2)
+        self.purgeParallelWorkflows = getattr(config.TaskArchiver, "purgeParallelWorkflows", 2)
+        self.purgeCheckpointDir = None
+        if getattr(config.TaskArchiver, "componentDir", None):
+            self.purgeCheckpointDir = os.path.join(config.TaskArchiver.componentDir, "purge")
+
     def setup(self, parameters=None):
         """
         Called at startup
@@ -286,10 +296,10 @@ class CleanCouchPoller(BaseWorkerThread):
 
     def archiveWorkflows(self, workflows, archiveState):
         updated = 0
+        workflows = [workflowName for workflowName in workflows if self.isUploadedToWMArchive(workflowName)]
+        cleaned = self.cleanLocalCouchDBs(workflows)
         for workflowName in workflows:
-            if not self.isUploadedToWMArchive(workflowName):
-                continue
-            if self.cleanAllLocalCouchDB(workflowName):
+            if cleaned[workflowName]:
                 if self.useReqMgrForCompletionCheck:
                     try:
                         self.reqmgr2Svc.updateRequestStatus(workflowName, archiveState)
@@ -369,10 +379,10 @@ class CleanCouchPoller(BaseWorkerThread):
         If we are asked to delete the workflow from couch, delete it
         to clear up some space.
 
-        Load the document IDs and revisions out of couch by workflowName,
-        then order a delete on them.
+        Read the document IDs and revisions out of couch by workflowName,
+        page by page, and delete each page with a bulk request.
         """
-        options = {"startkey": [workflowName], "endkey": [workflowName, {}], "reduce": False}
+        options = {"startkey": [workflowName], "endkey": [workflowName, {}]}
 
         if db == "JobDump":
             couchDB = self.jobsdatabase
@@ -386,43 +396,31 @@ class CleanCouchPoller(BaseWorkerThread):
         elif db == "WMStatsAgent":
             couchDB = self.wmstatsCouchDB.getDBInstance()
             view = "allWorkflows"
-            options = {"key": workflowName, "reduce": False}
+            options = {"key": workflowName}
 
-        if view is None:
-            try:
-                committed = couchDB.delete_doc(workflowName)
-            except CouchNotFoundError as ex:
-                return {'status': 'warning', 'message': "%s: %s" % (workflowName, str(ex))}
-        else:
-            try:
-                jobs = couchDB.loadView(db, view, options=options)['rows']
-            except Exception as ex:
-                errorMsg = "Error on loading jobs for %s" % workflowName
-                logging.warning("%s/n%s", str(ex), errorMsg)
-                return {'status': 'error', 'message': errorMsg}
-
-            for j in jobs:
-                doc = {}
-                doc["_id"] = j['value']['id']
-                doc["_rev"] = j['value']['rev']
-                couchDB.queueDelete(doc)
-            committed = couchDB.commit()
-
-        if committed:
-            # create the error report
-            errorReport = {}
-            deleted = 0
-            status = "ok"
-            for data in committed:
-                if 'error' in data:
-                    errorReport.setdefault(data['error'], 0)
-                    errorReport[data['error']] += 1
-                    status = "error"
-                else:
-                    deleted += 1
-            return {'status': status, 'delete': deleted, 'message': errorReport}
-        else:
-            return {'status': 'warning', 'message': "no %s exist" % workflowName}
+        if view is not None:
+            purge = CouchBulkPurge(couchDB, db, view, pageSize=self.purgePageSize,
+                                   maxInFlight=self.purgeMaxInFlight,
+                                   checkpointDir=self.purgeCheckpointDir)
+            return purge.purge(workflowName, options)
+
+        try:
+            committed = couchDB.delete_doc(workflowName)
+        except CouchNotFoundError as ex:
+            return {'status': 'warning', 'message': "%s: %s" % (workflowName, str(ex))}
+
+        # create the error report
+        errorReport = {}
+        deleted = 0
+        status = "ok"
+        for data in committed:
+            if 'error' in data:
+                errorReport.setdefault(data['error'], 0)
+                errorReport[data['error']] += 1
+                status = "error"
+            else:
+                deleted += 1
+        return {'status': status, 'delete': deleted, 'message': errorReport}
 
     def cleanAllLocalCouchDB(self, workflowName):
         logging.info("Deleting %s from JobCouch", workflowName)
@@ -445,6 +443,28 @@ class CleanCouchPoller(BaseWorkerThread):
         # other wise return True.
         return True
 
+    def cleanLocalCouchDBs(self, workflowNames):
+        """
+        _cleanLocalCouchDBs_
+
+        Delete several workflows from the local couch dbs, purgeParallelWorkflows
+        of them at the same time.  Returns a dictionary with the result of
+        cleanAllLocalCouchDB for each workflow.
+        """
+        if len(workflowNames) < 2 or self.purgeParallelWorkflows < 2:
+            return dict((workflowName, self.cleanAllLocalCouchDB(workflowName)) for workflowName in workflowNames)
+
+        startTime = time.time()
+        pool = ThreadPool(min(self.purgeParallelWorkflows, len(workflowNames)))
+        try:
+            results = pool.map(self.cleanAllLocalCouchDB, workflowNames)
+        finally:
+            pool.close()
+            pool.join()
+        logging.info("Deleted %d workflows from the local couch dbs in %.1f secs",
+                     len(workflowNames), time.time() - startTime)
+        return dict(zip(workflowNames, results))
+
     def isUploadedToWMArchive(self, workflowName):
 
         if hasattr(self.config, "ArchiveDataReporter") and self.config.ArchiveDataReporter.WMArchiveURL:
@@ -471,10 +491,10 @@ class CleanCouchPoller(BaseWorkerThread):
 
             workflowDict = self.centralRequestDBReader.getStatusAndTypeByRequest(requestNames)
 
-            for request, value in workflowDict.items():
-                if value[0].endswith("-archived"):
-                    self.cleanAllLocalCouchDB(request)
-                    numDeletedRequests += 1
+            archivedRequests = [request for request, value in workflowDict.items()
+                                if value[0].endswith("-archived")]
+            self.cleanLocalCouchDBs(archivedRequests)
+            numDeletedRequests = len(archivedRequests)
 
         except Exception as ex:
             errorMsg = "Error on loading workflow list from wmagent_summary db"
@@ -885,133 +905,108 @@ class CleanCouchPoller(BaseWorkerThread):
         failedJobs = self.getFailedJobs(workflowName)
 
         taskList = {}
-        finalTask = {}
-
         for row in perf:
-            taskName = row['value']['taskName']
-            stepName = row['value']['stepName']
-            if taskName not in taskList.keys():
-                taskList[taskName] = {}
-            if stepName not in taskList[taskName].keys():
-                taskList[taskName][stepName] = []
             value = row['value']
-            taskList[taskName][stepName].append(value)
+            taskList.setdefault(value['taskName'], {}).setdefault(value['stepName'], []).append(value)
 
-        for taskName in taskList.keys():
+        finalTask = {}
+        offenders = []
+        for taskName in taskList:
             final = {}
-            for stepName in taskList[taskName].keys():
-                output = {'jobTime': []}
-                outputFailed = {'jobTime': []}  # This will be same, but only for failed jobs
-                final[stepName] = {}
-                masterList = []
-
-                # For each step put the data into a dictionary called output
-                # keyed by the name of the value
-                for row in taskList[taskName][stepName]:
-                    masterList.append(row)
-                    for key in row.keys():
-                        if key in ['startTime', 'stopTime', 'taskName', 'stepName', 'jobID']:
-                            continue
-                        if key not in output.keys():
-                            output[key] = []
-                            if len(failedJobs) > 0:
-                                outputFailed[key] = []
-                        try:
-                            output[key].append(float(row[key]))
-                            if row['jobID'] in failedJobs:
-                                outputFailed[key].append(float(row[key]))
-
-                        except TypeError:
-                            # Why do we get None values here?
-                            # We may want to look into it
-                            logging.debug("Got a None performance value for key %s", key)
-                            if row[key] == None:
-                                output[key].append(0.0)
-                            else:
-                                raise
-                    try:
-                        jobTime = row.get('stopTime', None) - row.get('startTime', None)
-                        output['jobTime'].append(jobTime)
-                        row['jobTime'] = jobTime
-                        # Account job running time here only if the job has failed
-                        if row['jobID'] in failedJobs:
-                            outputFailed['jobTime'].append(jobTime)
-                    except TypeError:
-                        # One of those didn't have a real value
-                        pass
-
-                # Now that we've sorted the data, we process it one key at a time
-                for key in output.keys():
-                    final[stepName][key] = {}
-                    # Assemble the 'worstOffenders'
-                    # These are the top [self.nOffenders] in that particular category
-                    # i.e., those with the highest values
-                    offenders = MathAlgos.getLargestValues(dictList=masterList, key=key,
-                                                           n=self.nOffenders)
-                    for x in offenders:
-                        try:
-                            logArchive = self.fwjrdatabase.loadView("FWJRDump", "logArchivesByJobID",
-                                                                    options={"startkey": [x['jobID']],
-                                                                             "endkey": [x['jobID'],
-                                                                                        x['retry_count']],
-                                                                             "stale": "update_after"})['rows'][0]['value']['lfn']
-                            logCollectID = self.jobsdatabase.loadView("JobDump", "jobsByInputLFN",
-                                                                      options={"startkey": [workflowName, logArchive],
-                                                                               "endkey": [workflowName, logArchive],
-                                                                               "stale": "update_after"})['rows'][0]['value']
-                            logCollect = self.fwjrdatabase.loadView("FWJRDump", "outputByJobID",
-                                                                    options={"startkey": logCollectID,
-                                                                             "endkey": logCollectID,
-                                                                             "stale": "update_after"})['rows'][0]['value']['lfn']
-                            x['logArchive'] = logArchive.split('/')[-1]
-                            x['logCollect'] = logCollect
-                        except IndexError as ex:
-                            logging.debug("Unable to find final logArchive tarball for %i", x['jobID'])
-                            logging.debug(str(ex))
-                        except KeyError as ex:
-                            logging.debug("Unable to find final logArchive tarball for %i", x['jobID'])
-                            logging.debug(str(ex))
-
-                    if key in self.histogramKeys:
-                        # Usual histogram that was always done
-                        histogram = MathAlgos.createHistogram(numList=output[key],
-                                                              nBins=self.histogramBins,
-                                                              limit=self.histogramLimit)
-                        final[stepName][key]['histogram'] = histogram
-                        # Histogram only picking values from failed jobs
-                        # Operators  can use it to find out quicker why a workflow/task/step is failing :
-                        if len(failedJobs) > 0:
-                            failedJobsHistogram = MathAlgos.createHistogram(numList=outputFailed[key],
-                                                                            nBins=self.histogramBins,
-                                                                            limit=self.histogramLimit)
-
-                            final[stepName][key]['errorsHistogram'] = failedJobsHistogram
-                    else:
-                        average, stdDev = MathAlgos.getAverageStdDev(numList=output[key])
-                        final[stepName][key]['average'] = average
-                        final[stepName][key]['stdDev'] = stdDev
+            for stepName, rows in taskList[taskName].items():
+                final[stepName] = summarizeStepPerformance(rows, failedJobs, self.histogramKeys,
+                                                           self.histogramBins, self.histogramLimit,
+                                                           self.nOffenders)
+                for keySummary in final[stepName].values():
+                    offenders.extend(keySummary['worstOffenders'])
+            finalTask[taskName] = final
 
-                    final[stepName][key]['worstOffenders'] = [{'jobID': x['jobID'], 'value': x.get(key, 0.0),
-                                                               'log': x.get('logArchive', None),
-                                                               'logCollect': x.get('logCollect', None)} for x in
-                                                              offenders]
+        # Look up the log tarballs of all the worst offenders at once
+        self.addLogArchives(workflowName, offenders)
 
-            finalTask[taskName] = final
+        for final in finalTask.values():
+            for stepSummary in final.values():
+                for key, keySummary in stepSummary.items():
+                    keySummary['worstOffenders'] = [{'jobID': x['jobID'], 'value': x.get(key, 0.0),
+                                                     'log': x.get('logArchive', None),
+                                                     'logCollect': x.get('logCollect', None)} for x in
+                                                    keySummary['worstOffenders']]
         return finalTask
 
+    @staticmethod
+    def _firstRowValues(rows):
+        """
+        _firstRowValues_
+
+        Value of the first row of each key of a view query by keys
+        """
+        values = {}
+        for row in rows:
+            key = tuple(row['key']) if isinstance(row['key'], list) else row['key']
+            values.setdefault(key, row['value'])
+        return values
+
+    def addLogArchives(self, workflowName, jobs):
+        """
+        _addLogArchives_
+
+        Add the name of the logArchive tarball of each job performance row,
+        from its first retry, and the LogCollect tarball it went to.  All the
+        jobs are looked up with one query by keys per view.
+        """
+        jobKeys = set()
+        for job in jobs:
+            try:
+                jobKeys.add((job['jobID'], int(job['retry_count'])))
+            except (KeyError, TypeError, ValueError) as ex:
+                logging.debug("Unable to find final logArchive tarball for %s", job.get('jobID'))
+                logging.debug(str(ex))
+        if not jobKeys:
+            return
+
+        options = {"stale": "update_after"}
+        archiveKeys = [[jobID, retry] for jobID, retryCount in sorted(jobKeys) for retry in range(retryCount + 1)]
+        archives = self._firstRowValues(self.fwjrdatabase.loadView("FWJRDump", "logArchivesByJobID",
+                                                                   options=options, keys=archiveKeys)['rows'])
+        jobArchives = {}
+        for jobID, retryCount in jobKeys:
+            for retry in range(retryCount + 1):
+                if (jobID, retry) in archives:
+                    jobArchives[(jobID, retryCount)] = archives[(jobID, retry)]['lfn']
+                    break
+        if not jobArchives:
+            return
+
+        lfnKeys = [[workflowName, lfn] for lfn in sorted(set(jobArchives.values()))]
+        logCollectIDs = self._firstRowValues(self.jobsdatabase.loadView("JobDump", "jobsByInputLFN",
+                                                                        options=options, keys=lfnKeys)['rows'])
+        logCollects = {}
+        if logCollectIDs:
+            logCollects = self._firstRowValues(self.fwjrdatabase.loadView("FWJRDump", "outputByJobID", options=options,
+                                                                          keys=sorted(set(logCollectIDs.values())))['rows'])
+
+        for job in jobs:
+            logArchive = jobArchives.get((job.get('jobID'), job.get('retry_count')))
+            logCollectID = logCollectIDs.get((workflowName, logArchive))
+            if logCollectID in logCollects:
+                job['logArchive'] = logArchive.split('/')[-1]
+                job['logCollect'] = logCollects[logCollectID]['lfn']
+            else:
+                logging.debug("Unable to find final logArchive tarball for %s", job.get('jobID'))
+        return
+
     def getFailedJobs(self, workflowName):
+        """
+        _getFailedJobs_
+
+        Set of the ids of the jobs of the workflow which had an error
+        """
         # We want ALL the jobs, and I'm sorry, CouchDB doesn't support wildcards, above-than-absurd values will do:
         errorView = self.fwjrdatabase.loadView("FWJRDump", "errorsByWorkflowName",
                                                options={"startkey": [workflowName, 0, 0],
                                                         "endkey": [workflowName, 999999999, 999999],
                                                         "stale": "update_after"})['rows']
-        failedJobs = []
-        for row in errorView:
-            jobId = row['value']['jobid']
-            if jobId not in failedJobs:
-                failedJobs.append(jobId)
-
-        return failedJobs
+        return set(row['value']['jobid'] for row in errorView)
 
     def publishRecoPerfToDashBoard(self, workload):
 
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+_PerformanceSummary_
+
+Summary of the performance reports of the jobs of a workflow step, for the
+workload summary.
+
+The performance rows of a step are turned into one column of values per
+metric in a single pass, each column is then summarised on its own: the
+average and standard deviation or the histograms of the histogram metrics,
+and the worst offenders, the jobs with the largest values.
+"""
+
+from WMCore.Algorithms import MathAlgos
+
+# Fields of the performance rows which aren't metrics
+NON_METRIC_KEYS = frozenset(['startTime', 'stopTime', 'taskName', 'stepName', 'jobID'])
+
+
+def performanceColumns(rows, failedJobs):
+    """
+    _performanceColumns_
+
+    Split the performance rows of a step in columns of values keyed by
+    metric, for all the jobs and for the failed jobs only.  The job running
+    time is added to the rows as the jobTime metric.
+
+    failedJobs is a set of job ids.
+    """
+    columns = {'jobTime': []}
+    failedColumns = {'jobTime': []}
+    for row in rows:
+        failed = row['jobID'] in failedJobs
+        for key, value in row.items():
+            if key in NON_METRIC_KEYS:
+                continue
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = []
+                if failedJobs:
+                    failedColumns[key] = []
+            if value is None:
+                # Why do we get None values here?
+                # We may want to look into it
+                column.append(0.0)
+                continue
+            column.append(float(value))
+            if failed:
+                failedColumns[key].append(float(value))
+        try:
+            jobTime = row.get('stopTime', None) - row.get('startTime', None)
+        except TypeError:
+            # One of those didn't have a real value
+            continue
+        row['jobTime'] = jobTime
+        columns['jobTime'].append(jobTime)
+        # Account job running time here only if the job has failed
+        if failed:
+            failedColumns['jobTime'].append(jobTime)
+    return columns, failedColumns
+
+
+def summarizeStepPerformance(rows, failedJobs, histogramKeys, nBins, limit, nOffenders):
+    """
+    _summarizeStepPerformance_
+
+    Summarise the performance rows of a step.  Returns a dictionary keyed by
+    metric with either the histogram of the values, and of the values of the
+    failed jobs, for the histogramKeys metrics or their average and standard
+    deviation, and the rows of the nOffenders jobs with the largest values
+    as worstOffenders.
+    """
+    columns, failedColumns = performanceColumns(rows, failedJobs)
+
+    summary = {}
+    for key, values in columns.items():
+        summary[key] = {}
+        if key in histogramKeys:
+            summary[key]['histogram'] = MathAlgos.createHistogram(numList=values, nBins=nBins, limit=limit)
+            # Histogram only picking values from failed jobs
+            if failedJobs:
+                summary[key]['errorsHistogram'] = MathAlgos.createHistogram(numList=failedColumns[key],
+                                                                            nBins=nBins, limit=limit)
+        else:
+            average, stdDev = MathAlgos.getAverageStdDev(numList=values)
+            summary[key]['average'] = average
+            summary[key]['stdDev'] = stdDev
+        summary[key]['worstOffenders'] = MathAlgos.getLargestValues(dictList=rows, key=key, n=nOffenders)
+    return summary
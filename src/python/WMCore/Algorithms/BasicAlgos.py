@@ -11,7 +11,107 @@ import os
 import stat
 import time
 import zlib
-import subprocess
+from multiprocessing.pool import ThreadPool
+
+# read size of the checksum calculation
+CHECKSUM_BUFFER_SIZE = 4 * 1024 * 1024
+
+# generator polynomial of the POSIX cksum CRC
+CKSUM_POLYNOMIAL = 0x04C11DB7
+
+
+def _reverseBits(value, width):
+    """
+    _reverseBits_
+
+    Reverse the order of the lowest width bits of value
+    """
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+def _cksumTable():
+    """
+    _cksumTable_
+
+    Lookup table of the CRC of every byte value, most significant bit first
+    """
+    table = []
+    for byte in range(256):
+        crc = byte << 24
+        for _ in range(8):
+            if crc & 0x80000000:
+                crc = ((crc << 1) ^ CKSUM_POLYNOMIAL) & 0xffffffff
+            else:
+                crc = (crc << 1) & 0xffffffff
+        table.append(crc)
+    return table
+
+
+_CKSUM_TABLE = _cksumTable()
+# translation table reversing the bits of every byte
+_REFLECTED_BYTES = bytes(bytearray(_reverseBits(byte, 8) for byte in range(256)))
+
+
+class PosixCksum(object):
+    """
+    _PosixCksum_
+
+    Incremental calculation of the CRC of the cksum UNIX command line tool.
+
+    cksum uses the CRC-32 polynomial of zlib.crc32 but processes the bits of
+    each byte from the most significant one.  By default the data is fed to
+    zlib.crc32, which runs in C, with the bits of every byte reversed and the
+    result is reversed back.  With accelerated=False the table driven
+    implementation is used instead.
+    """
+
+    def __init__(self, accelerated=True):
+        self.accelerated = accelerated
+        self.length = 0
+        # zlib.crc32 chains the complement of the CRC register
+        self._crc = 0xffffffff if accelerated else 0
+
+    def _update(self, data):
+        if self.accelerated:
+            self._crc = zlib.crc32(data.translate(_REFLECTED_BYTES), self._crc) & 0xffffffff
+        else:
+            crc = self._crc
+            for byte in bytearray(data):
+                crc = ((crc << 8) & 0xffffffff) ^ _CKSUM_TABLE[(crc >> 24) ^ byte]
+            self._crc = crc
+
+    def update(self, data):
+        """
+        _update_
+
+        Add data to the checksum
+        """
+        self._update(data)
+        self.length += len(data)
+
+    def checksum(self):
+        """
+        _checksum_
+
+        CRC of the data added so far, as printed by cksum
+        """
+        # cksum adds the data length to the CRC, least significant byte first
+        length = self.length
+        lengthBytes = bytearray()
+        while length:
+            lengthBytes.append(length & 0xff)
+            length >>= 8
+        dataCrc = self._crc
+        self._update(bytes(lengthBytes))
+        crc, self._crc = self._crc, dataCrc
+        if self.accelerated:
+            crc = _reverseBits(~crc & 0xffffffff, 32)
+        return ~crc & 0xffffffff
+
 
 def calculateChecksums(filename):
     """
@@ -23,33 +123,45 @@ def calculateChecksums(filename):
       http://docs.python.org/library/zlib.html
 
     The cksum UNIX command line tool implements a CRC32 checksum that is
-    different than any of the python algorithms, therefore open cksum
-    in a subprocess and feed it the same chunks of data that are used
-    to calculate the adler32 checksum.
+    different than any of the python algorithms, it's calculated by
+    PosixCksum in the same pass over the file as the adler32 checksum.
 
     """
     adler32Checksum = 1 # adler32 of an empty string
-    cksumProcess = subprocess.Popen("cksum", stdin = subprocess.PIPE, stdout = subprocess.PIPE)
+    cksum = PosixCksum()
 
     # the lambda basically creates an iterator function with zero
-    # arguments that steps through the file in 4096 byte chunks
+    # arguments that steps through the file in large chunks
     with open(filename, 'rb') as f:
-        for chunk in iter((lambda:f.read(4096)),''):
+        for chunk in iter((lambda:f.read(CHECKSUM_BUFFER_SIZE)), b''):
             adler32Checksum = zlib.adler32(chunk, adler32Checksum)
-            cksumProcess.stdin.write(chunk)
+            cksum.update(chunk)
 
-    cksumProcess.stdin.close()
-    cksumProcess.wait()
-
-    cksumStdout = cksumProcess.stdout.read().split()
-    cksumProcess.stdout.close()
-
-    # consistency check on the cksum output
+    # consistency check on the data read
     filesize = os.stat(filename)[stat.ST_SIZE]
-    if len(cksumStdout) != 2 or int(cksumStdout[1]) != filesize:
+    if cksum.length != filesize:
         raise RuntimeError("Something went wrong with the cksum calculation !")
 
-    return ("%x" % (adler32Checksum & 0xffffffff), "%s" % cksumStdout[0])
+    return ("%x" % (adler32Checksum & 0xffffffff), "%s" % cksum.checksum())
+
+
+def calculateChecksumsForFiles(filenames, nThreads=4):
+    """
+    _calculateChecksumsForFiles_
+
+    Get the adler32 and crc32 checksums of several files, nThreads of them
+    at the same time.  Return a dictionary of the checksums by file name.
+    """
+    filenames = list(filenames)
+    if len(filenames) < 2 or nThreads < 2:
+        return dict((filename, calculateChecksums(filename)) for filename in filenames)
+
+    pool = ThreadPool(min(nThreads, len(filenames)))
+    try:
+        return dict(zip(filenames, pool.map(calculateChecksums, filenames)))
+    finally:
+        pool.close()
+        pool.join()
 
 
 def tail(filename, nLines = 20):
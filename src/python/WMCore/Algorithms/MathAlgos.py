@@ -7,6 +7,8 @@ Simple mathematical tools and tricks that might prove to
 be useful.
 """
 
+import bisect
+import heapq
 import math
 import decimal
 import logging
@@ -142,19 +144,10 @@ def createHistogram(numList, nBins, limit):
     for bin in histogram:
         if bin['type'] != 'standard':
             continue
-        binList = []
-        for value in histEvents:
-            if value >= bin['lowerEdge'] and value <= bin['upperEdge']:
-                # Then we're in the bin
-                binList.append(value)
-            elif value > bin['upperEdge']:
-                # Because this is a sorted list we are now out of the bin range
-                # Calculate our values and break
-                break
-            else:
-                continue
+        # histEvents is sorted, the values in the bin are a slice of it
+        binList = histEvents[bisect.bisect_left(histEvents, bin['lowerEdge']):
+                             bisect.bisect_right(histEvents, bin['upperEdge'])]
 
-        # If we get here, it's because we're out of values in the bin
         # Time to do some math
         if len(binList) < 1:
             # Nothing to do here, leave defaults
@@ -209,13 +202,11 @@ def getLargestValues(dictList, key, n = 1):
     Take a list of dictionaries, sort them by the value of a
     particular key, and return the n largest entries.
 
-    Key must be a numerical key.
+    Key must be a numerical key.  Same result as sorting the whole list,
+    without sorting it.
     """
 
-    sortedList = sortDictionaryListByKey(dictList = dictList, key = key,
-                                         reverse = True)
-
-    return sortedList[:n]
+    return heapq.nlargest(n, dictList, key=lambda k: k.get(key, 0.0))
 
 def validateNumericInput(value):
     """
@@ -29,6 +29,7 @@ from WMCore.WMConnectionBase    import WMConnectionBase
 from WMCore.WMException         import WMException
 from WMCore.FwkJobReport.Report import Report
 from WMCore.WMExceptions        import WM_JOB_ERROR_CODES
+from WMCore.WMSpec.WMSpecCache  import getSpecCache
 
 
 class BossAirException(WMException):
@@ -762,6 +763,7 @@ class BossAirAPI(WMConnectionBase):
         the data will be updated according the keyword arguments which
         will be interpreted by the individual plugins accordingly.
         """
+        getSpecCache().invalidateWorkflow(workflow)
         for plugin in self.plugins.keys():
             try:
                 pluginInst = self.plugins[plugin]
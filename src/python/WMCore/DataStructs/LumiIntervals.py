@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+_LumiIntervals_
+
+Sorted array representation of sets of run/lumi ranges.
+
+Every run, keyed by its run number as an integer, holds two arrays with the
+first and the last lumi of its ranges.  The ranges are sorted and merged
+when they are built, so the set operations are linear merges of the arrays
+and membership queries are binary searches instead of scans of every range.
+"""
+
+from array import array
+from bisect import bisect_right
+
+
+def mergeRanges(ranges):
+    """
+    _mergeRanges_
+
+    Sort a list of [first, last] lumi ranges and merge the overlapping and
+    adjacent ones.  Return the first and the last lumis as two arrays.
+    """
+    firsts = array('l')
+    lasts = array('l')
+    for first, last in sorted(ranges):
+        if firsts and first <= lasts[-1] + 1:
+            if last > lasts[-1]:
+                lasts[-1] = last
+        else:
+            firsts.append(first)
+            lasts.append(last)
+    return firsts, lasts
+
+
+def intersectRanges(ranges, otherRanges):
+    """
+    _intersectRanges_
+
+    Intersect two sets of merged ranges.
+    """
+    firsts, lasts = ranges
+    otherFirsts, otherLasts = otherRanges
+    newFirsts = array('l')
+    newLasts = array('l')
+
+    i = j = 0
+    while i < len(firsts) and j < len(otherFirsts):
+        first = max(firsts[i], otherFirsts[j])
+        last = min(lasts[i], otherLasts[j])
+        if first <= last:
+            newFirsts.append(first)
+            newLasts.append(last)
+        if lasts[i] < otherLasts[j]:
+            i += 1
+        else:
+            j += 1
+    return newFirsts, newLasts
+
+
+def subtractRanges(ranges, otherRanges):
+    """
+    _subtractRanges_
+
+    Remove a set of merged ranges from another one.
+    """
+    firsts, lasts = ranges
+    otherFirsts, otherLasts = otherRanges
+    newFirsts = array('l')
+    newLasts = array('l')
+
+    j = 0
+    for i in xrange(len(firsts)):
+        first = firsts[i]
+        last = lasts[i]
+        # skip the ranges ending before this one
+        while j < len(otherFirsts) and otherLasts[j] < first:
+            j += 1
+        # cut out the ranges starting inside this one, the last of them can
+        # overlap with the next range as well
+        while j < len(otherFirsts) and otherFirsts[j] <= last:
+            if otherFirsts[j] > first:
+                newFirsts.append(first)
+                newLasts.append(otherFirsts[j] - 1)
+            first = otherLasts[j] + 1
+            if first > last:
+                break
+            j += 1
+        if first <= last:
+            newFirsts.append(first)
+            newLasts.append(last)
+    return newFirsts, newLasts
+
+
+class LumiIntervals(object):
+    """
+    _LumiIntervals_
+
+    Set of lumi ranges by run, built from a compact list:
+        {'1': [[1, 33], [35, 35]], '2': [[1, 45], [50, 80]]}
+    where the run numbers can be given as strings or integers and the ranges
+    don't have to be sorted or disjoint.
+    """
+
+    def __init__(self, compactList=None):
+        self.runs = {}
+        for run, ranges in (compactList or {}).items():
+            self.runs[int(run)] = mergeRanges(ranges)
+
+    @classmethod
+    def fromRuns(cls, runs):
+        """
+        _fromRuns_
+
+        Build the set from a dictionary of merged ranges by run, leaving out
+        the runs without any range.
+        """
+        intervals = cls()
+        intervals.runs = dict([(run, ranges) for run, ranges in runs.items() if ranges[0]])
+        return intervals
+
+    def __len__(self):
+        """
+        Number of runs in the set
+        """
+        return len(self.runs)
+
+    def __contains__(self, run):
+        """
+        Check whether the run is in the set
+        """
+        return int(run) in self.runs
+
+    def __and__(self, other):
+        result = {}
+        for run in set(self.runs).intersection(other.runs):
+            result[run] = intersectRanges(self.runs[run], other.runs[run])
+        return LumiIntervals.fromRuns(result)
+
+    def __or__(self, other):
+        result = dict(self.runs)
+        for run, ranges in other.runs.items():
+            if run in result:
+                firsts, lasts = result[run]
+                otherFirsts, otherLasts = ranges
+                result[run] = mergeRanges(zip(firsts, lasts) + zip(otherFirsts, otherLasts))
+            else:
+                result[run] = ranges
+        return LumiIntervals.fromRuns(result)
+
+    def __sub__(self, other):
+        result = {}
+        for run, ranges in self.runs.items():
+            if run in other.runs:
+                result[run] = subtractRanges(ranges, other.runs[run])
+            else:
+                result[run] = ranges
+        return LumiIntervals.fromRuns(result)
+
+    def contains(self, run, lumi):
+        """
+        _contains_
+
+        Check whether a run/lumi is in the set.
+        """
+        ranges = self.runs.get(int(run))
+        if ranges is None:
+            return False
+        firsts, lasts = ranges
+        index = bisect_right(firsts, lumi) - 1
+        return index >= 0 and lumi <= lasts[index]
+
+    def filterRunLumis(self, run, lumis):
+        """
+        _filterRunLumis_
+
+        Return the lumis of a run that are in the set, in their original
+        order.
+        """
+        ranges = self.runs.get(int(run))
+        if ranges is None:
+            return []
+        firsts, lasts = ranges
+        filtered = []
+        for lumi in lumis:
+            index = bisect_right(firsts, lumi) - 1
+            if index >= 0 and lumi <= lasts[index]:
+                filtered.append(lumi)
+        return filtered
+
+    def filterLumis(self, lumiList):
+        """
+        _filterLumis_
+
+        Return the (run, lumi) pairs that are in the set, in their original
+        order.
+        """
+        filtered = []
+        lastRun = None
+        ranges = None
+        for (run, lumi) in lumiList:
+            if run != lastRun:
+                lastRun = run
+                ranges = self.runs.get(int(run))
+            if ranges is None:
+                continue
+            index = bisect_right(ranges[0], lumi) - 1
+            if index >= 0 and lumi <= ranges[1][index]:
+                filtered.append((run, lumi))
+        return filtered
+
+    def getRuns(self):
+        """
+        _getRuns_
+
+        Return the sorted list of runs in the set
+        """
+        return sorted(self.runs)
+
+    def getCompactList(self):
+        """
+        _getCompactList_
+
+        Return the set as a compact list with run numbers as strings.
+        """
+        compactList = {}
+        for run, (firsts, lasts) in self.runs.items():
+            compactList[str(run)] = [[first, last] for first, last in zip(firsts, lasts)]
+        return compactList
@@ -13,12 +13,13 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
-import copy
 import itertools
 import json
 import re
 import urllib2
 
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -146,79 +147,29 @@ class LumiList(object):
             self.compactList[run] = newLumis
 
     def __sub__(self, other): # Things from self not in other
-        result = {}
-        for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
-
-        return LumiList(compactList = result)
+        result = LumiIntervals(self.compactList) - LumiIntervals(other.compactList)
+        return LumiList._fromIntervals(result)
 
 
     def __and__(self, other): # Things in both
-        result = {}
-        aruns = set(self.compactList.keys())
-        bruns = set(other.compactList.keys())
-        for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
-        return LumiList(compactList = result)
+        result = LumiIntervals(self.compactList) & LumiIntervals(other.compactList)
+        return LumiList._fromIntervals(result)
 
 
     def __or__(self, other):
-        result = {}
-        aruns = self.compactList.keys()
-        bruns = other.compactList.keys()
-        runs = set(aruns + bruns)
-        for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
-        return LumiList(compactList = result)
+        result = LumiIntervals(self.compactList) | LumiIntervals(other.compactList)
+        return LumiList._fromIntervals(result)
+
+
+    @staticmethod
+    def _fromIntervals(intervals):
+        """
+        Build a LumiList from a LumiIntervals, its ranges are already sorted
+        and merged
+        """
+        lumiList = LumiList()
+        lumiList.compactList = intervals.getCompactList()
+        return lumiList
 
 
     def __add__(self, other):
@@ -235,14 +186,7 @@ class LumiList(object):
         lumilist is of the simple form
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
         """
-        filteredList = []
-        for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
-        return filteredList
+        return LumiIntervals(self.compactList).filterLumis(lumiList)
 
 
     def __str__ (self):
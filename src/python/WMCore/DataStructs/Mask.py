@@ -10,6 +10,7 @@ job in two ways:
 
 """
 
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
 from WMCore.DataStructs.Run import Run
 
 class Mask(dict):
@@ -208,17 +209,12 @@ class Mask(dict):
         passedRuns = set([r.run for r in runs])
         filteredRuns = maskRuns.intersection(passedRuns)
 
+        maskLumis = LumiIntervals(dict([(x, self["runAndLumis"][x]) for x in filteredRuns]))
+
         newRuns = set()
         for runNumber in filteredRuns:
-            maskLumis = set()
-            for pair in self["runAndLumis"][runNumber]:
-                if pair[0] == pair[1]:
-                    maskLumis.add(pair[0])
-                else:
-                    maskLumis = maskLumis.union(range(pair[0], pair[1] + 1, 1))
-
-            filteredLumis = set(runDict[runNumber].lumis).intersection(maskLumis)
+            filteredLumis = maskLumis.filterRunLumis(runNumber, set(runDict[runNumber].lumis))
             if len(filteredLumis) > 0:
-                newRuns.add(Run(runNumber, *list(filteredLumis)))
+                newRuns.add(Run(runNumber, *sorted(filteredLumis)))
 
         return newRuns
@@ -437,6 +437,19 @@ class Database(CouchDBRequests):
         self.last_seq = data['last_seq']
         return data
 
+    def changesWithDocs(self, limit=1000, since=-1):
+        """
+        Get the changes since sequence number with the changed documents
+        included. Store the last sequence value to self.last_seq. If the
+        since is negative use self.last_seq.
+        """
+        if since < 0:
+            since = self.last_seq
+        data = self.get('/%s/_changes' % self.name,
+                        {'limit': limit, 'since': since, 'include_docs': 'true'})
+        self.last_seq = data['last_seq']
+        return data
+
     def purge(self, data):
         return self.post('/%s/_purge' % self.name, data)
 
@@ -469,8 +482,8 @@ class Database(CouchDBRequests):
         encodedOptions = {}
         for k, v in options.iteritems():
             # We can't encode the stale option, as it will be converted to '"ok"'
-            # which couch barfs on.
-            if k == "stale":
+            # which couch barfs on, neither the doc ids which are plain strings.
+            if k in ("stale", "startkey_docid", "endkey_docid"):
                 encodedOptions[k] = v
             else:
                 encodedOptions[k] = self.encode(v)
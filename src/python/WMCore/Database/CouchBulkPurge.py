@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+_CouchBulkPurge_
+
+Streaming delete of the documents selected by a couch view.
+
+The view is read in pages of pageSize rows, following the view with the
+startkey/startkey_docid of the last row read, and each page is deleted with
+a single _bulk_docs request.  Up to maxInFlight pages are being deleted while
+the next page is read, so only a few pages are ever held in memory whatever
+the number of documents to delete.
+
+When a checkpoint directory is given, the position of the last page
+completely deleted is saved there, a purge which was interrupted resumes
+from it instead of reading the view from the start again.
+"""
+from __future__ import division
+
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+class CouchBulkPurge(object):
+    """
+    _CouchBulkPurge_
+
+    Delete the documents of a couch database selected by a view whose rows
+    have the document id and revision as value ({'id': ..., 'rev': ...}).
+    """
+
+    def __init__(self, couchDB, design, view, pageSize=5000, maxInFlight=2,
+                 checkpointDir=None):
+        self.couchDB = couchDB
+        self.design = design
+        self.view = view
+        # the first row of a page can be the last row of the previous one
+        self.pageSize = max(2, pageSize)
+        self.maxInFlight = max(1, maxInFlight)
+        self.checkpointDir = checkpointDir
+
+    def checkpointPath(self, name):
+        """
+        _checkpointPath_
+
+        Path of the checkpoint of the purge of name, None if checkpoints are
+        not enabled
+        """
+        if not self.checkpointDir:
+            return None
+        fileName = "purge-%s-%s-%s.json" % (self.couchDB.name, self.view, name)
+        return os.path.join(self.checkpointDir, re.sub(r"[^\w.-]", "_", fileName))
+
+    def loadCheckpoint(self, name):
+        """
+        _loadCheckpoint_
+
+        Return the checkpoint of an interrupted purge of name, or None
+        """
+        path = self.checkpointPath(name)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except Exception as ex:
+            logging.warning("Ignoring unreadable purge checkpoint %s: %s", path, str(ex))
+            return None
+
+    def saveCheckpoint(self, name, checkpoint):
+        """
+        _saveCheckpoint_
+
+        Atomically replace the checkpoint of the purge of name
+        """
+        path = self.checkpointPath(name)
+        if path is None:
+            return
+        if not os.path.isdir(self.checkpointDir):
+            os.makedirs(self.checkpointDir)
+        tmpPath = "%s.tmp" % path
+        with open(tmpPath, 'w') as handle:
+            json.dump(checkpoint, handle)
+        os.rename(tmpPath, path)
+        return
+
+    def removeCheckpoint(self, name):
+        """
+        _removeCheckpoint_
+
+        Remove the checkpoint of the purge of name
+        """
+        path = self.checkpointPath(name)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        return
+
+    def deletePage(self, rows):
+        """
+        _deletePage_
+
+        Delete the documents of a page of view rows, return the list of
+        _bulk_docs results.  A failed request counts as an error for every
+        document of the page.
+        """
+        docs = [{'_id': row['value']['id'], '_rev': row['value']['rev'], '_deleted': True}
+                for row in rows]
+        try:
+            return self.couchDB.post('/%s/_bulk_docs/' % self.couchDB.name, {'docs': docs})
+        except Exception as ex:
+            logging.warning("Failed to delete %d docs from %s: %s", len(docs), self.couchDB.name, str(ex))
+            return [{'id': doc['_id'], 'error': str(ex)} for doc in docs]
+
+    def purge(self, name, options):
+        """
+        _purge_
+
+        Delete all the documents in the view range given by options, either
+        a key or a startkey and endkey.  name identifies the purge in the
+        logs and in the checkpoints.
+
+        Returns a report dictionary with the status (ok, error or warning if
+        there was nothing to delete), the number of documents deleted, the
+        errors returned by couch, keyed by error, and the deletion rate.
+        """
+        viewOptions = dict(options)
+        viewOptions["reduce"] = False
+        viewOptions["limit"] = self.pageSize
+        if "key" in viewOptions:
+            viewOptions["startkey"] = viewOptions["endkey"] = viewOptions.pop("key")
+
+        report = {'status': 'ok', 'delete': 0, 'message': {}, 'pages': 0}
+        checkpoint = self.loadCheckpoint(name)
+        if checkpoint is not None:
+            logging.info("Resuming the purge of %s from %s after %d docs deleted",
+                         name, self.couchDB.name, checkpoint["delete"])
+            report['delete'] = checkpoint["delete"]
+            report['pages'] = checkpoint["pages"]
+            viewOptions["startkey"] = checkpoint["key"]
+            viewOptions["startkey_docid"] = checkpoint["docid"]
+        lastRow = checkpoint
+
+        startTime = time.time()
+        loadError = None
+        inFlight = deque()
+        pool = ThreadPool(self.maxInFlight)
+        try:
+            while True:
+                try:
+                    rows = self.couchDB.loadView(self.design, self.view, options=viewOptions)['rows']
+                except Exception as ex:
+                    loadError = "Error on loading docs of %s from %s" % (name, self.couchDB.name)
+                    logging.warning("%s\n%s", str(ex), loadError)
+                    rows = []
+                lastPage = loadError is not None or len(rows) < self.pageSize
+
+                # the page starts at the last row read, unless it was deleted already
+                if rows and lastRow is not None and \
+                        rows[0]['key'] == lastRow['key'] and rows[0]['id'] == lastRow['docid']:
+                    rows = rows[1:]
+                if rows:
+                    while len(inFlight) >= self.maxInFlight:
+                        self._completePage(name, report, inFlight.popleft(), startTime)
+                    lastRow = {'key': rows[-1]['key'], 'docid': rows[-1]['id']}
+                    viewOptions["startkey"] = lastRow['key']
+                    viewOptions["startkey_docid"] = lastRow['docid']
+                    inFlight.append((pool.apply_async(self.deletePage, (rows,)), lastRow))
+                if lastPage:
+                    while inFlight:
+                        self._completePage(name, report, inFlight.popleft(), startTime)
+                    break
+        finally:
+            pool.close()
+            pool.join()
+
+        elapsed = time.time() - startTime
+        report['rate'] = report['delete'] / max(elapsed, 1e-3)
+        if loadError is not None:
+            # resume from the checkpoint next time
+            report['status'] = 'error'
+            report['message'] = loadError
+            return report
+
+        self.removeCheckpoint(name)
+        if report['delete'] == 0 and not report['message']:
+            return {'status': 'warning', 'message': "no %s exist" % name}
+        logging.info("Deleted %d docs of %s from %s in %.1f secs (%.1f docs/s)", report['delete'],
+                     name, self.couchDB.name, elapsed, report['rate'])
+        return report
+
+    def _completePage(self, name, report, page, startTime):
+        """
+        _completePage_
+
+        Wait for the deletion of a page, add its results to the report and
+        checkpoint the purge as long as there was no error
+        """
+        result, pageEnd = page
+        self._addResults(report, result.get())
+        report['pages'] += 1
+        if report['status'] == 'ok':
+            self.saveCheckpoint(name, dict(pageEnd, delete=report['delete'], pages=report['pages']))
+        logging.debug("Deleted %d docs of %s from %s, %.1f docs/s", report['delete'], name,
+                      self.couchDB.name, report['delete'] / max(time.time() - startTime, 1e-3))
+        return
+
+    @staticmethod
+    def _addResults(report, results):
+        """
+        _addResults_
+
+        Add the _bulk_docs results of a page to the report
+        """
+        for data in results:
+            if 'error' in data:
+                report['message'].setdefault(data['error'], 0)
+                report['message'][data['error']] += 1
+                report['status'] = 'error'
+            else:
+                report['delete'] += 1
+        return
@@ -9,8 +9,10 @@ Core Database APIs
 
 
 
+import re
+
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, ColumnarResultSet
 from copy import copy
 import WMCore.WMLogging
 
@@ -37,6 +39,8 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        # Oracle refuses IN lists with more than 1000 elements
+        self.maxInListSize = 1000
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -53,7 +57,7 @@ class DBInterface(WMObject):
         return binds
 
     def executebinds(self, s=None, b=None, connection=None,
-                     returnCursor=False):
+                     returnCursor=False, columnar=False):
         """
         _executebinds_
 
@@ -67,13 +71,13 @@ class DBInterface(WMObject):
         if returnCursor:
             return resultProxy
 
-        result = ResultSet()
+        result = self.makeResultSet(columnar)
         result.add(resultProxy)
         resultProxy.close()
         return result
 
     def executemanybinds(self, s=None, b=None, connection=None,
-                         returnCursor=False):
+                         returnCursor=False, inKey=None, columnar=False):
         """
         _executemanybinds_
         b is a list of dictionaries for the binds, e.g.:
@@ -87,6 +91,12 @@ class DBInterface(WMObject):
         This will return a list of sqlalchemy.engine.base.ResultProxy object's
         one for each set of binds.
 
+        If inKey is set and the statement is a select, the binds are expected
+        to only differ in the value of inKey and the select is run in bulk
+        through executeinbinds() instead of once per bind.
+
+        If columnar is set the rows are stored in a ColumnarResultSet.
+
         returns a list of sqlalchemy.engine.base.ResultProxy objects
         """
 
@@ -95,12 +105,18 @@ class DBInterface(WMObject):
             """
             Trying to select many
             """
+            if inKey and not returnCursor:
+                result = self.executeinbinds(s, b, inKey, connection=connection,
+                                             columnar=columnar)
+                if result is not None:
+                    return self.makelist(result)
+
             if returnCursor:
                 result = []
                 for bind in b:
                     result.append(connection.execute(s, bind))
             else:
-                result = ResultSet()
+                result = self.makeResultSet(columnar)
                 for bind in b:
                     resultproxy = connection.execute(s, bind)
                     result.add(resultproxy)
@@ -114,6 +130,73 @@ class DBInterface(WMObject):
         result = connection.execute(s, b)
         return self.makelist(result)
 
+    def makeResultSet(self, columnar=False):
+        """
+        _makeResultSet_
+
+        Return an empty ResultSet, or ColumnarResultSet if columnar is set.
+        """
+        if columnar:
+            return ColumnarResultSet()
+        return ResultSet()
+
+    def executeinbinds(self, s, b, inKey, connection=None, columnar=False):
+        """
+        _executeinbinds_
+
+        Run a select for a list of binds that only differ in the value of the
+        inKey bind variable.  The "= :inKey" condition in the query is
+        rewritten into an "IN (:inKey_0, :inKey_1, ...)" list and the select
+        is executed once per chunk of maxInListSize (or maxBindsPerQuery,
+        whatever is smaller) distinct values.  Rows of all chunks are merged
+        into a single ResultSet.
+
+        Duplicate inKey values are only queried once, so unlike the per bind
+        loop rows are not repeated for duplicate binds.
+
+        Returns None if the query or the binds can't be run in bulk, the
+        caller is then expected to fall back to the per bind loop.
+        """
+        inPattern = re.compile(r"=\s*:%s\b" % re.escape(inKey), re.IGNORECASE)
+        if len(inPattern.findall(s)) != 1:
+            self.logger.debug("Can't bulk select on %s, bind must be used exactly once" % inKey)
+            return None
+
+        commonBinds = None
+        inValues = []
+        seenValues = set()
+        for bind in b:
+            if inKey not in bind:
+                return None
+            otherBinds = dict(bind)
+            value = otherBinds.pop(inKey)
+            if commonBinds is None:
+                commonBinds = otherBinds
+            elif otherBinds != commonBinds:
+                self.logger.debug("Can't bulk select on %s, other binds vary" % inKey)
+                return None
+            if value not in seenValues:
+                seenValues.add(value)
+                inValues.append(value)
+
+        chunkSize = min(self.maxInListSize, self.maxBindsPerQuery)
+        result = self.makeResultSet(columnar)
+        for start in range(0, len(inValues), chunkSize):
+            chunk = inValues[start:start + chunkSize]
+            bindNames = ["%s_%d" % (inKey, i) for i in range(len(chunk))]
+            inList = ", ".join([":%s" % name for name in bindNames])
+            sql = inPattern.sub(lambda match: "IN (%s)" % inList, s)
+
+            chunkBinds = dict(commonBinds)
+            chunkBinds.update(zip(bindNames, chunk))
+            resultproxy = self.executebinds(sql, chunkBinds,
+                                            connection=connection,
+                                            returnCursor=True)
+            result.add(resultproxy)
+            resultproxy.close()
+
+        return result
+
     def connection(self):
         """
         Return a connection to the engine (from the connection pool)
@@ -122,10 +205,16 @@ class DBInterface(WMObject):
 
 
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False, inKey=None,
+                    columnar=False):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
+        set inKey to the name of the only bind variable that varies between
+        the binds of a select to run it in bulk with IN lists, see
+        executeinbinds()
+        set columnar = True to get the rows back in ColumnarResultSets, which
+        are much more compact for large selects
 
         """
         connection = None
@@ -147,7 +236,8 @@ class DBInterface(WMObject):
 
                 for i in sqlstmt:
                     r = self.executebinds(i, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor,
+                                          columnar=columnar)
                     result.append(r)
 
                 if not transaction:
@@ -156,15 +246,20 @@ class DBInterface(WMObject):
                 #Run single SQL statement for a list of binds - use execute_many()
                 if not transaction:
                     trans = connection.begin()
-                while(len(binds) > self.maxBindsPerQuery):
+                # Bulk selects are chunked by executeinbinds() itself
+                bulkSelect = inKey and sqlstmt[0].strip().lower().startswith("select")
+                while(len(binds) > self.maxBindsPerQuery and not bulkSelect):
                     result.extend(self.processData(sqlstmt, binds[:self.maxBindsPerQuery],
                                                    conn=connection, transaction=True,
-                                                   returnCursor=returnCursor))
+                                                   returnCursor=returnCursor,
+                                                   columnar=columnar))
                     binds = binds[self.maxBindsPerQuery:]
 
                 for i in sqlstmt:
                     result.extend(self.executemanybinds(i, binds, connection=connection,
-                                                        returnCursor=returnCursor))
+                                                        returnCursor=returnCursor,
+                                                        inKey=inKey,
+                                                        columnar=columnar))
                 if not transaction:
                     trans.commit()
             elif len(binds) == len(sqlstmt):
@@ -176,7 +271,8 @@ class DBInterface(WMObject):
                     b = binds[i]
 
                     r = self.executebinds(s, b, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor,
+                                          columnar=columnar)
                     result.append(r)
 
                 if not transaction:
@@ -13,6 +13,7 @@ import time
 import types 
 
 from WMCore.DataStructs.WMObject import WMObject
+from WMCore.Database.ResultSet import ColumnarResultSet, LazyDictRows
 
 class DBFormatter(WMObject):
     def __init__(self, logger, dbinterface):
@@ -68,24 +69,43 @@ class DBFormatter(WMObject):
         """
         dictOut = []
         for r in result:
-            descriptions = r.keys
-            for i in r.fetchall():
-                #WARNING: this can generate errors for some stupid reason
-                # in both oracle and mysql.
-                entry = {}
-                for index in xrange(0,len(descriptions)):
-                    # WARNING: Oracle returns table names in CAP!
-                    if type(i[index]) == unicode:
-                        entry[str(descriptions[index].lower())] = str(i[index])
-                    else:
-                        entry[str(descriptions[index].lower())] = i[index]
-
-                dictOut.append(entry)
-
+            dictOut.extend(self.iterDicts(r))
             r.close()
 
         return dictOut
 
+    def formatDictLazy(self, result):
+        """
+        Returns a sized iterable over the results, each row is only formatted
+        into a dictionary when it is reached.  Meant for selects executed with
+        columnar = True, where it avoids holding all the dictionaries in
+        memory at once.
+        """
+        return LazyDictRows(result, self.iterDicts)
+
+    def iterDicts(self, resultSet):
+        """
+        Yield a dictionary for every row of a single (Columnar)ResultSet
+        """
+        if isinstance(resultSet, ColumnarResultSet):
+            for entry in resultSet.iterDicts():
+                yield entry
+            return
+
+        descriptions = resultSet.keys
+        for i in resultSet.fetchall():
+            #WARNING: this can generate errors for some stupid reason
+            # in both oracle and mysql.
+            entry = {}
+            for index in xrange(0,len(descriptions)):
+                # WARNING: Oracle returns table names in CAP!
+                if type(i[index]) == unicode:
+                    entry[str(descriptions[index].lower())] = str(i[index])
+                else:
+                    entry[str(descriptions[index].lower())] = i[index]
+
+            yield entry
+
     def formatOneDict(self, result):
         """
         Return a dictionary representing the first record
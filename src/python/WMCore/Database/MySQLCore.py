@@ -116,7 +116,7 @@ class MySQLInterface(DBInterface):
         return (updatedSQL, mySQLBindVarsList)
 
     def executebinds(self, s = None, b = None, connection = None,
-                     returnCursor = False):
+                     returnCursor = False, columnar = False):
         """
         _executebinds_
 
@@ -124,17 +124,27 @@ class MySQLInterface(DBInterface):
         Transform the bind variables into the format that MySQL expects.
         """
         s, b = self.substitute(s, b)
-        return DBInterface.executebinds(self, s, b, connection, returnCursor)
+        return DBInterface.executebinds(self, s, b, connection, returnCursor,
+                                        columnar)
 
     def executemanybinds(self, s = None, b = None, connection = None,
-                         returnCursor = False):
+                         returnCursor = False, inKey = None, columnar = False):
         """
         _executemanybinds_
 
         Execute a SQL statement that has multiple sets of bind variables.
         Transform the bind variables into the format that MySQL expects.
+
+        Bulk selects are rewritten before the substitution, executebinds()
+        takes care of transforming the binds of every IN list chunk.
         """
+        if inKey and not returnCursor and s.strip().lower().startswith("select"):
+            result = self.executeinbinds(s.strip(), b, inKey, connection,
+                                         columnar)
+            if result is not None:
+                return self.makelist(result)
+
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
-                                            returnCursor)
+                                            returnCursor, columnar = columnar)
@@ -41,3 +41,134 @@ class ResultSet:
                 self.data.append(r)
 
         return
+
+
+class RowView(object):
+    """
+    _RowView_
+
+    Lazy, read only view on a single row of a ColumnarResultSet.  Values can be
+    accessed by position or by column name, like a SQLAlchemy RowProxy.
+    """
+    __slots__ = ("_resultSet", "_index")
+
+    def __init__(self, resultSet, index):
+        self._resultSet = resultSet
+        self._index = index
+
+    def __getitem__(self, key):
+        if not isinstance(key, (int, long)):
+            key = self._resultSet.keyIndex[key]
+        return self._resultSet.columns[key][self._index]
+
+    def __len__(self):
+        return len(self._resultSet.columns)
+
+    def __iter__(self):
+        for column in self._resultSet.columns:
+            yield column[self._index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+    def keys(self):
+        return list(self._resultSet.keys)
+
+
+class ColumnarResultSet(object):
+    """
+    _ColumnarResultSet_
+
+    Compact drop in replacement for the ResultSet.  Instead of keeping one
+    RowProxy object per row the values are stored in one list per column,
+    rows are only exposed through lazy RowView objects or streamed as
+    dictionaries by iterDicts().
+    """
+    def __init__(self):
+        self.keys = []
+        self.columns = []
+        self.keyIndex = {}
+        self.rowCount = 0
+
+    def __len__(self):
+        return self.rowCount
+
+    @property
+    def data(self):
+        return self.fetchall()
+
+    def close(self):
+        return
+
+    def fetchone(self):
+        if self.rowCount > 0:
+            return RowView(self, 0)
+        else:
+            return []
+
+    def fetchall(self):
+        return [RowView(self, i) for i in xrange(self.rowCount)]
+
+    def add(self, resultproxy, batchSize=1000):
+        if resultproxy.closed or not resultproxy.returns_rows:
+            return
+
+        while True:
+            rows = resultproxy.fetchmany(batchSize)
+            if not rows:
+                break
+            if len(self.keys) == 0:
+                self.keys.extend(rows[0].keys())
+                self.keyIndex = dict([(key, i) for i, key in enumerate(self.keys)])
+                self.columns = [[] for dummyKey in self.keys]
+            for column, values in zip(self.columns, zip(*rows)):
+                column.extend(values)
+            self.rowCount += len(rows)
+
+        return
+
+    def iterDicts(self):
+        """
+        _iterDicts_
+
+        Yield one dictionary per row, keyed by the lower case column names.
+        Unicode values are converted to str, as done by DBFormatter.formatDict
+        """
+        names = [str(key.lower()) for key in self.keys]
+        for i in xrange(self.rowCount):
+            entry = {}
+            for name, column in zip(names, self.columns):
+                value = column[i]
+                if type(value) == unicode:
+                    value = str(value)
+                entry[name] = value
+            yield entry
+
+        return
+
+
+class LazyDictRows(object):
+    """
+    _LazyDictRows_
+
+    Sized iterable over the rows of a list of result sets that formats every
+    row as a dictionary only when it is reached.
+    """
+    def __init__(self, resultSets, formatter):
+        self.resultSets = resultSets
+        self.formatter = formatter
+
+    def __len__(self):
+        return sum([len(r) if isinstance(r, ColumnarResultSet) else len(r.data)
+                    for r in self.resultSets])
+
+    def __iter__(self):
+        for r in self.resultSets:
+            for entry in self.formatter(r):
+                yield entry
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+_CompactReport_
+
+Compact on disk format for the framework job report.
+
+The report ConfigSection tree is stored as marshalled parts instead of a
+pickle of the whole tree:
+  - a header with a magic string, the format version and the marshal version
+  - a table of contents with the name, offset and length of every part
+  - the parts: the top level report section, the core of every step section
+    (status, id, output module names...) and every child section of the
+    steps (output, input, errors, performance...) on its own.
+
+Lumi lists of the run sections are stored as ranges of consecutive lumis.
+Setting values that marshal can't handle are pickled.
+
+Splitting the report in parts allows reading only some of the sections of
+the steps, for instance the errors and the output files.
+"""
+
+import marshal
+import struct
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from WMCore.Configuration import ConfigSection
+
+COMPACT_MAGIC = "WMFWJR"
+COMPACT_VERSION = 1
+
+# magic, format version, marshal version, table of contents length
+_HEADER = struct.Struct("<6sBBI")
+
+_MARSHAL_TYPES = (str, unicode, int, long, float, bool, type(None))
+
+
+def compressLumis(lumis):
+    """
+    _compressLumis_
+
+    Turn a list of lumis into a flat list of (first lumi, count) pairs for
+    each range of consecutive lumis.
+    """
+    ranges = []
+    first = None
+    count = 0
+    for lumi in lumis:
+        if first is not None and lumi == first + count:
+            count += 1
+            continue
+        if first is not None:
+            ranges.extend((first, count))
+        first = lumi
+        count = 1
+    if first is not None:
+        ranges.extend((first, count))
+    return ranges
+
+
+def expandLumis(ranges):
+    """
+    _expandLumis_
+
+    Inverse of compressLumis.
+    """
+    lumis = []
+    for i in xrange(0, len(ranges), 2):
+        lumis.extend(xrange(ranges[i], ranges[i] + ranges[i + 1]))
+    return lumis
+
+
+def isLumiList(value):
+    """
+    _isLumiList_
+
+    Check whether a run section setting is a list of lumis.
+    """
+    if not isinstance(value, list):
+        return False
+    for lumi in value:
+        if type(lumi) is not int:
+            return False
+    return True
+
+
+def encodeSection(section, splitChildren=None):
+    """
+    _encodeSection_
+
+    Encode a ConfigSection into marshallable python types.  The children
+    sections listed in splitChildren are not encoded, they are replaced by the
+    name of the part they are stored in.
+    """
+    settings = []
+    lumiSettings = []
+    pickledSettings = []
+    children = []
+    isRunSection = section._internal_name == "runs"
+
+    for name in sorted(section._internal_settings):
+        value = getattr(section, name)
+        if name in section._internal_children:
+            if splitChildren is not None and name in splitChildren:
+                children.append((name, splitChildren[name]))
+            else:
+                children.append((name, encodeSection(value)))
+        elif isRunSection and isLumiList(value):
+            lumiSettings.append((name, compressLumis(value)))
+        elif type(value) in _MARSHAL_TYPES:
+            settings.append((name, value))
+        else:
+            try:
+                marshal.dumps(value)
+                settings.append((name, value))
+            except ValueError:
+                pickledSettings.append((name, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+
+    return (section._internal_name, section._internal_documentation,
+            section._internal_docstrings, section._internal_skipChecks,
+            settings, lumiSettings, pickledSettings, children)
+
+
+def decodeSection(encoded, parts=None):
+    """
+    _decodeSection_
+
+    Rebuild a ConfigSection from its encoded form.  Children sections stored
+    in other parts are taken from the parts dictionary, they are left out if
+    the part wasn't loaded.
+    """
+    name, documentation, docstrings, skipChecks, settings, lumiSettings, \
+        pickledSettings, children = encoded
+
+    section = ConfigSection(name)
+    section._internal_documentation = documentation
+    section._internal_docstrings = docstrings
+    section._internal_skipChecks = skipChecks
+
+    # bypass the type checks, the values were checked when they were set
+    for settingName, value in settings:
+        object.__setattr__(section, settingName, value)
+        section._internal_settings.add(settingName)
+    for settingName, ranges in lumiSettings:
+        object.__setattr__(section, settingName, expandLumis(ranges))
+        section._internal_settings.add(settingName)
+    for settingName, value in pickledSettings:
+        object.__setattr__(section, settingName, pickle.loads(value))
+        section._internal_settings.add(settingName)
+
+    for childName, child in children:
+        if isinstance(child, tuple):
+            setattr(section, childName, decodeSection(child))
+        elif parts is not None and child in parts:
+            setattr(section, childName, decodeSection(parts[child], parts))
+
+    return section
+
+
+def dumpReport(data, handle):
+    """
+    _dumpReport_
+
+    Write the report data section to an open file.
+    """
+    steps = getattr(data, "steps", [])
+    stepParts = dict([(x, x) for x in steps if x in data._internal_children])
+
+    parts = [("report", marshal.dumps(encodeSection(data, stepParts)))]
+    for stepName in stepParts:
+        step = getattr(data, stepName)
+        childParts = dict([(x, "%s/%s" % (stepName, x)) for x in step._internal_children])
+        parts.append((stepName, marshal.dumps(encodeSection(step, childParts))))
+        for childName, partName in childParts.items():
+            parts.append((partName, marshal.dumps(encodeSection(getattr(step, childName)))))
+
+    toc = []
+    offset = 0
+    for partName, blob in parts:
+        toc.append((partName, offset, len(blob)))
+        offset += len(blob)
+    toc = marshal.dumps(toc)
+
+    handle.write(_HEADER.pack(COMPACT_MAGIC, COMPACT_VERSION, marshal.version, len(toc)))
+    handle.write(toc)
+    for partName, blob in parts:
+        handle.write(blob)
+    return
+
+
+def isCompactReport(handle):
+    """
+    _isCompactReport_
+
+    Check whether an open file holds a compact report, leaves the file at
+    its start.
+    """
+    magic = handle.read(len(COMPACT_MAGIC))
+    handle.seek(0)
+    return magic == COMPACT_MAGIC
+
+
+def loadReport(handle, stepSections=None):
+    """
+    _loadReport_
+
+    Read the report data section from an open file.  If stepSections is
+    given only those child sections of the steps are read, on top of the
+    step settings.
+    """
+    header = handle.read(_HEADER.size)
+    magic, version, marshalVersion, tocLength = _HEADER.unpack(header)
+    if magic != COMPACT_MAGIC or version > COMPACT_VERSION:
+        raise ValueError("Unsupported framework job report format %s version %s" % (magic, version))
+    if marshalVersion > marshal.version:
+        raise ValueError("Framework job report written with marshal version %s, newer than %s" %
+                         (marshalVersion, marshal.version))
+
+    toc = marshal.loads(handle.read(tocLength))
+    dataStart = _HEADER.size + tocLength
+
+    parts = {}
+    if stepSections is None:
+        data = handle.read()
+        for partName, offset, length in toc:
+            parts[partName] = marshal.loads(data[offset:offset + length])
+    else:
+        # the step sections are named stepName/section
+        for partName, offset, length in toc:
+            if "/" in partName and partName.split("/", 1)[1] not in stepSections:
+                continue
+            handle.seek(dataStart + offset)
+            parts[partName] = marshal.loads(handle.read(length))
+
+    return decodeSection(parts.pop("report"), parts)
+
@@ -25,11 +25,13 @@ class FileInfo:
     """
 
 
-    def __init__(self):
+    def __init__(self, checksums=None):
         """
-        Doesn't do nothing
+        checksums can hold the (adler32, cksum) checksums of the files
+        already calculated, by absolute path
 
         """
+        self.checksums = checksums or {}
 
     def __call__(self, fileReport, step, outputModule):
         """
@@ -76,7 +78,10 @@ class FileInfo:
 
         """
         # Get checksum
-        (adler32, cksum) = calculateChecksums(filename)
+        if filename in self.checksums:
+            (adler32, cksum) = self.checksums[filename]
+        else:
+            (adler32, cksum) = calculateChecksums(filename)
 
         # Get info from spec
         output = getattr(step.output.modules, outputModule)
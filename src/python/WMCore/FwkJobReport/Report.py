@@ -8,6 +8,7 @@ Framework job report object.
 """
 from __future__ import print_function
 
+import os
 import re
 import logging
 import sys
@@ -19,11 +20,13 @@ try:
 except ImportError:
     import pickle
 
+from WMCore.Algorithms.BasicAlgos import calculateChecksumsForFiles
 from WMCore.Configuration import ConfigSection
 
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 
+from WMCore.FwkJobReport.CompactReport import dumpReport, loadReport, isCompactReport
 from WMCore.FwkJobReport.FileInfo import FileInfo
 from WMCore.WMException           import WMException
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
@@ -142,9 +145,9 @@ class Report:
         Read in the FrameworkJobReport XML file produced
         by cmsRun and pull the information from it into this object
         """
-        from WMCore.FwkJobReport.XMLParser import xmlToJobReport
+        from WMCore.FwkJobReport.XMLParser import streamXMLToJobReport
         try:
-            xmlToJobReport(self, xmlfile)
+            streamXMLToJobReport(self, xmlfile)
         except Exception as ex:
             msg = "Error reading XML job report file, possibly corrupt XML File:\n"
             msg += "Details: %s" % str(ex)
@@ -341,26 +344,37 @@ class Report:
 
         return returnCode
 
-    def persist(self, filename):
+    def persist(self, filename, compact=True):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Save this object to disk, in the compact report format or pickled.
         """
-        handle = open(filename, 'w')
-        pickle.dump(self.data, handle)
+        handle = open(filename, 'wb')
+        if compact:
+            dumpReport(self.data, handle)
+        else:
+            pickle.dump(self.data, handle)
         handle.close()
         return
 
-    def unpersist(self, filename, reportname=None):
+    def unpersist(self, filename, reportname=None, stepSections=None):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a FWJR from disk, either pickled or in the compact format.  For
+        compact reports, stepSections can restrict the sections of the steps
+        that are loaded (i.e. ["errors", "output"]), the step settings like
+        the status are always loaded.
         """
-        handle = open(filename, 'r')
-        self.data = pickle.load(handle)
-        handle.close()
+        handle = open(filename, 'rb')
+        try:
+            if isCompactReport(handle):
+                self.data = loadReport(handle, stepSections)
+            else:
+                self.data = pickle.load(handle)
+        finally:
+            handle.close()
 
         # old self.report (if it existed) became unattached
         if reportname:
@@ -676,13 +690,13 @@ class Report:
         reportSection = getattr(self.data, step, None)
         return reportSection
 
-    def load(self, filename):
+    def load(self, filename, stepSections=None):
         """
         _load_
 
         This just maps to unpersist
         """
-        self.unpersist(filename)
+        self.unpersist(filename, stepSections=stepSections)
         return
 
     def save(self, filename):
@@ -1087,13 +1101,24 @@ class Report:
         """
 
         stepReport = self.retrieveStep(step=stepName)
-        fileInfo = FileInfo()
 
         if not stepReport:
             return None
 
         listOfModules = getattr(stepReport, 'outputModules', None)
 
+        # checksum all the output files of the step at the same time
+        pfns = []
+        for module in listOfModules:
+            outputMod = getattr(stepReport.output, module, None)
+            for n in range(outputMod.files.fileCount):
+                pfn = getattr(getattr(outputMod.files, 'file%i' % n, None), 'pfn', None)
+                if pfn and pfn.startswith("file:"):
+                    pfn = pfn.replace("file:", "")
+                if pfn and os.path.isfile(pfn):
+                    pfns.append(os.path.abspath(pfn))
+        fileInfo = FileInfo(checksums=calculateChecksumsForFiles(pfns))
+
         for module in listOfModules:
             outputMod = getattr(stepReport.output, module, None)
             for n in range(outputMod.files.fileCount):
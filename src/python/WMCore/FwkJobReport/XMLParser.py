@@ -18,6 +18,35 @@ from WMCore.FwkJobReport import Report
 from WMCore.DataStructs.Run import Run
 from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine
 
+def addOutputFileAttributes(fileRef, fileAttrs):
+    """
+    _addOutputFileAttributes_
+
+    Add the attributes read from the XML to an output file section.
+    """
+    Report.addAttributesToFile(fileRef, lfn = fileAttrs["LFN"],
+                               pfn = fileAttrs["PFN"], catalog = fileAttrs["Catalog"],
+                               module_label = fileAttrs["ModuleLabel"],
+                               guid = fileAttrs["GUID"],
+                               ouput_module_class = fileAttrs["OutputModuleClass"],
+                               events = int(fileAttrs["TotalEvents"]),
+                               branch_hash = fileAttrs["BranchHash"])
+    return
+
+def addInputFileAttributes(fileRef, fileAttrs):
+    """
+    _addInputFileAttributes_
+
+    Add the attributes read from the XML to an input file section.
+    """
+    Report.addAttributesToFile(fileRef, lfn = fileAttrs["LFN"],
+                               pfn = fileAttrs["PFN"], catalog = fileAttrs["Catalog"],
+                               module_label = fileAttrs["ModuleLabel"],
+                               guid = fileAttrs["GUID"], input_type = fileAttrs["InputType"],
+                               input_source_class = fileAttrs["InputSourceClass"],
+                               events = int(fileAttrs["EventsRead"]))
+    return
+
 def reportBuilder(nodeStruct, report, target):
     """
     _reportBuilder_
@@ -44,22 +73,8 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send( (report, subnode) )
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send( (report, subnode) )
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send( (report, subnode) )
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send( (report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send( (report, subnode) )
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send( (report, subnode) )
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send( (report, subnode) )
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send( (report, subnode) )
+            if subnode.name in targets:
+                targets[subnode.name].send( (report, subnode) )
             else:
                 setattr(report.report.parameters, subnode.name, subnode.text)
 
@@ -91,15 +106,7 @@ def fileHandler(targets):
             else:
                 fileAttrs[subnode.name] = subnode.text
 
-        Report.addAttributesToFile(fileRef, lfn = fileAttrs["LFN"],
-                                   pfn = fileAttrs["PFN"], catalog = fileAttrs["Catalog"],
-                                   module_label = fileAttrs["ModuleLabel"],
-                                   guid = fileAttrs["GUID"],
-                                   ouput_module_class = fileAttrs["OutputModuleClass"],
-                                   events = int(fileAttrs["TotalEvents"]),
-                                   branch_hash = fileAttrs["BranchHash"])
-
-        [fileRef]
+        addOutputFileAttributes(fileRef, fileAttrs)
 
 @coroutine
 def inputFileHandler(targets):
@@ -127,14 +134,7 @@ def inputFileHandler(targets):
             else:
                 fileAttrs[subnode.name] = subnode.text
 
-        Report.addAttributesToFile(fileRef, lfn = fileAttrs["LFN"],
-                                   pfn = fileAttrs["PFN"], catalog = fileAttrs["Catalog"],
-                                   module_label = fileAttrs["ModuleLabel"],
-                                   guid = fileAttrs["GUID"], input_type = fileAttrs["InputType"],
-                                   input_source_class = fileAttrs["InputSourceClass"],
-                                   events = int(fileAttrs["EventsRead"]))
-
-        [fileRef]
+        addInputFileAttributes(fileRef, fileAttrs)
 
 @coroutine
 def analysisFileHandler(targets):
@@ -530,4 +530,226 @@ def xmlToJobReport(reportInstance, xmlFile):
         )
 
     return
+
+
+def sectionDispatchers():
+    """
+    _sectionDispatchers_
+
+    Set up the coroutine pipelines for the sections of the report that are
+    not file sections.
+    """
+    perfRepDispatchers = {
+        "PerformanceSummary" : perfSummaryHandler(),
+        "CPU" : perfCPUHandler(),
+        "Memory" : perfMemHandler(),
+        "Storage": perfStoreHandler(),
+        }
+
+    dispatchers  = {
+        "PerformanceReport" : perfRepHandler(perfRepDispatchers),
+        "AnalysisFile" : analysisFileHandler({}),
+        "FrameworkError" : errorHandler(),
+        "SkippedFile" : skippedFileHandler(),
+        "FallbackAttempt" : fallbackAttemptHandler(),
+        "SkippedEvent" : skippedEventHandler(),
+        }
+    return dispatchers
+
+
+class ReportStreamParser(object):
+    """
+    _ReportStreamParser_
+
+    Single pass expat parser that fills the report while reading the XML.
+
+    Input and output file sections, which hold the bulk of the report with
+    their run and lumi information, are added to the report straight from
+    the expat events without building a Node structure.  The other sections
+    of the report are small, they are built as Node structures and handed
+    to the same handlers as xmlToJobReport once they are read.
+    """
+    def __init__(self, report):
+        self.report = report
+        self.dispatchers = sectionDispatchers()
+
+        self.depth = 0
+        self.charCache = []
+        self.inReport = False
+        # Node structure of the current non file section
+        self.nodeStack = []
+
+        # state of the current file section
+        self.fileType = None
+        self.fileAttrs = {}
+        self.moduleLabel = None
+        self.fileContents = []
+        self.fileChild = None
+        self.runInfo = None
+        self.inputData = None
+        return
+
+    def parse(self, xmlFile):
+        """
+        _parse_
+
+        Parse the XML file into the report.
+        """
+        parser = xml.parsers.expat.ParserCreate()
+        parser.buffer_text = True
+        parser.returns_unicode = False
+        parser.StartElementHandler = self.startElement
+        parser.EndElementHandler = self.endElement
+        parser.CharacterDataHandler = self.charCache.append
+
+        with open(xmlFile, 'r') as handle:
+            parser.ParseFile(handle)
+        return
+
+    def startElement(self, name, attrs):
+        """
+        _startElement_
+
+        Handle the start of an XML element.
+        """
+        self.depth += 1
+        del self.charCache[:]
+
+        if self.depth == 1:
+            self.inReport = (name == "FrameworkJobReport")
+            if not self.inReport:
+                print("Not Handling: ", name)
+        elif not self.inReport:
+            return
+        elif self.depth == 2:
+            if name in ("File", "InputFile"):
+                self.fileType = name
+                self.fileAttrs = {}
+                self.moduleLabel = None
+                self.fileContents = []
+            else:
+                self.nodeStack = [Node(name, attrs)]
+        elif self.fileType:
+            self.startFileElement(name, attrs)
+        else:
+            newNode = Node(name, attrs)
+            self.nodeStack[-1].children.append(newNode)
+            self.nodeStack.append(newNode)
+        return
+
+    def endElement(self, name):
+        """
+        _endElement_
+
+        Handle the end of an XML element.
+        """
+        text = str(''.join(self.charCache)).strip()
+        del self.charCache[:]
+        depth = self.depth
+        self.depth -= 1
+
+        if depth == 1 or not self.inReport:
+            return
+        elif self.fileType:
+            if depth == 2:
+                self.addFile()
+                self.fileType = None
+            else:
+                self.endFileElement(name, depth, text)
+        else:
+            node = self.nodeStack.pop()
+            node.text = text
+            if depth == 2:
+                if name in self.dispatchers:
+                    self.dispatchers[name].send((self.report, node))
+                else:
+                    setattr(self.report.report.parameters, name, text)
+        return
+
+    def startFileElement(self, name, attrs):
+        """
+        _startFileElement_
+
+        Handle the start of an element inside a file section.  Runs are built
+        as they are read, branches are ignored.
+        """
+        if self.depth == 3:
+            self.fileChild = name
+        elif self.fileChild == "Runs":
+            if self.depth == 4:
+                self.runInfo = None
+                if name == "Run" and "ID" in attrs:
+                    self.runInfo = Run(runNumber = str(attrs["ID"]))
+                    self.fileContents.append(self.runInfo)
+            elif self.depth == 5 and self.runInfo is not None and "ID" in attrs:
+                self.runInfo.lumis.append(int(attrs["ID"]))
+        elif self.fileChild == "Inputs" and self.fileType == "File":
+            if self.depth == 4:
+                self.inputData = {}
+        return
+
+    def endFileElement(self, name, depth, text):
+        """
+        _endFileElement_
+
+        Handle the end of an element inside a file section.
+        """
+        if depth == 3:
+            if name == "Runs" or name == "Branches" or \
+               (name == "Inputs" and self.fileType == "File"):
+                pass
+            else:
+                self.fileAttrs[name] = text
+                if name == "ModuleLabel" and self.moduleLabel is None:
+                    self.moduleLabel = text
+            self.fileChild = None
+        elif self.fileChild == "Inputs" and self.fileType == "File":
+            if depth == 5:
+                self.inputData[name] = text
+            elif depth == 4:
+                self.fileContents.append((self.inputData["LFN"], self.inputData["PFN"]))
+        return
+
+    def addFile(self):
+        """
+        _addFile_
+
+        Add the file section that was just read to the report.
+        """
+        if self.moduleLabel is None:
+            raise IndexError("%s without ModuleLabel in the report" % self.fileType)
+
+        if self.fileType == "File":
+            self.report.addOutputModule(self.moduleLabel)
+            fileRef = self.report.addOutputFile(self.moduleLabel)
+        else:
+            self.report.addInputSource(self.moduleLabel)
+            fileRef = self.report.addInputFile(self.moduleLabel)
+
+        for content in self.fileContents:
+            if isinstance(content, Run):
+                Report.addRunInfoToFile(fileRef, content)
+            else:
+                Report.addInputToFile(fileRef, content[0], content[1])
+
+        if self.fileType == "File":
+            addOutputFileAttributes(fileRef, self.fileAttrs)
+        else:
+            addInputFileAttributes(fileRef, self.fileAttrs)
+        self.fileContents = []
+        return
+
+
+def streamXMLToJobReport(reportInstance, xmlFile):
+    """
+    _streamXMLToJobReport_
+
+    parse the XML file in a single pass and insert the information into the
+    Report instance provided
+
+    """
+    ReportStreamParser(reportInstance).parse(xmlFile)
+    return
+
+
 childrenMatching = lambda node, nname: [x for x in node.children if x.name == nname]
@@ -17,6 +17,7 @@ import operator
 import traceback
 import math
 
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
 from WMCore.DataStructs.Run         import Run
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.JobSplitting.LumiBased  import isGoodLumi, isGoodRun, LumiChecker
@@ -96,6 +97,10 @@ class EventAwareLumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        if goodRunList:
+            # look up the lumis in sorted arrays instead of scanning the ranges
+            goodRunList = LumiIntervals(goodRunList)
+
         lDict = self.sortByLocation()
         locationDict = {}
 
@@ -146,6 +151,10 @@ class EventAwareLumiBased(JobFactory):
         currentJobAvgEventCount = 0
         stopTask = False
         self.lumiChecker = LumiChecker(applyLumiCorrection)
+        # Load the parentage of all files at once, findParent is memoized
+        if getParents:
+            self.loadParents(locationDict)
+
         for location in locationDict:
 
             # For each location, we need a new jobGroup
@@ -66,6 +66,10 @@ class EventBased(JobFactory):
         totalJobs = 0
 
         locationDict = self.sortByLocation()
+        # Load the parentage of all files at once, findParent is memoized
+        if getParents:
+            self.loadParents(locationDict)
+
         for location in locationDict:
             self.newGroup()
             fileList = locationDict[location]
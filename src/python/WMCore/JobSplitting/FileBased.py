@@ -96,6 +96,10 @@ class FileBased(JobFactory):
                     if f in locationDict[locSet]:
                         locationDict[locSet].remove(f)
 
+        # Load the parentage of all files at once, findParent is memoized
+        if getParents:
+            self.loadParents(locationDict)
+
         for locSet in locationDict.keys():
             #Now we have all the files in a certain location set
             fileList = locationDict[locSet]
@@ -10,6 +10,7 @@ import threading
 from WMCore.DataStructs.WMObject import WMObject
 from WMCore.Services.UUID        import makeUUID
 from WMCore.WMBS.File            import File as WMBSFile
+from WMCore.WMBS.ParentageResolver import ParentageResolver
 from WMCore.DAOFactory           import DAOFactory
 
 
@@ -51,6 +52,7 @@ class JobFactory(WMObject):
                                          logger = myThread.logger,
                                          dbinterface = myThread.dbi)
             self.getParentInfoAction  = self.daoFactory(classname = "Files.GetParentInfo")
+            self.parentageResolver = ParentageResolver(self.getParentInfoAction)
 
             self.pnn_to_psn = self.daoFactory(classname = "Locations.GetPNNtoPSNMapping").execute()
 
@@ -76,6 +78,10 @@ class JobFactory(WMObject):
         # Every time we restart, re-zero the jobs
         self.nJobs = 0
 
+        # Parentage is only memoized within a splitting pass
+        if self.package == "WMCore.WMBS":
+            self.parentageResolver.reset()
+
         # Create a new name
         self.baseUUID = makeUUID()
 
@@ -397,35 +403,31 @@ class JobFactory(WMObject):
 
         Find the parents for a file based on its lfn
         """
+        return self.findParents([lfn])[lfn]
 
-        parentsInfo = self.getParentInfoAction.execute([lfn])
-        newParents  = set()
-        for parentInfo in parentsInfo:
-
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
+    def findParents(self, lfns):
+        """
+        _findParents_
 
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
+        Find the parents for a list of files based on their lfns, one query
+        per generation of ancestors.  Returns a dictionary keyed by lfn, the
+        results are memoized for the rest of the splitting pass so splitting
+        algorithms can load all the parents upfront and then call findParent
+        for individual files.
+        """
+        return self.parentageResolver.findParents(lfns)
 
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findParent(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+    def loadParents(self, locationDict):
+        """
+        _loadParents_
 
-        return newParents
+        Find the parents of all the files of a sortByLocation() dictionary
+        """
+        lfns = []
+        for fileList in locationDict.values():
+            lfns.extend([x['lfn'] for x in fileList])
+        self.findParents(lfns)
+        return
 
     def getPerformanceParameters(self, defaultParams):
         """
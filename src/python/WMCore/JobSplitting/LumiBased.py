@@ -15,6 +15,7 @@ import logging
 import threading
 import traceback
 
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
 from WMCore.DataStructs.Run import Run
 
 from WMCore.JobSplitting.JobFactory import JobFactory
@@ -27,7 +28,12 @@ def isGoodLumi(goodRunList, run, lumi):
 
     Checks to see if runs match a run-lumi combination in the goodRunList
     This is a pain in the ass.
+    The goodRunList can be a compact list or a LumiIntervals, an empty
+    LumiIntervals is a mask which rejects every lumi
     """
+    if isinstance(goodRunList, LumiIntervals):
+        return goodRunList.contains(run, lumi)
+
     if goodRunList == None or goodRunList == {}:
         return True
 
@@ -50,10 +56,13 @@ def isGoodRun(goodRunList, run):
 
     Tell if this is a good run
     """
+    if isinstance(goodRunList, LumiIntervals):
+        return run in goodRunList
+
     if goodRunList == None or goodRunList == {}:
         return True
 
-    if str(run) in goodRunList.keys():
+    if str(run) in goodRunList:
         # @e can find a run
         return True
 
@@ -203,6 +212,10 @@ class LumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        if goodRunList:
+            # look up the lumis in sorted arrays instead of scanning the ranges
+            goodRunList = LumiIntervals(goodRunList)
+
         lDict = self.sortByLocation()
         locationDict = {}
 
@@ -255,6 +268,10 @@ class LumiBased(JobFactory):
         lumisInJob = 0
         lumisInTask = 0
         self.lumiChecker = LumiChecker(applyLumiCorrection)
+        # Load the parentage of all files at once, findParent is memoized
+        if getParents:
+            self.loadParents(locationDict)
+
         for location in locationDict.keys():
 
             # For each location, we need a new jobGroup
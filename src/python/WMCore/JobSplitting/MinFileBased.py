@@ -39,6 +39,10 @@ class MinFileBased(JobFactory):
         #Get a dictionary of sites, files
         locationDict = self.sortByLocation()
 
+        # Load the parentage of all files at once, findParent is memoized
+        if getParents:
+            self.loadParents(locationDict)
+
         for location in locationDict.keys():
             #Now we have all the files in a certain location
             fileList    = locationDict[location]
@@ -16,6 +16,63 @@ try:
 except ImportError:
     from cherrypy.lib import http as httputil
 
+#: JSON encoder backends, name -> function encoding one object into a string.
+_json_encoders = {'json': json.dumps}
+
+try:
+    import orjson
+    _json_encoders['orjson'] = orjson.dumps
+except ImportError:
+    pass
+
+try:
+    import ujson
+    _json_encoders['ujson'] = lambda obj: ujson.dumps(obj, escape_forward_slashes=False)
+except ImportError:
+    pass
+
+try:
+    import cjson
+    _json_encoders['cjson'] = cjson.encode
+except ImportError:
+    pass
+
+#: Object which a JSON encoder backend must encode like the standard library.
+_JSON_PROBE = [{"float": 1.0 / 3, "small": -0.5e-300, "big": 2 ** 40,
+                "list": [True, False, None, "/a/b", u"\u00e9\n"]}]
+
+def json_encoder_compatible(name):
+    """Check that the JSON encoder backend `name` output decodes back to the
+    same objects as the standard library output, in particular that floats
+    keep their full precision."""
+    try:
+        return json.loads(_json_encoders[name](_JSON_PROBE)) == _JSON_PROBE
+    except Exception:
+        return False
+
+#: Default JSON encoder backend, the first compatible fast backend available.
+default_json_encoder = 'json'
+for _name in ('orjson', 'ujson', 'cjson'):
+    if _name in _json_encoders and json_encoder_compatible(_name):
+        default_json_encoder = _name
+        break
+
+def json_encoder(name=None):
+    """Return a function encoding one object into JSON with the `name`
+    backend, `default_json_encoder` if None. Objects the backend fails to
+    encode, for instance types it doesn't know, are encoded with the
+    standard library instead."""
+    dumps = _json_encoders[name or default_json_encoder]
+    if dumps is json.dumps:
+        return dumps
+
+    def encode(obj):
+        try:
+            return dumps(obj)
+        except Exception:
+            return json.dumps(obj)
+    return encode
+
 def vary_by(header):
     """Add 'Vary' header for `header`."""
     varies = cherrypy.response.headers.get('Vary', '')
@@ -197,7 +254,7 @@ class JSONFormat(RESTFormat):
     must inspect the X-REST-Status trailer header to find out if it got the
     complete output. No ETag header is generated in case of an exception.
 
-    The ETag generation is deterministic only if `cjson.encode()` output is
+    The ETag generation is deterministic only if the JSON encoder output is
     deterministic for the input. Beware in particular the key order for a
     dict is arbitrary and may differ for two semantically identical dicts.
 
@@ -220,14 +277,31 @@ class JSONFormat(RESTFormat):
     dictionary and an array ("``{key: [``"), one line of JSON rendering of
     each object in `stream`, with the first line starting with exactly one
     space and second and subsequent lines starting with a comma, and one
-    final trailer line consisting of "``]}``". Each line is generated as a
-    HTTP transfer chunk. This format is fixed so readers can be constructed
-    to read and parse the stream incrementally one line at a time,
-    facilitating maximum throughput processing of the response."""
+    final trailer line consisting of "``]}``". The preamble is generated as
+    a HTTP transfer chunk, the following lines are grouped into chunks of
+    whole lines of about `max_chunk` bytes. This format is fixed so readers
+    can be constructed to read and parse the stream incrementally one line
+    at a time, facilitating maximum throughput processing of the response.
+
+    The objects are encoded with the `encoder` backend, by default the
+    fastest available backend compatible with the standard library, see
+    `json_encoder()`."""
+
+    def __init__(self, encoder=None, max_chunk=64*1024):
+        self.encode = json_encoder(encoder)
+        self.max_chunk = max_chunk
+
+    def format_obj(self, obj):
+        """Render an object `obj` into one line of JSON."""
+        return self.encode(obj) + "\n"
 
     def stream_chunked(self, stream, etag, preamble, trailer):
         """Generator for actually producing the output."""
         comma = " "
+        format_obj = self.format_obj
+        max_chunk = self.max_chunk
+        pending = []
+        npending = 0
 
         try:
             if preamble:
@@ -236,22 +310,33 @@ class JSONFormat(RESTFormat):
 
             try:
                 for obj in stream:
-                    chunk = comma + json.dumps(obj) + "\n"
-                    etag.update(chunk)
-                    yield chunk
+                    chunk = comma + format_obj(obj)
                     comma = ","
+                    pending.append(chunk)
+                    npending += len(chunk)
+                    if npending >= max_chunk:
+                        chunk = "".join(pending)
+                        pending = []
+                        npending = 0
+                        etag.update(chunk)
+                        yield chunk
             except GeneratorExit:
                 etag.invalidate()
-                trailer = None
+                pending = None
                 raise
             except Exception as exp:
                 print("ERROR, json.dumps failed to serialize %s, type %s\nException: %s" \
                         % (obj, type(obj), str(exp)))
                 raise
             finally:
-                if trailer:
-                    etag.update(trailer)
-                    yield trailer
+                # the rows left and the trailer, unless the consumer went away
+                if pending is not None:
+                    if trailer:
+                        pending.append(trailer)
+                    if pending:
+                        chunk = "".join(pending)
+                        etag.update(chunk)
+                        yield chunk
 
             cherrypy.response.headers["X-REST-Status"] = 100
         except RESTError as e:
@@ -274,40 +359,20 @@ class JSONFormat(RESTFormat):
         return preamble, trailer
 
 class PrettyJSONFormat(JSONFormat):
-    """ Format used for human, (web browser)"""
+    """ Format used for human, (web browser)
 
-    def stream_chunked(self, stream, etag, preamble, trailer):
-        """Generator for actually producing the output."""
-        comma = " "
+    The objects are always indented by the standard library encoder, which
+    is not guaranteed to produce one line per object."""
 
-        try:
-            if preamble:
-                etag.update(preamble)
-                yield preamble
+    def __init__(self, max_chunk=64*1024):
+        JSONFormat.__init__(self, 'json', max_chunk)
+        self.encode = json.JSONEncoder(indent=2).encode
+
+    def format_obj(self, obj):
+        """Render an object `obj` into indented JSON."""
+        return self.encode(obj)
 
-            try:
-                for obj in stream:
-                    chunk = comma + json.dumps(obj, indent=2)
-                    etag.update(chunk)
-                    yield chunk
-                    comma = ","
-            except GeneratorExit:
-                etag.invalidate()
-                trailer = None
-                raise
-            finally:
-                if trailer:
-                    etag.update(trailer)
-                    yield trailer
 
-            cherrypy.response.headers["X-REST-Status"] = 100
-        except RESTError as e:
-            etag.invalidate()
-            report_rest_error(e, format_exc(), False)
-        except Exception as e:
-            etag.invalidate()
-            report_rest_error(ExecutionError(), format_exc(), False)
-            
 class RawFormat(RESTFormat):
     """Format an iterable of objects as raw data.
 
@@ -378,13 +443,12 @@ def _stream_compress_identity(reply, *args):
     """Streaming compressor which returns original data unchanged."""
     return reply
 
-def _stream_compress_deflate(reply, compress_level, max_chunk):
-    """Streaming compressor for the 'deflate' method. Generates output that
-    is guaranteed to expand at the exact same chunk boundaries as original
-    reply stream."""
+def _stream_compress_zlib(reply, compress_level, max_chunk, wbits):
+    """Streaming zlib compressor, producing the format selected by `wbits`.
+    Generates output that is guaranteed to expand at the exact same chunk
+    boundaries as original reply stream."""
 
-    # Create zlib compression object, with raw data stream (negative window size)
-    z = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS,
+    z = zlib.compressobj(compress_level, zlib.DEFLATED, wbits,
                          zlib.DEF_MEM_LEVEL, 0)
 
     # Data pending compression. We only take entire chunks from original
@@ -402,14 +466,25 @@ def _stream_compress_deflate(reply, compress_level, max_chunk):
             npending = 0
             yield part
 
-    # Crank the compressor one more time for remaining output.
-    if npending:
-        yield z.compress("".join(pending)) + z.flush(zlib.Z_FINISH)
+    # Crank the compressor one more time for remaining output, and end the
+    # stream (for gzip, with the checksum trailer) even if nothing is left.
+    yield z.compress("".join(pending)) + z.flush(zlib.Z_FINISH)
+
+def _stream_compress_deflate(reply, compress_level, max_chunk):
+    """Streaming compressor for the 'deflate' method, a raw data stream
+    (negative window size)."""
+    return _stream_compress_zlib(reply, compress_level, max_chunk, -zlib.MAX_WBITS)
+
+def _stream_compress_gzip(reply, compress_level, max_chunk):
+    """Streaming compressor for the 'gzip' method, zlib adds the gzip header
+    and trailer (window size plus 16)."""
+    return _stream_compress_zlib(reply, compress_level, max_chunk, 16 + zlib.MAX_WBITS)
 
 #: Stream compression methods.
 _stream_compressor = {
   'identity': _stream_compress_identity,
-  'deflate': _stream_compress_deflate
+  'deflate': _stream_compress_deflate,
+  'gzip': _stream_compress_gzip
 }
 
 def stream_compress(reply, available, compress_level, max_chunk):
@@ -422,21 +497,31 @@ def stream_compress(reply, available, compress_level, max_chunk):
     compression entirely."""
 
     global _stream_compressor
+    enc = compression_method(available, compress_level)
+    if enc:
+        # Add 'Vary' header for 'Accept-Encoding'.
+        vary_by('Accept-Encoding')
+
+        # Compress contents at original chunk boundaries.
+        if 'Content-Length' in cherrypy.response.headers:
+            del cherrypy.response.headers['Content-Length']
+        cherrypy.response.headers['Content-Encoding'] = enc
+        return _stream_compressor[enc](reply, compress_level, max_chunk)
+
+    return reply
+
+def compression_method(available, compress_level):
+    """Return the compression method requested via Accept-Encoding request
+    header among the `available` ones, or None if the response shouldn't be
+    compressed."""
     for enc in cherrypy.request.headers.elements('Accept-Encoding'):
         if enc.value not in available:
             continue
 
         elif enc.value in _stream_compressor and compress_level > 0:
-            # Add 'Vary' header for 'Accept-Encoding'.
-            vary_by('Accept-Encoding')
+            return enc.value
 
-            # Compress contents at original chunk boundaries.
-            if 'Content-Length' in cherrypy.response.headers:
-                del cherrypy.response.headers['Content-Length']
-            cherrypy.response.headers['Content-Encoding'] = enc.value
-            return _stream_compressor[enc.value](reply, compress_level, max_chunk)
-
-    return reply
+    return None
 
 def _etag_match(status, etagval, match, nomatch):
     """Match ETag value against any If-Match / If-None-Match headers."""
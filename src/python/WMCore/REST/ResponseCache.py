@@ -0,0 +1,160 @@
+"""Server side cache of formatted REST responses.
+
+Responses of the APIs which opt in with the ``cache_ttl`` :func:`restcall`
+argument are kept in memory with their ETag, so that repeated identical
+GET/HEAD requests are answered, including with 304 Not Modified, without
+calling the API method again. See :class:`ResponseCache`."""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import cherrypy
+
+from WMCore.REST.Format import _etag_match, _stream_compressor, \
+     compression_method, vary_by
+
+class CachedResponse(object):
+    """A cached response: the ETag, the formatted body and the compressed
+    bodies for the content encodings which have been requested so far."""
+
+    def __init__(self, api, etag, body, expires):
+        self.api = api
+        self.etag = etag
+        self.expires = expires
+        self.bodies = {'identity': body}
+        self.size = len(body)
+
+class ResponseCache(object):
+    """Memory bounded LRU cache of formatted responses.
+
+    Entries are keyed on the API name, the response format and the validated
+    arguments, and expire after the time to live given when they are stored.
+    The total size of the cached bodies, compressed ones included, is kept
+    under `max_size` bytes by evicting the least recently used entries.
+
+    Entries of an API are dropped with :meth:`invalidate`, which the REST
+    server calls after every successful PUT, POST or DELETE on the API.
+    Responses computed while an API was being invalidated are not stored.
+
+    Note the key does not include the identity of the client: only APIs
+    whose responses are the same for all authorised clients should use
+    the cache."""
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._generations = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def key(api, format, safe):
+        """Return the cache key for a call with validated arguments `safe`."""
+        return (api, format, repr(safe.args), repr(sorted(safe.kwargs.items())))
+
+    def generation(self, api):
+        """Return the invalidation counter of `api`, to be given back to
+        :meth:`put` for responses computed from now on."""
+        with self._lock:
+            return (self._generation, self._generations.get(api, 0))
+
+    def get(self, key):
+        """Return the cached response for `key`, or None if there is no
+        valid entry."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry.expires < time.time():
+                if entry is not None:
+                    self.size -= entry.size
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry
+
+    def put(self, key, generation, etag, body, ttl, encoding=None, encoded=None):
+        """Store the formatted `body` with its `etag` for `ttl` seconds, and
+        its compressed version `encoded` for content `encoding` if given.
+        Nothing is stored if the API was invalidated since `generation`."""
+        api = key[0]
+        entry = CachedResponse(api, etag, body, time.time() + ttl)
+        if encoding and encoding != 'identity':
+            entry.bodies[encoding] = encoded
+            entry.size += len(encoded)
+
+        with self._lock:
+            if (self._generation, self._generations.get(api, 0)) != generation \
+               or entry.size > self.max_size:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            self._evict()
+
+    def add_encoding(self, key, entry, encoding, encoded):
+        """Add the compressed body for content `encoding` to a cached entry."""
+        with self._lock:
+            if encoding in entry.bodies:
+                return
+            entry.bodies[encoding] = encoded
+            entry.size += len(encoded)
+            if self._entries.get(key) is entry:
+                self.size += len(encoded)
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_size.
+        Must be called with the lock held."""
+        while self.size > self.max_size and self._entries:
+            dummyKey, entry = self._entries.popitem(last=False)
+            self.size -= entry.size
+
+    def invalidate(self, api=None):
+        """Drop the cached responses of `api`, or all of them if None."""
+        with self._lock:
+            if api is None:
+                self._generation += 1
+                self._entries.clear()
+                self.size = 0
+                return
+
+            self._generations[api] = self._generations.get(api, 0) + 1
+            for key in [k for k in self._entries if k[0] == api]:
+                self.size -= self._entries.pop(key).size
+
+    def stats(self):
+        """Return a dictionary of the cache counters."""
+        with self._lock:
+            return {"entries": len(self._entries), "size": self.size,
+                    "hits": self.hits, "misses": self.misses}
+
+    def reply(self, key, entry, available, compress_level, max_chunk):
+        """Respond with a cached entry. Sets the ETag header and handles any
+        If-Match / If-None-Match request headers like :func:`stream_maybe_etag`,
+        then returns the body compressed for the negotiated content encoding,
+        compressing and storing it if it's the first request for it."""
+        req = cherrypy.request
+        res = cherrypy.response
+        match = [str(x) for x in (req.headers.elements('If-Match') or [])]
+        nomatch = [str(x) for x in (req.headers.elements('If-None-Match') or [])]
+        res.headers['ETag'] = entry.etag
+        _etag_match(res.status or 200, entry.etag, match, nomatch)
+
+        encoding = compression_method(available, compress_level)
+        body = entry.bodies['identity']
+        if encoding:
+            vary_by('Accept-Encoding')
+            res.headers['Content-Encoding'] = encoding
+            if encoding not in entry.bodies:
+                encoded = "".join(_stream_compressor[encoding]([body], compress_level, max_chunk))
+                self.add_encoding(key, entry, encoding, encoded)
+            body = entry.bodies[encoding]
+
+        res.headers['Content-Length'] = len(body)
+        return body
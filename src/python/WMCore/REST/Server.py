@@ -13,6 +13,7 @@ from cherrypy import engine, expose, request, response, HTTPError, HTTPRedirect,
 
 from WMCore.REST.Error import *
 from WMCore.REST.Format import *
+from WMCore.REST.ResponseCache import ResponseCache
 from WMCore.REST.Validation import validate_no_more_input
 
 try:
@@ -440,10 +441,11 @@ class MiniRESTApi:
     The output from the response formatter is sent to a compressor if the
     request headers include suitable "Accept-Encoding" header and the API
     object hasn't declined compression. Normally all output is compressed
-    with ZLIB level 9 provided the client supports ``deflate`` encoding.
-    It is recommended to keep compression enabled except if the output is
-    known to be incompressible, e.g. images or compressed data files. The
-    added CPU use is usually well worth the network communication savings.
+    with ZLIB level 9 provided the client supports ``deflate`` or ``gzip``
+    encoding. It is recommended to keep compression enabled except if the
+    output is known to be incompressible, e.g. images or compressed data
+    files. The added CPU use is usually well worth the network communication
+    savings.
 
     .. rubric:: Entity tags and response caching
 
@@ -581,18 +583,21 @@ class MiniRESTApi:
 
        A list of accepted compression mechanisms to be matched against the
        "Accept-Encoding" HTTP request header. Currently supported values are
-       ``deflate`` and ``identity``. Using ``identity`` or emptying the list
-       disables compression. The default is ``['deflate']``. Change this only
-       for API mount points which are known to generate incompressible output,
-       using ``compression`` keyword argument to :func:`restcall`.
+       ``deflate``, ``gzip`` and ``identity``. Using ``identity`` or emptying
+       the list disables compression. The default is ``['deflate', 'gzip']``,
+       the method is picked in the order of the client preferences. Change
+       this only for API mount points which are known to generate
+       incompressible output, using ``compression`` keyword argument to
+       :func:`restcall`.
 
     .. attribute:: compression_level
 
-       Integer 0-9, the default ZLIB compression level for ``deflate`` encoding.
-       The default is the maximum 9; for most servers the increased CPU use is
-       usually well worth the reduction in network transmission costs. Setting
-       the level to zero disables compression. The API can override this value
-       with ``compression_level`` keyword argument to :func:`restcall`.
+       Integer 0-9, the default ZLIB compression level for ``deflate`` and
+       ``gzip`` encodings. The default is the maximum 9; for most servers the
+       increased CPU use is usually well worth the reduction in network
+       transmission costs. Setting the level to zero disables compression.
+       The API can override this value with ``compression_level`` keyword
+       argument to :func:`restcall`.
 
     .. attribute:: compression_chunk
 
@@ -622,6 +627,22 @@ class MiniRESTApi:
        object can override this value with ``expires_opts`` keyword argument
        to :func:`restcall`. The default is an empty list.
 
+    .. attribute:: response_cache
+
+       The :class:`~.ResponseCache` of the GET / HEAD responses of the APIs
+       which set the ``cache_ttl`` keyword argument to :func:`restcall`. A
+       response of such API is kept for ``cache_ttl`` seconds with its ETag,
+       if it fits in the ETag buffer, and identical requests are answered
+       from the cache, including 304 replies to If-None-Match requests,
+       without calling the API method. Successful PUT, POST and DELETE
+       requests invalidate the cached responses of the same API, APIs whose
+       data changes through other means can call ``invalidate()``
+       explicitly. Any other change of the data is seen only once the
+       cached response expires, so a cached response can be up to
+       ``cache_ttl`` seconds stale. Requests with a true ``_nostale``
+       argument neither use nor fill the cache. The default cache holds at
+       most 64 MB of responses.
+
     .. rubric:: Constructor arguments
 
     :arg app: The main application :class:`~.RESTMain` object.
@@ -634,12 +655,13 @@ class MiniRESTApi:
         self.etag_limit = 8 * 1024 * 1024
         self.compression_level = 9
         self.compression_chunk = 64 * 1024
-        self.compression = ['deflate']
+        self.compression = ['deflate', 'gzip']
         self.formats = [ ('application/json', JSONFormat()),
                          ('application/xml', XMLFormat(self.app.appname)) ]
         self.methods = {}
         self.default_expires = 3600
         self.default_expires_opts = []
+        self.response_cache = ResponseCache(64 * 1024 * 1024)
 
     def _addAPI(self, method, api, callable, args, validation, **kwargs):
         """Add an API method.
@@ -779,9 +801,67 @@ class MiniRESTApi:
             v(apiobj, request.method, api, param, safe)
         validate_no_more_input(param)
 
+        # Serve the response from the cache if the API uses it, unless the
+        # client asked for fresh data with the _nostale argument.
+        cache_ttl = apiobj.get('cache_ttl', 0)
+        cache_key = None
+        if cache_ttl > 0 and (request.method == 'GET' or request.method == 'HEAD') \
+           and not safe.kwargs.get('_nostale', False):
+            cache_key = self.response_cache.key(api, format, safe)
+            cache_generation = self.response_cache.generation(api)
+            entry = self.response_cache.get(cache_key)
+            if entry:
+                self._set_cache_headers(apiobj)
+                response.headers['X-REST-Status'] = 100
+                response.headers['Content-Type'] = format
+                return self.response_cache.reply(cache_key, entry,
+                                                 apiobj.get('compression', self.compression),
+                                                 apiobj.get('compression_level', self.compression_level),
+                                                 apiobj.get('compression_chunk', self.compression_chunk))
+
         # Invoke the method.
         obj = apiobj['call'](*safe.args, **safe.kwargs)
 
+        # The method changed the data, drop the cached responses.
+        if request.method != 'GET' and request.method != 'HEAD':
+            self.response_cache.invalidate(api)
+
+        self._set_cache_headers(apiobj)
+
+        # Format the response.
+        response.headers['X-REST-Status'] = 100
+        response.headers['Content-Type'] = format
+        etagger = apiobj.get('etagger', None) or SHA1ETag()
+        etag_limit = apiobj.get('etag_limit', self.etag_limit)
+        formatted = fmthandler(obj, etagger)
+        if cache_key:
+            capture = _StreamCapture(self.response_cache.max_size)
+            formatted = capture.stream(formatted)
+        reply = stream_compress(formatted,
+                                apiobj.get('compression', self.compression),
+                                apiobj.get('compression_level', self.compression_level),
+                                apiobj.get('compression_chunk', self.compression_chunk))
+        if not cache_key:
+            return stream_maybe_etag(etag_limit, etagger, reply)
+
+        # Store fully buffered responses in the cache, also when the ETag
+        # matched and the client gets a 304 reply.
+        result = None
+        try:
+            result = stream_maybe_etag(etag_limit, etagger, reply)
+        except HTTPRedirect:
+            result = ""
+            raise
+        finally:
+            etagval = etagger.value()
+            if isinstance(result, str) and etagval and capture.complete:
+                encoding = result and response.headers.get('Content-Encoding')
+                self.response_cache.put(cache_key, cache_generation, etagval, capture.body(),
+                                        cache_ttl, encoding, result)
+        return result
+
+    def _set_cache_headers(self, apiobj):
+        """Set the Vary and expires response headers for `apiobj`."""
         # Add Vary: Accept header.
         vary_by('Accept')
 
@@ -807,16 +887,6 @@ class MiniRESTApi:
                 expires_opts = (expires_opts and ', '.join([''] + expires_opts)) or ''
                 response.headers['Cache-Control'] = 'max-age=%d%s' % (expires, expires_opts)
 
-        # Format the response.
-        response.headers['X-REST-Status'] = 100
-        response.headers['Content-Type'] = format
-        etagger = apiobj.get('etagger', None) or SHA1ETag()
-        reply = stream_compress(fmthandler(obj, etagger),
-                                apiobj.get('compression', self.compression),
-                                apiobj.get('compression_level', self.compression_level),
-                                apiobj.get('compression_chunk', self.compression_chunk))
-        return stream_maybe_etag(apiobj.get('etag_limit', self.etag_limit), etagger, reply)
-
     def _precall(self, param):
         """Point for derived classes to hook into prior to peeking at URL.
 
@@ -2323,8 +2393,14 @@ def restcall(func=None, args=None, generate="result", **kwargs):
     compression         "Accept-Encoding" methods, empty disables compression.
     compression_level   ZLIB compression level for output (0 .. 9).
     compression_chunk   Approximate amount of output to compress at once.
+    cache_ttl           Seconds to keep GET responses in the response cache.
     =================== ======================================================
 
+    Responses kept in the response cache with ``cache_ttl`` can be up to
+    ``cache_ttl`` seconds stale when the data changes other than through
+    the PUT, POST or DELETE methods of the same API. Clients which need the
+    current data pass a true ``_nostale`` argument to bypass the cache.
+
     :returns: The original function suitably enriched with attributes if
       invoked as a function-like decorator, or a function which will apply
       the decoration if invoked as bare-word style decorator.
@@ -2344,6 +2420,42 @@ def restcall(func=None, args=None, generate="result", **kwargs):
         return func
     return (func and apply_restcall_opts(func)) or apply_restcall_opts
 
+class _StreamCapture(object):
+    """Copy of the chunks of a formatted response stream, for storing the
+    response in the cache. Responses over `size_limit` bytes are not cached,
+    so the copy is dropped and capturing stops as soon as the stream goes
+    over the limit. The rest of the stream passes through untouched.
+
+    The limit applies to the uncompressed response, so it is the size of
+    the cache rather than the ETag limit, which applies to the compressed
+    stream: a response over the ETag limit which fits in it once compressed
+    still gets an ETag and is cached."""
+
+    def __init__(self, size_limit):
+        self.size_limit = size_limit
+        self.size = 0
+        self.chunks = []
+        self.complete = True
+
+    def stream(self, stream):
+        """Generator which yields the `stream` chunks and keeps a copy of
+        them until the stream goes over the size limit."""
+        for chunk in stream:
+            if self.complete:
+                self.size += len(chunk)
+                if self.size > self.size_limit:
+                    self.complete = False
+                    self.chunks = []
+                else:
+                    self.chunks.append(chunk)
+            yield chunk
+
+    def body(self):
+        """The captured response, None if it went over the size limit."""
+        if not self.complete:
+            return None
+        return "".join(self.chunks)
+
 def rows(cursor):
     """Utility function to convert a sequence `cursor` to a generator."""
     for row in cursor:
@@ -74,6 +74,7 @@ def moveToArchivedForNoJobs(reqDBWriter, wfStatusDict, logger):
 class StatusChangeTasks(CherryPyPeriodicTask):
     def __init__(self, rest, config):
         super(StatusChangeTasks, self).__init__(config)
+        self.rest = rest
 
     def setConcurrentTasks(self, config):
         """
@@ -96,4 +97,14 @@ class StatusChangeTasks(CherryPyPeriodicTask):
         moveForwardStatus(reqDBWriter, wfStatusDict, self.logger)
         moveToArchivedForNoJobs(reqDBWriter, wfStatusDict, self.logger)
 
+        self.invalidateRequestCache()
         return
+
+    def invalidateRequestCache(self):
+        """
+        drop the cached responses of the request API, since the status
+        changes don't go through the REST methods which invalidate them
+        """
+        for view in self.rest.views.values():
+            if hasattr(view, "response_cache"):
+                view.response_cache.invalidate("request")
@@ -279,13 +279,16 @@ class Request(RESTEntity):
         else:
             return result
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              cache_ttl=30)
     def get(self, **kwargs):
         """
         Returns request info depending on the conditions set by kwargs
         Currently defined kwargs are following.
         statusList, requestNames, requestType, prepID, inputDataset, outputDataset, dateRange
         If jobInfo is True, returns jobInfomation about the request as well.
+        Responses are cached for 30 seconds, so they may lag behind status
+        changes by up to that long; pass _nostale=true for current data.
 
         TODO:
         stuff like this has to masked out from result of this call:
@@ -5,14 +5,16 @@ _DBSReader_
 Readonly DBS Interface
 
 """
+import threading
 import time
 from collections import defaultdict
+from multiprocessing.pool import ThreadPool
 
 from dbs.apis.dbsClient import DbsApi
 from dbs.exceptions.dbsClientException import dbsClientException
 
 from RestClient.ErrorHandling.RestClientExceptions import HTTPError
-from Utils.IteratorTools import grouper
+from Utils.IteratorTools import grouper, flattenList
 from WMCore.Services.DBS.DBSErrors import DBSReaderError, formatEx3
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
 
@@ -51,31 +53,88 @@ class DBS3Reader(object):
     # cache all the datatiers known by DBS
     _datatiers = {}
 
-    def __init__(self, url, **contact):
+    def __init__(self, url, parallelCalls=4, **contact):
 
         # instantiate dbs api object
         try:
             self.dbsURL = url
+            self.contact = contact
             self.dbs = DbsApi(url, **contact)
         except dbsClientException as ex:
             msg = "Error in DBSReader with DbsApi\n"
             msg += "%s\n" % formatEx3(ex)
             raise DBSReaderError(msg)
 
+        # maximum number of concurrent DBS calls, every thread making calls
+        # gets its own DbsApi since the client isn't thread safe
+        self.parallelCalls = parallelCalls
+        self._threadData = threading.local()
+        self._threadData.dbs = self.dbs
+        # idle DbsApi objects of the _runParallel workers, kept for the life
+        # of the reader since the worker threads only live for one call
+        self._idleDbsApis = []
+        self._idleDbsApisLock = threading.Lock()
+
         # connection to PhEDEx (Use default endpoint url)
         self.phedex = PhEDEx(responseType="json")
 
+    def _threadDbsApi(self):
+        """
+        Return the DbsApi object of the calling thread
+        """
+        dbsApi = getattr(self._threadData, 'dbs', None)
+        if dbsApi is None:
+            dbsApi = DbsApi(self.dbsURL, **self.contact)
+            self._threadData.dbs = dbsApi
+        return dbsApi
+
+    def _runInThread(self, func):
+        """
+        Run a function in a worker thread of _runParallel, with an idle
+        DbsApi of the reader or a new one if they are all in use
+        """
+        self._threadData.inPool = True
+        with self._idleDbsApisLock:
+            dbsApi = self._idleDbsApis.pop() if self._idleDbsApis else None
+        if dbsApi is None:
+            dbsApi = DbsApi(self.dbsURL, **self.contact)
+        self._threadData.dbs = dbsApi
+        try:
+            return func()
+        finally:
+            self._threadData.dbs = None
+            with self._idleDbsApisLock:
+                self._idleDbsApis.append(dbsApi)
+
+    def _runParallel(self, funcs):
+        """
+        Call a list of functions without arguments, at most parallelCalls
+        of them at the same time, and return their results in order.
+        Calls made from the worker threads are not parallelized again.
+        """
+        funcs = list(funcs)
+        if len(funcs) < 2 or self.parallelCalls < 2 or getattr(self._threadData, 'inPool', False):
+            return [func() for func in funcs]
+
+        pool = ThreadPool(min(self.parallelCalls, len(funcs)))
+        try:
+            return pool.map(self._runInThread, funcs)
+        finally:
+            pool.close()
+            pool.join()
+
     def _getLumiList(self, blockName=None, lfns=None, validFileOnly=1):
         """
         currently only take one lfn but dbs api need be updated
         """
         try:
+            dbsApi = self._threadDbsApi()
             if blockName:
-                lumiLists = self.dbs.listFileLumis(block_name=blockName, validFileOnly=validFileOnly)
+                lumiLists = dbsApi.listFileLumis(block_name=blockName, validFileOnly=validFileOnly)
             elif lfns:
-                lumiLists = []
-                for slfn in grouper(lfns, 50):
-                    lumiLists.extend(self.dbs.listFileLumiArray(logical_file_name = slfn))
+                lumiLists = flattenList(self._runParallel(
+                    [lambda slfn=slfn: self._threadDbsApi().listFileLumiArray(logical_file_name=slfn)
+                     for slfn in grouper(lfns, 50)]))
             else:
                 # shouldn't call this with both blockName and lfns empty
                 # but still returns empty dict for that case
@@ -486,6 +545,27 @@ class DBS3Reader(object):
             return False
         return True
 
+    def _getBlockInfo(self, fileBlockName):
+        """
+        _getBlockInfo_
+
+        Return the detailed information of a block, or None if it doesn't
+        exist.  This doubles as an existence check for the calls that need
+        the block details anyway.
+        """
+        self.checkBlockName(fileBlockName)
+        try:
+            blocks = self._threadDbsApi().listBlocks(block_name=fileBlockName, detail=True)
+        except Exception as ex:
+            msg = "Error in "
+            msg += "DBSReader.listBlocks(%s)\n" % fileBlockName
+            msg += "%s\n" % formatEx3(ex)
+            raise DBSReaderError(msg)
+
+        if len(blocks) == 0:
+            return None
+        return blocks[0]
+
     def listFilesInBlock(self, fileBlockName, lumis=True, validFileOnly=1):
         """
         _listFilesInBlock_
@@ -501,16 +581,31 @@ class DBS3Reader(object):
             msg = "DBSReader.listFilesInBlock(%s): No matching data"
             raise DBSReaderError(msg % fileBlockName)
 
-        try:
-            files = self.dbs.listFileArray(block_name=fileBlockName, validFileOnly=validFileOnly, detail=True)
-        except dbsClientException as ex:
-            msg = "Error in "
-            msg += "DBSReader.listFilesInBlock(%s)\n" % fileBlockName
-            msg += "%s\n" % formatEx3(ex)
-            raise DBSReaderError(msg)
+        return self._listFilesInBlock(fileBlockName, lumis, validFileOnly)
+
+    def _listFilesInBlock(self, fileBlockName, lumis=True, validFileOnly=1):
+        """
+        _listFilesInBlock_
+
+        listFilesInBlock without the block existence check, the files and
+        their lumis are fetched concurrently.
+        """
+        def listFiles():
+            try:
+                return self._threadDbsApi().listFileArray(block_name=fileBlockName,
+                                                          validFileOnly=validFileOnly, detail=True)
+            except dbsClientException as ex:
+                msg = "Error in "
+                msg += "DBSReader.listFilesInBlock(%s)\n" % fileBlockName
+                msg += "%s\n" % formatEx3(ex)
+                raise DBSReaderError(msg)
 
         if lumis:
-            lumiDict = self._getLumiList(blockName=fileBlockName, validFileOnly=validFileOnly)
+            files, lumiDict = self._runParallel([listFiles,
+                                                 lambda: self._getLumiList(blockName=fileBlockName,
+                                                                           validFileOnly=validFileOnly)])
+        else:
+            files = listFiles()
 
         result = []
         for fileInfo in files:
@@ -534,10 +629,21 @@ class DBS3Reader(object):
             msg = "DBSReader.listFilesInBlockWithParents(%s): No matching data"
             raise DBSReaderError(msg % fileBlockName)
 
+        return self._listFilesInBlockWithParents(fileBlockName, lumis, validFileOnly)
+
+    def _listFilesInBlockWithParents(self, fileBlockName, lumis=True, validFileOnly=1):
+        """
+        _listFilesInBlockWithParents_
+
+        listFilesInBlockWithParents without the block existence check.  The
+        file parents and the file details are fetched concurrently, then the
+        chunks of parent details and lumis.
+        """
         try:
             # TODO: shoud we get only valid block for this?
-            files = self.dbs.listFileParents(block_name=fileBlockName)
-            fileDetails = self.listFilesInBlock(fileBlockName, lumis, validFileOnly)
+            files, fileDetails = self._runParallel(
+                [lambda: self._threadDbsApi().listFileParents(block_name=fileBlockName),
+                 lambda: self._listFilesInBlock(fileBlockName, lumis, validFileOnly)])
 
         except dbsClientException as ex:
             msg = "Error in "
@@ -560,14 +666,17 @@ class DBS3Reader(object):
                 fileBlockName)
             raise DBSReaderError(msg)
 
-        parentFilesDetail = []
         # TODO: slicing parentLFNs util DBS api is handling that.
         # Remove slicing if DBS api handles
-        for pLFNs in grouper(parentsLFNs, 50):
-            parentFilesDetail.extend(self.dbs.listFileArray(logical_file_name=pLFNs, detail=True))
-
+        calls = [lambda pLFNs=pLFNs: self._threadDbsApi().listFileArray(logical_file_name=pLFNs, detail=True)
+                 for pLFNs in grouper(parentsLFNs, 50)]
         if lumis:
-            parentLumis = self._getLumiList(lfns=parentsLFNs)
+            # the lumi chunks are fanned out by _getLumiList
+            calls.append(lambda: self._getLumiList(lfns=parentsLFNs))
+        results = self._runParallel(calls)
+        if lumis:
+            parentLumis = results.pop()
+        parentFilesDetail = flattenList(results)
 
         parentsByLFN = defaultdict(list)
 
@@ -673,14 +782,15 @@ class DBS3Reader(object):
         # Pointless code in python3
         if isinstance(fileBlockName, str):
             fileBlockName = unicode(fileBlockName)
-        if not self.blockExists(fileBlockName):
+        blockInfo = self._getBlockInfo(fileBlockName)
+        if blockInfo is None:
             msg = "DBSReader.getFileBlock(%s): No matching data"
             raise DBSReaderError(msg % fileBlockName)
 
         result = {fileBlockName: {
             "PhEDExNodeNames": self.listFileBlockLocation(fileBlockName, dbsOnly),
-            "Files": self.listFilesInBlock(fileBlockName),
-            "IsOpen": self.blockIsOpen(fileBlockName)
+            "Files": self._listFilesInBlock(fileBlockName),
+            "IsOpen": self._isBlockOpen(blockInfo)
             }
         }
         return result
@@ -702,18 +812,56 @@ class DBS3Reader(object):
         if isinstance(fileBlockName, str):
             fileBlockName = unicode(fileBlockName)
 
-        if not self.blockExists(fileBlockName):
+        blockInfo = self._getBlockInfo(fileBlockName)
+        if blockInfo is None:
             msg = "DBSReader.getFileBlockWithParents(%s): No matching data"
             raise DBSReaderError(msg % fileBlockName)
 
         result = {fileBlockName: {
             "PhEDExNodeNames": self.listFileBlockLocation(fileBlockName),
-            "Files": self.listFilesInBlockWithParents(fileBlockName),
-            "IsOpen": self.blockIsOpen(fileBlockName)
+            "Files": self._listFilesInBlockWithParents(fileBlockName),
+            "IsOpen": self._isBlockOpen(blockInfo)
             }
         }
         return result
 
+    def getFileBlocks(self, fileBlockNames, withParents=False, lumis=True, dbsOnly=False):
+        """
+        _getFileBlocks_
+
+        Prefetch several blocks at once, return the same dictionary as
+        getFileBlock (or getFileBlockWithParents) for all of them.  The
+        blocks are listed concurrently, at most parallelCalls at a time,
+        and their locations are looked up in a single call.  Set lumis to
+        False to skip the lumi calls when the lumis are not needed.
+        """
+        fileBlockNames = [unicode(x) if isinstance(x, str) else x for x in fileBlockNames]
+        for blockName in fileBlockNames:
+            self.checkBlockName(blockName)
+
+        def fetchBlock(blockName):
+            blockInfo = self._getBlockInfo(blockName)
+            if blockInfo is None:
+                msg = "DBSReader.getFileBlocks(%s): No matching data"
+                raise DBSReaderError(msg % blockName)
+            if withParents:
+                files = self._listFilesInBlockWithParents(blockName, lumis)
+            else:
+                files = self._listFilesInBlock(blockName, lumis)
+            return {"Files": files, "IsOpen": self._isBlockOpen(blockInfo)}
+
+        blocks = self._runParallel([lambda blockName=blockName: fetchBlock(blockName)
+                                    for blockName in fileBlockNames])
+        locations = {}
+        if fileBlockNames:
+            locations = self.listFileBlockLocation(fileBlockNames, dbsOnly)
+
+        result = {}
+        for blockName, block in zip(fileBlockNames, blocks):
+            block["PhEDExNodeNames"] = locations[blockName]
+            result[blockName] = block
+        return result
+
     def getFiles(self, dataset, onlyClosedBlocks=False):
         """
         _getFiles_
@@ -753,8 +901,14 @@ class DBS3Reader(object):
         blockInstance = self.dbs.listBlocks(block_name=blockName, detail=True)
         if len(blockInstance) == 0:
             return False
-        blockInstance = blockInstance[0]
-        isOpen = blockInstance.get('open_for_writing', 1)
+        return self._isBlockOpen(blockInstance[0])
+
+    @staticmethod
+    def _isBlockOpen(blockInfo):
+        """
+        Whether a block is open, from its detailed information
+        """
+        isOpen = blockInfo.get('open_for_writing', 1)
         if isOpen == 0:
             return False
         return True
@@ -0,0 +1,342 @@
+"""
+_RequestJobInfoCache_
+
+In memory copy of the requests and of their latest job information.
+
+Instead of loading and merging the request and job information views on
+every query, the cache loads them once and then follows the _changes feeds
+of the request and wmstats databases, applying only the changed documents.
+When the cache has fallen too far behind the feeds it is reloaded from the
+views.
+"""
+from __future__ import division, print_function
+
+import logging
+import threading
+import time
+
+from Utils.IteratorTools import grouper
+
+
+class RequestJobInfoCache(object):
+    """
+    _RequestJobInfoCache_
+
+    Requests in the tracked statuses and the latest agent_request document
+    of each of these requests and agent, for a WMStatsReader with a request
+    database.  The agent_request documents of the other requests are not
+    loaded.
+
+    staleTolerance: seconds during which the cache is served without looking
+                    at the _changes feeds
+    maxChanges: number of pending changes above which the cache is reloaded
+                from the views instead of applying the changes
+
+    NOT A THREAD SAFE CLASS for the documents it returns: the job information
+    documents are shared with the cache and must not be modified.
+    """
+
+    def __init__(self, wmstatsReader, trackedStatus, staleTolerance=60, maxChanges=5000):
+        self.wmstatsDB = wmstatsReader.couchDB
+        self.wmstatsApp = wmstatsReader.couchapp
+        self.reqDB = wmstatsReader.reqDB.couchDB
+        self.reqDBApp = wmstatsReader.reqDB.couchapp
+        self.trackedStatus = set(trackedStatus)
+        self.staleTolerance = staleTolerance
+        self.maxChanges = maxChanges
+        self.logger = logging.getLogger()
+        self.lock = threading.RLock()
+
+        # request name: request document
+        self.requests = {}
+        # request name: {agent url: latest agent_request document}
+        self.jobInfo = {}
+        # agent_request document id: (request name, agent url, timestamp)
+        self.jobDocs = {}
+        # (request name, agent url): {document id: timestamp}
+        self.jobDocsByAgent = {}
+
+        self.requestSeq = None
+        self.wmstatsSeq = None
+        self.lastSync = None
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.changesApplied = 0
+
+    @staticmethod
+    def _filterCouchInfo(doc):
+        """
+        Remove the couch specific information, like RequestDBReader does
+        """
+        for key in ['_rev', '_attachments']:
+            doc.pop(key, None)
+        return doc
+
+    def reload(self):
+        """
+        _reload_
+
+        Load the requests and the job information from the views.  The
+        sequence numbers are taken first, the changes made while loading
+        are applied again at the next sync, which does no harm.
+        """
+        requestSeq = self.reqDB.info()['update_seq']
+        wmstatsSeq = self.wmstatsDB.info()['update_seq']
+
+        requests = {}
+        result = self.reqDB.loadView(self.reqDBApp, "bystatus", {"include_docs": True},
+                                     list(self.trackedStatus))
+        for row in result['rows']:
+            if row.get('doc'):
+                requests[row['id']] = self._filterCouchInfo(row['doc'])
+
+        self.requests = requests
+        self.jobDocs = {}
+        self.jobDocsByAgent = {}
+        self.jobInfo = {}
+        self._loadLatestJobDocs(self._loadJobDocIds(set(requests)))
+
+        self.requestSeq = requestSeq
+        self.wmstatsSeq = wmstatsSeq
+        self.lastSync = time.time()
+        self.reloads += 1
+        self.logger.info("RequestJobInfoCache reloaded: %d requests, %d job info documents",
+                         len(self.requests), len(self.jobDocs))
+        return
+
+    def _addJobDocId(self, docId, workflow, agentURL, timestamp):
+        """
+        Track an agent_request document
+        """
+        self.jobDocs[docId] = (workflow, agentURL, timestamp)
+        self.jobDocsByAgent.setdefault((workflow, agentURL), {})[docId] = timestamp
+
+    def _removeJobDocId(self, docId):
+        """
+        Stop tracking an agent_request document, return its request and agent
+        """
+        workflow, agentURL, dummyTimestamp = self.jobDocs.pop(docId)
+        docIds = self.jobDocsByAgent[(workflow, agentURL)]
+        del docIds[docId]
+        if not docIds:
+            del self.jobDocsByAgent[(workflow, agentURL)]
+        return workflow, agentURL
+
+    def _loadJobDocIds(self, workflows):
+        """
+        Track the agent_request documents of the requests, return the
+        (request, agent) keys found
+        """
+        if not workflows:
+            return []
+        result = self.wmstatsDB.loadView(self.wmstatsApp, "requestAgentUrl", {"reduce": True, "group": True})
+        keys = [row['key'] for row in result['rows'] if row['key'][0] in workflows]
+        for keysChunk in grouper(keys, 1000):
+            result = self.wmstatsDB.loadView(self.wmstatsApp, "latestRequest", {"reduce": False}, keysChunk)
+            for row in result['rows']:
+                workflow, agentURL = row['key']
+                self._addJobDocId(row['id'], workflow, agentURL, row['value']['timestamp'])
+        return [tuple(key) for key in keys]
+
+    def _dropJobDocs(self, workflows):
+        """
+        Stop tracking the agent_request documents of the requests
+        """
+        if not workflows:
+            return
+        for key in [x for x in self.jobDocsByAgent if x[0] in workflows]:
+            for docId in self.jobDocsByAgent.pop(key):
+                del self.jobDocs[docId]
+        for workflow in workflows:
+            self.jobInfo.pop(workflow, None)
+
+    def _setJobDoc(self, workflow, agentURL, doc):
+        """
+        Set or remove (with doc None) the job information of a request and agent
+        """
+        if doc is not None:
+            self.jobInfo.setdefault(workflow, {})[agentURL] = doc
+        elif workflow in self.jobInfo:
+            self.jobInfo[workflow].pop(agentURL, None)
+            if not self.jobInfo[workflow]:
+                del self.jobInfo[workflow]
+
+    def _loadLatestJobDocs(self, keys):
+        """
+        Load the latest agent_request document of the (request, agent) keys
+        """
+        latestIds = []
+        for key in keys:
+            docIds = self.jobDocsByAgent.get(key)
+            if docIds:
+                latestIds.append(max(docIds, key=lambda x: (docIds[x], x)))
+            else:
+                self._setJobDoc(key[0], key[1], None)
+
+        for docIds in grouper(latestIds, 1000):
+            result = self.wmstatsDB.allDocs({"include_docs": True}, docIds)
+            for row in result['rows']:
+                # documents deleted in the meantime are removed by the changes
+                if row.get('doc'):
+                    self._setJobDoc(row['doc']['workflow'], row['doc']['agent_url'], row['doc'])
+        return
+
+    def _applyRequestChanges(self):
+        """
+        Apply the changes of the request database, return False if there
+        are too many of them.  The job information of the requests entering
+        the tracked statuses is loaded, the one of the requests leaving them
+        is dropped.
+        """
+        changes = self.reqDB.changesWithDocs(limit=self.maxChanges, since=self.requestSeq)
+        if len(changes['results']) >= self.maxChanges:
+            return False
+
+        added = set()
+        removed = set()
+        for row in changes['results']:
+            doc = row.get('doc')
+            if row.get('deleted') or not doc or doc.get('RequestStatus') not in self.trackedStatus:
+                if self.requests.pop(row['id'], None) is not None:
+                    removed.add(row['id'])
+                    added.discard(row['id'])
+            else:
+                if row['id'] not in self.requests:
+                    added.add(row['id'])
+                    removed.discard(row['id'])
+                self.requests[row['id']] = self._filterCouchInfo(doc)
+        self._dropJobDocs(removed)
+        self._loadLatestJobDocs(self._loadJobDocIds(added))
+        self.requestSeq = changes['last_seq']
+        self.changesApplied += len(changes['results'])
+        return True
+
+    def _applyJobInfoChanges(self):
+        """
+        Apply the changes of the wmstats database, return False if there are
+        too many of them.
+        """
+        changes = self.wmstatsDB.changesWithDocs(limit=self.maxChanges, since=self.wmstatsSeq)
+        if len(changes['results']) >= self.maxChanges:
+            return False
+
+        # (request, agent) whose latest document was deleted
+        reloadKeys = set()
+        for row in changes['results']:
+            docId = row['id']
+            doc = row.get('doc')
+            if docId in self.jobDocs:
+                key = self._removeJobDocId(docId)
+                latestDoc = self.jobInfo.get(key[0], {}).get(key[1])
+                if latestDoc is not None and latestDoc['_id'] == docId:
+                    reloadKeys.add(key)
+            if row.get('deleted') or not doc or doc.get('type') != 'agent_request' or \
+                    doc['workflow'] not in self.requests:
+                continue
+
+            key = (doc['workflow'], doc['agent_url'])
+            self._addJobDocId(docId, key[0], key[1], doc['timestamp'])
+            latestDoc = self.jobInfo.get(key[0], {}).get(key[1])
+            if key in reloadKeys:
+                docIds = self.jobDocsByAgent[key]
+                if max(docIds, key=lambda x: (docIds[x], x)) == docId:
+                    self._setJobDoc(key[0], key[1], doc)
+                    reloadKeys.discard(key)
+            elif latestDoc is None or \
+                    (doc['timestamp'], docId) >= (latestDoc['timestamp'], latestDoc['_id']):
+                self._setJobDoc(key[0], key[1], doc)
+
+        self._loadLatestJobDocs(reloadKeys)
+        self.wmstatsSeq = changes['last_seq']
+        self.changesApplied += len(changes['results'])
+        return True
+
+    def sync(self):
+        """
+        _sync_
+
+        Bring the cache up to date unless it was synced less than
+        staleTolerance seconds ago.  Return False if it had to be reloaded.
+        """
+        if self.lastSync is not None and time.time() - self.lastSync <= self.staleTolerance:
+            return True
+
+        if self.lastSync is not None:
+            try:
+                if self._applyRequestChanges() and self._applyJobInfoChanges():
+                    self.lastSync = time.time()
+                    return True
+                self.logger.info("RequestJobInfoCache is more than %d changes behind", self.maxChanges)
+            except Exception as ex:
+                self.logger.warning("Failed to follow the changes, reloading the cache: %s", str(ex))
+        self.reload()
+        return False
+
+    def _getRequests(self, requestNames, jobInfoFlag):
+        """
+        Copy the requests, with their job information if jobInfoFlag is set
+        """
+        requestInfo = {}
+        for requestName in requestNames:
+            requestInfo[requestName] = dict(self.requests[requestName])
+            if jobInfoFlag and requestName in self.jobInfo:
+                requestInfo[requestName]["AgentJobInfo"] = dict(self.jobInfo[requestName])
+        return requestInfo
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def getRequestByStatus(self, statusList, jobInfoFlag=False):
+        """
+        _getRequestByStatus_
+
+        Return the requests in the given statuses like
+        WMStatsReader.getRequestByStatus, or None if some of the statuses
+        are not tracked.
+        """
+        if not self.trackedStatus.issuperset(statusList):
+            self._count(False)
+            return None
+
+        statusList = set(statusList)
+        with self.lock:
+            self._count(self.sync())
+            requestNames = [name for name, doc in self.requests.iteritems()
+                            if doc.get('RequestStatus') in statusList]
+            return self._getRequests(requestNames, jobInfoFlag)
+
+    def getRequestByNames(self, requestNames, jobInfoFlag=False):
+        """
+        _getRequestByNames_
+
+        Return the requests like WMStatsReader.getRequestByNames, or None if
+        some of them are not in the cache.
+        """
+        if isinstance(requestNames, basestring):
+            requestNames = [requestNames]
+
+        with self.lock:
+            hit = self.sync()
+            if not all([name in self.requests for name in requestNames]):
+                self._count(False)
+                return None
+            self._count(hit)
+            return self._getRequests(requestNames, jobInfoFlag)
+
+    def getStats(self):
+        """
+        _getStats_
+
+        Return the cache counters
+        """
+        queries = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hitRate": self.hits / queries if queries else 0.0,
+                "reloads": self.reloads, "changesApplied": self.changesApplied,
+                "requests": len(self.requests), "jobInfoDocs": len(self.jobDocs),
+                "lastSync": self.lastSync}
@@ -3,6 +3,7 @@ from __future__ import division, print_function
 from Utils.IteratorTools import nestedDictUpdate
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.Services.WMStats.DataStruct.RequestInfoCollection import RequestInfo
+from WMCore.Services.WMStats.RequestJobInfoCache import RequestJobInfoCache
 from WMCore.Lexicon import splitCouchServiceURL, sanitizeURL
 from WMCore.Services.RequestDB.RequestDBReader import RequestDBReader
 
@@ -86,6 +87,27 @@ class WMStatsReader(object):
             self.reqDB = RequestDBReader(reqdbURL, reqdbCouchApp)
         else:
             self.reqDB = None
+        self.cache = None
+
+    def enableCache(self, trackedStatus=None, staleTolerance=60, maxChanges=5000):
+        """
+        Serve the requests in trackedStatus (ACTIVE_STATUS by default) and
+        their job info from an in memory cache following the couch _changes
+        feeds. Needs reqdbURL to be set when wmstats initialized.
+        See RequestJobInfoCache for the options.
+        """
+        if trackedStatus is None:
+            trackedStatus = WMStatsReader.ACTIVE_STATUS
+        self.cache = RequestJobInfoCache(self, trackedStatus, staleTolerance, maxChanges)
+        return self.cache
+
+    def getCacheStats(self):
+        """
+        return the hit/miss counters of the cache, None if it is not enabled
+        """
+        if self.cache is None:
+            return None
+        return self.cache.getStats()
     
     def _sanitizeURL(self, couchURL):
         return sanitizeURL(couchURL)['url']
@@ -292,6 +314,11 @@ class WMStatsReader(object):
         To use this function reqDBURL need to be set when wmstats initialized.
         This will be deplicated so please don use this. 
         """
+        if self.cache is not None:
+            requestInfo = self.cache.getRequestByNames(requestNames, jobInfoFlag)
+            if requestInfo is not None:
+                return requestInfo
+
         requestInfo = self.reqDB.getRequestByNames(requestNames, True)
 
         if jobInfoFlag:
@@ -317,7 +344,15 @@ class WMStatsReader(object):
         If legacyFormat is True convert data to old wmstats format from current reqmgr format.
         Shouldn't be set to True unless existing code breaks  
         """
-        
+        requestInfo = None
+        if self.cache is not None and limit is None and skip is None:
+            requestInfo = self.cache.getRequestByStatus(statusList, jobInfoFlag)
+        if requestInfo is not None:
+            if legacyFormat:
+                for requestName, doc in requestInfo.items():
+                    requestInfo[requestName] = convertToLegacyFormat(doc)
+            return requestInfo
+
         requestInfo = self.reqDB.getRequestByStatus(statusList, True, limit, skip)
         
         if legacyFormat:
@@ -63,7 +63,11 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', 30)
         self.followlocation = config.get('followlocation', 1)
         self.maxredirs = config.get('maxredirs', 5)
+        self.maxconcurrent = config.get('maxconcurrent', 10)
         self.logger = logger if logger else logging.getLogger()
+        # reusable curl handles and DNS/TLS session cache shared between them
+        self.curlpool = []
+        self.curlshare = None
 
     def encode_params(self, params, verb, doseq):
         """ Encode request parameters for usage with the 4 verbs.
@@ -175,6 +179,20 @@ class RequestHandler(object):
         """
         return ResponseHeader(header)
 
+    def http_exception(self, url, params, headers, header, data):
+        """Create HTTPException for a failed request"""
+        msg = 'url=%s, code=%s, reason=%s, headers=%s' \
+                % (url, header.status, header.reason, header.header)
+        exc = httplib.HTTPException(msg)
+        setattr(exc, 'req_data', params)
+        setattr(exc, 'req_headers', headers)
+        setattr(exc, 'url', url)
+        setattr(exc, 'result', data)
+        setattr(exc, 'status', header.status)
+        setattr(exc, 'reason', header.reason)
+        setattr(exc, 'headers', header.header)
+        return exc
+
     def request(self, url, params, headers=None, verb='GET',
                 verbose=0, ckey=None, cert=None, capath=None, doseq=True, decode=False, cainfo=None):
         """Fetch data for given set of parameters"""
@@ -192,19 +210,9 @@ class RequestHandler(object):
                 data = self.parse_body(bbuf.getvalue(), decode)
         else:
             data = bbuf.getvalue()
-            msg = 'url=%s, code=%s, reason=%s, headers=%s' \
-                    % (url, header.status, header.reason, header.header)
-            exc = httplib.HTTPException(msg)
-            setattr(exc, 'req_data', params)
-            setattr(exc, 'req_headers', headers)
-            setattr(exc, 'url', url)
-            setattr(exc, 'result', data)
-            setattr(exc, 'status', header.status)
-            setattr(exc, 'reason', header.reason)
-            setattr(exc, 'headers', header.header)
             bbuf.flush()
             hbuf.flush()
-            raise exc
+            raise self.http_exception(url, params, headers, header, data)
 
         bbuf.flush()
         hbuf.flush()
@@ -224,41 +232,133 @@ class RequestHandler(object):
                     verbose, ckey, cert, doseq)
         return header
 
-    def multirequest(self, url, parray, headers=None,
-                ckey=None, cert=None, verbose=None):
-        """Fetch data for given set of parameters"""
-        multi = pycurl.CurlMulti()
-        for params in parray:
+    def get_curl(self):
+        """
+        Get a curl handle from the pool, or a new one if the pool is empty.
+        All handles share the DNS and TLS session caches.
+        """
+        if  self.curlshare is None:
+            self.curlshare = pycurl.CurlShare()
+            self.curlshare.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+            self.curlshare.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        try:
+            curl = self.curlpool.pop()
+        except IndexError:
             curl = pycurl.Curl()
-            bbuf, hbuf = \
-                self.set_opts(curl, url, params, headers, ckey, cert, verbose)
-            multi.add_handle(curl)
+        curl.setopt(pycurl.SHARE, self.curlshare)
+        return curl
+
+    def release_curl(self, curl):
+        """
+        Put a curl handle back into the pool. Resetting the handle drops
+        its options but keeps its connections alive for the next request.
+        """
+        if  len(self.curlpool) < self.maxconcurrent:
+            curl.unsetopt(pycurl.SHARE)
+            curl.reset()
+            self.curlpool.append(curl)
+        else:
+            curl.close()
+
+    def multi_request(self, requests, ckey=None, cert=None, capath=None,
+                      cainfo=None, verbose=None, maxconcurrent=None, timeout=None):
+        """
+        Run several requests concurrently over a CurlMulti object.
+
+        requests is an iterable of dictionaries with url, params, headers,
+        verb, doseq and timeout keys (only url is mandatory). At most
+        maxconcurrent requests are in flight at any time, new ones are
+        only taken from the iterable when a slot frees up.
+
+        Yields (request, header, data, error) tuples in completion order,
+        error is a pycurl.error for failed transfers (e.g. timeouts), in
+        which case header and data are None.
+        """
+        maxconcurrent = maxconcurrent or self.maxconcurrent
+        pending = iter(requests)
+        active = {}
+        multi = pycurl.CurlMulti()
+        try:
             while True:
-                ret, num_handles = multi.perform()
-                if  ret != pycurl.E_CALL_MULTI_PERFORM:
+                while len(active) < maxconcurrent:
+                    try:
+                        request = next(pending)
+                    except StopIteration:
+                        break
+                    curl = self.get_curl()
+                    bbuf, hbuf = self.set_opts(curl, request['url'], request.get('params'),
+                                               request.get('headers'), ckey=ckey, cert=cert,
+                                               capath=capath, verbose=verbose,
+                                               verb=request.get('verb', 'GET'),
+                                               doseq=request.get('doseq', True), cainfo=cainfo)
+                    reqtimeout = request.get('timeout', timeout)
+                    if  reqtimeout:
+                        curl.setopt(pycurl.TIMEOUT, reqtimeout)
+                    multi.add_handle(curl)
+                    active[curl] = (request, bbuf, hbuf)
+
+                if  not active:
                     break
-            while num_handles:
-                ret = multi.select(1.0)
-                if  ret == -1:
-                    continue
+
                 while True:
-                    ret, num_handles = multi.perform()
+                    ret, dummyNumHandles = multi.perform()
                     if  ret != pycurl.E_CALL_MULTI_PERFORM:
                         break
-            dummyNumq, response, dummyErr = multi.info_read()
-            for dummyCobj in response:
-                data = json.loads(bbuf.getvalue())
-                if  isinstance(data, dict):
-                    data.update(params)
-                    yield data
-                if  isinstance(data, list):
-                    for item in data:
-                        if  isinstance(item, dict):
-                            item.update(params)
-                            yield item
-                        else:
-                            err = 'Unsupported data format: data=%s, type=%s'\
-                                % (item, type(item))
-                            raise Exception(err)
-                bbuf.flush()
-                hbuf.flush()
+
+                completed = []
+                while True:
+                    numq, okList, errList = multi.info_read()
+                    for curl in okList:
+                        request, bbuf, hbuf = active.pop(curl)
+                        multi.remove_handle(curl)
+                        completed.append((request, self.parse_header(hbuf.getvalue()),
+                                          bbuf.getvalue(), None))
+                        self.release_curl(curl)
+                    for curl, errno, errmsg in errList:
+                        request, dummyBbuf, dummyHbuf = active.pop(curl)
+                        multi.remove_handle(curl)
+                        completed.append((request, None, None, pycurl.error(errno, errmsg)))
+                        curl.close()
+                    if  not numq:
+                        break
+
+                for result in completed:
+                    yield result
+
+                if  active and not completed:
+                    multi.select(1.0)
+        finally:
+            for curl in active:
+                multi.remove_handle(curl)
+                curl.close()
+            multi.close()
+
+    def multirequest(self, url, parray, headers=None,
+                ckey=None, cert=None, verbose=None, maxconcurrent=None, timeout=None):
+        """
+        Fetch data for given set of parameters. The requests run concurrently
+        (see multi_request) and the JSON records they return are yielded,
+        updated with the request parameters, as soon as a request completes.
+        """
+        requests = ({'url': url, 'params': params, 'headers': headers} for params in parray)
+        for request, header, body, error in \
+                self.multi_request(requests, ckey=ckey, cert=cert, verbose=verbose,
+                                   maxconcurrent=maxconcurrent, timeout=timeout):
+            params = request['params']
+            if  error:
+                raise error
+            if  header.status >= 300:
+                raise self.http_exception(url, params, headers, header, body)
+            data = json.loads(body)
+            if  isinstance(data, dict):
+                data.update(params)
+                yield data
+            if  isinstance(data, list):
+                for item in data:
+                    if  isinstance(item, dict):
+                        item.update(params)
+                        yield item
+                    else:
+                        err = 'Unsupported data format: data=%s, type=%s'\
+                            % (item, type(item))
+                        raise Exception(err)
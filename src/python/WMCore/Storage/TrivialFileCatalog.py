@@ -27,13 +27,18 @@ Usage: Given a TFC constact string: trivialcatalog_file:/path?protocol=proto
 
 import os
 import re
+import threading
 import urlparse
+from collections import OrderedDict
 from xml.dom.minidom import Element
 
 from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode
 
 _TFCArgSplit = re.compile("\?protocol=")
 
+# guards the match caches of all the catalogs
+_matchCacheLock = threading.Lock()
+
 
 class TrivialFileCatalog(dict):
     """
@@ -41,13 +46,22 @@ class TrivialFileCatalog(dict):
 
     Object that can map LFNs to PFNs based on contents of a Trivial
     File Catalog
+
+    The mappings of each style and protocol are gathered the first time
+    they are used and the results of matchLFN and matchPFN, including the
+    chained rules they resolve, are kept in an LRU cache of
+    matchCacheSize paths.  Both are reset by addMapping.
     """
 
+    matchCacheSize = 10000
+
     def __init__(self):
         dict.__init__(self)
         self['lfn-to-pfn'] = []
         self['pfn-to-lfn'] = []
         self.preferredProtocol = None # attribute for preferred protocol
+        self._rules = {}
+        self._matchCache = OrderedDict()
 
 
     def addMapping(self, protocol, match, result,
@@ -65,6 +79,57 @@ class TrivialFileCatalog(dict):
         entry.setdefault("result", result)
         entry.setdefault("chain", chain)
         self[mapping_type].append(entry)
+        self.clearMatchCache()
+
+
+    def clearMatchCache(self):
+        """
+        _clearMatchCache_
+
+        Forget the mappings by protocol and the cached matches, to be called
+        if the mappings are modified other than through addMapping
+
+        """
+        with _matchCacheLock:
+            self._rules = {}
+            self._matchCache = OrderedDict()
+
+
+    def _getRules(self, style, protocol):
+        """
+        _getRules_
+
+        The mappings of a style for a protocol, in the catalog order
+
+        """
+        rules = self._rules.get((style, protocol))
+        if rules is None:
+            rules = [mapping for mapping in self[style] if mapping['protocol'] == protocol]
+            self._rules[(style, protocol)] = rules
+        return rules
+
+
+    def _cachedMatch(self, protocol, path, style, caller):
+        """
+        _cachedMatch_
+
+        _doMatch through the LRU cache of the matches
+
+        """
+        key = (style, protocol, path)
+        with _matchCacheLock:
+            if key in self._matchCache:
+                result = self._matchCache.pop(key)
+                self._matchCache[key] = result
+                return result
+
+        result = self._doMatch(protocol, path, style, caller)
+
+        with _matchCacheLock:
+            self._matchCache[key] = result
+            while len(self._matchCache) > self.matchCacheSize:
+                self._matchCache.popitem(last=False)
+        return result
 
 
     def _doMatch(self, protocol, path, style, caller):
@@ -76,21 +141,16 @@ class TrivialFileCatalog(dict):
         Return None if no match
 
         """
-        for mapping in self[style]:
-            if mapping['protocol'] != protocol:
-                continue
+        for mapping in self._getRules(style, protocol):
             if mapping['path-match-expr'].match(path) or mapping["chain"] != None:
                 if mapping["chain"] != None:
                     oldpath = path
                     path = caller(mapping["chain"], path)
                     if not path:
                         continue
-                splitList = []
-                if len(mapping['path-match-expr'].split(path, 1)) > 1 :
-                    for split in range(len(mapping['path-match-expr'].split(path, 1))):
-                        s = mapping['path-match-expr'].split(path, 1)[split]
-                        if s:
-                            splitList.append(s)
+                splitList = mapping['path-match-expr'].split(path, 1)
+                if len(splitList) > 1:
+                    splitList = [s for s in splitList if s]
                 else:
                     path = oldpath
                     continue
@@ -112,7 +172,7 @@ class TrivialFileCatalog(dict):
         Return None if no match
 
         """
-        result = self._doMatch(protocol, lfn, "lfn-to-pfn", self.matchLFN)
+        result = self._cachedMatch(protocol, lfn, "lfn-to-pfn", self.matchLFN)
         return result
 
 
@@ -126,7 +186,7 @@ class TrivialFileCatalog(dict):
         Return None if no match
 
         """
-        result = self._doMatch(protocol, pfn, "pfn-to-lfn", self.matchPFN)
+        result = self._cachedMatch(protocol, pfn, "pfn-to-lfn", self.matchPFN)
         return result
 
 
@@ -533,6 +533,7 @@ def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS = True,
     addFileAction           = daofactory(classname = "Files.Add")
     addToFileset            = daofactory(classname = "Files.AddDupsToFileset")
     updateFileAction        = daofactory(classname = "Files.Update")
+    existsAction            = daofactory(classname = "Files.ExistsBulk")
 
     # build up list of binds for all files then run in single transaction
     parentageBinds = []
@@ -541,16 +542,23 @@ def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS = True,
     fileLocations  = []
     fileCreate     = []
     fileLFNs       = []
-    lfnsToCreate   = []
+    lfnsToCreate   = set()
     lfnList        = []
     fileUpdate     = []
 
+    # Find the files that already exist with a single query
+    existingFiles = existsAction.execute(lfns = [x['lfn'] for x in files],
+                                         conn = conn,
+                                         transaction = transaction)
+    filesetLFNs = set()
+
     for wmbsFile in files:
         lfn           = wmbsFile['lfn']
         lfnList.append(lfn)
 
         if wmbsFile.get('inFileset', True):
-            if not lfn in fileLFNs:
+            if not lfn in filesetLFNs:
+                filesetLFNs.add(lfn)
                 fileLFNs.append(lfn)
         for parent in wmbsFile['parents']:
             parentageBinds.append({'child': lfn, 'parent': parent["lfn"]})
@@ -569,7 +577,9 @@ def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS = True,
         for loc in wmbsFile['newlocations']:
             fileLocations.append({'lfn': lfn, 'location': loc})
 
-        if wmbsFile.exists():
+        if lfn in existingFiles:
+            if wmbsFile['id'] == -1:
+                wmbsFile['id'] = existingFiles[lfn]
             # update events, size, first_event, merged
             fileUpdate.append([lfn,
                                wmbsFile['size'],
@@ -581,7 +591,7 @@ def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS = True,
 
         if lfn in lfnsToCreate:
             continue
-        lfnsToCreate.append(lfn)
+        lfnsToCreate.add(lfn)
 
         if selfChecksums:
             # If we have checksums we have to create a bind
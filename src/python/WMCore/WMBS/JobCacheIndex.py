@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+_JobCacheIndex_
+
+Compact index of the jobs saved in a job collection directory.
+
+The JobCreator pickles every job into its cache directory for the runtime,
+but the JobSubmitter only needs a few fields of each job to cache it for
+submission.  Those fields are also appended to an index file in the job
+collection directory, so that they can be read with a single file open
+instead of opening and unpickling every job.
+
+The index file starts with a header holding a magic string, the format
+version and the marshal version, followed by one record per job made of the
+job id, the payload length and the marshalled dictionary of job fields.
+Records are only ever appended, a truncated record at the end of the file
+is ignored.
+"""
+
+import marshal
+import mmap
+import os
+import struct
+
+INDEX_NAME = "JobCacheIndex.bin"
+INDEX_MAGIC = "WMJCI"
+INDEX_VERSION = 1
+
+# magic, index format version, marshal format version
+_HEADER = struct.Struct("<5sBB")
+# job id, payload length
+_RECORD = struct.Struct("<II")
+
+# job fields needed by the JobSubmitter to cache a job
+INDEX_FIELDS = ["name", "possiblePSN", "sandbox", "ownerDN", "ownerGroup", "ownerRole",
+                "scramArch", "swVersion", "proxyPath", "estimatedJobTime",
+                "estimatedDiskUsage", "estimatedMemoryUsage", "numberOfCores",
+                "inputDataset", "inputDatasetLocations", "allowOpportunistic",
+                "fileLocations", "siteWhitelist", "siteBlacklist"]
+
+
+def jobCacheRecord(job):
+    """
+    _jobCacheRecord_
+
+    Pull the fields needed by the JobSubmitter out of a job.  The number of
+    cores can be overridden by the job baggage.
+    """
+    record = dict([(x, job[x]) for x in INDEX_FIELDS if x in job])
+
+    numberOfCores = job.get('numberOfCores', 1)
+    if numberOfCores == 1:
+        numberOfCores = getattr(job.getBaggage(), "numberOfCores", 1)
+    record['numberOfCores'] = numberOfCores
+    return record
+
+
+def appendJobCacheRecords(indexPath, records):
+    """
+    _appendJobCacheRecords_
+
+    Append a list of (job id, record) tuples to an index file, writing the
+    header first if the file is new.
+    """
+    chunks = []
+    for jobID, record in records:
+        payload = marshal.dumps(record)
+        chunks.append(_RECORD.pack(jobID, len(payload)))
+        chunks.append(payload)
+
+    with open(indexPath, 'ab') as handle:
+        if handle.tell() == 0:
+            handle.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, marshal.version))
+        handle.write("".join(chunks))
+    return
+
+
+def readJobCacheIndex(indexPath, jobIDs=None):
+    """
+    _readJobCacheIndex_
+
+    Map an index file and return a dictionary of the job records keyed by job
+    id, optionally only for the given job ids.  Returns an empty dictionary
+    if the file doesn't exist or was written with another format.
+    """
+    records = {}
+    try:
+        handle = open(indexPath, 'rb')
+    except IOError:
+        return records
+
+    try:
+        if os.fstat(handle.fileno()).st_size < _HEADER.size:
+            return records
+        data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        handle.close()
+
+    try:
+        if _HEADER.unpack_from(data, 0) != (INDEX_MAGIC, INDEX_VERSION, marshal.version):
+            return records
+
+        offset = _HEADER.size
+        dataSize = len(data)
+        while offset + _RECORD.size <= dataSize:
+            jobID, length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            if offset + length > dataSize:
+                break
+            if jobIDs is None or jobID in jobIDs:
+                records[jobID] = marshal.loads(data[offset:offset + length])
+            offset += length
+    finally:
+        data.close()
+
+    return records
@@ -130,6 +130,16 @@ class Mask(WMBSBase, WMMask):
 
         self.commitTransaction(existingTransaction)
 
+        self.loadEntries(jobMask)
+        return
+
+    def loadEntries(self, jobMask):
+        """
+        _loadEntries_
+
+        Fill the mask from the list of mask entries loaded from the database
+        by the Masks.Load DAO.
+        """
         # Now we get a bit weird.
         # We assemble things into a list
         # NOTE: Right now this will totally break down if you have multiple mask entries
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+"""
+_ExistsBulk_
+
+MySQL implementation of Files.ExistsBulk
+"""
+
+__all__ = []
+
+
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class ExistsBulk(DBFormatter):
+    """
+    Find which of a list of lfns already exist, return a dictionary
+    of the file ids keyed by lfn.
+    """
+    sql = "SELECT lfn, id FROM wmbs_file_details WHERE lfn = :lfn"
+
+    def execute(self, lfns, conn = None, transaction = False):
+        if len(lfns) == 0:
+            return {}
+
+        binds = [{"lfn": lfn} for lfn in set(lfns)]
+        result = self.dbi.processData(self.sql, binds,
+                         conn = conn, transaction = transaction,
+                         inKey = "lfn")
+        return dict(self.format(result))
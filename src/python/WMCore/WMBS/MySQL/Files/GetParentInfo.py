@@ -14,7 +14,7 @@ whether or not the file is a redneck parent or redneck child.
 from WMCore.Database.DBFormatter import DBFormatter
 
 class GetParentInfo(DBFormatter):
-    sql = """SELECT wfp.id, wfp.lfn, wfp.merged,
+    sql = """SELECT wfd.lfn AS child_lfn, wfp.id, wfp.lfn, wfp.merged,
                     wfgp.lfn AS gplfn, wfgp.merged AS gpmerged
              FROM wmbs_file_details wfp
              INNER JOIN wmbs_file_parent wfpa ON wfpa.parent = wfp.id
@@ -32,5 +32,6 @@ class GetParentInfo(DBFormatter):
             bindVars.append({"child_lfn": childLFN})
 
         result = self.dbi.processData(self.sql, bindVars,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         inKey = "child_lfn")
         return self.formatDict(result)
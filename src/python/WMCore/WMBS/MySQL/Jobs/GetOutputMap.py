@@ -8,7 +8,14 @@ MySQL implementation of Jobs.GetOutputMap
 from WMCore.Database.DBFormatter import DBFormatter
 
 class GetOutputMap(DBFormatter):
-    sql = """SELECT wmbs_workflow_output.output_identifier AS wf_output_id,
+    """
+    _GetOutputMap_
+
+    Given a job ID, or a list of job IDs, get the output filesets of the
+    workflow by output module.
+    """
+    sql = """SELECT wmbs_job.id AS jobid,
+                    wmbs_workflow_output.output_identifier AS wf_output_id,
                     wmbs_workflow_output.output_fileset AS wf_output_fset,
                     wmbs_workflow_output.merged_output_fileset AS wf_output_mfset
                     FROM wmbs_workflow_output
@@ -21,14 +28,32 @@ class GetOutputMap(DBFormatter):
              WHERE wmbs_job.id = :jobid"""
 
     def execute(self, jobID, conn = None, transaction = False):
-        results = self.dbi.processData(self.sql, {"jobid": jobID}, conn = conn,
-                                       transaction = transaction)
+        isList = type(jobID) == type([])
+        if isList:
+            if len(jobID) == 0:
+                return {}
+            binds = [{"jobid": job} for job in jobID]
+        else:
+            binds = {"jobid": jobID}
+        results = self.dbi.processData(self.sql, binds, conn = conn,
+                                       transaction = transaction,
+                                       inKey = "jobid")
+
+        outputMaps = {}
+        if isList:
+            for job in jobID:
+                outputMaps[job] = {}
+        else:
+            outputMaps[jobID] = {}
 
-        outputMap = {}
         for result in self.formatDict(results):
+            outputMap = outputMaps.setdefault(result["jobid"], {})
             if result["wf_output_id"] not in outputMap:
                 outputMap[result["wf_output_id"]] = []
 
             outputMap[result["wf_output_id"]].append({"output_fileset": result["wf_output_fset"],
                                                       "merged_output_fileset": result["wf_output_mfset"]})
-        return outputMap
+        if isList:
+            return outputMaps
+        else:
+            return outputMaps[jobID]
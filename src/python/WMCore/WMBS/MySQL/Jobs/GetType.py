@@ -35,7 +35,8 @@ class GetType(DBFormatter):
         else:
             binds = {"jobid": jobID}
         result = self.dbi.processData(self.sql, binds, conn = conn,
-                                      transaction = transaction)
+                                      transaction = transaction,
+                                      inKey = "jobid")
         if isList:
             return self.formatDict(result)
         else:
@@ -33,7 +33,16 @@ class ListForSubmitter(DBFormatter):
                  wmbs_subscription.workflow = wmbs_workflow.id
              WHERE wmbs_job_state.name = 'created'"""
 
-    def execute(self, conn = None, transaction = False):
+    def execute(self, conn = None, transaction = False, lazy = False):
+        """
+        _execute_
+
+        With lazy = True the rows are kept in columnar result sets and
+        only formatted into dictionaries while iterating over the result.
+        """
         result = self.dbi.processData(self.sql, conn = conn,
-                                      transaction = transaction)
+                                      transaction = transaction,
+                                      columnar = lazy)
+        if lazy:
+            return self.formatDictLazy(result)
         return self.formatDict(result)
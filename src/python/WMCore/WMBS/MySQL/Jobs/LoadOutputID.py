@@ -18,7 +18,7 @@ class LoadOutputID(DBFormatter):
     """
 
 
-    sql = """SELECT wfs.id AS id FROM wmbs_fileset wfs
+    sql = """SELECT wj.id AS jobid, wfs.id AS id FROM wmbs_fileset wfs
                 INNER JOIN wmbs_jobgroup wjg ON wjg.output = wfs.id
                 INNER JOIN wmbs_job wj ON wj.jobgroup = wjg.id
                 WHERE wj.id = :jobid"""
@@ -26,9 +26,18 @@ class LoadOutputID(DBFormatter):
 
     def execute(self, jobID, conn = None, transaction = False):
         """
-        Given a jobID, find the fileset
+        Given a jobID, find the fileset.  Given a list of jobIDs, return a
+        dictionary of filesets keyed by jobID.
 
         """
+        if type(jobID) == list:
+            if len(jobID) == 0:
+                return {}
+            binds = [{"jobid": job} for job in jobID]
+            result = self.dbi.processData(self.sql, binds, conn = conn,
+                                          transaction = transaction,
+                                          inKey = "jobid")
+            return dict([(x["jobid"], x["id"]) for x in self.formatDict(result)])
 
         result = self.dbi.processData(self.sql, {"jobid": jobID}, conn = conn,
                                       transaction = transaction)
@@ -12,7 +12,12 @@ __all__ = []
 from WMCore.Database.DBFormatter import DBFormatter
 
 class Load(DBFormatter):
-    sql = """SELECT DISTINCT FirstEvent, LastEvent, FirstLumi, LastLumi, FirstRun,
+    """
+    _Load_
+
+    Load the mask entries of a job, or of a list of jobs.
+    """
+    sql = """SELECT DISTINCT job AS jobid, FirstEvent, LastEvent, FirstLumi, LastLumi, FirstRun,
              LastRun FROM wmbs_job_mask WHERE job = :jobid"""
 
     def format(self, results):
@@ -22,6 +27,7 @@ class Load(DBFormatter):
 
         for entry in dictList:
             tmpDict = {}
+            tmpDict['jobid']      = entry['jobid']
             tmpDict['FirstEvent'] = entry['firstevent']
             tmpDict['LastEvent']  = entry['lastevent']
             tmpDict['FirstLumi']  = entry['firstlumi']
@@ -34,7 +40,22 @@ class Load(DBFormatter):
         return out
 
     def execute(self, jobid, conn = None, transaction = False):
+        """
+        _execute_
+
+        Return the list of mask entries of a job, or a dictionary of lists of
+        mask entries keyed by job id if given a list of job ids.
+        """
+        if type(jobid) == list and len(jobid) == 0:
+            return {}
         binds = self.getBinds(jobid = jobid)
         result = self.dbi.processData(self.sql, binds, conn = conn,
-                                      transaction = transaction)
-        return self.format(result)
+                                      transaction = transaction,
+                                      inKey = "jobid")
+        if type(jobid) != list:
+            return self.format(result)
+
+        masks = dict([(x, []) for x in jobid])
+        for entry in self.format(result):
+            masks.setdefault(entry['jobid'], []).append(entry)
+        return masks
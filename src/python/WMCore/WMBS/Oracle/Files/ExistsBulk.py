@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+_ExistsBulk_
+
+Oracle implementation of Files.ExistsBulk
+"""
+
+__all__ = []
+
+
+
+from WMCore.WMBS.MySQL.Files.ExistsBulk import ExistsBulk as ExistsBulkMySQL
+
+class ExistsBulk(ExistsBulkMySQL):
+    pass
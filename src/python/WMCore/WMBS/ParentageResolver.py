@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+_ParentageResolver_
+
+Resolve the merged parentage of WMBS files in bulk.
+"""
+
+
+class ParentageResolver(object):
+    """
+    _ParentageResolver_
+
+    Find the merged parents of a set of files.  Unmerged parents are skipped
+    by looking at their own parents (the grand parents of the file) and, if
+    those aren't merged either, by walking up the generations until merged
+    files are found.
+
+    Every generation is resolved with a single Files.GetParentInfo query and
+    results are memoized, so files sharing ancestors are only looked up once.
+    Call reset() to drop the memoized results.
+    """
+    def __init__(self, getParentInfoAction):
+        self.getParentInfoAction = getParentInfoAction
+        self.reset()
+        return
+
+    def reset(self):
+        """
+        _reset_
+
+        Forget everything that was resolved so far.
+        """
+        # lfn -> set of merged parent lfns
+        self.resolved = {}
+        # lfn -> (merged parent lfns, unmerged grand parent lfns to walk up)
+        self.parentInfo = {}
+        return
+
+    def loadGenerations(self, lfns, conn = None, transaction = False):
+        """
+        _loadGenerations_
+
+        Query the parentage information of the given files, one generation at
+        a time, until no unmerged ancestor is left to look at.
+        """
+        toQuery = set([lfn for lfn in lfns if lfn not in self.resolved and \
+                       lfn not in self.parentInfo])
+        while toQuery:
+            for lfn in toQuery:
+                self.parentInfo[lfn] = (set(), set())
+
+            nextGeneration = set()
+            for row in self.getParentInfoAction.execute(list(toQuery), conn = conn,
+                                                        transaction = transaction):
+                mergedParents, unmergedAncestors = self.parentInfo[row["child_lfn"]]
+
+                # This will catch straight to merge files that do not have redneck
+                # parents.  We will mark the straight to merge file from the job
+                # as a child of the merged parent.
+                if int(row["merged"]) == 1:
+                    mergedParents.add(row["lfn"])
+
+                elif row["gpmerged"] == None:
+                    continue
+
+                # Handle the files that result from merge jobs that aren't redneck
+                # children.
+                elif int(row["gpmerged"]) == 1:
+                    mergedParents.add(row["gplfn"])
+
+                # Otherwise we've reached the great-grandparents and have to
+                # look at the next generation
+                else:
+                    unmergedAncestors.add(row["gplfn"])
+                    if row["gplfn"] not in self.resolved and \
+                       row["gplfn"] not in self.parentInfo:
+                        nextGeneration.add(row["gplfn"])
+
+            toQuery = nextGeneration
+
+        return
+
+    def resolve(self, lfn):
+        """
+        _resolve_
+
+        Combine the memoized parentage information of a file and of its
+        unmerged ancestors into its set of merged parents.
+        """
+        if lfn in self.resolved:
+            return self.resolved[lfn]
+
+        # guard against loops in the parentage
+        self.resolved[lfn] = set()
+        mergedParents, unmergedAncestors = self.parentInfo.get(lfn, (set(), set()))
+        newParents = set(mergedParents)
+        for ancestor in unmergedAncestors:
+            newParents.update(self.resolve(ancestor))
+
+        self.resolved[lfn] = newParents
+        return newParents
+
+    def findParents(self, lfns, conn = None, transaction = False):
+        """
+        _findParents_
+
+        Return a dictionary with the set of merged parent lfns for each of
+        the given lfns.
+        """
+        self.loadGenerations(lfns, conn = conn, transaction = transaction)
+        return dict([(lfn, self.resolve(lfn)) for lfn in lfns])
@@ -15,11 +15,11 @@ import logging
 import traceback
 import time
 
-import WMCore.Algorithms.SubprocessAlgos as subprocessAlgos
 import WMCore.FwkJobReport.Report        as Report
 
 from WMCore.WMRuntime.Monitors.DashboardMonitor import getStepPID
 from WMCore.WMRuntime.Monitors.WMRuntimeMonitor import WMRuntimeMonitor
+from WMCore.WMRuntime.ProcessSampler            import ProcessTreeSampler
 from WMCore.WMSpec.Steps.Executor               import getStepSpace
 from WMCore.WMSpec.WMStep                       import WMStepHelper
 from WMCore.WMException                         import WMException
@@ -45,8 +45,8 @@ class PerformanceMonitor(WMRuntimeMonitor):
     """
     _PerformanceMonitor_
 
-    Monitors the performance by pinging ps and
-    recording data regarding the current step
+    Monitors the performance by sampling the processes of the
+    current step from /proc and recording data regarding them
     """
 
     def __init__(self):
@@ -57,15 +57,11 @@ class PerformanceMonitor(WMRuntimeMonitor):
 
         self.pid              = None
         self.uid              = os.getuid()
-        self.monitorBase      = "ps -p %i -o pid,ppid,rss,vsize,pcpu,pmem,cmd -ww | grep %i"
-        self.monitorCommand   = None
         self.currentStepSpace = None
         self.currentStepName  = None
 
-        self.rss   = []
-        self.vsize = []
-        self.pcpu  = []
-        self.pmem  = []
+        # Samples the step process and its children
+        self.sampler = None
 
         self.maxRSS      = None
         self.maxVSize    = None
@@ -141,6 +137,11 @@ class PerformanceMonitor(WMRuntimeMonitor):
         Package the information and send it off
         """
 
+        if self.sampler is not None:
+            logging.info("Performance figures of step %s: %s" % (self.currentStepName,
+                                                                 self.sampler.summary()))
+            self.sampler = None
+
         if not self.disableStep:
             # No information to correlate
             return
@@ -183,28 +184,31 @@ class PerformanceMonitor(WMRuntimeMonitor):
             # Then we have no step PID, we can do nothing
             return
 
-        # Now we run the monitor command and collate the data
-        cmd = self.monitorBase % (stepPID, stepPID)
-        stdout, stderr, retcode = subprocessAlgos.runCommand(cmd)
-
-        output = stdout.split()
-        if not len(output) > 7:
-            # Then something went wrong in getting the ps data
-            msg =  "Error when grabbing output from process ps\n"
-            msg += "output = %s\n" % output
-            msg += "command = %s\n" % self.monitorCommand
-            logging.error(msg)
+        # Now we sample the step process and all its children
+        if self.sampler is None or self.sampler.pid != stepPID:
+            self.sampler = ProcessTreeSampler(stepPID)
+        sample = self.sampler.sample()
+        if sample is None:
+            # Then the step process is gone
+            logging.error("Error when sampling the processes of step PID %i" % stepPID)
             return
-        rss   = float(output[2])
-        vsize = float(output[3])
-        logging.info("Retrieved following performance figures:")
-        logging.info("RSS: %s;  VSize: %s; PCPU: %s; PMEM: %s" % (output[2], output[3],
-                                                                  output[4], output[5]))
+        rss   = float(sample['rss'])
+        vsize = float(sample['vsize'])
+        logging.info("Retrieved following performance figures for %i processes:" % sample['nProcesses'])
+        logging.info("RSS: %s;  PSS: %s; VSize: %s; Threads: %s; CPU time: %.1f" % (sample['rss'], sample['pss'],
+                                                                                    sample['vsize'], sample['nThreads'],
+                                                                                    sample['cpuTime']))
+
+        # The pages shared by the processes are counted once in the PSS, use it
+        # for the memory of the processes if the kernel provides it
+        memory = rss if sample['pss'] is None else float(sample['pss'])
 
         msg = 'Error in CMSSW step %s\n' % self.currentStepName
-        if self.maxRSS != None and rss >= self.maxRSS:
+        if self.maxRSS != None and memory >= self.maxRSS:
             msg += "Job has exceeded maxRSS: %s\n" % self.maxRSS
             msg += "Job has RSS: %s\n" % rss
+            if sample['pss'] is not None:
+                msg += "Job has PSS: %s\n" % sample['pss']
             killProc = True
             reason = 'RSS'
         if self.maxVSize != None and vsize >= self.maxVSize:
@@ -8,6 +8,8 @@ import os
 import sys
 from types import *
 
+from WMCore.WMRuntime.ProcessSampler import ProcessTreeSampler
+
 class ProcessMonitor(object):
     '''
     Lets us fork (and optionally exec) processes, monitoring their exit codes
@@ -18,10 +20,24 @@ class ProcessMonitor(object):
         '''
         self.processList = {}
         self.returnedList = {}
+        self.samplers = {}
 
     def executeAndMonitor(self, child):
         pid = child.forkAndExecute()
         self.processList[pid] = child
+        self.samplers[pid] = ProcessTreeSampler(pid)
+
+    def sampleChildren(self):
+        """
+            Samples the usage of our running children and their own
+            children, the samplers keep the usage over time
+        """
+        samples = {}
+        for pid in self.processList:
+            sample = self.samplers[pid].sample()
+            if sample is not None:
+                samples[pid] = sample
+        return samples
 
     def checkChildren(self, deleteOldOnes = True):
         """
@@ -29,6 +45,8 @@ class ProcessMonitor(object):
         """
         if (deleteOldOnes):
             self.returnedList = {}
+            self.samplers = dict((pid, sampler) for pid, sampler in self.samplers.items()
+                                 if pid in self.processList)
 
         for child in self.processList:
             newstatus, newsignal = child.isRunning()
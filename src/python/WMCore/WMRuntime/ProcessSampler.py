@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+_ProcessSampler_
+
+Memory and CPU usage of a process and all of its descendants, read from
+/proc without running any command.
+
+A process tree is sampled by listing the processes whose parent is in the
+tree, then reading the stat, statm and smaps_rollup files of each of them.
+Memory figures are in kB, as reported by ps.  The PSS (proportional set
+size) counts the pages shared by several processes, e.g. a forked cmsRun
+and its children, only once across the tree while the RSS of each process
+counts all of them.
+"""
+
+import os
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') // 1024
+CLOCK_TICKS = float(os.sysconf('SC_CLK_TCK'))
+
+
+def _readProcFile(procDir, pid, name):
+    """
+    _readProcFile_
+
+    Content of a /proc file of a process, None if the process is gone or
+    the file can't be read
+    """
+    try:
+        with open(os.path.join(procDir, str(pid), name)) as handle:
+            return handle.read()
+    except (IOError, OSError):
+        return None
+
+
+def _statFields(statLine):
+    """
+    _statFields_
+
+    Fields of a /proc/<pid>/stat line after the command name, the command
+    name can contain spaces and parentheses.  The first one is the state.
+    """
+    return statLine[statLine.rfind(')') + 2:].split()
+
+
+def processTree(pid, procDir="/proc"):
+    """
+    _processTree_
+
+    List of the pids of a process and all of its descendants, empty if the
+    process doesn't exist
+    """
+    children = {}
+    for entry in os.listdir(procDir):
+        if not entry.isdigit():
+            continue
+        statLine = _readProcFile(procDir, entry, "stat")
+        if statLine is None:
+            continue
+        children.setdefault(int(_statFields(statLine)[1]), []).append(int(entry))
+
+    if not os.path.isdir(os.path.join(procDir, str(pid))):
+        return []
+    pids = [pid]
+    for treePid in pids:
+        pids.extend(children.get(treePid, []))
+    return pids
+
+
+def sampleProcess(pid, procDir="/proc"):
+    """
+    _sampleProcess_
+
+    Memory and CPU usage of a single process, None if the process is gone.
+    The PSS is None if the kernel doesn't provide it.
+    """
+    statLine = _readProcFile(procDir, pid, "stat")
+    statm = _readProcFile(procDir, pid, "statm")
+    if statLine is None or statm is None:
+        return None
+    fields = _statFields(statLine)
+    pages = statm.split()
+
+    # smaps_rollup is the sum of smaps, only the older kernels need the latter
+    smaps = _readProcFile(procDir, pid, "smaps_rollup") or _readProcFile(procDir, pid, "smaps")
+    pss = None
+    if smaps:
+        pss = sum(int(line.split()[1]) for line in smaps.splitlines() if line.startswith("Pss:"))
+
+    return {'pid': pid,
+            'vsize': int(pages[0]) * PAGE_SIZE,
+            'rss': int(pages[1]) * PAGE_SIZE,
+            'pss': pss,
+            'nThreads': int(fields[17]),
+            'cpuTime': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS}
+
+
+class ProcessTreeSampler(object):
+    """
+    _ProcessTreeSampler_
+
+    Samples the usage of a process tree and keeps the minimum, maximum and
+    average of each metric over the samples taken.
+    """
+
+    METRICS = ('rss', 'pss', 'vsize', 'nProcesses', 'nThreads')
+
+    def __init__(self, pid, procDir="/proc"):
+        self.pid = pid
+        self.procDir = procDir
+        self.nSamples = 0
+        self.stats = {}
+
+    def sample(self):
+        """
+        _sample_
+
+        Usage of the whole process tree: the sum of the memory, threads and
+        CPU time of its processes.  None if the process is gone.
+        """
+        total = {'pids': [], 'rss': 0, 'pss': 0, 'vsize': 0, 'nThreads': 0, 'cpuTime': 0.0}
+        for pid in processTree(self.pid, self.procDir):
+            usage = sampleProcess(pid, self.procDir)
+            if usage is None:
+                continue
+            total['pids'].append(pid)
+            for metric in ('rss', 'vsize', 'nThreads', 'cpuTime'):
+                total[metric] += usage[metric]
+            if usage['pss'] is None or total['pss'] is None:
+                total['pss'] = None
+            else:
+                total['pss'] += usage['pss']
+        if not total['pids']:
+            return None
+        total['nProcesses'] = len(total['pids'])
+
+        self.nSamples += 1
+        for metric in self.METRICS:
+            value = total[metric]
+            if value is None:
+                continue
+            if metric not in self.stats:
+                self.stats[metric] = {'min': value, 'max': value, 'avg': float(value), 'n': 1}
+                continue
+            stats = self.stats[metric]
+            stats['n'] += 1
+            stats['min'] = min(stats['min'], value)
+            stats['max'] = max(stats['max'], value)
+            stats['avg'] += (value - stats['avg']) / stats['n']
+        return total
+
+    def summary(self):
+        """
+        _summary_
+
+        Minimum, maximum and average of each metric over the samples
+        """
+        return dict((metric, dict(stats)) for metric, stats in self.stats.items())
@@ -18,6 +18,7 @@ import Utils
 import WMCore.WMSpec.WMStep as WMStep
 import WMCore.WMSpec.WMTask as WMTask
 from WMCore.WMSpec.Steps.StepFactory import getFetcher
+from WMCore.WMSpec.WMSpecIndex import writeSpecIndex
 
 
 def tarFilter(tarinfo):
@@ -135,6 +136,7 @@ class SandboxCreator:
         # pickle up the workload for storage in the sandbox
         workload.setSpecUrl(workloadFile)
         workload.save(workloadFile)
+        writeSpecIndex(workload, workloadFile)
 
         # now, tar everything up and put it somewhere special
 
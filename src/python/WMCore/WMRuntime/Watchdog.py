@@ -16,6 +16,7 @@ import traceback
 
 from WMCore.WMFactory   import WMFactory
 from WMCore.WMException import WMException
+from WMCore.WMRuntime.ProcessSampler import ProcessTreeSampler
 from PSetTweaks.WMTweak import resizeResources
 
 class WatchdogException(WMException):
@@ -56,6 +57,9 @@ class Watchdog(threading.Thread):
         self.factory      = WMFactory(self.__class__.__name__,
                                       "WMCore.WMRuntime.Monitors")
 
+        # Usage of the whole job, the runtime and all the step processes
+        self.jobSampler   = ProcessTreeSampler(os.getpid())
+
 
     def setupMonitors(self, task, wmbsJob):
         logging.info("In Watchdog.setupMonitors")
@@ -234,6 +238,9 @@ class Watchdog(threading.Thread):
         updating.
         """
         logging.info("MonitorThread: JobEnded")
+        if self.jobSampler.nSamples:
+            logging.info("Job usage over %i samples: %s" % (self.jobSampler.nSamples,
+                                                            self.jobSampler.summary()))
         for monitor in self._Monitors:
             try:
                 monitor.jobEnd(task)
@@ -302,6 +309,10 @@ class Watchdog(threading.Thread):
             # // Update State information only during a running task
             #//
             if self._RunUpdate.isSet():
+                try:
+                    self.jobSampler.sample()
+                except Exception as ex:
+                    logging.warning("Failed to sample the job processes: %s" % str(ex))
                 for monitor in self._Monitors:
                     try:
                         monitor.periodicUpdate()
@@ -44,6 +44,10 @@ class PersistencyHelper:
         #extension = filename.split(".")[-1].lower()
         pickle.dump(self.data, handle)
         handle.close()
+
+        # drop the copy of the previous version from the spec cache
+        from WMCore.WMSpec.WMSpecCache import getSpecCache
+        getSpecCache().invalidate(filename)
         return
 
     def load(self, filename):
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+_WMSpecCache_
+
+Process wide cache of the workload specs loaded from the agent sandboxes.
+
+The agent components load the same WMWorkload.pkl files every polling
+cycle.  The cache keeps the loaded workloads, keyed by the spec path and
+validated against the spec file modification time and size, so a spec is
+only unpickled again after it changed on disk.
+
+The cache is bounded by an estimate of the memory held by the workloads
+and by a number of specs, the least recently used specs are dropped first.
+A workload loaded in full is charged MEMORY_FACTOR times the size of its
+spec file, a lazy workload (see WMSpecIndex) MEMORY_FACTOR times the size
+of its index until it is materialized.  Lazy workloads materialized by the
+callers are charged in full at the next lookup in the cache.
+
+The cached workloads are shared by all the callers in the process and must
+be treated as read-only, callers which need to modify a workload must load
+their own copy with getWorkload(specPath, readOnly=False).
+"""
+from __future__ import division
+
+import os
+import threading
+from collections import OrderedDict
+
+from WMCore.WMSpec.WMSpecIndex import LazyWMWorkloadHelper, loadWorkload, specIndexPath
+
+# memory taken by an unpickled workload relative to the size of its pickle,
+# about 13 for a 50 task spec
+MEMORY_FACTOR = 12
+
+
+class WMSpecCache(object):
+    """
+    _WMSpecCache_
+
+    LRU cache of loaded workloads, bounded by the estimated memory of the
+    workloads (maxSize bytes) and by their number (maxSpecs).  Thread safe.
+    """
+
+    def __init__(self, maxSize=256 * 1024 * 1024, maxSpecs=200):
+        self.maxSize = maxSize
+        self.maxSpecs = maxSpecs
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # spec path: (mtime, size, workload, charged memory)
+        self._specs = OrderedDict()
+        # specs cached as lazy workloads which weren't materialized yet
+        self._lazySpecs = set()
+        self._lock = threading.Lock()
+
+    def getWorkload(self, specPath, readOnly=True):
+        """
+        _getWorkload_
+
+        Return the workload of the spec file, loaded lazily when the spec has
+        an index (see WMSpecIndex).  The workload is shared unless readOnly
+        is False, in which case a private copy is loaded.
+        """
+        if not readOnly:
+            return loadWorkload(specPath)
+
+        specStat = os.stat(specPath)
+        with self._lock:
+            self._chargeMaterialized()
+            entry = self._specs.pop(specPath, None)
+            if entry is not None:
+                if entry[:2] == (specStat.st_mtime, specStat.st_size):
+                    self._specs[specPath] = entry
+                    self.hits += 1
+                    return entry[2]
+                self._forget(specPath, entry)
+            self.misses += 1
+
+        workload = loadWorkload(specPath)
+        lazy = isinstance(workload, LazyWMWorkloadHelper) and not workload.isMaterialized()
+        charge = MEMORY_FACTOR * specStat.st_size
+        if lazy:
+            try:
+                charge = MEMORY_FACTOR * os.path.getsize(specIndexPath(specPath))
+            except OSError:
+                # the index is gone, charge it as a full workload
+                lazy = False
+
+        with self._lock:
+            old = self._specs.pop(specPath, None)
+            if old is not None:
+                self._forget(specPath, old)
+            if charge <= self.maxSize:
+                self._specs[specPath] = (specStat.st_mtime, specStat.st_size, workload, charge)
+                self.size += charge
+                if lazy:
+                    self._lazySpecs.add(specPath)
+                self._evict()
+        return workload
+
+    def _forget(self, specPath, entry):
+        """
+        _forget_
+
+        Account for an entry removed from the cache, with the lock held
+        """
+        self.size -= entry[3]
+        self._lazySpecs.discard(specPath)
+        return
+
+    def _evict(self):
+        """
+        _evict_
+
+        Drop the least recently used specs until the cache is within its
+        bounds, with the lock held
+        """
+        while self._specs and (self.size > self.maxSize or len(self._specs) > self.maxSpecs):
+            specPath, entry = self._specs.popitem(last=False)
+            self._forget(specPath, entry)
+        return
+
+    def _chargeMaterialized(self):
+        """
+        _chargeMaterialized_
+
+        Charge the full memory of the lazy workloads materialized since they
+        were cached, with the lock held
+        """
+        materialized = [x for x in self._lazySpecs if self._specs[x][2].isMaterialized()]
+        for specPath in materialized:
+            entry = self._specs[specPath]
+            charge = MEMORY_FACTOR * entry[1]
+            if charge > self.maxSize:
+                self._forget(specPath, self._specs.pop(specPath))
+                continue
+            self.size += charge - entry[3]
+            self._specs[specPath] = entry[:3] + (charge,)
+            self._lazySpecs.discard(specPath)
+        if materialized:
+            self._evict()
+        return
+
+    def invalidate(self, specPath=None):
+        """
+        _invalidate_
+
+        Drop the cached workload of a spec, or all of them
+        """
+        with self._lock:
+            if specPath is None:
+                self.invalidations += len(self._specs)
+                self._specs.clear()
+                self._lazySpecs.clear()
+                self.size = 0
+            elif specPath in self._specs:
+                self._forget(specPath, self._specs.pop(specPath))
+                self.invalidations += 1
+        return
+
+    def invalidateWorkflow(self, workflowName):
+        """
+        _invalidateWorkflow_
+
+        Drop the cached workloads with the given name
+        """
+        with self._lock:
+            for specPath, entry in self._specs.items():
+                if entry[2].name() == workflowName:
+                    self._forget(specPath, self._specs.pop(specPath))
+                    self.invalidations += 1
+        return
+
+    def getStats(self):
+        """
+        _getStats_
+
+        Return the cache counters, size is the estimated memory of the
+        cached workloads
+        """
+        with self._lock:
+            self._chargeMaterialized()
+            lookups = self.hits + self.misses
+            return {"specs": len(self._specs), "lazySpecs": len(self._lazySpecs),
+                    "size": self.size, "hits": self.hits, "misses": self.misses,
+                    "hitRate": self.hits / lookups if lookups else 0.0,
+                    "invalidations": self.invalidations}
+
+
+_specCache = WMSpecCache()
+
+
+def getSpecCache():
+    """
+    _getSpecCache_
+
+    Return the spec cache of this process
+    """
+    return _specCache
+
+
+def specCacheSummary():
+    """
+    _specCacheSummary_
+
+    One line summary of the spec cache counters, for the component heartbeat.
+    Empty if the process didn't load any spec.
+    """
+    stats = _specCache.getStats()
+    lookups = stats["hits"] + stats["misses"]
+    if not lookups:
+        return ""
+    return "spec cache %.1f%% hits of %d, %d specs" % (100 * stats["hitRate"], lookups, stats["specs"])
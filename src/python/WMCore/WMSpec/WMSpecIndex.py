@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+_WMSpecIndex_
+
+Index sidecar of a pickled workload spec and a lazy workload helper reading it.
+
+Unpickling a whole workload, with every task, step and configuration
+section, is expensive while most agent components only look at a few
+attributes of one task.  The index holds a summary of the workload and of
+each of its tasks, it is written next to the spec when the sandbox is
+created and is a small fraction of the spec size.
+
+LazyWMWorkloadHelper answers from the index and only unpickles the spec the
+first time something outside of the summaries is accessed.
+"""
+from __future__ import print_function
+
+import copy
+import logging
+import os
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
+
+INDEX_SUFFIX = ".index"
+INDEX_VERSION = 1
+
+
+def specIndexPath(specPath):
+    """
+    _specIndexPath_
+
+    Path of the index sidecar of a spec file
+    """
+    return specPath + INDEX_SUFFIX
+
+
+def taskSummary(task):
+    """
+    _taskSummary_
+
+    Summary of the task attributes read by the agent components
+    """
+    try:
+        numberOfCores = task.getNumberOfCores()
+    except AttributeError:
+        numberOfCores = 1
+
+    return {"pathName": task.getPathName(),
+            "name": task.name(),
+            "taskType": task.taskType(),
+            "splitting": task.jobSplittingParameters(),
+            "sandbox": task.getSandbox(),
+            "inputDataset": task.getInputDatasetPath(),
+            "swVersion": task.getSwVersion(),
+            "scramArch": task.getScramArch(),
+            "numberOfCores": numberOfCores,
+            "generators": task.listGenerators()}
+
+
+def writeSpecIndex(workload, specPath):
+    """
+    _writeSpecIndex_
+
+    Write the index sidecar of a workload just saved to specPath.  The
+    index is tied to the spec file size and modification time, it is
+    ignored if the spec is saved again.
+    """
+    specStat = os.stat(specPath)
+    index = {"version": INDEX_VERSION,
+             "specSize": specStat.st_size,
+             "specMtime": specStat.st_mtime,
+             "name": workload.name(),
+             "owner": workload.getOwner(),
+             "allowOpportunistic": workload.getAllowOpportunistic(),
+             "tasks": {}}
+    for task in workload.taskIterator():
+        for taskNode in task.taskIterator():
+            # tasks which can't be summarised are read from the whole spec
+            try:
+                index["tasks"][taskNode.getPathName()] = taskSummary(taskNode)
+            except Exception as ex:
+                logging.debug("Task %s left out of the spec index: %s", taskNode.getPathName(), str(ex))
+
+    indexPath = specIndexPath(specPath)
+    tmpPath = "%s.%s" % (indexPath, os.getpid())
+    with open(tmpPath, 'wb') as handle:
+        pickle.dump(index, handle, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmpPath, indexPath)
+    return indexPath
+
+
+def loadSpecIndex(specPath):
+    """
+    _loadSpecIndex_
+
+    Load the index sidecar of a spec, return None if there is no index or
+    it doesn't belong to the current spec file.
+    """
+    try:
+        specStat = os.stat(specPath)
+        with open(specIndexPath(specPath), 'rb') as handle:
+            index = pickle.load(handle)
+    except Exception as ex:
+        logging.debug("No usable index for spec %s: %s", specPath, str(ex))
+        return None
+
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    if index["specSize"] != specStat.st_size or index["specMtime"] != specStat.st_mtime:
+        logging.debug("Index of spec %s is older than the spec", specPath)
+        return None
+    return index
+
+
+def loadWorkload(specPath):
+    """
+    _loadWorkload_
+
+    Return a LazyWMWorkloadHelper for the spec if it has a valid index,
+    otherwise the fully loaded WMWorkloadHelper
+    """
+    index = loadSpecIndex(specPath)
+    if index is not None:
+        return LazyWMWorkloadHelper(specPath, index)
+
+    wmWorkload = WMWorkloadHelper(WMWorkload("workload"))
+    wmWorkload.load(specPath)
+    return wmWorkload
+
+
+class LazyWMTaskHelper(object):
+    """
+    _LazyWMTaskHelper_
+
+    Task of a LazyWMWorkloadHelper.  The summarised attributes are read from
+    the index, any other attribute comes from the task of the fully loaded
+    workload.
+    """
+
+    def __init__(self, workload, summary):
+        self._workload = workload
+        self._summary = summary
+        self._task = None
+
+    def materialize(self):
+        """
+        _materialize_
+
+        Return the WMTaskHelper of the fully loaded workload
+        """
+        if self._task is None:
+            self._task = self._workload.materialize().getTaskByPath(self._summary["pathName"])
+        return self._task
+
+    def __getattr__(self, name):
+        return getattr(self.materialize(), name)
+
+    def getPathName(self):
+        return self._summary["pathName"]
+
+    def name(self):
+        return self._summary["name"]
+
+    def taskType(self):
+        return self._summary["taskType"]
+
+    def jobSplittingParameters(self, performance=True):
+        if not performance:
+            return self.materialize().jobSplittingParameters(performance)
+        return copy.deepcopy(self._summary["splitting"])
+
+    def getSandbox(self):
+        return self._summary["sandbox"]
+
+    def getInputDatasetPath(self):
+        return self._summary["inputDataset"]
+
+    def getSwVersion(self):
+        return self._summary["swVersion"]
+
+    def getScramArch(self):
+        return self._summary["scramArch"]
+
+    def getNumberOfCores(self):
+        return self._summary["numberOfCores"]
+
+    def listGenerators(self):
+        return list(self._summary["generators"])
+
+
+class LazyWMWorkloadHelper(object):
+    """
+    _LazyWMWorkloadHelper_
+
+    Stand-in for a WMWorkloadHelper built from the spec index.  The spec is
+    unpickled the first time an attribute which is not in the index is
+    accessed, from then on everything is delegated to the loaded workload.
+    """
+
+    def __init__(self, specPath, index):
+        self._specPath = specPath
+        self._index = index
+        self._workload = None
+        self._tasks = {}
+
+    def materialize(self):
+        """
+        _materialize_
+
+        Return the fully loaded WMWorkloadHelper
+        """
+        if self._workload is None:
+            logging.debug("Loading the whole spec %s", self._specPath)
+            self._workload = WMWorkloadHelper(WMWorkload("workload"))
+            self._workload.load(self._specPath)
+        return self._workload
+
+    def isMaterialized(self):
+        return self._workload is not None
+
+    def __getattr__(self, name):
+        return getattr(self.materialize(), name)
+
+    def name(self):
+        return self._index["name"]
+
+    def getOwner(self):
+        return dict(self._index["owner"])
+
+    def getAllowOpportunistic(self):
+        return self._index["allowOpportunistic"]
+
+    def getTaskByPath(self, taskPath):
+        """
+        _getTaskByPath_
+
+        Lazy task for the path, tasks missing from the index are looked up
+        in the fully loaded workload
+        """
+        if taskPath not in self._tasks:
+            summary = self._index["tasks"].get(taskPath)
+            if summary is None:
+                return self.materialize().getTaskByPath(taskPath)
+            self._tasks[taskPath] = LazyWMTaskHelper(self, summary)
+        return self._tasks[taskPath]
@@ -801,6 +801,14 @@ class WMTaskHelper(TreeHelper):
         """
         return getattr(self.data.input, "dataset", None)
 
+    def getSandbox(self):
+        """
+        _getSandbox_
+
+        Get the path of the sandbox archive of the task
+        """
+        return getattr(self.data.input, "sandbox", None)
+
     def getInputDatasetPath(self):
         """
         _getInputDatasetPath_
@@ -1325,6 +1333,17 @@ class WMTaskHelper(TreeHelper):
         """
         return getattr(self.data.parameters, 'processingString', None)
 
+    def getNumberOfCores(self):
+        """
+        _getNumberOfCores_
+
+        Get the largest number of cores used by the steps of this task
+        """
+        maxCores = 1
+        for stepName in self.listAllStepNames():
+            maxCores = max(maxCores, self.getStep(stepName).getNumberOfCores())
+        return maxCores
+
     def setNumberOfCores(self, cores):
         """
         _setNumberOfCores_
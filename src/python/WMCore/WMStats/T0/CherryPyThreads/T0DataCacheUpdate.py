@@ -11,6 +11,8 @@ class T0DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
 
+        # reader kept between the updates, its cache follows the couch changes
+        self.wmstatsDB = None
         CherryPyPeriodicTask.__init__(self, config)
 
     def setConcurrentTasks(self, config):
@@ -25,11 +27,15 @@ class T0DataCacheUpdate(CherryPyPeriodicTask):
         """
         try:
             if DataCache.islatestJobDataExpired():
-                wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url, 
-                                          reqdbCouchApp = "T0Request")
-                jobData = wmstatsDB.getT0ActiveData(jobInfoFlag = True)
+                if self.wmstatsDB is None:
+                    self.wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
+                                                   reqdbCouchApp="T0Request")
+                    self.wmstatsDB.enableCache(WMStatsReader.T0_ACTIVE_STATUS, staleTolerance=0,
+                                               maxChanges=getattr(config, "cacheMaxChanges", 5000))
+                jobData = self.wmstatsDB.getT0ActiveData(jobInfoFlag = True)
                 DataCache.setlatestJobData(jobData)
-                self.logger.info("DataCache is updated: %s", len(jobData))
+                self.logger.info("DataCache is updated: %s, cache %s", len(jobData),
+                                 self.wmstatsDB.getCacheStats())
         except Exception as ex:
             self.logger.error(str(ex))
         return
\ No newline at end of file
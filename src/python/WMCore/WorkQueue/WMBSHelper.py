@@ -196,12 +196,14 @@ class WMBSHelper(WMConnectionBase):
         self.dbsSetLocation = self.dbsDaoFactory(classname="DBSBufferFiles.SetLocationByLFN")
         self.dbsInsertLocation = self.dbsDaoFactory(classname="DBSBufferFiles.AddLocation")
         self.dbsSetChecksum = self.dbsDaoFactory(classname="DBSBufferFiles.AddChecksumByLFN")
+        self.dbsFilesExist = self.dbsDaoFactory(classname="DBSBufferFiles.ExistsForAccountant")
         self.dbsInsertWorkflow = self.dbsDaoFactory(classname="InsertWorkflow")
 
         # Added for file creation bookkeeping
         self.dbsFilesToCreate = []
         self.addedLocations = []
         self.wmbsFilesToCreate = []
+        self.wmbsFilesByLFN = {}
         self.insertedBogusDataset = -1
 
         return
@@ -446,6 +448,7 @@ class WMBSHelper(WMConnectionBase):
                 self._addACDCFileToWMBSFile(acdcFile)
         else:
             self.isDBS = True
+            self.wmbsFilesByLFN = {}
             for dbsFile in self.validFiles(block['Files']):
                 self._addDBSFileToWMBSFile(dbsFile, block['PhEDExNodeNames'])
 
@@ -512,6 +515,21 @@ class WMBSHelper(WMConnectionBase):
             # Whoops, nothing to do!
             return
 
+        # Find the files already in DBSBuffer with a single query and only
+        # create each of the other ones once
+        existingFiles = self.dbsFilesExist.execute(lfn=[x['lfn'] for x in self.dbsFilesToCreate],
+                                                   conn=self.getDBConn(),
+                                                   transaction=self.existingTransaction())
+        knownLFNs = set([x[0] for x in existingFiles])
+        dbsFilesToCreate = []
+        for dbsFile in self.dbsFilesToCreate:
+            if dbsFile['lfn'] not in knownLFNs:
+                knownLFNs.add(dbsFile['lfn'])
+                dbsFilesToCreate.append(dbsFile)
+        self.dbsFilesToCreate = dbsFilesToCreate
+        if len(self.dbsFilesToCreate) == 0:
+            return
+
         dbsFileTuples = []
         dbsFileLoc = []
         dbsCksumBinds = []
@@ -530,12 +548,9 @@ class WMBSHelper(WMConnectionBase):
             lfn = dbsFile['lfn']
             selfChecksums = dbsFile['checksums']
 
-            newTuple = (lfn, dbsFile['size'],
-                        dbsFile['events'], self.insertedBogusDataset,
-                        dbsFile['status'], self.topLevelTaskDBSBufferId)
-
-            if newTuple not in dbsFileTuples:
-                dbsFileTuples.append(newTuple)
+            dbsFileTuples.append((lfn, dbsFile['size'],
+                                  dbsFile['events'], self.insertedBogusDataset,
+                                  dbsFile['status'], self.topLevelTaskDBSBufferId))
 
             if len(dbsFile['newlocations']) < 1:
                 msg = ''
@@ -585,6 +600,9 @@ class WMBSHelper(WMConnectionBase):
         """
         This step is just for increase the performance for
         Accountant doesn't neccessary to check the parentage
+
+        Files already in DBSBuffer are filtered out in bulk when the files
+        are created, see _createFilesInDBSBuffer
         """
         dbsBuffer = DBSBufferFile(lfn=dbsFile["LogicalFileName"],
                                   size=dbsFile["FileSize"],
@@ -597,9 +615,7 @@ class WMBSHelper(WMConnectionBase):
                                appFam="Unknown", psetHash="Unknown",
                                configContent="Unknown")
 
-        if not dbsBuffer.exists():
-            self.dbsFilesToCreate.append(dbsBuffer)
-        # dbsBuffer.create()
+        self.dbsFilesToCreate.append(dbsBuffer)
         return
 
     def _addDBSFileToWMBSFile(self, dbsFile, storageElements, inFileset=True):
@@ -611,7 +627,14 @@ class WMBSHelper(WMConnectionBase):
         2. Assumes parents files are in the same location as child files.
            This is not True in general case, but workquue should only select work only
            where child and parent files are in the same location
+        Parents shared by several files of the block are only converted once.
         """
+        if dbsFile["LogicalFileName"] in self.wmbsFilesByLFN:
+            wmbsFile = self.wmbsFilesByLFN[dbsFile["LogicalFileName"]]
+            if inFileset:
+                wmbsFile['inFileset'] = True
+            return wmbsFile
+
         wmbsParents = []
         dbsFile.setdefault("ParentList", [])
         for parent in dbsFile["ParentList"]:
@@ -645,6 +668,7 @@ class WMBSHelper(WMConnectionBase):
 
         wmbsFile['inFileset'] = bool(inFileset)
         self.wmbsFilesToCreate.append(wmbsFile)
+        self.wmbsFilesByLFN[wmbsFile['lfn']] = wmbsFile
 
         return wmbsFile
 
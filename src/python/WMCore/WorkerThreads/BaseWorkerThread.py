@@ -20,6 +20,7 @@ from WMCore.Database.Transaction import Transaction
 from WMCore.Database.CMSCouch import CouchError
 from WMCore.Database.CouchUtils import CouchConnectionError
 from WMCore.Alerts import API as alertAPI
+from WMCore.WMSpec.WMSpecCache import specCacheSummary
 
 class BaseWorkerThread:
     """
@@ -169,7 +170,7 @@ class BaseWorkerThread:
                                 if hasattr(self.component.config, "Agent"):
                                     if getattr(self.component.config.Agent, "useHeartbeat", True):
                                         self.heartbeatAPI.updateWorkerHeartbeat(
-                                            myThread.getName(), "Running")
+                                            myThread.getName(), self.heartbeatState())
                             except (CouchError, CouchConnectionError) as ex:
                                 msg  = " Failed to update heartbeat for worker %s" % str(self)
                                 msg += ":\n %s" % str(ex)
@@ -237,7 +238,19 @@ class BaseWorkerThread:
         doesn't return any values
         """
         time.sleep( self.idleTime )
-        
+
+    def heartbeatState(self):
+        """
+        _heartbeatState_
+
+        State reported in the heartbeat of a running worker, with the spec
+        cache counters of the component if it loaded any spec.
+        """
+        summary = specCacheSummary()
+        if summary:
+            return "Running (%s)" % summary
+        return "Running"
+
     def initAlerts(self, compName = None):
         """
         _initAlerts_
@@ -26,7 +26,7 @@ from WMComponent.DBS3Buffer.DBSBufferFile import DBSBufferFile
 from WMComponent.DBS3Buffer.DBSBufferUtil import DBSBufferUtil
 from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock
 
-from WMComponent.DBS3Buffer.DBSUploadPoller import DBSUploadPoller
+from WMComponent.DBS3Buffer.DBSUploadPoller import DBSUploadPoller, RetryScheduler
 
 from WMQuality.Emulators.DBSClient.DBS3API import DbsApi as MockDbsApi
 from WMQuality.TestInit     import TestInit
@@ -611,5 +611,82 @@ class DBSUploadTest(unittest.TestCase):
             del os.environ["DONT_TRAP_EXIT"]
         return
 
+    def testRetryScheduler(self):
+        """
+        _testRetryScheduler_
+
+        Verify the exponential backoff of the block retries.
+        """
+        scheduler = RetryScheduler(baseDelay = 10, maxDelay = 35)
+        self.assertEqual([scheduler.schedule("blockA", now = 100) for _ in range(5)],
+                         [0, 10, 20, 35, 35])
+        scheduler.schedule("blockB", now = 100)
+        self.assertTrue("blockA" in scheduler)
+        self.assertEqual(len(scheduler), 2)
+        self.assertTrue(scheduler.isWaiting("blockA", now = 120))
+        self.assertFalse(scheduler.isWaiting("blockB", now = 120))
+        self.assertEqual(scheduler.due(now = 120), ["blockB"])
+        self.assertEqual(scheduler.due(now = 140), ["blockB", "blockA"])
+        scheduler.remove("blockB")
+        self.assertEqual(scheduler.due(now = 140), ["blockA"])
+        return
+
+    def testPipelinedUpload(self):
+        """
+        _testPipelinedUpload_
+
+        Upload blocks with more blocks than upload slots to the fake DBS,
+        verify that every block makes it there once and that the upload
+        latencies are recorded.
+        """
+        # Signal trapExit that we are a friend
+        os.environ["DONT_TRAP_EXIT"] = "True"
+        try:
+            from WMComponent.DBS3Buffer import DBSUploadPoller as MockDBSUploadPoller
+            MockDBSUploadPoller.DbsApi = MockDbsApi
+
+            myThread = threading.currentThread()
+            (_, dbsFilePath) = mkstemp(dir = self.testDir)
+            self.dbsUrl = dbsFilePath
+            config = self.getConfig()
+            config.DBS3Upload.nProcesses = 2
+            config.DBS3Upload.dbsMaxInFlight = 1
+            dbsUploader = MockDBSUploadPoller.DBSUploadPoller(config = config)
+
+            acqEra = "TropicalSeason%s" % (int(time.time()))
+            workflowName = 'TestWorkload%s' % (int(time.time()))
+            taskPath = '/%s/TestProcessing' % workflowName
+            self.injectWorkflow(workflowName, taskPath,
+                                MaxWaitTime = 2, MaxFiles = 2,
+                                MaxEvents = 200000000)
+            self.createParentFiles(acqEra, nFiles = 20,
+                                   workflowName = workflowName,
+                                   taskPath = taskPath)
+
+            dbsUploader.algorithm()
+            # The blocks with a mock proxy error are in DBS, they are found
+            # by the check
+            dbsUploader.checkBlocks()
+            self.assertEqual(len(dbsUploader.blocksToCheck), 0)
+            self.assertEqual(len(dbsUploader.blocksToRetry), 0)
+
+            fakeDBS = open(self.dbsUrl, 'r')
+            fakeDBSInfo = json.load(fakeDBS)
+            fakeDBS.close()
+            blockNames = [x['block']['block_name'] for x in fakeDBSInfo]
+            self.assertEqual(len(blockNames), 9)
+            self.assertEqual(len(set(blockNames)), 9)
+
+            latency = dbsUploader.latencySummary['latency']
+            self.assertEqual(latency['internalData']['nPoints'], 9)
+            self.assertEqual(dbsUploader.latencySummary['queueLatency']['internalData']['nPoints'], 9)
+
+            globalFiles = myThread.dbi.processData("SELECT id FROM dbsbuffer_file WHERE status = 'InDBS'")[0].fetchall()
+            self.assertEqual(len(globalFiles), 18)
+        finally:
+            # We don't trust anyone else with _exit
+            del os.environ["DONT_TRAP_EXIT"]
+        return
+
 if __name__ == '__main__':
     unittest.main()
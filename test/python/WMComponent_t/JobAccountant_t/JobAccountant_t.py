@@ -570,6 +570,84 @@ class JobAccountantTest(unittest.TestCase):
 
         return
 
+    def testPrefetchJobInfo(self):
+        """
+        _testPrefetchJobInfo_
+
+        Verify that the job information loaded in bulk for a slice of jobs is
+        the same as the one loaded job by job.
+        """
+        self.setupDBForSplitJobSuccess()
+        config = self.createConfig()
+        accountant = AccountantWorker(config = config)
+
+        jobIDs = [self.testJobA["id"], self.testJobB["id"], self.testJobC["id"]]
+        jobInfo = accountant.prefetchJobInfo(jobIDs)
+        self.assertEqual(sorted(jobInfo.keys()), sorted(jobIDs))
+        self.assertEqual(accountant.prefetchJobInfo([]), {})
+
+        for jobID in jobIDs:
+            wmbsJob = Job(id = jobID)
+            wmbsJob.load()
+            wmbsJob.getMask()
+
+            self.assertEqual(jobInfo[jobID]["outputMap"], self.getOutputMapAction.execute(jobID = jobID))
+            self.assertEqual(jobInfo[jobID]["jobType"], self.getJobTypeAction.execute(jobID = jobID))
+            self.assertEqual(jobInfo[jobID]["outputID"], wmbsJob.loadOutputID())
+            self.assertEqual(dict(jobInfo[jobID]["job"]["mask"]), dict(wmbsJob["mask"]))
+            self.assertEqual(jobInfo[jobID]["job"]["name"], wmbsJob["name"])
+            self.assertEqual(jobInfo[jobID]["job"]["state"], wmbsJob["state"])
+            self.assertEqual(jobInfo[jobID]["job"]["fwjr_path"], wmbsJob["fwjr_path"])
+
+        self.assertEqual(jobInfo[self.testJobB["id"]]["job"]["mask"]["FirstEvent"], 20000)
+        self.assertEqual(sorted(jobInfo[self.testJobA["id"]]["outputMap"].keys()),
+                         ["ALCARECOStreamCombined", "FEVT"])
+
+        accountant([{"id": self.testJobA["id"],
+                     "fwjr_path": jobInfo[self.testJobA["id"]]["job"]["fwjr_path"]}])
+        self.assertEqual(sorted(accountant.phaseTimings.keys()),
+                         ["commit", "handleJobs", "loadReports", "prefetch"])
+        self.verifyJobSuccess(self.testJobA["id"])
+        return
+
+    def testReportLoaderPool(self):
+        """
+        _testReportLoaderPool_
+
+        Verify that the reports loaded and digested by the report loader
+        processes are the same as the ones loaded in the worker.
+        """
+        self.setupDBForSplitJobSuccess()
+        config = self.createConfig()
+        fwjrBasePath = os.path.join(WMCore.WMBase.getTestBase(),
+                                    "WMComponent_t/JobAccountant_t/fwjrs/")
+        jobs = [{"id": self.testJobA["id"], "fwjr_path": fwjrBasePath + "SplitSuccessA.pkl"},
+                {"id": self.testJobB["id"], "fwjr_path": fwjrBasePath + "SplitSuccessB.pkl"},
+                {"id": self.testJobC["id"], "fwjr_path": fwjrBasePath + "EmptyJobReport.pkl"}]
+
+        serialReports = AccountantWorker(config = config).loadJobReports(jobs)
+        config.JobAccountant.reportLoaderProcesses = 2
+        accountant = AccountantWorker(config = config)
+        poolReports = accountant.loadJobReports(jobs)
+
+        for job, (report, digest), (serialReport, serialDigest) in zip(jobs, poolReports, serialReports):
+            self.assertEqual(report.getJobID(), job["id"])
+            self.assertEqual(digest["success"], serialDigest["success"])
+            self.assertEqual(digest["steps"], serialDigest["steps"])
+            self.assertEqual(digest["skippedFiles"], serialDigest["skippedFiles"])
+            self.assertEqual([x["lfn"] for x in digest["files"]],
+                             [x["lfn"] for x in serialDigest["files"]])
+            self.assertEqual(len(digest["files"]), len(report.getAllFiles()))
+        self.assertFalse(poolReports[2][1]["success"])
+        self.assertEqual(poolReports[2][0].getExitCode(), 84)
+
+        accountant(jobs[:2])
+        self.assertTrue(accountant.reportsPerSecond > 0)
+        accountant.close()
+        self.verifyJobSuccess(self.testJobA["id"])
+        self.verifyJobSuccess(self.testJobB["id"])
+        return
+
     def testSplitJobs(self):
         """
         _testSplitJobs_
@@ -194,5 +194,45 @@ class JobSubmitterCachingTest(unittest.TestCase):
                          "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
         return
 
+    def testSiteStateChange(self):
+        """
+        _testSiteStateChange_
+
+        Verify that a change in the site states only updates the cached jobs
+        that can run at the affected sites, instead of rebuilding the cache.
+        """
+        config            = self.createConfig()
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 20)
+        self.assertEqual(sorted(mySubmitterPoller.siteJobIndex.keys()),
+                         ["T1_UK_RAL", "T1_US_FNAL"])
+        fnalJobs = dict([(x, mySubmitterPoller.jobDataCache[x])
+                         for x in mySubmitterPoller.siteJobIndex["T1_US_FNAL"]])
+
+        # The RAL jobs can't run anywhere else, they are dropped from the cache
+        ResourceControl().changeSiteState("T1_UK_RAL", "Draining")
+        mySubmitterPoller.getThresholds()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10)
+        self.assertEqual(mySubmitterPoller.siteJobIndex.keys(), ["T1_US_FNAL"])
+        for jobID, jobInfo in fnalJobs.items():
+            self.assertTrue(mySubmitterPoller.jobDataCache[jobID] is jobInfo)
+
+        # and failed by the next refresh, the FNAL jobs are not reloaded
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10)
+        for jobID, jobInfo in fnalJobs.items():
+            self.assertTrue(mySubmitterPoller.jobDataCache[jobID] is jobInfo)
+            self.assertEqual(jobInfo['possibleSites'], frozenset(["T1_US_FNAL"]))
+
+        # Sites getting back to normal don't affect jobs that can't run there
+        ResourceControl().changeSiteState("T1_UK_RAL", "Normal")
+        mySubmitterPoller.getThresholds()
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10)
+        return
+
 if __name__ == "__main__":
     unittest.main()
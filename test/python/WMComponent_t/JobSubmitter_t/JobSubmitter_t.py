@@ -11,10 +11,14 @@ import cProfile
 import os
 import pickle
 import pstats
+import random
 import threading
 import time
 import unittest
 
+from collections import Counter
+from operator import itemgetter
+
 from nose.plugins.attrib import attr
 from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
 from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
@@ -24,6 +28,7 @@ from WMCore.ResourceControl.ResourceControl import ResourceControl
 from WMCore.Services.UUID import makeUUID
 from WMCore.WMBase import getTestBase
 from WMCore.WMBS.File import File
+from WMCore.WMBS.JobCacheIndex import INDEX_NAME, appendJobCacheRecords, jobCacheRecord
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Job import Job
 from WMCore.WMBS.JobGroup import JobGroup
@@ -34,6 +39,36 @@ from WMCore_t.WMSpec_t.TestSpec import testWorkload
 from WMQuality.TestInitCouchApp import TestInitCouchApp as TestInit
 from WMQuality.Emulators import EmulatorSetup
 
+def legacyAssignJobLocations(poller):
+    """
+    _legacyAssignJobLocations_
+
+    Former JobSubmitterPoller.assignJobLocations loop, going through all the
+    cached jobs sorted by priority and age.  Only returns the number of jobs
+    assigned to each site.
+    """
+    jobsCount = 0
+    assigned = Counter()
+    for jobPrio in sorted(poller.cachedJobs, reverse=True):
+        if jobsCount >= poller.maxJobsPerPoll:
+            break
+        for job in sorted(poller.cachedJobs[jobPrio].values(), key=itemgetter('timestamp')):
+            for siteName in job['possibleLocations']:
+                siteThresholds = poller.currentRcThresholds[siteName]
+                taskThresholds = siteThresholds['thresholds'][job['type']]
+                if siteThresholds["total_pending_jobs"] >= siteThresholds["total_pending_slots"] or \
+                   taskThresholds["task_pending_jobs"] >= taskThresholds["pending_slots"]:
+                    continue
+                siteThresholds["total_pending_jobs"] += 1
+                taskThresholds["task_pending_jobs"] += 1
+                jobsCount += 1
+                assigned[siteName] += 1
+                break
+            if jobsCount >= poller.maxJobsPerPoll:
+                break
+    return assigned
+
+
 class JobSubmitterTest(unittest.TestCase):
     """
     _JobSubmitterTest_
@@ -336,6 +371,10 @@ class JobSubmitterTest(unittest.TestCase):
         result = getJobsAction.execute(state = 'Executing', jobType = "Processing")
         self.assertEqual(len(result), nSubs * nJobs)
 
+        # Submitted jobs are gone from all the caches
+        self.assertEqual(jobSubmitter.cachedJobIDs, set())
+        self.assertEqual(jobSubmitter.jobDataCache, {})
+
         # Check assigned locations
         getLocationAction = self.daoFactory(classname = "Jobs.GetLocation")
         for jobId in result:
@@ -639,6 +678,54 @@ class JobSubmitterTest(unittest.TestCase):
 
         return
 
+    def testD_BrokenJobPickles(self):
+        """
+        _testD_BrokenJobPickles_
+
+        Check that jobs found in the job cache index whose pickled job is
+        missing or can't be loaded go to SubmitFailed without stopping the
+        submission of the other jobs
+        """
+        workloadName = "basicWorkload"
+        workload = self.createTestWorkload()
+        config = self.getConfig()
+        changeState = ChangeState(config)
+
+        nSubs = 2
+        nJobs = 10
+        site = "T2_US_UCSD"
+
+        self.setResourceThresholds(site, pendingSlots = 50, runningSlots = 100, tasks = ['Processing'],
+                                   Processing = {'pendingSlots' : 50, 'runningSlots' : 100})
+
+        jobGroupList = self.createJobGroups(nSubs = nSubs, nJobs = nJobs,
+                                            task = workload.getTask("ReReco"),
+                                            workloadSpec = os.path.join(self.testDir, 'workloadTest',
+                                                                        workloadName),
+                                            site = site)
+        for group in jobGroupList:
+            for job in group.jobs:
+                appendJobCacheRecords(os.path.join(os.path.dirname(job['cache_dir']), INDEX_NAME),
+                                      [(job['id'], jobCacheRecord(job))])
+            changeState.propagate(group.jobs, 'created', 'new')
+
+        # one pickled job is gone, another one is corrupted
+        os.remove(os.path.join(jobGroupList[0].jobs[0]['cache_dir'], 'job.pkl'))
+        with open(os.path.join(jobGroupList[1].jobs[0]['cache_dir'], 'job.pkl'), 'w') as handle:
+            handle.write("not a pickle")
+
+        jobSubmitter = JobSubmitterPoller(config = config)
+        jobSubmitter.algorithm()
+
+        getJobsAction = self.daoFactory(classname = "Jobs.GetAllJobs")
+        result = getJobsAction.execute(state = 'SubmitFailed', jobType = "Processing")
+        self.assertEqual(sorted(result), sorted([group.jobs[0]['id'] for group in jobGroupList]))
+        result = getJobsAction.execute(state = 'Executing', jobType = "Processing")
+        self.assertEqual(len(result), nSubs * nJobs - 2)
+        self.assertEqual(jobSubmitter.cachedJobIDs, set())
+
+        return
+
     def testE_SiteModesTest(self):
         """
         _testE_SiteModesTest_
@@ -805,5 +892,70 @@ class JobSubmitterTest(unittest.TestCase):
 
         return
 
+    @attr('performance')
+    def testG_AssignJobLocationsPerformance(self):
+        """
+        _testG_AssignJobLocationsPerformance_
+
+        Compare the job assignment of the priority heaps against the former
+        loop over all the cached jobs, with 500k synthetic jobs from 500 site
+        lists cached for 100 sites which have room for a few thousand of them.
+        """
+        nSites = 100
+        nJobs = 500000
+        sites = ["T2_XX_Site%03d" % i for i in range(nSites)]
+        taskTypes = ["Processing", "Production", "Merge"]
+
+        def thresholds():
+            rcThresholds = {}
+            for siteName in sites:
+                rcThresholds[siteName] = {"total_pending_slots": 50, "total_pending_jobs": 0,
+                                          "total_running_slots": 1000, "total_running_jobs": 0,
+                                          "thresholds": {}}
+                for taskType in taskTypes:
+                    rcThresholds[siteName]["thresholds"][taskType] = {"pending_slots": 30,
+                                                                     "task_pending_jobs": 0,
+                                                                     "max_slots": 1000,
+                                                                     "task_running_jobs": 0,
+                                                                     "priority": 1}
+            return rcThresholds
+
+        jobSubmitter = JobSubmitterPoller(config = self.getConfig())
+        jobSubmitter.maxJobsPerPoll = nJobs
+        random.seed(42)
+        # jobs of the same workflow share their site lists
+        siteLists = [random.sample(sites, random.randint(1, 5)) for _ in range(500)]
+        for jobID in range(nJobs):
+            possibleLocations = random.choice(siteLists)
+            jobPrio = random.choice([0, 10000, 20000, 100000])
+            cachedJob = {'id': jobID, 'type': random.choice(taskTypes), 'timestamp': jobID % 1000,
+                         'possibleLocations': possibleLocations}
+            jobSubmitter.cachedJobs.setdefault(jobPrio, {})[jobID] = cachedJob
+            jobSubmitter.cachedJobIDs.add(jobID)
+            jobSubmitter.jobDataCache[jobID] = {'id': jobID, 'packageDir': 'package',
+                                                'sandbox': 'sandbox',
+                                                'possibleSites': frozenset(possibleLocations),
+                                                'potentialSites': frozenset(possibleLocations)}
+            jobSubmitter._pushJobToHeap(jobPrio, cachedJob)
+
+        jobSubmitter.currentRcThresholds = thresholds()
+        startTime = time.time()
+        legacyAssigned = legacyAssignJobLocations(jobSubmitter)
+        legacyTime = time.time() - startTime
+
+        jobSubmitter.currentRcThresholds = thresholds()
+        startTime = time.time()
+        jobsToSubmit = jobSubmitter.assignJobLocations()
+        heapTime = time.time() - startTime
+
+        assigned = Counter([job['custom']['location'] for job in jobsToSubmit['package']])
+        self.assertEqual(assigned, legacyAssigned)
+        self.assertEqual(len(jobSubmitter.jobDataCache), nJobs - sum(assigned.values()))
+        self.assertEqual(jobSubmitter.cachedJobIDs, set(jobSubmitter.jobDataCache))
+
+        print("Assigned %d jobs: former loop %.2f s, priority heaps %.2f s" %
+              (sum(assigned.values()), legacyTime, heapTime))
+        return
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+_PerformanceSummary_t_
+
+Unit tests for the step performance summary of the TaskArchiver.
+"""
+from __future__ import print_function
+
+import copy
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Algorithms import MathAlgos
+from WMComponent.TaskArchiver.PerformanceSummary import summarizeStepPerformance
+
+
+def legacySummary(rows, failedJobs, histogramKeys, nBins, limit, nOffenders):
+    """
+    The step summary as it was computed row by row, with the failed jobs
+    as a list
+    """
+    output = {'jobTime': []}
+    outputFailed = {'jobTime': []}
+    final = {}
+    for row in rows:
+        for key in row.keys():
+            if key in ['startTime', 'stopTime', 'taskName', 'stepName', 'jobID']:
+                continue
+            if key not in output.keys():
+                output[key] = []
+                if len(failedJobs) > 0:
+                    outputFailed[key] = []
+            try:
+                output[key].append(float(row[key]))
+                if row['jobID'] in failedJobs:
+                    outputFailed[key].append(float(row[key]))
+            except TypeError:
+                if row[key] == None:
+                    output[key].append(0.0)
+                else:
+                    raise
+        try:
+            jobTime = row.get('stopTime', None) - row.get('startTime', None)
+            output['jobTime'].append(jobTime)
+            row['jobTime'] = jobTime
+            if row['jobID'] in failedJobs:
+                outputFailed['jobTime'].append(jobTime)
+        except TypeError:
+            pass
+
+    for key in output.keys():
+        final[key] = {}
+        offenders = sorted(rows, key=lambda k: k.get(key, 0.0), reverse=True)[:nOffenders]
+        if key in histogramKeys:
+            final[key]['histogram'] = MathAlgos.createHistogram(numList=output[key], nBins=nBins, limit=limit)
+            if len(failedJobs) > 0:
+                final[key]['errorsHistogram'] = MathAlgos.createHistogram(numList=outputFailed[key],
+                                                                          nBins=nBins, limit=limit)
+        else:
+            average, stdDev = MathAlgos.getAverageStdDev(numList=output[key])
+            final[key]['average'] = average
+            final[key]['stdDev'] = stdDev
+        final[key]['worstOffenders'] = offenders
+    return final
+
+
+def performanceRows(nJobs, seed=1234):
+    """
+    Performance rows of nJobs jobs, with some missing and None values and
+    some ties
+    """
+    rng = random.Random(seed)
+    rows = []
+    for jobID in range(1, nJobs + 1):
+        startTime = rng.randint(1000, 2000)
+        row = {'jobID': jobID, 'retry_count': rng.randint(0, 2),
+               'taskName': '/TestWorkload/ReReco', 'stepName': 'cmsRun1',
+               'startTime': startTime, 'stopTime': startTime + rng.randint(10, 500),
+               'AvgEventTime': rng.gauss(10, 2), 'TotalJobCPU': rng.randint(1, 20),
+               'PeakValueRss': rng.choice([1000.0, 2000.0, rng.uniform(500, 3000)]),
+               'writeTotalMB': rng.expovariate(0.1)}
+        if jobID % 7 == 0:
+            row['readTotalMB'] = None
+        if jobID % 11 == 0:
+            del row['stopTime']
+        if jobID % 13 == 0:
+            row['NumberOfThreads'] = 4
+        rows.append(row)
+    return rows
+
+
+class PerformanceSummaryTest(unittest.TestCase):
+
+    histogramKeys = ['AvgEventTime', 'writeTotalMB', 'jobTime']
+
+    def testLegacyEquivalence(self):
+        """
+        _testLegacyEquivalence_
+
+        The summary is the one computed row by row
+        """
+        for nJobs, failedJobs in [(1, []), (50, [3, 7, 11, 14]), (500, range(1, 500, 3))]:
+            rows = performanceRows(nJobs)
+            legacyRows = copy.deepcopy(rows)
+            summary = summarizeStepPerformance(rows, set(failedJobs), self.histogramKeys, 5, 5, 3)
+            legacy = legacySummary(legacyRows, failedJobs, self.histogramKeys, 5, 5, 3)
+            self.assertEqual(rows, legacyRows)
+            self.assertEqual(summary, legacy)
+            self.assertTrue('errorsHistogram' in summary['AvgEventTime'] or not failedJobs)
+        return
+
+    def testEmptyValues(self):
+        """
+        _testEmptyValues_
+
+        None values count as zero, other non numeric values are errors
+        """
+        rows = [{'jobID': 1, 'startTime': 1, 'stopTime': 11, 'TotalJobCPU': None},
+                {'jobID': 2, 'startTime': None, 'stopTime': 11, 'TotalJobCPU': 5}]
+        summary = summarizeStepPerformance(rows, set([2]), [], 5, 5, 1)
+        self.assertEqual(summary['TotalJobCPU']['average'], 2.5)
+        self.assertEqual(summary['jobTime']['average'], 10.0)
+        self.assertEqual(summary['TotalJobCPU']['worstOffenders'], [rows[1]])
+
+        rows[0]['TotalJobCPU'] = [1]
+        self.assertRaises(TypeError, summarizeStepPerformance, rows, set(), [], 5, 5, 1)
+        return
+
+    @attr('performance')
+    def testSummaryTime(self):
+        """
+        _testSummaryTime_
+
+        Time to summarise a step of a large workflow
+        """
+        nJobs = 20000
+        rows = performanceRows(nJobs)
+        failedJobs = range(1, nJobs, 10)
+        for name, summarize, failed in [("row by row", legacySummary, failedJobs),
+                                        ("columnar", summarizeStepPerformance, set(failedJobs))]:
+            startTime = time.time()
+            summarize(copy.deepcopy(rows), failed, self.histogramKeys, 10, 5, 3)
+            print("\n%s: %.3f secs" % (name, time.time() - startTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,17 @@ _BasicAlgos_t_
 Test class for Basic Algorithms
 """
 
+from __future__ import print_function
+
 import os
 import os.path
+import random
+import subprocess
+import time
 import unittest
+import zlib
+
+from nose.plugins.attrib import attr
 
 import WMCore.Algorithms.BasicAlgos as BasicAlgos
 from WMQuality.TestInitCouchApp import TestInitCouchApp
@@ -76,6 +84,94 @@ class testBasicAlgos(unittest.TestCase):
         self.assertEqual(info['Size'], 34)
         return
 
+    def makeFile(self, name, size, seed=1234):
+        """
+        Write a file of size random bytes
+        """
+        rng = random.Random(seed)
+        filename = os.path.join(self.testDir, name)
+        with open(filename, 'wb') as f:
+            f.write(bytes(bytearray(rng.getrandbits(8) for _ in range(size))))
+        return filename
+
+    @staticmethod
+    def cksum(filename):
+        """
+        Checksums of the file from the cksum command line tool and zlib
+        """
+        with open(filename, 'rb') as f:
+            adler32 = "%x" % (zlib.adler32(f.read()) & 0xffffffff)
+        return adler32, subprocess.check_output(["cksum", filename]).split()[0].decode()
+
+    def test_checksums(self):
+        """
+        _checksums_
+
+        Test the checksums against the cksum command line tool
+        """
+        sizes = [0, 1, 3, 255, 256, 4095, 4096, 65537, 1024 * 1024 + 17]
+        filenames = [self.makeFile("cksum%d.test" % size, size, seed=size) for size in sizes]
+        for filename in filenames:
+            self.assertEqual(BasicAlgos.calculateChecksums(filename), self.cksum(filename))
+
+        # across several buffers
+        bufferSize = BasicAlgos.CHECKSUM_BUFFER_SIZE
+        BasicAlgos.CHECKSUM_BUFFER_SIZE = 1000
+        try:
+            self.assertEqual(BasicAlgos.calculateChecksums(filenames[-1]), self.cksum(filenames[-1]))
+        finally:
+            BasicAlgos.CHECKSUM_BUFFER_SIZE = bufferSize
+
+        checksums = BasicAlgos.calculateChecksumsForFiles(filenames, nThreads=3)
+        self.assertEqual(checksums, dict((x, self.cksum(x)) for x in filenames))
+        return
+
+    def test_posixCksum(self):
+        """
+        _posixCksum_
+
+        The table driven and the zlib based cksum agree, in any chunks
+        """
+        data = open(self.makeFile("cksum.test", 10000), 'rb').read()
+        tableCksum = BasicAlgos.PosixCksum(accelerated=False)
+        zlibCksum = BasicAlgos.PosixCksum()
+        for start in range(0, len(data), 777):
+            tableCksum.update(data[start:start + 777])
+            zlibCksum.update(data[start:start + 777])
+            self.assertEqual(tableCksum.checksum(), zlibCksum.checksum())
+        self.assertEqual(zlibCksum.length, 10000)
+        self.assertEqual("%s" % zlibCksum.checksum(), self.cksum(os.path.join(self.testDir, "cksum.test"))[1])
+        self.assertEqual(BasicAlgos.PosixCksum().checksum(), 4294967295)
+        return
+
+    @attr('performance')
+    def test_checksumTime(self):
+        """
+        _checksumTime_
+
+        Time to checksum a large file in process and piping it to cksum
+        """
+        filename = os.path.join(self.testDir, "large.test")
+        with open(filename, 'wb') as f:
+            for _ in range(64):
+                f.write(os.urandom(1024 * 1024))
+
+        startTime = time.time()
+        cksumProcess = subprocess.Popen("cksum", stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        adler32Checksum = 1
+        with open(filename, 'rb') as f:
+            for chunk in iter((lambda: f.read(4096)), b''):
+                adler32Checksum = zlib.adler32(chunk, adler32Checksum)
+                cksumProcess.stdin.write(chunk)
+        cksumProcess.stdin.close()
+        cksumProcess.wait()
+        print("\ncksum subprocess: %.3f secs" % (time.time() - startTime))
+
+        startTime = time.time()
+        BasicAlgos.calculateChecksums(filename)
+        print("in process: %.3f secs" % (time.time() - startTime))
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
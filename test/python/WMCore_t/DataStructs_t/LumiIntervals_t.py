@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+_LumiIntervals_t_
+
+Unit tests for the sorted array lumi ranges.
+"""
+from __future__ import print_function
+
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
+from WMCore.DataStructs.LumiList import LumiList
+from WMCore.DataStructs.Mask import Mask
+from WMCore.DataStructs.Run import Run
+
+
+def expandCompactList(compactList):
+    """
+    _expandCompactList_
+
+    Turn a compact list into a set of (run, lumi) pairs.
+    """
+    lumis = set()
+    for run, ranges in compactList.items():
+        for first, last in ranges:
+            lumis.update([(int(run), x) for x in range(first, last + 1)])
+    return lumis
+
+
+def makeGoldenJSON(nRuns, nRanges, maxGap=20, maxLength=50, seed=None):
+    """
+    _makeGoldenJSON_
+
+    Build a compact list similar to a certification JSON, with nRanges
+    disjoint lumi ranges in each of the nRuns runs.
+    """
+    rand = random.Random(seed)
+    compactList = {}
+    for run in range(nRuns):
+        ranges = []
+        lumi = 1
+        for dummy in range(nRanges):
+            lumi += rand.randint(1, maxGap)
+            length = rand.randint(0, maxLength)
+            ranges.append([lumi, lumi + length])
+            lumi += length + 1
+        compactList[str(190000 + run)] = ranges
+    return compactList
+
+
+def legacyAnd(compactList, otherCompactList):
+    """
+    _legacyAnd_
+
+    The range by range intersection used before the sorted arrays.
+    """
+    result = {}
+    for run in set(compactList).intersection(otherCompactList):
+        lumiList = []
+        for alumi in compactList[run]:
+            for blumi in otherCompactList[run]:
+                if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]:
+                    lumiList.append(alumi)
+                if blumi[0] > alumi[0] and blumi[1] < alumi[1]:
+                    lumiList.append(blumi)
+                elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]:
+                    lumiList.append([alumi[0], blumi[1]])
+                elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]:
+                    lumiList.append([blumi[0], alumi[1]])
+        result[run] = lumiList
+    return LumiList(compactList=result)
+
+
+def legacyFilterLumis(compactList, lumiList):
+    """
+    _legacyFilterLumis_
+
+    The range by range lumi filter used before the sorted arrays.
+    """
+    filteredList = []
+    for (run, lumi) in lumiList:
+        for (first, last) in compactList.get(str(run), [[0, -1]]):
+            if lumi >= first and lumi <= last:
+                filteredList.append((run, lumi))
+                break
+    return filteredList
+
+
+class LumiIntervalsTest(unittest.TestCase):
+    """
+    _LumiIntervalsTest_
+
+    Compare the sorted array lumi ranges with sets of lumis.
+    """
+
+    def testMerge(self):
+        """
+        _testMerge_
+
+        Verify that overlapping and adjacent ranges are merged.
+        """
+        intervals = LumiIntervals({'1': [[10, 20], [1, 5], [6, 8], [15, 30], [40, 40]],
+                                   2: [[3, 3]], '3': []})
+        self.assertEqual(intervals.getCompactList(),
+                         {'1': [[1, 8], [10, 30], [40, 40]], '2': [[3, 3]], '3': []})
+        self.assertEqual(intervals.getRuns(), [1, 2, 3])
+        self.assertEqual(len(intervals), 3)
+        self.assertTrue('2' in intervals)
+        self.assertTrue(3 in intervals)
+        self.assertFalse(4 in intervals)
+        return
+
+    def testMembership(self):
+        """
+        _testMembership_
+
+        Verify the single and bulk lumi lookups.
+        """
+        intervals = LumiIntervals({'1': [[1, 8], [10, 30], [40, 40]], '5': [[1, 0xFFFFFFF]]})
+        for lumi in range(50):
+            self.assertEqual(intervals.contains(1, lumi),
+                             1 <= lumi <= 8 or 10 <= lumi <= 30 or lumi == 40)
+        self.assertTrue(intervals.contains('5', 100000))
+        self.assertFalse(intervals.contains(2, 1))
+
+        self.assertEqual(intervals.filterRunLumis(1, [41, 40, 9, 8, 1, 0]), [40, 8, 1])
+        self.assertEqual(intervals.filterRunLumis(2, [1, 2]), [])
+        self.assertEqual(intervals.filterLumis([(1, 9), (1, 10), ('5', 7), (2, 1), (1, 40)]),
+                         [(1, 10), ('5', 7), (1, 40)])
+        return
+
+    def testRandomSetOperations(self):
+        """
+        _testRandomSetOperations_
+
+        Compare the set operations with sets of lumis on random ranges.
+        """
+        rand = random.Random(1234)
+        for dummy in range(200):
+            compactLists = []
+            for dummy2 in range(2):
+                compactList = {}
+                for run in rand.sample(range(1, 5), rand.randint(0, 4)):
+                    ranges = []
+                    for dummy3 in range(rand.randint(1, 6)):
+                        first = rand.randint(1, 60)
+                        ranges.append([first, first + rand.randint(0, 10)])
+                    compactList[str(run)] = ranges
+                compactLists.append(compactList)
+
+            a, b = [LumiIntervals(x) for x in compactLists]
+            aLumis, bLumis = [expandCompactList(x) for x in compactLists]
+            self.assertEqual(expandCompactList((a & b).getCompactList()), aLumis & bLumis)
+            self.assertEqual(expandCompactList((a | b).getCompactList()), aLumis | bLumis)
+            self.assertEqual(expandCompactList((a - b).getCompactList()), aLumis - bLumis)
+
+            # the results are merged and don't hold empty runs
+            for result in [a & b, a | b, a - b]:
+                compactList = result.getCompactList()
+                self.assertEqual(LumiIntervals(compactList).getCompactList(), compactList)
+                self.assertTrue([] not in compactList.values())
+
+            # LumiList gives the same results with the old range by range code
+            aList, bList = [LumiList(compactList=x) for x in compactLists]
+            self.assertEqual((aList & bList).getCompactList(),
+                             legacyAnd(aList.getCompactList(), bList.getCompactList()).getCompactList())
+            pairs = [(rand.randint(1, 5), rand.randint(0, 80)) for dummy2 in range(50)]
+            self.assertEqual(aList.filterLumis(pairs),
+                             legacyFilterLumis(aList.getCompactList(), pairs))
+        return
+
+    def testMaskFilter(self):
+        """
+        _testMaskFilter_
+
+        Verify that masks with unmerged and very large ranges filter runs.
+        """
+        mask = Mask()
+        mask.addRunAndLumis(run=1, lumis=[1, 0xFFFFFFF])
+        mask.addRunAndLumis(run=2, lumis=[5, 10])
+        mask.addRunAndLumis(run=2, lumis=[8, 12])
+        runs = [Run(1, 3, 1, 2), Run(2, 1, 5, 11, 12, 13), Run(2, 9), Run(3, 1)]
+        filtered = sorted([(x.run, x.lumis) for x in mask.filterRunLumisByMask(runs)])
+        self.assertEqual(filtered, [(1, [1, 2, 3]), (2, [5, 9, 11, 12])])
+        return
+
+    @attr('performance')
+    def testGoldenJSONPerformance(self):
+        """
+        _testGoldenJSONPerformance_
+
+        Time the set operations and lumi filtering of LumiList on golden JSON
+        sized lists with 100k lumi ranges, against the range by range code.
+        """
+        golden = LumiList(compactList=makeGoldenJSON(2000, 50, seed=1))
+        other = LumiList(compactList=makeGoldenJSON(2000, 50, seed=2))
+        nRanges = sum([len(x) for x in golden.getCompactList().values()])
+        self.assertTrue(nRanges >= 100000)
+
+        rand = random.Random(3)
+        pairs = [(190000 + rand.randint(0, 1999), rand.randint(1, 3000)) for dummy in range(200000)]
+
+        startTime = time.time()
+        legacyResult = legacyAnd(golden.getCompactList(), other.getCompactList())
+        legacyAndTime = time.time() - startTime
+        startTime = time.time()
+        legacyFiltered = legacyFilterLumis(golden.getCompactList(), pairs)
+        legacyFilterTime = time.time() - startTime
+
+        startTime = time.time()
+        result = golden & other
+        andTime = time.time() - startTime
+        startTime = time.time()
+        filtered = golden.filterLumis(pairs)
+        filterTime = time.time() - startTime
+        startTime = time.time()
+        golden | other
+        golden - other
+        orSubTime = time.time() - startTime
+
+        self.assertEqual(result.getCompactList(), legacyResult.getCompactList())
+        self.assertEqual(filtered, legacyFiltered)
+        print("%d ranges: and %.2f s (legacy %.2f s), filter %d lumis %.2f s (legacy %.2f s), "
+              "or and sub %.2f s" % (nRanges, andTime, legacyAndTime, len(pairs), filterTime,
+                                     legacyFilterTime, orSubTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+_CouchBulkPurge_t_
+
+Unit tests for the paginated couch purge, against an in memory view.
+"""
+from __future__ import print_function
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Database.CouchBulkPurge import CouchBulkPurge
+
+
+class FakeViewDatabase(object):
+    """
+    Database with a single view of (key, docid) pairs, served with the
+    startkey/startkey_docid/endkey/limit semantics of couch
+    """
+
+    def __init__(self, docs, failPosts=(), failLoads=(), postDelay=0):
+        self.name = "fake/jobs"
+        self.docs = dict((docId, {'key': key, 'rev': "1-%s" % docId}) for key, docId in docs)
+        self.failPosts = set(failPosts)
+        self.failLoads = set(failLoads)
+        self.postDelay = postDelay
+        self.loads = 0
+        self.posts = 0
+        self.inFlight = 0
+        self.maxInFlight = 0
+        self.lock = threading.Lock()
+
+    def loadView(self, design, view, options):
+        self.loads += 1
+        if self.loads in self.failLoads:
+            raise RuntimeError("view timeout")
+        # objects sort after strings
+        endKey = [u"\uffff" if x == {} else x for x in options["endkey"]] \
+            if isinstance(options["endkey"], list) else options["endkey"]
+        startKey = (options["startkey"], options.get("startkey_docid", ""))
+        rows = []
+        with self.lock:
+            for docId in sorted(self.docs, key=lambda x: (self.docs[x]['key'], x)):
+                key = self.docs[docId]['key']
+                if (key, docId) < startKey or key > endKey:
+                    continue
+                rows.append({'id': docId, 'key': key, 'value': {'id': docId, 'rev': self.docs[docId]['rev']}})
+        return {'rows': rows[:options["limit"]]}
+
+    def post(self, uri, data):
+        with self.lock:
+            self.posts += 1
+            post = self.posts
+            self.inFlight += 1
+            self.maxInFlight = max(self.maxInFlight, self.inFlight)
+        time.sleep(self.postDelay)
+        try:
+            if post in self.failPosts:
+                raise RuntimeError("bulk docs timeout")
+            results = []
+            with self.lock:
+                for doc in data['docs']:
+                    if doc['_id'].endswith("conflict"):
+                        results.append({'id': doc['_id'], 'error': 'conflict', 'reason': 'Document update conflict.'})
+                    else:
+                        del self.docs[doc['_id']]
+                        results.append({'id': doc['_id'], 'rev': "2-%s" % doc['_id']})
+            return results
+        finally:
+            with self.lock:
+                self.inFlight -= 1
+
+
+class CouchBulkPurgeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpointDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpointDir)
+
+    @staticmethod
+    def workflowDocs(workflow, nDocs):
+        docIds = ["%s-%05d" % (workflow, i) for i in range(nDocs)]
+        return [([workflow, docId], docId) for docId in docIds]
+
+    def testPagination(self):
+        """
+        _testPagination_
+
+        All the docs of the workflow are deleted in pages, the other
+        workflows are left alone
+        """
+        couchDB = FakeViewDatabase(self.workflowDocs("wf1", 1005) + self.workflowDocs("wf2", 10))
+        purge = CouchBulkPurge(couchDB, "JobDump", "jobsByWorkflowName", pageSize=100,
+                               maxInFlight=3, checkpointDir=self.checkpointDir)
+        report = purge.purge("wf1", {"startkey": ["wf1"], "endkey": ["wf1", {}]})
+        self.assertEqual(report['status'], 'ok')
+        self.assertEqual(report['delete'], 1005)
+        self.assertEqual(report['message'], {})
+        self.assertTrue(report['pages'] >= 11)
+        self.assertTrue(report['rate'] > 0)
+        self.assertEqual(sorted(couchDB.docs), [docId for _, docId in self.workflowDocs("wf2", 10)])
+        self.assertTrue(couchDB.maxInFlight <= 3)
+        self.assertEqual(purge.loadCheckpoint("wf1"), None)
+
+        report = purge.purge("wf1", {"startkey": ["wf1"], "endkey": ["wf1", {}]})
+        self.assertEqual(report['status'], 'warning')
+        return
+
+    def testErrors(self):
+        """
+        _testErrors_
+
+        Conflicts and failed bulk requests are counted in the error report
+        """
+        docs = self.workflowDocs("wf1", 250) + [(["wf1", "wf1-99999-conflict"], "wf1-99999-conflict")]
+        couchDB = FakeViewDatabase(docs, failPosts=[2])
+        purge = CouchBulkPurge(couchDB, "JobDump", "jobsByWorkflowName", pageSize=100)
+        report = purge.purge("wf1", {"startkey": ["wf1"], "endkey": ["wf1", {}]})
+        self.assertEqual(report['status'], 'error')
+        self.assertEqual(report['message']['conflict'], 1)
+        # the second page has 99 or 100 docs, depending on the first one being deleted
+        failed = report['message']['bulk docs timeout']
+        self.assertTrue(failed in (99, 100))
+        self.assertEqual(report['delete'], 250 - failed)
+        self.assertEqual(len(couchDB.docs), failed + 1)
+        return
+
+    def testResume(self):
+        """
+        _testResume_
+
+        A purge interrupted by a view failure resumes from its checkpoint
+        """
+        couchDB = FakeViewDatabase(self.workflowDocs("wf1", 500), failLoads=[3])
+        purge = CouchBulkPurge(couchDB, "JobDump", "jobsByWorkflowName", pageSize=100,
+                               maxInFlight=1, checkpointDir=self.checkpointDir)
+        options = {"startkey": ["wf1"], "endkey": ["wf1", {}]}
+        report = purge.purge("wf1", options)
+        self.assertEqual(report['status'], 'error')
+        self.assertTrue(report['delete'] in (199, 200))
+        checkpoint = purge.loadCheckpoint("wf1")
+        self.assertEqual(checkpoint['docid'], "wf1-%05d" % (report['delete'] - 1))
+        self.assertEqual(checkpoint['delete'], report['delete'])
+
+        report = purge.purge("wf1", options)
+        self.assertEqual(report['status'], 'ok')
+        self.assertEqual(report['delete'], 500)
+        self.assertEqual(couchDB.docs, {})
+        self.assertEqual(purge.loadCheckpoint("wf1"), None)
+        return
+
+    def testKey(self):
+        """
+        _testKey_
+
+        A single key selects the docs to delete
+        """
+        docs = [("wf%d" % (i % 3), "doc%02d" % i) for i in range(30)]
+        couchDB = FakeViewDatabase(docs)
+        purge = CouchBulkPurge(couchDB, "WMStatsAgent", "allWorkflows", pageSize=3)
+        report = purge.purge("wf1", {"key": "wf1"})
+        self.assertEqual(report['delete'], 10)
+        self.assertEqual(len(couchDB.docs), 20)
+        self.assertFalse([doc for doc in couchDB.docs.values() if doc['key'] == "wf1"])
+        return
+
+    @attr('performance')
+    def testThroughput(self):
+        """
+        _testThroughput_
+
+        Deletion rate with and without overlapping the bulk requests
+        """
+        for maxInFlight in [1, 4]:
+            couchDB = FakeViewDatabase(self.workflowDocs("wf1", 20000), postDelay=0.05)
+            purge = CouchBulkPurge(couchDB, "JobDump", "jobsByWorkflowName", pageSize=1000,
+                                   maxInFlight=maxInFlight)
+            report = purge.purge("wf1", {"startkey": ["wf1"], "endkey": ["wf1", {}]})
+            print("\nmaxInFlight %d: %.1f docs/s" % (maxInFlight, report['rate']))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ _DBCore_t_
 
 Unit tests for the DBInterface class
 """
+from __future__ import print_function
 
 
 
@@ -11,6 +12,9 @@ Unit tests for the DBInterface class
 import unittest
 import logging
 import threading
+import time
+
+from nose.plugins.attrib import attr
 
 from WMQuality.TestInit import TestInit
 
@@ -315,5 +319,89 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testProcessDataInKey(self):
+        """
+        _testProcessDataInKey_
+
+        Verify that bulk selects with an IN list return the same rows as the
+        per bind loop, across several IN list chunks.
+        """
+        insertBinds = []
+        for i in range(1200):
+            insertBinds.append({"one": i, "two": i % 2, "three": str(i)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = \
+          """SELECT column1, column2, column3 FROM test_tablea
+             WHERE column1 = :one AND column2 = :two"""
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = insertBinds)
+
+        selectBinds = []
+        for i in range(0, 1200, 2):
+            selectBinds.append({"one": i, "two": 0})
+
+        loopResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds):
+            loopResults.extend([tuple(row) for row in resultSet.fetchall()])
+
+        myThread.dbi.maxInListSize = 7
+        bulkResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds,
+                                                  inKey = "one"):
+            bulkResults.extend([tuple(row) for row in resultSet.fetchall()])
+
+        self.assertEqual(len(bulkResults), 600)
+        self.assertEqual(sorted(bulkResults), sorted(loopResults))
+
+        # Duplicated values are only selected once
+        bulkResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, selectBinds * 2,
+                                                  inKey = "one"):
+            bulkResults.extend([tuple(row) for row in resultSet.fetchall()])
+        self.assertEqual(sorted(bulkResults), sorted(loopResults))
+
+        # Binds that differ in more than the IN key use the per bind loop
+        mixedBinds = [{"one": 1, "two": 1}, {"one": 2, "two": 0}]
+        mixedResults = []
+        for resultSet in myThread.dbi.processData(selectSQL, mixedBinds,
+                                                  inKey = "one"):
+            mixedResults.extend([tuple(row) for row in resultSet.fetchall()])
+        self.assertEqual(sorted(mixedResults), [(1, 1, "1"), (2, 0, "2")])
+
+        return
+
+    @attr('performance')
+    def testProcessDataInKeyPerformance(self):
+        """
+        _testProcessDataInKeyPerformance_
+
+        Compare the per bind select loop with the bulk IN list select.
+        """
+        insertBinds = []
+        for i in range(20000):
+            insertBinds.append({"one": i, "two": i * 2, "three": str(i)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea WHERE column1 = :one"
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = insertBinds)
+        selectBinds = [{"one": i} for i in range(20000)]
+
+        startTime = time.time()
+        loopResults = myThread.dbi.processData(selectSQL, selectBinds)
+        loopTime = time.time() - startTime
+
+        startTime = time.time()
+        bulkResults = myThread.dbi.processData(selectSQL, selectBinds, inKey = "one")
+        bulkTime = time.time() - startTime
+
+        self.assertEqual(sum([len(x.fetchall()) for x in loopResults]),
+                         sum([len(x.fetchall()) for x in bulkResults]))
+        print("Per bind select: %.3f s, IN list select: %.3f s" % (loopTime, bulkTime))
+        return
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,7 +7,9 @@ Unit tests for the DBFormatter class
 """
 from __future__ import print_function
 
+import resource
 import threading
+import time
 import unittest
 
 from nose.plugins.attrib import attr
@@ -94,6 +96,68 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         output = dbformatter.formatOneDict(result)
         self.assertEqual(output, {'bind2': 'value2a', 'bind1': 'value1a'})
 
+    def testColumnarFormatting(self):
+        """
+        Test that columnar results are formatted like regular ones
+        """
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        expected = dbformatter.formatDict(myThread.dbi.processData(myThread.select))
+        result = myThread.dbi.processData(myThread.select, columnar = True)
+        self.assertEqual(dbformatter.formatDict(result), expected)
+
+        result = myThread.dbi.processData(myThread.select, columnar = True)
+        output = dbformatter.formatDictLazy(result)
+        self.assertEqual(len(output), 3)
+        self.assertEqual(list(output), expected)
+
+        result = myThread.dbi.processData(myThread.select, columnar = True)
+        self.assertEqual(dbformatter.format(result), [['value1a', 'value2a'], \
+                                  ['value1b', 'value2b'], ['value1c', 'value2d']])
+        result = myThread.dbi.processData(myThread.select, columnar = True)
+        self.assertEqual(dbformatter.formatOneDict(result),
+                         {'bind2': 'value2a', 'bind1': 'value1a'})
+        return
+
+    @attr('performance')
+    def testColumnarMemory(self):
+        """
+        Compare time and peak memory of formatDict on a regular result set
+        with the streaming formatting of a columnar one.  The columnar pass
+        runs first as the peak RSS only ever grows.
+        """
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+        nRows = 500000
+
+        binds = []
+        for i in range(nRows):
+            binds.append({'bind1': 'value1_%d' % i, 'bind2': 'value2_%d' % i})
+        myThread.dbi.processData(myThread.insert, binds)
+        del binds
+
+        startRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        startTime = time.time()
+        result = myThread.dbi.processData(myThread.select, columnar = True)
+        count = 0
+        for dummyRow in dbformatter.formatDictLazy(result):
+            count += 1
+        lazyTime = time.time() - startTime
+        del result
+        lazyRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        startTime = time.time()
+        result = myThread.dbi.processData(myThread.select)
+        output = dbformatter.formatDict(result)
+        dictTime = time.time() - startTime
+        dictRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        self.assertEqual(count, len(output))
+        print("Columnar + lazy dicts: %.2f s, peak RSS growth %d kB" % (lazyTime, lazyRSS - startRSS))
+        print("ResultSet + formatDict: %.2f s, peak RSS growth %d kB" % (dictTime, dictRSS - lazyRSS))
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -16,7 +16,7 @@ import threading
 import os
 
 from WMCore.WMFactory import WMFactory
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, ColumnarResultSet
 from WMQuality.TestInit import TestInit
 
 
@@ -119,6 +119,40 @@ class ResultSetTest(unittest.TestCase):
 
         return
 
+    def testColumnarResultSet(self):
+        """
+        _testColumnarResultSet_
+
+        Verify that the ColumnarResultSet holds the same rows as the ResultSet
+        and that rows can be accessed by position and by column name.
+        """
+        binds = []
+        for i in range(2500):
+            binds.append({'column1': 'value1%s' % i, 'column2': 'value2%s' % i})
+        self.myThread.dbi.processData('insert into test_tablec (column1, column2) values (:column1, :column2)', binds)
+
+        sql = "select column1, column2 from test_tablec"
+        testSet = ResultSet()
+        testSet.add(self.myThread.dbi.connection().execute(sql))
+        columnarSet = ColumnarResultSet()
+        columnarSet.add(self.myThread.dbi.connection().execute(sql), batchSize = 1000)
+
+        self.assertEqual(len(columnarSet), 2500)
+        self.assertEqual([x.lower() for x in columnarSet.keys],
+                         [x.lower() for x in testSet.keys])
+        self.assertEqual([list(x) for x in columnarSet.fetchall()],
+                         [list(x) for x in testSet.fetchall()])
+        self.assertEqual(list(columnarSet.fetchone()), list(testSet.fetchone()))
+
+        row = columnarSet.fetchall()[10]
+        self.assertEqual(row[0], row[columnarSet.keys[0]])
+        self.assertEqual(len(row), 2)
+
+        dicts = list(columnarSet.iterDicts())
+        self.assertEqual(len(dicts), 2500)
+        self.assertEqual(dicts[10], {'column1': str(row[0]), 'column2': str(row[1])})
+        return
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+_CompactReport_t_
+
+Unit tests for the compact framework job report format.
+"""
+from __future__ import print_function
+
+import marshal
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.Run import Run
+from WMCore.FwkJobReport.CompactReport import _HEADER, compressLumis, expandLumis
+from WMCore.FwkJobReport.Report import Report
+from WMCore.WMBase import getTestBase
+from WMCore_t.FwkJobReport_t.XMLParser_t import writeLargeReport
+
+
+class CompactReportTest(unittest.TestCase):
+    """
+    _CompactReportTest_
+
+    Compare reports saved in the compact format with pickled reports.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.xmlPath = os.path.join(getTestBase(),
+                                    "WMCore_t/FwkJobReport_t/CMSSWProcessingReport.xml")
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def makeReport(self, xmlPath=None):
+        """
+        _makeReport_
+
+        Build a two step report with errors, performance information and
+        settings that don't fit in the simple types.
+        """
+        report = Report("cmsRun1")
+        report.parse(xmlPath or self.xmlPath)
+        report.setTaskName("/ReReco/DataProcessing")
+        report.setJobID(42)
+        report.addError("cmsRun1", 8020, "FileOpenError", "Unable to open file")
+        report.addSkippedFile("/store/data/skipped.root", "skipped.root")
+        report.setStepStartTime("cmsRun1")
+        report.setStepStopTime("cmsRun1")
+
+        report.addStep("stageOut1")
+        report.report.cleanup.removed.fileCount = 1
+        # not a simple type, has to be pickled
+        report.data.stageOut1._internal_skipChecks = True
+        report.data.stageOut1.runInfo = Run(1, 2, 3)
+        report.data.stageOut1.unicodeList = [u"a", "b", 1L, 2.5, None, (1, 2)]
+        return report
+
+    def roundTrip(self, report, compact):
+        """
+        _roundTrip_
+
+        Save and load a report.
+        """
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath, compact=compact)
+        loadedReport = Report()
+        loadedReport.unpersist(reportPath)
+        return loadedReport
+
+    def assertSameSection(self, section, otherSection):
+        """
+        _assertSameSection_
+
+        Recursively compare two ConfigSections.
+        """
+        self.assertEqual(section._internal_name, otherSection._internal_name)
+        self.assertEqual(section._internal_documentation, otherSection._internal_documentation)
+        self.assertEqual(section._internal_docstrings, otherSection._internal_docstrings)
+        self.assertEqual(section._internal_skipChecks, otherSection._internal_skipChecks)
+        self.assertEqual(section._internal_settings, otherSection._internal_settings)
+        self.assertEqual(section._internal_children, otherSection._internal_children)
+        for name in section._internal_settings:
+            value = getattr(section, name)
+            otherValue = getattr(otherSection, name)
+            if name in section._internal_children:
+                self.assertTrue(otherValue._internal_parent_ref is otherSection)
+                self.assertSameSection(value, otherValue)
+            elif isinstance(value, Run):
+                self.assertEqual((value.run, value.lumis), (otherValue.run, otherValue.lumis))
+            else:
+                self.assertEqual(value, otherValue)
+                self.assertEqual(type(value), type(otherValue))
+                if isinstance(value, list):
+                    self.assertEqual([type(x) for x in value], [type(x) for x in otherValue])
+        return
+
+    def testLumiCompression(self):
+        """
+        _testLumiCompression_
+
+        Verify that lumi lists are rebuilt exactly, whatever their order.
+        """
+        for lumis in [[], [1], [1, 2, 3, 4], [5, 1, 2, 3, 3, 4, 10, 11, 7]]:
+            self.assertEqual(expandLumis(compressLumis(lumis)), lumis)
+        self.assertEqual(compressLumis(range(1, 501)), [1, 500])
+        return
+
+    def testRoundTrip(self):
+        """
+        _testRoundTrip_
+
+        Verify that a report saved in the compact format loads back the same
+        as a pickled report.
+        """
+        report = self.makeReport()
+        pickledReport = self.roundTrip(report, compact=False)
+        compactReport = self.roundTrip(report, compact=True)
+
+        self.assertSameSection(pickledReport.data, compactReport.data)
+        self.assertEqual(pickledReport.__to_json__(None), compactReport.__to_json__(None))
+        self.assertEqual(compactReport.getExitCode(), 8020)
+        self.assertEqual(compactReport.getTaskName(), "/ReReco/DataProcessing")
+        self.assertEqual(compactReport.getAllSkippedFiles(), ["/store/data/skipped.root"])
+        self.assertEqual(len(compactReport.getAllFilesFromStep("cmsRun1")), 2)
+
+        # a loaded report can be modified and saved again
+        compactReport.addStep("logArch1")
+        compactReport.setStepStatus("logArch1", 0)
+        self.assertSameSection(compactReport.data,
+                               self.roundTrip(compactReport, compact=True).data)
+        return
+
+    def testPartialLoad(self):
+        """
+        _testPartialLoad_
+
+        Load only the errors and output files of the steps.
+        """
+        report = self.makeReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath)
+
+        partialReport = Report()
+        partialReport.load(reportPath, stepSections=["errors", "output"])
+        self.assertEqual(partialReport.listSteps(), ["cmsRun1", "stageOut1"])
+        self.assertEqual(partialReport.getExitCode(), 8020)
+        self.assertEqual(partialReport.getStepExitCode("cmsRun1"), 8020)
+        self.assertEqual(partialReport.getTaskName(), "/ReReco/DataProcessing")
+        self.assertEqual(len(partialReport.getAllFilesFromStep("cmsRun1")), 2)
+        self.assertFalse(hasattr(partialReport.data.cmsRun1, "performance"))
+        self.assertFalse(hasattr(partialReport.data.cmsRun1, "input"))
+
+        self.assertSameSection(partialReport.data.cmsRun1.output, report.data.cmsRun1.output)
+        self.assertSameSection(partialReport.data.cmsRun1.errors, report.data.cmsRun1.errors)
+        return
+
+    def testMarshalVersion(self):
+        """
+        _testMarshalVersion_
+
+        Verify that a report written with a newer marshal version is refused.
+        """
+        report = self.makeReport()
+        reportPath = os.path.join(self.testDir, "Report.pkl")
+        report.persist(reportPath)
+
+        with open(reportPath, "r+b") as handle:
+            header = handle.read(_HEADER.size)
+            magic, version, dummyMarshalVersion, tocLength = _HEADER.unpack(header)
+            handle.seek(0)
+            handle.write(_HEADER.pack(magic, version, marshal.version + 1, tocLength))
+
+        self.assertRaises(ValueError, Report().load, reportPath)
+        return
+
+    @attr('performance')
+    def testLoadPerformance(self):
+        """
+        _testLoadPerformance_
+
+        Compare loading pickled and compact reports, with a report with 10k
+        lumis.
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        writeLargeReport(xmlPath, 2, 5, 1000)
+        report = self.makeReport(xmlPath)
+
+        nLoads = 200
+        for compact in [False, True]:
+            reportPath = os.path.join(self.testDir, "Report.pkl")
+            report.persist(reportPath, compact=compact)
+            startTime = time.time()
+            for dummy in range(nLoads):
+                Report().load(reportPath)
+            loadTime = time.time() - startTime
+
+            startTime = time.time()
+            for dummy in range(nLoads):
+                Report().load(reportPath, stepSections=["errors", "output"])
+            partialTime = time.time() - startTime
+
+            print("%s: %d bytes, %.1f reports/s, %.1f partial reports/s" %
+                  ("compact" if compact else "pickled", os.path.getsize(reportPath),
+                   nLoads / loadTime, nLoads / partialTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
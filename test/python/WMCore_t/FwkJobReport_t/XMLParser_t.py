@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Check the single pass FWJR parser against the Node based one.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.XMLParser import xmlToJobReport, streamXMLToJobReport
+from WMCore.WMBase import getTestBase
+
+
+def writeLargeReport(xmlPath, nFiles, nRuns, nLumis):
+    """
+    _writeLargeReport_
+
+    Write a report with an input and an output file for each of the nFiles,
+    each of them with nRuns runs of nLumis lumi sections.
+    """
+    runsXML = ["<Runs>\n"]
+    for run in range(nRuns):
+        runsXML.append('<Run ID="%d">\n' % (100000 + run))
+        runsXML.extend(['   <LumiSection ID="%d"/>\n' % (lumi + 1) for lumi in range(nLumis)])
+        runsXML.append("</Run>\n")
+    runsXML.append("</Runs>\n")
+    runsXML = "".join(runsXML)
+
+    with open(xmlPath, "w") as handle:
+        handle.write("<FrameworkJobReport>\n")
+        for i in range(nFiles):
+            handle.write("""<InputFile>
+<State  Value="closed"/>
+<LFN>/store/data/Run2016/MinimumBias/RAW/v1/000/input%(i)d.root</LFN>
+<PFN>root://eoscms.cern.ch//eos/cms/store/data/Run2016/MinimumBias/RAW/v1/000/input%(i)d.root</PFN>
+<Catalog></Catalog>
+<ModuleLabel>source</ModuleLabel>
+<GUID>142F3F42-C5D6-DE11-945D-%(i)012d</GUID>
+<Branches>
+  <Branch>FEDRawDataCollection_rawDataCollector__LHC.</Branch>
+</Branches>
+<InputType>primaryFiles</InputType>
+<InputSourceClass>PoolSource</InputSourceClass>
+<EventsRead>%(events)d</EventsRead>
+%(runs)s</InputFile>
+""" % {'i': i, 'events': nRuns * nLumis * 10, 'runs': runsXML})
+        for i in range(nFiles):
+            handle.write("""<File>
+<State  Value="closed"/>
+<LFN>/store/unmerged/Run2016/MinimumBias/RECO/v1/000/output%(i)d.root</LFN>
+<PFN>outputRECO%(i)d.root</PFN>
+<Catalog></Catalog>
+<ModuleLabel>outputRECO%(i)d</ModuleLabel>
+<OutputModuleClass>PoolOutputModule</OutputModuleClass>
+<GUID>7E3359C8-222E-DF11-B2B0-%(i)012d</GUID>
+<DataType>Data</DataType>
+<BranchHash>0ad8b2ddb3d0f1f1e0a1b6c5f1bd2ac2</BranchHash>
+<TotalEvents>%(events)d</TotalEvents>
+%(runs)s<Branches>
+  <Branch>recoTracks_generalTracks__RECO.</Branch>
+</Branches>
+<Inputs>
+  <Input>
+    <LFN>/store/data/Run2016/MinimumBias/RAW/v1/000/input%(i)d.root</LFN>
+    <PFN>input%(i)d.root</PFN>
+    <FastCopying>1</FastCopying>
+  </Input>
+</Inputs>
+</File>
+""" % {'i': i, 'events': nRuns * nLumis * 10, 'runs': runsXML})
+        handle.write("""<ReadBranches>
+</ReadBranches>
+<PerformanceReport>
+  <PerformanceSummary Metric="Timing">
+    <Metric Name="TotalJobCPU" Value="1234.5"/>
+  </PerformanceSummary>
+</PerformanceReport>
+</FrameworkJobReport>
+""")
+    return
+
+
+class XMLParserTest(unittest.TestCase):
+    """
+    _XMLParserTest_
+
+    Compare the reports built by the streaming parser and by the Node based
+    parser.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.xmlDir = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def parseBoth(self, xmlPath):
+        """
+        _parseBoth_
+
+        Parse a report with both parsers and return both reports.
+        """
+        reference = Report("cmsRun1")
+        xmlToJobReport(reference, xmlPath)
+        streamed = Report("cmsRun1")
+        streamXMLToJobReport(streamed, xmlPath)
+        return reference, streamed
+
+    def assertSameReport(self, reference, streamed):
+        """
+        _assertSameReport_
+
+        Verify that the two reports are identical, down to the order their
+        attributes were set.
+        """
+        self.assertEqual(streamed.data.dictionary_whole_tree_(),
+                         reference.data.dictionary_whole_tree_())
+        self.assertEqual(str(streamed.data), str(reference.data))
+        return
+
+    def testEquivalence(self):
+        """
+        _testEquivalence_
+
+        Parse all the CMSSW reports used in the unit tests with both parsers,
+        including the corrupted ones.
+        """
+        xmlFiles = [x for x in os.listdir(self.xmlDir) if x.endswith(".xml")]
+        self.assertTrue(len(xmlFiles) > 5)
+        for xmlFile in xmlFiles:
+            xmlPath = os.path.join(self.xmlDir, xmlFile)
+            try:
+                xmlToJobReport(Report("cmsRun1"), xmlPath)
+            except Exception as ex:
+                self.assertRaises(type(ex), streamXMLToJobReport, Report("cmsRun1"), xmlPath)
+                continue
+            reference, streamed = self.parseBoth(xmlPath)
+            self.assertSameReport(reference, streamed)
+        return
+
+    def testReportContents(self):
+        """
+        _testReportContents_
+
+        Verify the contents of a streamed report.
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        writeLargeReport(xmlPath, 2, 3, 4)
+        reference, streamed = self.parseBoth(xmlPath)
+        self.assertSameReport(reference, streamed)
+
+        inputFiles = streamed.getInputFilesFromStep("cmsRun1")
+        self.assertEqual(len(inputFiles), 2)
+        self.assertEqual(inputFiles[1]["lfn"], "/store/data/Run2016/MinimumBias/RAW/v1/000/input1.root")
+        self.assertEqual(inputFiles[1]["events"], 120)
+        self.assertEqual(sorted([(x.run, x.lumis) for x in inputFiles[1]["runs"]]),
+                         [(100000, [1, 2, 3, 4]), (100001, [1, 2, 3, 4]), (100002, [1, 2, 3, 4])])
+
+        outputFiles = streamed.getFilesFromOutputModule("cmsRun1", "outputRECO0")
+        self.assertEqual(len(outputFiles), 1)
+        self.assertEqual(outputFiles[0]["input"],
+                         ["/store/data/Run2016/MinimumBias/RAW/v1/000/input0.root"])
+        self.assertEqual(streamed.report.performance.cpu.TotalJobCPU, "1234.5")
+        return
+
+    def testBadXML(self):
+        """
+        _testBadXML_
+
+        Verify that errors are reported the same way.
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        with open(xmlPath, "w") as handle:
+            handle.write("<FrameworkJobReport>\n<File>\n<LFN>/store/file.root</LFN>\n</File>\n")
+
+        report = Report("cmsRun1")
+        self.assertRaises(Exception, report.parse, xmlPath)
+        self.assertEqual(report.getExitCode(), 50115)
+        return
+
+    @attr('performance')
+    def testLargeReportPerformance(self):
+        """
+        _testLargeReportPerformance_
+
+        Time both parsers on a report with 100k lumi sections.
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        writeLargeReport(xmlPath, 10, 10, 500)
+
+        startTime = time.time()
+        reference = Report("cmsRun1")
+        xmlToJobReport(reference, xmlPath)
+        referenceTime = time.time() - startTime
+
+        startTime = time.time()
+        streamed = Report("cmsRun1")
+        streamXMLToJobReport(streamed, xmlPath)
+        streamTime = time.time() - startTime
+
+        self.assertSameReport(reference, streamed)
+        print("%.1f MB report: Node based parser %.2f s, streaming parser %.2f s" %
+              (os.path.getsize(xmlPath) / 1024.0 / 1024.0, referenceTime, streamTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
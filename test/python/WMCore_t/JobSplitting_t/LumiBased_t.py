@@ -8,12 +8,14 @@ Lumi based splitting test.
 import unittest
 
 from WMCore.DataStructs.File import File
+from WMCore.DataStructs.LumiIntervals import LumiIntervals
 from WMCore.DataStructs.Fileset import Fileset
 from WMCore.DataStructs.Job import Job
 from WMCore.DataStructs.Subscription import Subscription
 from WMCore.DataStructs.Workflow import Workflow
 from WMCore.DataStructs.Run import Run
 
+from WMCore.JobSplitting.LumiBased import isGoodLumi, isGoodRun
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 from WMCore.Services.UUID import makeUUID
 
@@ -302,5 +304,31 @@ class LumiBasedTest(unittest.TestCase):
         jobs = jobGroups[0].jobs
         self.assertEqual(len(jobs), 3)
 
+    def testD_GoodLumis(self):
+        """
+        _testD_GoodLumis_
+
+        No mask accepts everything, an empty set of lumi ranges rejects
+        everything
+        """
+        for goodRunList in [None, {}]:
+            self.assertTrue(isGoodRun(goodRunList, 1))
+            self.assertTrue(isGoodLumi(goodRunList, 1, 5))
+
+        for goodRunList in [{'1': [[1, 10]]}, LumiIntervals({'1': [[1, 10]]})]:
+            self.assertTrue(isGoodRun(goodRunList, 1))
+            self.assertFalse(isGoodRun(goodRunList, 2))
+            self.assertTrue(isGoodLumi(goodRunList, 1, 5))
+            self.assertFalse(isGoodLumi(goodRunList, 1, 11))
+            self.assertFalse(isGoodLumi(goodRunList, 2, 5))
+
+        emptyMask = LumiIntervals({'1': [[1, 10]]}) & LumiIntervals({'1': [[20, 30]]})
+        self.assertEqual(len(emptyMask), 0)
+        for goodRunList in [emptyMask, LumiIntervals({})]:
+            self.assertFalse(isGoodRun(goodRunList, 1))
+            self.assertFalse(isGoodLumi(goodRunList, 1, 5))
+        self.assertFalse(isGoodLumi({'1': []}, 1, 5))
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,7 +9,7 @@ from cherrypy import response
 from cherrypy.test import webtest
 
 # WMCore modules
-from WMCore.REST.Server import RESTApi, RESTEntity, restcall, rows
+from WMCore.REST.Server import RESTApi, RESTEntity, restcall, rows, _StreamCapture
 from WMCore.REST.Test import setup_dummy_server, fake_authz_headers
 from WMCore.REST.Test import fake_authz_key_file
 from WMCore.REST.Validation import validate_num, validate_str
@@ -65,12 +65,52 @@ class Image(RESTEntity):
     def get(self):
         return gif_bytes
 
+class Cached(RESTEntity):
+    calls = 0
+
+    def validate(self, apiobj, method, api, param, safe):
+        validate_num("n", param, safe, optional=True)
+        if method == 'GET':
+            validate_str("_nostale", param, safe, re.compile("^true$"), optional=True)
+
+    @restcall(cache_ttl=300)
+    def get(self, n, _nostale):
+        Cached.calls += 1
+        return rows([Cached.calls])
+
+    @restcall
+    def put(self, n):
+        return rows(["ok"])
+
+class CachedLarge(RESTEntity):
+    calls = 0
+
+    def validate(self, *args): pass
+
+    @restcall(cache_ttl=300, etag_limit=1000)
+    def get(self):
+        CachedLarge.calls += 1
+        return rows([[CachedLarge.calls, "x" * 100] for _ in range(50)])
+
+class CachedCompressible(RESTEntity):
+    calls = 0
+
+    def validate(self, *args): pass
+
+    @restcall(cache_ttl=300, etag_limit=1000)
+    def get(self):
+        CachedCompressible.calls += 1
+        return rows([[CachedCompressible.calls, "x" * 100] for _ in range(50)])
+
 class Root(RESTApi):
     def __init__(self, app, config, mount):
         RESTApi.__init__(self, app, config, mount)
         self._add({ "simple": Simple(app, self, config, mount),
                     "image":  Image(app, self, config, mount),
-                    "multi":  Multi(app, self, config, mount) })
+                    "multi":  Multi(app, self, config, mount),
+                    "cached": Cached(app, self, config, mount),
+                    "cachedlarge": CachedLarge(app, self, config, mount),
+                    "cachedcompressible": CachedCompressible(app, self, config, mount) })
 
 class Tester(webtest.WebCase):
 
@@ -244,6 +284,95 @@ class Tester(webtest.WebCase):
             assert b["result"][i][0] == "row"
             assert b["result"][i][1] == i
 
+    def test_cached(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cached", headers = h)
+        self.assertStatus("200 OK")
+        first = json.loads(self.body)["result"][0]
+        etag = dict(self.headers)["Etag"]
+
+        self.getPage("/test/cached", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("X-REST-Status", "100")
+        self.assertHeader("ETag", etag)
+        assert json.loads(self.body)["result"][0] == first
+
+        self.getPage("/test/cached", headers = h + [("Accept-Encoding", "gzip")])
+        self.assertStatus("200 OK")
+        self.assertHeader("Content-Encoding", "gzip")
+        b = json.loads(zlib.decompress(self.body, 16 + zlib.MAX_WBITS))
+        assert b["result"][0] == first
+
+        self.getPage("/test/cached", headers = h + [("If-None-Match", etag)])
+        self.assertStatus(304)
+
+        self.getPage("/test/cached?n=1", headers = h)
+        assert json.loads(self.body)["result"][0] != first
+
+        # _nostale requests neither use nor fill the cache
+        self.getPage("/test/cached?_nostale=true", headers = h)
+        self.assertStatus("200 OK")
+        fresh = json.loads(self.body)["result"][0]
+        assert fresh > first
+        self.getPage("/test/cached", headers = h)
+        assert json.loads(self.body)["result"][0] == first
+
+        self.getPage("/test/cached", method = "PUT", body = "n=1",
+                     headers = h + [("Content-Type", "application/x-www-form-urlencoded"),
+                                    ("Content-Length", "3")])
+        self.assertStatus("200 OK")
+        self.getPage("/test/cached", headers = h)
+        self.assertStatus("200 OK")
+        assert json.loads(self.body)["result"][0] > first
+
+    def test_cached_over_limit(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cachedlarge", headers = h)
+        self.assertStatus("200 OK")
+        first = json.loads(self.body)["result"]
+        assert len(first) == 50
+        assert "Etag" not in dict(self.headers)
+
+        # streamed responses over the ETag limit are not cached
+        self.getPage("/test/cachedlarge", headers = h)
+        self.assertStatus("200 OK")
+        assert json.loads(self.body)["result"][0][0] > first[0][0]
+
+    def test_cached_compressed(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        h.append(("Accept-Encoding", "gzip"))
+        self.getPage("/test/cachedcompressible", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("Content-Encoding", "gzip")
+        assert len(self.body) < 1000
+        first = json.loads(zlib.decompress(self.body, 16 + zlib.MAX_WBITS))["result"]
+        assert len(json.dumps(first)) > 1000
+        etag = dict(self.headers)["Etag"]
+
+        # over the ETag limit uncompressed, but within it compressed
+        self.getPage("/test/cachedcompressible", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("ETag", etag)
+        b = json.loads(zlib.decompress(self.body, 16 + zlib.MAX_WBITS))
+        assert b["result"] == first
+
+    def test_stream_capture(self):
+        chunks = ["a" * 10, "b" * 10, "c" * 10]
+        capture = _StreamCapture(25)
+        stream = capture.stream(iter(chunks))
+        assert [stream.next(), stream.next()] == chunks[:2]
+        assert capture.complete and capture.chunks == chunks[:2]
+        assert list(stream) == chunks[2:]
+        assert not capture.complete and capture.chunks == []
+        assert capture.body() is None
+
+        capture = _StreamCapture(30)
+        assert list(capture.stream(iter(chunks))) == chunks
+        assert capture.body() == "".join(chunks)
+
 def setup_server():
     srcfile = __file__.split("/")[-1].split(".py")[0]
     setup_dummy_server(srcfile, "Root", authz_key_file=FAKE_FILE, port=PORT)
@@ -1,10 +1,21 @@
+from __future__ import print_function
+
+import json
+import time
+import unittest
+import zlib
+
+from nose.plugins.attrib import attr
+
 from WMCore.REST.Format import RESTFormat
 from WMCore.REST.Format import XMLFormat
 from WMCore.REST.Format import JSONFormat
+from WMCore.REST.Format import PrettyJSONFormat
 from WMCore.REST.Format import RawFormat
 from WMCore.REST.Format import DigestETag
 from WMCore.REST.Format import MD5ETag
 from WMCore.REST.Format import SHA1ETag
+from WMCore.REST.Format import _json_encoders, _stream_compressor, json_encoder, default_json_encoder
 RESTFormat()
 XMLFormat("app")
 JSONFormat()
@@ -12,3 +23,99 @@ RawFormat()
 DigestETag('md5')
 MD5ETag()
 SHA1ETag()
+
+PREAMBLE = '{"result": [\n'
+TRAILER = ']}\n'
+
+
+def makeRows(nRows):
+    """Rows like the ones of a request listing"""
+    return [{"RequestName": "amaltaro_TaskChain_%d" % i, "RequestStatus": "running-closed",
+             "RequestPriority": 100000 + i, "FilterEfficiency": 0.987654321 * i,
+             "Teams": ["production"], "SiteWhitelist": ["T1_US_FNAL", "T2_CH_CERN"],
+             "OutputDatasets": ["/Primary/Era-Proc-v%d/AODSIM" % i]} for i in range(nRows)]
+
+
+class JSONFormatTest(unittest.TestCase):
+
+    def stream(self, formatter, rows, preamble=PREAMBLE):
+        etag = SHA1ETag()
+        chunks = list(formatter.stream_chunked(iter(rows), etag, preamble, TRAILER))
+        return chunks, etag.value()
+
+    def testBatchedOutput(self):
+        """Rows are batched in chunks of whole lines with the same output"""
+        rows = makeRows(500)
+        legacy = PREAMBLE + " " + "\n,".join([json.dumps(x) for x in rows]) + "\n" + TRAILER
+        legacyETag = SHA1ETag()
+        legacyETag.update(legacy)
+
+        for encoder in [None, 'json']:
+            chunks, etag = self.stream(JSONFormat(encoder, max_chunk=4096), rows)
+            self.assertEqual(chunks[0], PREAMBLE)
+            self.assertEqual(json.loads("".join(chunks)), {"result": rows})
+            self.assertTrue(len(chunks) > 2)
+            for chunk in chunks:
+                self.assertTrue(chunk.endswith("\n"))
+                self.assertTrue(len(chunk) < 4096 + 1024)
+            if encoder == 'json':
+                self.assertEqual("".join(chunks), legacy)
+                self.assertEqual(etag, legacyETag.value())
+
+        chunks, dummyETag = self.stream(JSONFormat(), [], preamble=None)
+        self.assertEqual(chunks, [TRAILER])
+
+    def testPrettyOutput(self):
+        """PrettyJSONFormat output is the same as with json.dumps"""
+        rows = makeRows(20)
+        chunks, dummyETag = self.stream(PrettyJSONFormat(max_chunk=1024), rows)
+        legacy = PREAMBLE + " " + ",".join([json.dumps(x, indent=2) for x in rows]) + TRAILER
+        self.assertEqual("".join(chunks), legacy)
+
+    def testEncoderFallback(self):
+        """Objects the fast encoders can't handle go to the standard library"""
+        encode = json_encoder()
+        for obj in [2 ** 70, {1: "a"}, [1.0 / 3, u"\u00e9"]]:
+            self.assertEqual(json.loads(encode(obj)), json.loads(json.dumps(obj)))
+        self.assertTrue(default_json_encoder in _json_encoders)
+
+    def testStreamCompressors(self):
+        """deflate and gzip streams expand back to the original chunks"""
+        chunks = [json.dumps(x) + "\n" for x in makeRows(2000)]
+        for method, wbits in [('deflate', -zlib.MAX_WBITS), ('gzip', 16 + zlib.MAX_WBITS)]:
+            parts = list(_stream_compressor[method](iter(chunks), 9, 16 * 1024))
+            self.assertTrue(len(parts) > 1)
+            z = zlib.decompressobj(wbits)
+            data = "".join([z.decompress(part) for part in parts]) + z.flush()
+            self.assertEqual(data, "".join(chunks))
+            self.assertTrue(z.unused_data == "")
+
+            # also a complete stream for empty replies
+            z = zlib.decompressobj(wbits)
+            self.assertEqual(z.decompress("".join(_stream_compressor[method](iter([]), 9, 1024))), "")
+
+    @attr('performance')
+    def testFormatPerformance(self):
+        """Rows per second for JSONFormat and PrettyJSONFormat"""
+        rows = makeRows(100000)
+        legacyChunks = []
+        startTime = time.time()
+        etag = SHA1ETag()
+        for obj in rows:
+            chunk = "," + json.dumps(obj) + "\n"
+            etag.update(chunk)
+            legacyChunks.append(chunk)
+        legacyTime = time.time() - startTime
+        print("\nper row json.dumps and ETag update: %.0f rows/s" % (len(rows) / legacyTime))
+
+        for name, formatter in [('JSONFormat %s' % default_json_encoder, JSONFormat()),
+                                ('JSONFormat json', JSONFormat('json')),
+                                ('PrettyJSONFormat', PrettyJSONFormat())]:
+            startTime = time.time()
+            chunks, dummyETag = self.stream(formatter, rows)
+            formatTime = time.time() - startTime
+            print("%s: %.0f rows/s in %d chunks" % (name, len(rows) / formatTime, len(chunks)))
+
+
+if __name__ == '__main__':
+    unittest.main()
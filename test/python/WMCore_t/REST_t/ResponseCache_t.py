@@ -0,0 +1,134 @@
+from __future__ import print_function
+
+import time
+import unittest
+import zlib
+
+import cherrypy
+from cherrypy.lib.httputil import HeaderMap
+from nose.plugins.attrib import attr
+
+from WMCore.REST.Format import JSONFormat, SHA1ETag
+from WMCore.REST.ResponseCache import ResponseCache
+
+
+class Args(object):
+    """Validated arguments like the ones given to the API methods"""
+
+    def __init__(self, *args, **kwargs):
+        self.args = list(args)
+        self.kwargs = kwargs
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.request = cherrypy._cprequest.Request(None, None)
+        self.request.headers = HeaderMap()
+        self.response = cherrypy._cprequest.Response()
+        cherrypy.serving.load(self.request, self.response)
+
+    def tearDown(self):
+        cherrypy.serving.clear()
+
+    def store(self, cache, api, body, ttl=60, **kwargs):
+        key = cache.key(api, 'application/json', Args(**kwargs))
+        cache.put(key, cache.generation(api), '"%s"' % api, body, ttl)
+        return key
+
+    def testKey(self):
+        """Arguments and format are part of the key"""
+        key = ResponseCache.key('request', 'application/json', Args(name=['a', 'b'], status=[]))
+        self.assertEqual(key, ResponseCache.key('request', 'application/json',
+                                                Args(status=[], name=['a', 'b'])))
+        self.assertNotEqual(key, ResponseCache.key('request', 'text/plain',
+                                                   Args(name=['a', 'b'], status=[])))
+        self.assertNotEqual(key, ResponseCache.key('request', 'application/json',
+                                                   Args(name=['b', 'a'], status=[])))
+
+    def testExpiryAndEviction(self):
+        """Entries expire after their ttl and the cache stays under max_size"""
+        cache = ResponseCache(max_size=1000)
+        expired = self.store(cache, 'request', 'x' * 100, ttl=-1)
+        self.assertEqual(cache.get(expired), None)
+        self.assertEqual(cache.stats()['size'], 0)
+
+        keys = [self.store(cache, 'request', 'x' * 300, name=i) for i in range(3)]
+        self.assertEqual(cache.get(keys[0]).etag, '"request"')
+        # keys[1] is the least recently used one
+        self.store(cache, 'request', 'x' * 300, name=3)
+        self.assertEqual(cache.get(keys[1]), None)
+        self.assertNotEqual(cache.get(keys[0]), None)
+        self.assertTrue(cache.stats()['size'] <= 1000)
+
+        # too large to be cached at all
+        key = self.store(cache, 'request', 'x' * 2000, name=4)
+        self.assertEqual(cache.get(key), None)
+        self.assertEqual(cache.stats()['entries'], 3)
+
+    def testInvalidate(self):
+        """Writes drop the entries of the API and the ones being computed"""
+        cache = ResponseCache()
+        key = self.store(cache, 'request', 'x')
+        otherKey = self.store(cache, 'status', 'y')
+        generation = cache.generation('request')
+        cache.invalidate('request')
+        self.assertEqual(cache.get(key), None)
+        self.assertNotEqual(cache.get(otherKey), None)
+
+        # response computed before the invalidation is not stored
+        cache.put(key, generation, '"x"', 'x', 60)
+        self.assertEqual(cache.get(key), None)
+        cache.put(key, cache.generation('request'), '"x"', 'x', 60)
+        self.assertNotEqual(cache.get(key), None)
+
+        generation = cache.generation('status')
+        cache.invalidate()
+        self.assertEqual(cache.stats()['entries'], 0)
+        cache.put(otherKey, generation, '"y"', 'y', 60)
+        self.assertEqual(cache.get(otherKey), None)
+
+    def testReply(self):
+        """Cached replies are compressed on demand and honour If-None-Match"""
+        cache = ResponseCache()
+        body = '{"result": [\n' + ",".join(['{"a": %d}\n' % i for i in range(1000)]) + ']}\n'
+        key = self.store(cache, 'request', body)
+        entry = cache.get(key)
+
+        self.assertEqual(cache.reply(key, entry, ['deflate', 'gzip'], 9, 4096), body)
+        self.assertEqual(self.response.headers['ETag'], '"request"')
+        self.assertEqual(self.response.headers['Content-Length'], len(body))
+        self.assertFalse('Content-Encoding' in self.response.headers)
+
+        self.request.headers['Accept-Encoding'] = 'gzip'
+        reply = cache.reply(key, entry, ['deflate', 'gzip'], 9, 4096)
+        self.assertEqual(self.response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(zlib.decompress(reply, 16 + zlib.MAX_WBITS), body)
+        self.assertTrue(entry.bodies['gzip'] is reply)
+        self.assertEqual(cache.stats()['size'], len(body) + len(reply))
+
+        self.request.headers['If-None-Match'] = '"request"'
+        self.assertRaises(cherrypy.HTTPRedirect, cache.reply, key, entry, ['gzip'], 9, 4096)
+        self.request.headers['If-None-Match'] = '"other"'
+        self.assertEqual(cache.reply(key, entry, [], 9, 4096), body)
+
+    @attr('performance')
+    def testCacheHitSpeed(self):
+        """Time of a cache hit compared with formatting the response"""
+        rows = [{"RequestName": "request_%d" % i, "RequestStatus": "running-open"} for i in range(10000)]
+        startTime = time.time()
+        etag = SHA1ETag()
+        body = "".join(JSONFormat().stream_chunked(iter(rows), etag, '{"result": [\n', ']}\n'))
+        formatTime = time.time() - startTime
+
+        cache = ResponseCache()
+        key = self.store(cache, 'request', body)
+        startTime = time.time()
+        self.assertEqual(cache.reply(key, cache.get(key), [], 9, 4096), body)
+        hitTime = time.time() - startTime
+        print("\nformat: %.4f s, cache hit: %.6f s" % (formatTime, hitTime))
+        self.assertTrue(hitTime < formatTime)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,11 +4,17 @@ _DBSReader_t_
 
 Unit test for the DBS helper class.
 """
+from __future__ import print_function
 
+import time
 import unittest
 
+import mock
+from nose.plugins.attrib import attr
+
 from WMCore.Services.DBS.DBS3Reader import DBS3Reader as DBSReader
 from WMCore.Services.DBS.DBSErrors import DBSReaderError
+from WMQuality.Emulators.DBSClient.MockDbsApi import MockDbsApi
 from WMQuality.Emulators.EmulatedUnitTestCase import EmulatedUnitTestCase
 
 # A small dataset that should always exist
@@ -25,6 +31,28 @@ PARENT_BLOCK = PARENT_DATASET + '#929366bc-0c31-11e1-b764-003048caaace'
 PARENT_FILE = '/store/data/ComissioningHI/Cosmics/RAW/v1/000/181/369/662EAD44-300C-E111-A709-BCAEC518FF62.root'
 
 
+class SlowMockDbsApi(MockDbsApi):
+    """
+    Emulated DBS with a fixed latency for every call
+    """
+    latency = 0.05
+
+    def genericLookup(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super(SlowMockDbsApi, self).genericLookup(*args, **kwargs)
+
+
+class CountingMockDbsApi(MockDbsApi):
+    """
+    Emulated DBS which counts the DbsApi objects created
+    """
+    instances = 0
+
+    def __init__(self, url, **contact):
+        CountingMockDbsApi.instances += 1
+        super(CountingMockDbsApi, self).__init__(url)
+
+
 class DBSReaderTest(EmulatedUnitTestCase):
     def setUp(self):
         """
@@ -295,6 +323,60 @@ class DBSReaderTest(EmulatedUnitTestCase):
 
         self.assertRaises(DBSReaderError, self.dbs.getFileBlockWithParents, BLOCK + 'asas')
 
+    def testGetFileBlocks(self):
+        """getFileBlocks returns several blocks, listed concurrently"""
+        self.dbs = DBSReader(self.endpoint)
+        blocks = self.dbs.getFileBlocks([BLOCK, BLOCK_WITH_PARENTS])
+        self.assertItemsEqual([BLOCK, BLOCK_WITH_PARENTS], blocks.keys())
+        self.assertEqual(blocks[BLOCK], self.dbs.getFileBlock(BLOCK)[BLOCK])
+        self.assertEqual(blocks[BLOCK_WITH_PARENTS],
+                         self.dbs.getFileBlock(BLOCK_WITH_PARENTS)[BLOCK_WITH_PARENTS])
+
+        blocks = self.dbs.getFileBlocks([BLOCK_WITH_PARENTS], withParents=True)
+        self.assertEqual(blocks, self.dbs.getFileBlockWithParents(BLOCK_WITH_PARENTS))
+
+        # the same with serial calls
+        self.dbs = DBSReader(self.endpoint, parallelCalls=1)
+        self.assertEqual(blocks, self.dbs.getFileBlocks([BLOCK_WITH_PARENTS], withParents=True))
+
+        self.assertEqual({}, self.dbs.getFileBlocks([]))
+        self.assertRaises(DBSReaderError, self.dbs.getFileBlocks, [BLOCK, BLOCK + 'asas'])
+
+    def testParallelDbsApiReuse(self):
+        """the DbsApi objects of the parallel calls are reused across calls"""
+        with mock.patch('WMCore.Services.DBS.DBS3Reader.DbsApi', new=CountingMockDbsApi):
+            CountingMockDbsApi.instances = 0
+            self.dbs = DBSReader(self.endpoint, parallelCalls=4)
+            blocks = self.dbs.getFileBlocks([BLOCK, BLOCK_WITH_PARENTS], withParents=True)
+            created = CountingMockDbsApi.instances
+            self.assertTrue(1 < created <= 1 + 4)
+
+            for _ in range(3):
+                self.assertEqual(blocks, self.dbs.getFileBlocks([BLOCK, BLOCK_WITH_PARENTS], withParents=True))
+                self.dbs.getFileBlock(BLOCK)
+            self.assertEqual(CountingMockDbsApi.instances, created)
+
+    @attr('performance')
+    def testGetFileBlocksPerformance(self):
+        """compare listing blocks one by one and concurrently with a slow DBS"""
+        blockNames = [BLOCK, BLOCK_WITH_PARENTS]
+        with mock.patch('WMCore.Services.DBS.DBS3Reader.DbsApi', new=SlowMockDbsApi):
+            self.dbs = DBSReader(self.endpoint, parallelCalls=1)
+            startTime = time.time()
+            serialBlocks = {}
+            for blockName in blockNames:
+                serialBlocks.update(self.dbs.getFileBlockWithParents(blockName))
+            serialTime = time.time() - startTime
+
+            self.dbs = DBSReader(self.endpoint, parallelCalls=8)
+            startTime = time.time()
+            parallelBlocks = self.dbs.getFileBlocks(blockNames, withParents=True)
+            parallelTime = time.time() - startTime
+
+        self.assertEqual(serialBlocks, parallelBlocks)
+        print("%d blocks with %.2f s latency: serial %.2f s, parallel %.2f s" %
+              (len(blockNames), SlowMockDbsApi.latency, serialTime, parallelTime))
+
     def testGetFiles(self):
         """getFiles returns files in dataset"""
         self.dbs = DBSReader(self.endpoint)
@@ -10,7 +10,7 @@ from WMCore.Services.WMStats.DataStruct.RequestInfoCollection \
     import RequestInfoCollection, RequestInfo
 
 from WMCore_t.Services_t.WMStats_t.WMStatsDocGenerator \
-   import generate_reqmgr_schema, sample_request_info, sample_complete
+   import generate_reqmgr_schema, generate_agent_requests, sample_request_info, sample_complete
     
 class WMStatsTest(unittest.TestCase):
     """
@@ -109,6 +109,68 @@ class WMStatsTest(unittest.TestCase):
         requests = self.wmstatsReader.getRequestSummaryWithJobInfo(schema[0]['RequestName'])
         self.assertEqual(requests.keys(), [schema[0]['RequestName']])
         
+    def testRequestJobInfoCache(self):
+        """
+        _testRequestJobInfoCache_
+
+        Verify that the cache follows the request and job info changes and
+        returns the same data as the views.
+        """
+        schema = generate_reqmgr_schema(4)
+        for request in schema[:3]:
+            self.reqDBWriter.insertGenericRequest(request)
+            self.reqDBWriter.updateRequestStatus(request['RequestName'], "running-open")
+        # the fourth request isn't in ReqMgr yet, only its job info
+        for doc in generate_agent_requests(4, 2):
+            self.wmstatsReader.couchDB.commitOne(doc)
+
+        uncached = self.wmstatsReader.getActiveData(jobInfoFlag=True)
+        cache = self.wmstatsReader.enableCache(staleTolerance=0)
+        self.assertEqual(self.wmstatsReader.getActiveData(jobInfoFlag=True), uncached)
+        self.assertEqual(cache.reloads, 1)
+        self.assertEqual(cache.getStats()['misses'], 1)
+        trackedWorkflows = lambda: set([x[0] for x in cache.jobDocs.values()])
+        self.assertEqual(trackedWorkflows(), set([x['RequestName'] for x in schema[:3]]))
+
+        # status change, new job info and removed request
+        requestName = schema[0]['RequestName']
+        self.reqDBWriter.updateRequestStatus(requestName, "completed")
+        newDoc = generate_agent_requests(1)[0]
+        newDoc['timestamp'] += 100
+        self.wmstatsReader.couchDB.commitOne(newDoc)
+        self.reqDBWriter.updateRequestStatus(schema[1]['RequestName'], "normal-archived")
+        self.reqDBWriter.insertGenericRequest(schema[3])
+        self.reqDBWriter.updateRequestStatus(schema[3]['RequestName'], "running-open")
+
+        requests = self.wmstatsReader.getActiveData(jobInfoFlag=True)
+        self.wmstatsReader.cache = None
+        self.assertEqual(requests, self.wmstatsReader.getActiveData(jobInfoFlag=True))
+        self.wmstatsReader.cache = cache
+        self.assertEqual(requests[requestName]['RequestStatus'], "completed")
+        self.assertEqual(requests[requestName]['AgentJobInfo'][newDoc['agent_url']]['timestamp'],
+                         newDoc['timestamp'])
+        self.assertFalse(schema[1]['RequestName'] in requests)
+        self.assertTrue('AgentJobInfo' in requests[schema[3]['RequestName']])
+        # the job info of requests leaving the tracked statuses is dropped
+        self.assertEqual(trackedWorkflows(), set([x['RequestName'] for x in schema if x != schema[1]]))
+        self.assertEqual(cache.reloads, 1)
+        self.assertEqual(cache.getStats()['hits'], 1)
+
+        # queries the cache doesn't cover go to couch
+        self.assertEqual(self.wmstatsReader.getRequestByNames([schema[1]['RequestName']]).keys(),
+                         [schema[1]['RequestName']])
+        self.assertEqual(self.wmstatsReader.getRequestByStatus(["running-open"], limit=1).keys(),
+                         [schema[2]['RequestName']])
+        self.assertEqual(cache.getStats()['misses'], 2)
+
+        # too many changes to follow
+        cache.maxChanges = 1
+        self.reqDBWriter.updateRequestStatus(requestName, "closed-out")
+        self.reqDBWriter.updateRequestStatus(schema[2]['RequestName'], "completed")
+        requests = self.wmstatsReader.getRequestByStatus(["closed-out"])
+        self.assertEqual(requests.keys(), [requestName])
+        self.assertEqual(cache.reloads, 2)
+
     def testCompletedCheck(self):
         self.assertEqual(RequestInfo(sample_request_info).isWorkflowFinished(), False)
         self.assertEqual(RequestInfo(sample_complete).isWorkflowFinished(), True)
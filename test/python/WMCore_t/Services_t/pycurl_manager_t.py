@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+_pycurl_manager_t_
+
+Unit tests for the concurrent requests of the pycurl RequestHandler,
+run against a local stub HTTP server.
+"""
+from __future__ import print_function
+
+import json
+import threading
+import time
+import unittest
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import pycurl
+from nose.plugins.attrib import attr
+
+from WMCore.Services.pycurl_manager import RequestHandler
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answer GET requests with a JSON record holding the query parameters,
+    after sleeping for the number of seconds given by the delay parameter.
+    """
+    protocol_version = 'HTTP/1.1'
+    # ResponseHeader takes any header line mentioning HTTP for the status line
+    server_version = 'StubServer/1.0'
+    sys_version = ''
+
+    def do_GET(self):
+        query = dict(urlparse.parse_qsl(urlparse.urlparse(self.path).query))
+        time.sleep(float(query.get('delay', 0)))
+        body = json.dumps([{'path': urlparse.urlparse(self.path).path}])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class PycurlManagerTest(unittest.TestCase):
+    """
+    _PycurlManagerTest_
+
+    Test concurrent requests with the pycurl RequestHandler.
+    """
+
+    def setUp(self):
+        self.server = StubServer(('127.0.0.1', 0), StubHandler)
+        self.url = 'http://127.0.0.1:%d/data' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+    def testMultirequest(self):
+        """
+        _testMultirequest_
+
+        Verify that every request returns its record, updated with the
+        request parameters.
+        """
+        handler = RequestHandler()
+        parray = [{'idx': str(i)} for i in range(25)]
+        results = list(handler.multirequest(self.url, parray, maxconcurrent=5))
+
+        self.assertEqual(len(results), 25)
+        self.assertEqual(sorted([int(x['idx']) for x in results]), range(25))
+        for result in results:
+            self.assertEqual(result['path'], '/data')
+
+        # the handles went back to the pool for the next calls
+        self.assertEqual(len(handler.curlpool), 5)
+        self.assertEqual(len(list(handler.multirequest(self.url, parray))), 25)
+        return
+
+    def testConcurrency(self):
+        """
+        _testConcurrency_
+
+        Verify that requests are really in flight at the same time and that
+        results are yielded in completion order.
+        """
+        handler = RequestHandler()
+        parray = [{'delay': '0.5', 'idx': '0'}] + \
+                 [{'delay': '0.1', 'idx': str(i)} for i in range(1, 10)]
+
+        startTime = time.time()
+        results = list(handler.multirequest(self.url, parray, maxconcurrent=10))
+        self.assertTrue(time.time() - startTime < 1.5)
+        self.assertEqual(results[-1]['idx'], '0')
+        return
+
+    def testTimeout(self):
+        """
+        _testTimeout_
+
+        Verify that a request timing out doesn't affect the other ones.
+        """
+        handler = RequestHandler()
+        requests = [{'url': self.url, 'params': {'delay': '3'}, 'timeout': 1},
+                    {'url': self.url, 'params': {'delay': '0'}}]
+        results = list(handler.multi_request(requests))
+
+        self.assertEqual(len(results), 2)
+        okResults = [x for x in results if x[3] is None]
+        errResults = [x for x in results if x[3] is not None]
+        self.assertEqual(len(okResults), 1)
+        self.assertEqual(okResults[0][1].status, 200)
+        self.assertEqual(len(errResults), 1)
+        self.assertTrue(isinstance(errResults[0][3], pycurl.error))
+        self.assertEqual(errResults[0][0]['params'], {'delay': '3'})
+
+        self.assertRaises(pycurl.error, list,
+                          handler.multirequest(self.url, [{'delay': '3'}], timeout=1))
+        return
+
+    @attr('performance')
+    def testThroughput(self):
+        """
+        _testThroughput_
+
+        Print the request throughput against a server with 50 ms latency for
+        growing concurrency.
+        """
+        handler = RequestHandler()
+        parray = [{'delay': '0.05', 'idx': str(i)} for i in range(200)]
+        for concurrency in [1, 2, 5, 10, 20, 50]:
+            startTime = time.time()
+            results = list(handler.multirequest(self.url, parray, maxconcurrent=concurrency))
+            elapsed = time.time() - startTime
+            self.assertEqual(len(results), len(parray))
+            print("concurrency %3d: %7.1f requests/s" % (concurrency, len(parray) / elapsed))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,11 +5,19 @@ _TrivialFileCatalog_t_
 Test the parsing of the TFC.
 """
 
+from __future__ import print_function
+
+import glob
 import os
+import random
+import re
+import time
 import unittest
 import nose
 import tempfile
 
+from nose.plugins.attrib import attr
+
 from xml.dom.minidom import parseString
 from WMCore.WMBase import getTestBase
 
@@ -20,6 +28,81 @@ from WMCore.Storage.TrivialFileCatalog import tfcFilename, tfcProtocol, readTFC,
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
 
 
+class LegacyTrivialFileCatalog(TrivialFileCatalog):
+    """
+    The matching engine of the catalog as it was: a scan of all the
+    mappings for every match, without cache
+    """
+
+    def _doMatch(self, protocol, path, style, caller):
+        for mapping in self[style]:
+            if mapping['protocol'] != protocol:
+                continue
+            if mapping['path-match-expr'].match(path) or mapping["chain"] != None:
+                if mapping["chain"] != None:
+                    oldpath = path
+                    path = caller(mapping["chain"], path)
+                    if not path:
+                        continue
+                splitList = []
+                if len(mapping['path-match-expr'].split(path, 1)) > 1 :
+                    for split in range(len(mapping['path-match-expr'].split(path, 1))):
+                        s = mapping['path-match-expr'].split(path, 1)[split]
+                        if s:
+                            splitList.append(s)
+                else:
+                    path = oldpath
+                    continue
+                result = mapping['result']
+                for split in range(len(splitList)):
+                    result = result.replace("$" + str(split + 1), splitList[split])
+                return result
+
+        return None
+
+    def matchLFN(self, protocol, lfn):
+        return self._doMatch(protocol, lfn, "lfn-to-pfn", self.matchLFN)
+
+    def matchPFN(self, protocol, pfn):
+        return self._doMatch(protocol, pfn, "pfn-to-lfn", self.matchPFN)
+
+
+def randomPaths(tfc, rng, nPaths):
+    """
+    Paths built from the literal parts of the path-match of the catalog
+    rules, with random directories, file names and edits
+    """
+    literals = set(["/store/", "/store/user/fred/", "/store/unmerged/", "//store/", "/", ""])
+    for mappings in tfc.values():
+        for mapping in mappings:
+            for literal in re.split(r"[\^$()*+?\[\]|]|\.\*", mapping['path-match']):
+                literals.add(literal.replace("\\", ""))
+    literals = sorted(literals)
+    pieces = ["data", "LoadTest07_FNAL_01_a_b", ".LTgenerated.T1_US_FNAL.x", "file1.root",
+              "fileA.root", "0", "?SFN=", "srm://", "1.root"]
+
+    paths = []
+    for _ in range(nPaths):
+        path = rng.choice(literals)
+        for _ in range(rng.randint(0, 4)):
+            path += rng.choice(pieces + literals) + rng.choice(["/", "", "_"])
+        if rng.random() < 0.2 and path:
+            index = rng.randrange(len(path))
+            path = path[:index] + rng.choice(["", "/", "x", "$1"]) + path[index + 1:]
+        paths.append(path)
+    return paths
+
+
+def matchOrError(match, protocol, path):
+    """
+    Result of a match, or the type of the error it raised
+    """
+    try:
+        return match(protocol, path)
+    except Exception as ex:
+        return type(ex)
+
+
 class TrivialFileCatalogTest(unittest.TestCase):
     def setUp(self):
         pass
@@ -214,6 +297,88 @@ class TrivialFileCatalogTest(unittest.TestCase):
         pfn = tfc.matchLFN('srmv2', in_lfn)
         self.assertEqual(out_pfn, pfn)
 
+    def assertLegacyEquivalent(self, tfc, paths, protocols):
+        """
+        Check that the catalog matches the paths as the legacy engine
+        """
+        legacy = LegacyTrivialFileCatalog()
+        legacy.update(tfc)
+        for protocol in protocols:
+            for path in paths:
+                for match, legacyMatch in [(tfc.matchLFN, legacy.matchLFN), (tfc.matchPFN, legacy.matchPFN)]:
+                    self.assertEqual(matchOrError(match, protocol, path),
+                                     matchOrError(legacyMatch, protocol, path),
+                                     "%s %s %s" % (match.__name__, protocol, path))
+
+    def testLegacyEquivalence(self):
+        """
+        _testLegacyEquivalence_
+
+        The indexed and cached matching gives the results of the legacy
+        engine for random paths on the sample catalogs, cached or not
+        """
+        rng = random.Random(20161018)
+        tfcFiles = glob.glob(os.path.join(getTestBase(), "WMCore_t/Storage_t", "*TrivialFileCatalog.xml"))
+        self.assertTrue(tfcFiles)
+        for tfcFile in tfcFiles:
+            tfc = readTFC(tfcFile)
+            tfc.matchCacheSize = 100
+            protocols = sorted(set(x['protocol'] for mappings in tfc.values() for x in mappings))
+            paths = randomPaths(tfc, rng, 300)
+            # and the pfns of the lfns
+            pfns = [matchOrError(tfc.matchLFN, rng.choice(protocols), path) for path in paths[:100]]
+            paths += [pfn for pfn in pfns if isinstance(pfn, basestring)]
+            self.assertLegacyEquivalent(tfc, paths + rng.sample(paths, 100), protocols + ["missing"])
+        return
+
+    def testLegacyEquivalenceCorners(self):
+        """
+        _testLegacyEquivalenceCorners_
+
+        Chains, chains which don't match, empty matches and many groups
+        are resolved as with the legacy engine
+        """
+        tfc = TrivialFileCatalog()
+        tfc.addMapping("direct", "/+(.*)", "/castor/cern.ch/cms/$1")
+        tfc.addMapping("direct", "x*", "/x/$1/$2")
+        tfc.addMapping("stageout", "/+store/(.*)", "$1", chain="direct")
+        tfc.addMapping("stageout", "(.*)", "/other/$1")
+        tfc.addMapping("broken", "(.*)", "$1", chain="missing")
+        tfc.addMapping("broken", "(.*)", "$1")
+        tfc.addMapping("groups", "/(a)?(b)?/(c)(d)(e)(f)(g)(h)(i)(j)(k)", "$1-$2-$3-$10-$11")
+        tfc.addMapping("empty", "(.*)", "[$1]")
+        tfc.addMapping("loop", "(.*)", "$1", chain="loop")
+        paths = ["/store/a", "//store/a/b", "/castor/a", "store", "abxc", "", "x", "xx/y",
+                 "/b/cdefghijk", "/ab/cdefghijk", "/a/cdefghijk"]
+        protocols = ["direct", "stageout", "broken", "groups", "empty", "loop"]
+        self.assertLegacyEquivalent(tfc, paths, protocols)
+
+        # adding a mapping resets the cache
+        self.assertEqual(tfc.matchLFN("new", "/store/a"), None)
+        tfc.addMapping("new", "(.*)", "$1")
+        self.assertEqual(tfc.matchLFN("new", "/store/a"), "/store/a")
+        return
+
+    @attr('performance')
+    def testMatchTime(self):
+        """
+        _testMatchTime_
+
+        Time to match the LFNs of a stage out with the legacy and the
+        cached engine
+        """
+        tfcFile = os.path.join(getTestBase(), "WMCore_t/Storage_t", "T1_US_FNAL_TrivialFileCatalog.xml")
+        tfc = readTFC(tfcFile)
+        legacy = LegacyTrivialFileCatalog()
+        legacy.update(tfc)
+        lfns = ["/store/unmerged/data/Run2016/file%d.root" % (i % 500) for i in range(20000)]
+        for name, catalog in [("legacy", legacy), ("cached", tfc)]:
+            startTime = time.time()
+            for lfn in lfns:
+                catalog.matchLFN("srmv2", lfn)
+            print("\n%s: %.4f secs" % (name, time.time() - startTime))
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+_JobCacheIndex_t_
+
+Unit tests for the job cache index files.
+"""
+from __future__ import print_function
+
+import os
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.Job import Job
+from WMCore.WMBS.JobCacheIndex import INDEX_NAME, jobCacheRecord, appendJobCacheRecords, \
+                                      readJobCacheIndex
+
+
+class JobCacheIndexTest(unittest.TestCase):
+    """
+    _JobCacheIndexTest_
+
+    Test writing and reading job cache index files.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.indexPath = os.path.join(self.testDir, INDEX_NAME)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def makeJob(self, jobID):
+        """
+        _makeJob_
+
+        Create a job with the fields needed by the JobSubmitter.
+        """
+        job = Job(name="testJob-%d" % jobID)
+        job["id"] = jobID
+        job["possiblePSN"] = set(["T1_US_FNAL", "T2_CH_CERN"])
+        job["sandbox"] = "/somewhere/sandbox.tar.bz2"
+        job["ownerDN"] = "/DC=ch/CN=Steve"
+        job["estimatedMemoryUsage"] = 2300.0
+        job["inputDatasetLocations"] = ["T1_US_FNAL_Disk"]
+        job["allowOpportunistic"] = False
+        return job
+
+    def testRecord(self):
+        """
+        _testRecord_
+
+        Verify that the record holds the submitter fields and that the number
+        of cores can be overridden by the baggage.
+        """
+        job = self.makeJob(1)
+        record = jobCacheRecord(job)
+        self.assertEqual(record["name"], "testJob-1")
+        self.assertEqual(record["possiblePSN"], set(["T1_US_FNAL", "T2_CH_CERN"]))
+        self.assertEqual(record["numberOfCores"], 1)
+        self.assertFalse("input_files" in record)
+
+        job.addBaggageParameter("numberOfCores", 8)
+        self.assertEqual(jobCacheRecord(job)["numberOfCores"], 8)
+        job["numberOfCores"] = 4
+        self.assertEqual(jobCacheRecord(job)["numberOfCores"], 4)
+        return
+
+    def testReadWrite(self):
+        """
+        _testReadWrite_
+
+        Append records in two batches and read them back, all of them or only
+        some jobs.
+        """
+        self.assertEqual(readJobCacheIndex(self.indexPath), {})
+
+        records = dict([(x, jobCacheRecord(self.makeJob(x))) for x in range(1, 11)])
+        appendJobCacheRecords(self.indexPath, [(x, records[x]) for x in range(1, 6)])
+        appendJobCacheRecords(self.indexPath, [(x, records[x]) for x in range(6, 11)])
+
+        self.assertEqual(readJobCacheIndex(self.indexPath), records)
+        self.assertEqual(readJobCacheIndex(self.indexPath, jobIDs=set([2, 7, 20])),
+                         {2: records[2], 7: records[7]})
+        return
+
+    def testTruncatedIndex(self):
+        """
+        _testTruncatedIndex_
+
+        Verify that a record being written is ignored and that files written
+        with another format are not read.
+        """
+        records = [(x, jobCacheRecord(self.makeJob(x))) for x in range(1, 4)]
+        appendJobCacheRecords(self.indexPath, records)
+        with open(self.indexPath, 'rb') as handle:
+            data = handle.read()
+
+        with open(self.indexPath, 'wb') as handle:
+            handle.write(data[:-3])
+        self.assertEqual(sorted(readJobCacheIndex(self.indexPath).keys()), [1, 2])
+
+        with open(self.indexPath, 'wb') as handle:
+            handle.write("WMJCX" + data[5:])
+        self.assertEqual(readJobCacheIndex(self.indexPath), {})
+
+        with open(self.indexPath, 'wb') as handle:
+            handle.write(data[:3])
+        self.assertEqual(readJobCacheIndex(self.indexPath), {})
+        return
+
+    @attr('performance')
+    def testReadPerformance(self):
+        """
+        _testReadPerformance_
+
+        Compare reading a collection of 1000 jobs from the index against
+        unpickling every job.
+        """
+        nJobs = 1000
+        records = []
+        for jobID in range(nJobs):
+            job = self.makeJob(jobID)
+            job["input_files"] = [{"lfn": "/store/data/file%d.root" % x, "events": 1000,
+                                   "locations": set(["T1_US_FNAL_Disk"])} for x in range(20)]
+            jobDir = os.path.join(self.testDir, "job_%d" % jobID)
+            os.mkdir(jobDir)
+            with open(os.path.join(jobDir, "job.pkl"), "w") as handle:
+                pickle.dump(job, handle, pickle.HIGHEST_PROTOCOL)
+            records.append((jobID, jobCacheRecord(job)))
+        appendJobCacheRecords(self.indexPath, records)
+
+        startTime = time.time()
+        for jobID in range(nJobs):
+            with open(os.path.join(self.testDir, "job_%d" % jobID, "job.pkl"), "r") as handle:
+                jobCacheRecord(pickle.load(handle))
+        pickleTime = time.time() - startTime
+
+        startTime = time.time()
+        self.assertEqual(len(readJobCacheIndex(self.indexPath)), nJobs)
+        indexTime = time.time() - startTime
+
+        print("%d jobs: %.3f s unpickling jobs (%.0f files/s), %.3f s reading the index" %
+              (nJobs, pickleTime, nJobs / pickleTime, indexTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
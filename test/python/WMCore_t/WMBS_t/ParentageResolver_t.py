@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+_ParentageResolver_t_
+
+Unit tests for the bulk parentage resolution.
+"""
+
+import unittest
+
+from WMCore.WMBS.ParentageResolver import ParentageResolver
+
+
+class MockGetParentInfo(object):
+    """
+    _MockGetParentInfo_
+
+    Answer Files.GetParentInfo queries from a child -> parents dictionary and
+    a set of merged files, counting the number of queries.
+    """
+    def __init__(self, parentage, merged):
+        self.parentage = parentage
+        self.merged = merged
+        self.queries = []
+
+    def execute(self, childLFNs, conn = None, transaction = False):
+        self.queries.append(sorted(childLFNs))
+        results = []
+        for child in childLFNs:
+            for parent in self.parentage.get(child, []):
+                row = {"child_lfn": child, "lfn": parent,
+                       "merged": int(parent in self.merged),
+                       "gplfn": None, "gpmerged": None}
+                grandParents = self.parentage.get(parent, [])
+                if not grandParents:
+                    results.append(row)
+                for grandParent in grandParents:
+                    gpRow = dict(row)
+                    gpRow["gplfn"] = grandParent
+                    gpRow["gpmerged"] = int(grandParent in self.merged)
+                    results.append(gpRow)
+        return results
+
+
+class ParentageResolverTest(unittest.TestCase):
+    """
+    _ParentageResolverTest_
+
+    Test the ParentageResolver against a recursive, one file at a time
+    resolution.
+    """
+
+    def setUp(self):
+        # Two generations of unmerged files (redneck parentage) between the
+        # job output and the merged files.
+        self.parentage = {"output1": ["unmergedA"],
+                          "output2": ["unmergedA", "mergedX"],
+                          "output3": ["unmergedB"],
+                          "output4": ["unmergedC"],
+                          "unmergedA": ["unmergedD"],
+                          "unmergedB": ["mergedY"],
+                          "unmergedC": ["unmergedE"],
+                          "unmergedD": ["unmergedF"],
+                          "unmergedE": [],
+                          "unmergedF": ["mergedZ", "mergedW"]}
+        self.merged = set(["mergedX", "mergedY", "mergedZ", "mergedW"])
+        return
+
+    def recursiveParents(self, action, lfn):
+        """
+        _recursiveParents_
+
+        Reference implementation, the former JobFactory.findParent
+        """
+        newParents = set()
+        for parentInfo in action.execute([lfn]):
+            if int(parentInfo["merged"]) == 1:
+                newParents.add(parentInfo["lfn"])
+            elif parentInfo['gpmerged'] == None:
+                continue
+            elif int(parentInfo["gpmerged"]) == 1:
+                newParents.add(parentInfo["gplfn"])
+            else:
+                newParents.update(self.recursiveParents(action, parentInfo['gplfn']))
+        return newParents
+
+    def testFindParents(self):
+        """
+        _testFindParents_
+
+        Verify that the resolver finds the same parents as the recursive
+        resolution, with one query per generation.
+        """
+        lfns = ["output1", "output2", "output3", "output4", "noParents"]
+        action = MockGetParentInfo(self.parentage, self.merged)
+        resolver = ParentageResolver(action)
+        results = resolver.findParents(lfns)
+
+        reference = MockGetParentInfo(self.parentage, self.merged)
+        for lfn in lfns:
+            self.assertEqual(results[lfn], self.recursiveParents(reference, lfn))
+
+        self.assertEqual(results["output1"], set(["mergedZ", "mergedW"]))
+        self.assertEqual(results["output2"], set(["mergedX", "mergedZ", "mergedW"]))
+        self.assertEqual(results["output3"], set(["mergedY"]))
+        self.assertEqual(results["output4"], set())
+        self.assertEqual(results["noParents"], set())
+
+        self.assertEqual(action.queries, [sorted(lfns), ["unmergedD", "unmergedE"]])
+        self.assertTrue(len(reference.queries) > len(action.queries))
+        return
+
+    def testMemoization(self):
+        """
+        _testMemoization_
+
+        Verify that resolved files are not queried again until reset.
+        """
+        action = MockGetParentInfo(self.parentage, self.merged)
+        resolver = ParentageResolver(action)
+        resolver.findParents(["output1"])
+        self.assertEqual(len(action.queries), 2)
+
+        self.assertEqual(resolver.findParents(["output1", "unmergedD"]),
+                         {"output1": set(["mergedZ", "mergedW"]),
+                          "unmergedD": set(["mergedZ", "mergedW"])})
+        self.assertEqual(len(action.queries), 2)
+
+        resolver.reset()
+        resolver.findParents(["output1"])
+        self.assertEqual(len(action.queries), 4)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+_ProcessSampler_t_
+
+Unit tests for the /proc based process tree sampler.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WMRuntime.ProcessSampler import PAGE_SIZE, ProcessTreeSampler, processTree, sampleProcess
+
+# parent which forks a child, both holding 20 MB
+TREE_SCRIPT = """
+import os, sys, time
+data = bytearray(20 * 1024 * 1024)
+if os.fork() == 0:
+    data = bytearray(20 * 1024 * 1024)
+sys.stdout.write("ready\\n")
+sys.stdout.flush()
+time.sleep(60)
+"""
+
+
+class ProcessSamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.procDir = tempfile.mkdtemp()
+        self.process = None
+
+    def tearDown(self):
+        shutil.rmtree(self.procDir)
+        if self.process is not None:
+            for pid in processTree(self.process.pid):
+                os.kill(pid, 9)
+            self.process.wait()
+
+    def startTree(self):
+        """
+        Start a process with a forked child, wait for both to allocate
+        their memory
+        """
+        self.process = subprocess.Popen([sys.executable, "-c", TREE_SCRIPT], stdout=subprocess.PIPE)
+        self.process.stdout.readline()
+        self.process.stdout.readline()
+        return self.process.pid
+
+    def fakeProcess(self, pid, ppid, comm="cmsRun", vsize=1000, rss=100, pss=None, utime=250, stime=50):
+        """
+        Write the /proc files of a process in the fake proc dir
+        """
+        pidDir = os.path.join(self.procDir, str(pid))
+        os.mkdir(pidDir)
+        with open(os.path.join(pidDir, "stat"), 'w') as handle:
+            fields = ["S", ppid] + [0] * 9 + [utime, stime] + [0] * 4 + [3] + [0] * 10
+            handle.write("%d (%s) %s\n" % (pid, comm, " ".join(str(x) for x in fields)))
+        with open(os.path.join(pidDir, "statm"), 'w') as handle:
+            handle.write("%d %d 0 0 0 0 0\n" % (vsize, rss))
+        if pss is not None:
+            with open(os.path.join(pidDir, "smaps_rollup"), 'w') as handle:
+                handle.write("00400000-7ffd0000 ---p 00000000 00:00 0   [rollup]\n")
+                handle.write("Rss:    %d kB\nPss:    %d kB\nShared_Clean:    0 kB\n" % (rss * PAGE_SIZE, pss))
+        return
+
+    def testProcessTree(self):
+        """
+        _testProcessTree_
+
+        The children and their own children are part of the tree
+        """
+        self.fakeProcess(10, 1)
+        self.fakeProcess(11, 10, comm="weird) name (")
+        self.fakeProcess(12, 11)
+        self.fakeProcess(13, 1)
+        os.mkdir(os.path.join(self.procDir, "self"))
+        self.assertEqual(processTree(10, self.procDir), [10, 11, 12])
+        self.assertEqual(processTree(13, self.procDir), [13])
+        self.assertEqual(processTree(14, self.procDir), [])
+        return
+
+    def testSampleProcess(self):
+        """
+        _testSampleProcess_
+
+        Memory in kB and CPU time in seconds
+        """
+        self.fakeProcess(10, 1, vsize=1000, rss=100, pss=123, utime=250, stime=50)
+        self.fakeProcess(11, 1)
+        usage = sampleProcess(10, self.procDir)
+        self.assertEqual(usage['vsize'], 1000 * PAGE_SIZE)
+        self.assertEqual(usage['rss'], 100 * PAGE_SIZE)
+        self.assertEqual(usage['pss'], 123)
+        self.assertEqual(usage['nThreads'], 3)
+        self.assertEqual(usage['cpuTime'], 300 / float(os.sysconf('SC_CLK_TCK')))
+        self.assertEqual(sampleProcess(11, self.procDir)['pss'], None)
+        self.assertEqual(sampleProcess(12, self.procDir), None)
+        return
+
+    def testRollingStats(self):
+        """
+        _testRollingStats_
+
+        The tree usage is the sum of its processes, the min, max and
+        average are kept over the samples
+        """
+        self.fakeProcess(10, 1, rss=100, pss=300)
+        self.fakeProcess(11, 10, rss=200, pss=200)
+        sampler = ProcessTreeSampler(10, self.procDir)
+        sample = sampler.sample()
+        self.assertEqual(sample['pids'], [10, 11])
+        self.assertEqual(sample['rss'], 300 * PAGE_SIZE)
+        self.assertEqual(sample['pss'], 500)
+
+        shutil.rmtree(os.path.join(self.procDir, "11"))
+        sample = sampler.sample()
+        self.assertEqual(sample['nProcesses'], 1)
+        self.assertEqual(sampler.nSamples, 2)
+        self.assertEqual(sampler.summary()['pss'], {'min': 300, 'max': 500, 'avg': 400.0, 'n': 2})
+        self.assertEqual(sampler.summary()['nProcesses']['max'], 2)
+
+        # no PSS for one process, no PSS for the tree
+        self.fakeProcess(12, 10, rss=200)
+        self.assertEqual(sampler.sample()['pss'], None)
+        self.assertEqual(sampler.summary()['pss']['n'], 2)
+
+        shutil.rmtree(os.path.join(self.procDir, "10"))
+        self.assertEqual(sampler.sample(), None)
+        return
+
+    def testLiveTree(self):
+        """
+        _testLiveTree_
+
+        Sample a real process and its forked child
+        """
+        pid = self.startTree()
+        sample = ProcessTreeSampler(pid).sample()
+        self.assertEqual(sample['nProcesses'], 2)
+        self.assertTrue(sample['rss'] > 40 * 1024)
+        self.assertTrue(sample['vsize'] >= sample['rss'])
+        if sample['pss'] is not None:
+            # the pages of the parent shared with the child are counted once
+            self.assertTrue(40 * 1024 < sample['pss'] < sample['rss'])
+        return
+
+    @attr('performance')
+    def testSamplingTime(self):
+        """
+        _testSamplingTime_
+
+        Time to sample a process tree from /proc and to run ps on its parent
+        """
+        pid = self.startTree()
+        nSamples = 20
+        startTime = time.time()
+        for _ in range(nSamples):
+            subprocess.check_output("ps -p %i -o pid,ppid,rss,vsize,pcpu,pmem,cmd -ww | grep %i" % (pid, pid),
+                                    shell=True)
+        print("\nps: %.4f secs per sample" % ((time.time() - startTime) / nSamples))
+
+        sampler = ProcessTreeSampler(pid)
+        startTime = time.time()
+        for _ in range(nSamples):
+            sampler.sample()
+        print("/proc: %.4f secs per sample" % ((time.time() - startTime) / nSamples))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,7 @@ class SandboxCreator_t(unittest.TestCase):
 
         self.fileExistsTest( extractDir + "/WMSandbox")
         self.fileExistsTest( extractDir + "/WMSandbox/WMWorkload.pkl")
+        self.fileExistsTest( extractDir + "/WMSandbox/WMWorkload.pkl.index")
         self.fileExistsTest( extractDir + "/WMSandbox/__init__.py")
         self.fileExistsTest( extractDir + "/WMSandbox/FirstTask/__init__.py")
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+_WMSpecCache_t_
+
+Unit tests for the process wide workload spec cache.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WMSpec.WMSpecCache import MEMORY_FACTOR, WMSpecCache, getSpecCache, specCacheSummary
+from WMCore.WMSpec.WMSpecIndex import LazyWMWorkloadHelper, loadWorkload, specIndexPath, writeSpecIndex
+from WMCore_t.WMSpec_t.TestSpec import testWorkload as makeTestWorkload
+from WMCore_t.WMSpec_t.WMSpecIndex_t import bigWorkload
+
+
+class WMSpecCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def saveWorkload(self, name, workload=None, index=True):
+        workload = workload or makeTestWorkload()
+        specPath = os.path.join(self.testDir, "%s.pkl" % name)
+        workload.save(specPath)
+        if index:
+            writeSpecIndex(workload, specPath)
+        return specPath
+
+    def testHitsAndReload(self):
+        """
+        _testHitsAndReload_
+
+        Specs are loaded once until they change on disk
+        """
+        cache = WMSpecCache()
+        specPath = self.saveWorkload("spec1")
+        workload = cache.getWorkload(specPath)
+        self.assertTrue(isinstance(workload, LazyWMWorkloadHelper))
+        self.assertTrue(cache.getWorkload(specPath) is workload)
+        self.assertEqual(cache.getStats()["hits"], 1)
+        self.assertEqual(cache.getStats()["misses"], 1)
+
+        # private copies aren't cached
+        self.assertFalse(cache.getWorkload(specPath, readOnly=False) is workload)
+
+        # the spec was saved by another process
+        os.utime(specPath, (time.time() + 10, time.time() + 10))
+        self.assertFalse(cache.getWorkload(specPath) is workload)
+        self.assertEqual(cache.getStats()["misses"], 2)
+        self.assertEqual(cache.getStats()["specs"], 1)
+        # the index is older than the spec, the workload is loaded in full
+        self.assertEqual(cache.getStats()["size"], MEMORY_FACTOR * os.path.getsize(specPath))
+        return
+
+    def testInvalidation(self):
+        """
+        _testInvalidation_
+
+        Saving a spec or updating the jobs of a workflow drops the cached workload
+        """
+        specPath = self.saveWorkload("spec1", index=False)
+        otherPath = self.saveWorkload("spec2")
+        cache = getSpecCache()
+        workload = cache.getWorkload(specPath)
+        cache.getWorkload(otherPath)
+        self.assertTrue(cache.getWorkload(specPath) is workload)
+
+        workload.save(specPath)
+        self.assertFalse(cache.getWorkload(specPath) is workload)
+
+        cache.invalidateWorkflow("TestWorkload")
+        self.assertFalse(specPath in cache._specs)
+        self.assertFalse(otherPath in cache._specs)
+
+        cache.getWorkload(specPath)
+        cache.invalidate()
+        self.assertEqual(cache.getStats()["size"], 0)
+        self.assertTrue(specCacheSummary().startswith("spec cache "))
+        return
+
+    def testEviction(self):
+        """
+        _testEviction_
+
+        The least recently used specs are dropped to stay under maxSize
+        """
+        specPaths = [self.saveWorkload("spec%d" % i, index=False) for i in range(4)]
+        specSize = MEMORY_FACTOR * os.path.getsize(specPaths[0])
+        cache = WMSpecCache(maxSize=3 * specSize)
+        for specPath in specPaths[:3]:
+            cache.getWorkload(specPath)
+        cache.getWorkload(specPaths[0])
+        cache.getWorkload(specPaths[3])
+        self.assertEqual(sorted(cache._specs.keys()), sorted([specPaths[0], specPaths[2], specPaths[3]]))
+        self.assertEqual(cache.getStats()["size"], 3 * specSize)
+
+        cache = WMSpecCache(maxSize=specSize - 1)
+        cache.getWorkload(specPaths[0])
+        self.assertEqual(cache.getStats()["specs"], 0)
+
+        # the number of specs is bounded as well
+        cache = WMSpecCache(maxSpecs=2)
+        for specPath in specPaths:
+            cache.getWorkload(specPath)
+        self.assertEqual(list(cache._specs.keys()), specPaths[2:])
+        return
+
+    def testMaterializedCharge(self):
+        """
+        _testMaterializedCharge_
+
+        Lazy workloads are charged the size of their index, until they get
+        materialized and are charged in full
+        """
+        specPaths = [self.saveWorkload("spec%d" % i) for i in range(3)]
+        indexSize = MEMORY_FACTOR * os.path.getsize(specIndexPath(specPaths[0]))
+        specSize = MEMORY_FACTOR * os.path.getsize(specPaths[0])
+        cache = WMSpecCache(maxSize=2 * specSize)
+        workloads = [cache.getWorkload(specPath) for specPath in specPaths]
+        self.assertEqual(cache.getStats()["size"], 3 * indexSize)
+        self.assertEqual(cache.getStats()["lazySpecs"], 3)
+
+        workloads[1].materialize()
+        self.assertEqual(cache.getStats()["size"], 2 * indexSize + specSize)
+        self.assertEqual(cache.getStats()["lazySpecs"], 2)
+
+        # the least recently used spec makes room for the second full one
+        workloads[2].materialize()
+        self.assertEqual(cache.getStats()["specs"], 2)
+        self.assertEqual(cache.getStats()["size"], 2 * specSize)
+        self.assertTrue(cache.getWorkload(specPaths[2]) is workloads[2])
+
+        # a materialized workload too large for the cache is dropped
+        cache = WMSpecCache(maxSize=specSize - 1)
+        cache.getWorkload(specPaths[0]).materialize()
+        self.assertEqual(cache.getStats()["specs"], 0)
+        self.assertEqual(cache.getStats()["size"], 0)
+        return
+
+    @attr('performance')
+    def testCachedLoadingTime(self):
+        """
+        _testCachedLoadingTime_
+
+        Time to get a spec every cycle with and without the cache
+        """
+        specPath = self.saveWorkload("big", bigWorkload(50), index=False)
+        cache = WMSpecCache()
+        nCycles = 20
+        for name, load in [("uncached", loadWorkload), ("cached", cache.getWorkload)]:
+            startTime = time.time()
+            for _ in range(nCycles):
+                load(specPath).listAllTaskPathNames()
+            print("\n%s: %.4f secs per cycle" % (name, (time.time() - startTime) / nCycles))
+        print(cache.getStats())
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
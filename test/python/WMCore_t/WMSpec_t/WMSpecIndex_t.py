@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+_WMSpecIndex_t_
+
+Unit tests for the spec index sidecar and the lazy workload helper.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WMSpec.WMSpecIndex import LazyWMWorkloadHelper, loadWorkload, \
+    specIndexPath, writeSpecIndex
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
+from WMCore_t.WMSpec_t.TestSpec import TestWorkloadFactory, testWorkload
+
+
+def bigWorkload(nTasks):
+    """
+    Workload with nTasks processing tasks, each with a LogCollect task
+    """
+    factory = TestWorkloadFactory()
+    factory.emulation = False
+    workload = factory.createWorkload()
+    for i in range(nTasks):
+        procTask = workload.newTask("Processing%d" % i)
+        factory.setupProcessingTask(procTask)
+        procTask.setSplittingAlgorithm("EventAwareLumiBased", events_per_job=100 + i)
+        factory.addLogCollectTask(procTask)
+        factory.addOutputModule(procTask, "TestOutputModule", "RECO", "SomeFilter")
+    return workload
+
+
+class WMSpecIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.specPath = os.path.join(self.testDir, "WMWorkload.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def saveWorkload(self, workload):
+        workload.setSandbox("/some/where/Sandbox.tar.bz2")
+        for task in workload.taskIterator():
+            for taskNode in task.taskIterator():
+                setattr(taskNode.data.input, 'sandbox', "/some/where/Sandbox.tar.bz2")
+        workload.save(self.specPath)
+        writeSpecIndex(workload, self.specPath)
+
+    def testLazyLoading(self):
+        """
+        _testLazyLoading_
+
+        The summarised attributes are the ones of the full workload and are
+        read without unpickling the spec
+        """
+        workload = testWorkload()
+        self.saveWorkload(workload)
+        lazyWorkload = loadWorkload(self.specPath)
+        self.assertTrue(isinstance(lazyWorkload, LazyWMWorkloadHelper))
+
+        self.assertEqual(lazyWorkload.name(), workload.name())
+        self.assertEqual(lazyWorkload.getOwner(), workload.getOwner())
+        self.assertEqual(lazyWorkload.getAllowOpportunistic(), workload.getAllowOpportunistic())
+        for taskPath in workload.listAllTaskPathNames():
+            task = workload.getTaskByPath(taskPath)
+            lazyTask = lazyWorkload.getTaskByPath(taskPath)
+            self.assertEqual(lazyTask.getPathName(), task.getPathName())
+            self.assertEqual(lazyTask.name(), task.name())
+            self.assertEqual(lazyTask.taskType(), task.taskType())
+            self.assertEqual(lazyTask.jobSplittingParameters(), task.jobSplittingParameters())
+            self.assertEqual(lazyTask.getSandbox(), "/some/where/Sandbox.tar.bz2")
+            self.assertEqual(lazyTask.getInputDatasetPath(), task.getInputDatasetPath())
+            self.assertEqual(lazyTask.getSwVersion(), task.getSwVersion())
+            self.assertEqual(lazyTask.getScramArch(), task.getScramArch())
+            self.assertEqual(lazyTask.getNumberOfCores(), task.getNumberOfCores())
+            self.assertEqual(lazyTask.listGenerators(), task.listGenerators())
+        self.assertFalse(lazyWorkload.isMaterialized())
+
+        # the copies can be modified
+        lazyTask = lazyWorkload.getTaskByPath("/TestWorkload/ReReco")
+        lazyTask.jobSplittingParameters()["files_per_job"] = 100
+        self.assertEqual(lazyTask.jobSplittingParameters()["files_per_job"], 1)
+
+        # everything else comes from the whole spec
+        self.assertEqual(lazyTask.listAllStepNames(), ["cmsRun1", "stageOut1", "logArch1"])
+        self.assertEqual(lazyWorkload.listAllTaskPathNames(), workload.listAllTaskPathNames())
+        self.assertTrue(lazyWorkload.isMaterialized())
+        return
+
+    def testStaleIndex(self):
+        """
+        _testStaleIndex_
+
+        The index is not used if the spec is saved again or if it's corrupted
+        """
+        workload = testWorkload()
+        self.saveWorkload(workload)
+        workload.setOwner("someoneelse")
+        os.utime(self.specPath, (time.time() + 10, time.time() + 10))
+        wmWorkload = loadWorkload(self.specPath)
+        self.assertTrue(isinstance(wmWorkload, WMWorkloadHelper))
+
+        with open(specIndexPath(self.specPath), 'w') as handle:
+            handle.write("not a pickle")
+        self.assertTrue(isinstance(loadWorkload(self.specPath), WMWorkloadHelper))
+
+        os.remove(specIndexPath(self.specPath))
+        self.assertTrue(isinstance(loadWorkload(self.specPath), WMWorkloadHelper))
+        return
+
+    @attr('performance')
+    def testLoadingTime(self):
+        """
+        _testLoadingTime_
+
+        Time to read the task attributes used by the JobCreator from the
+        whole spec and from the index
+        """
+        workload = bigWorkload(50)
+        self.saveWorkload(workload)
+        taskPaths = workload.listAllTaskPathNames()
+        print("\nspec: %d bytes, index: %d bytes" % (os.path.getsize(self.specPath),
+                                                    os.path.getsize(specIndexPath(self.specPath))))
+
+        def readTasks(wmWorkload):
+            for taskPath in taskPaths:
+                task = wmWorkload.getTaskByPath(taskPath)
+                task.jobSplittingParameters()
+                task.getNumberOfCores()
+                task.getSwVersion()
+                wmWorkload.getOwner()
+
+        nLoads = 20
+        for name, load in [("full unpickling", self.loadFull), ("lazy loading", loadWorkload)]:
+            startTime = time.time()
+            for _ in range(nLoads):
+                readTasks(load(self.specPath))
+            print("%s: %.4f secs per spec" % (name, (time.time() - startTime) / nLoads))
+        return
+
+    @staticmethod
+    def loadFull(specPath):
+        wmWorkload = WMWorkloadHelper(WMWorkload("workload"))
+        wmWorkload.load(specPath)
+        return wmWorkload
+
+
+if __name__ == '__main__':
+    unittest.main()
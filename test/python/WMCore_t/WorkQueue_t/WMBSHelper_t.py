@@ -5,10 +5,15 @@ _WMBSHelper_t_
 Unit tests for the WMBSHelper class.
 """
 
+from __future__ import print_function
+
 import os
 import threading
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.BossAir.BossAirAPI import BossAirAPI
 from WMCore.Configuration import loadConfigurationFile
 from WMCore.DAOFactory import DAOFactory
@@ -38,6 +43,30 @@ mcArgs = getMCArgs()
 BLOCK1 = '03fe83c2-0c23-11e1-b764-003048caaace'
 BLOCK2 = '04be2fcc-0b8f-11e1-b764-003048caaace'
 
+def makeBlockWithParents(nFiles, nParents, pnns):
+    """
+    _makeBlockWithParents_
+
+    Build a DBS block with parents where every parent file is shared by
+    nFiles / nParents files.
+    """
+    parents = []
+    for i in range(nParents):
+        parents.append({'LogicalFileName': '/store/data/parent/file%d.root' % i,
+                        'FileSize': 2000, 'NumberOfEvents': 200,
+                        'Checksum': '1234', 'Adler32': 'abcd',
+                        'LumiList': [{'RunNumber': 1, 'LumiSectionNumber': [i + 1]}]})
+    files = []
+    for i in range(nFiles):
+        parent = parents[i % nParents]
+        files.append({'LogicalFileName': '/store/data/child/file%d.root' % i,
+                      'FileSize': 1000, 'NumberOfEvents': 100,
+                      'Checksum': '5678', 'Adler32': 'ef01',
+                      'LumiList': [{'RunNumber': 1,
+                                    'LumiSectionNumber': parent['LumiList'][0]['LumiSectionNumber']}],
+                      'ParentList': [dict(parent)]})
+    return {'Files': files, 'PhEDExNodeNames': pnns, 'IsOpen': False}
+
 def getFirstTask(wmspec):
     """Return the 1st top level task"""
     # http://www.logilab.org/ticket/8774
@@ -957,6 +986,62 @@ class WMBSHelperTest(EmulatedUnitTestCase):
         for child in wmbs.topLevelFileset.files:
             self.assertEqual(len(child["parents"]), 1)  # one parent per child
 
+    def testSharedParents(self):
+        """
+        _testSharedParents_
+
+        Verify that parents shared by several files of a block are only
+        created once in WMBS and DBSBuffer, and that injecting the block
+        again doesn't create anything.
+        """
+        resourceControl = ResourceControl()
+        resourceControl.insertSite(siteName = 'site1', pnn = 'goodse.cern.ch',
+                                   ceName = 'site1', plugin = "TestPlugin")
+        block = makeBlockWithParents(20, 4, ['goodse.cern.ch'])
+        myThread = threading.currentThread()
+
+        wmbs = WMBSHelper(self.wmspec, self.topLevelTask.name(), "SomeBlock", cachepath = self.workDir)
+        dummySub, numFiles = wmbs.createSubscriptionAndAddFiles(block = block)
+        self.assertEqual(numFiles, 24)
+        wmbs.topLevelFileset.loadData()
+        self.assertEqual(len(wmbs.topLevelFileset.files), 20)
+        for child in wmbs.topLevelFileset.files:
+            self.assertEqual(len(child["parents"]), 1)
+
+        dbsBufferFiles = myThread.dbi.processData("SELECT lfn FROM dbsbuffer_file")[0].fetchall()
+        self.assertEqual(len(dbsBufferFiles), 24)
+        self.assertEqual(len(set(dbsBufferFiles)), 24)
+        dbsBufferChecksums = myThread.dbi.processData("SELECT fileid FROM dbsbuffer_file_checksums")[0].fetchall()
+        self.assertEqual(len(dbsBufferChecksums), 48)
+
+        wmspec = self.createWMSpec("TestSpec1")
+        wmbs = WMBSHelper(wmspec, getFirstTask(wmspec).name(), "SomeBlock", cachepath = self.workDir)
+        dummySub, numFiles = wmbs.createSubscriptionAndAddFiles(block = block)
+        self.assertEqual(numFiles, 0)
+        dbsBufferFiles = myThread.dbi.processData("SELECT lfn FROM dbsbuffer_file")[0].fetchall()
+        self.assertEqual(len(dbsBufferFiles), 24)
+        return
+
+    @attr('performance')
+    def testBlockInjectionPerformance(self):
+        """
+        _testBlockInjectionPerformance_
+
+        Time the injection of a block with 5000 files and shared parents.
+        """
+        resourceControl = ResourceControl()
+        resourceControl.insertSite(siteName = 'site1', pnn = 'goodse.cern.ch',
+                                   ceName = 'site1', plugin = "TestPlugin")
+        block = makeBlockWithParents(5000, 500, ['goodse.cern.ch'])
+
+        wmbs = WMBSHelper(self.wmspec, self.topLevelTask.name(), "SomeBlock", cachepath = self.workDir)
+        startTime = time.time()
+        dummySub, numFiles = wmbs.createSubscriptionAndAddFiles(block = block)
+        injectionTime = time.time() - startTime
+        self.assertEqual(numFiles, 5500)
+        print("Injected a block of 5000 files with 500 parents in %.2f s" % injectionTime)
+        return
+
     def testMCFakeFileInjection(self):
         """Inject fake Monte Carlo files into WMBS"""
 